@@ -0,0 +1,49 @@
+"""add_message_composite_indexes
+
+Revision ID: d3e5f7a9b1c2
+Revises: c2d4e6f8a9b0
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d3e5f7a9b1c2"
+down_revision: Union[str, Sequence[str], None] = "c2d4e6f8a9b0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("messages", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_messages_session_deleted_create_time",
+            ["session_id", "deleted", "create_time", "id"],
+            unique=False,
+        )
+        batch_op.create_index(
+            "ix_messages_session_deleted_id",
+            ["session_id", "deleted", "id"],
+            unique=False,
+        )
+        batch_op.create_index(
+            "ix_messages_friend_deleted_id",
+            ["friend_id", "deleted", "id"],
+            unique=False,
+        )
+
+    # idx_messages_session_id (init.sql) 是新复合索引的前缀，保留只会增加写放大
+    op.execute("DROP INDEX IF EXISTS idx_messages_session_id")
+
+
+def downgrade() -> None:
+    op.execute("CREATE INDEX IF NOT EXISTS idx_messages_session_id ON messages(session_id)")
+
+    with op.batch_alter_table("messages", schema=None) as batch_op:
+        batch_op.drop_index("ix_messages_friend_deleted_id")
+        batch_op.drop_index("ix_messages_session_deleted_id")
+        batch_op.drop_index("ix_messages_session_deleted_create_time")
@@ -0,0 +1,50 @@
+"""add_message_keyset_pagination
+
+Revision ID: e4f6a8b0c2d4
+Revises: d3e5f7a9b1c2
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e4f6a8b0c2d4"
+down_revision: Union[str, Sequence[str], None] = "d3e5f7a9b1c2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 历史用户消息没有写 friend_id，回填后好友聊天记录可直接按 friend_id 走索引分页
+    op.execute(
+        """
+        UPDATE messages
+        SET friend_id = (
+            SELECT chat_sessions.friend_id FROM chat_sessions
+            WHERE chat_sessions.id = messages.session_id
+        )
+        WHERE friend_id IS NULL
+        """
+    )
+
+    with op.batch_alter_table("group_messages", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_group_messages_group_session_id",
+            ["group_id", "session_id", "id"],
+            unique=False,
+        )
+        batch_op.create_index(
+            "ix_group_messages_group_id_id",
+            ["group_id", "id"],
+            unique=False,
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("group_messages", schema=None) as batch_op:
+        batch_op.drop_index("ix_group_messages_group_id_id")
+        batch_op.drop_index("ix_group_messages_group_session_id")
@@ -0,0 +1,118 @@
+"""add_conversation_summaries
+
+Revision ID: f5a7b9c1d3e5
+Revises: e4f6a8b0c2d4
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import re
+
+from alembic import op
+import sqlalchemy as sa
+from app.db.types import UTCDateTime
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f5a7b9c1d3e5"
+down_revision: Union[str, Sequence[str], None] = "e4f6a8b0c2d4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PREVIEW_MAX_CHARS = 200
+
+
+def _build_preview(content):
+    if not content:
+        return content
+    parts = re.findall(r"<message>(.*?)</message>", content, re.DOTALL)
+    if parts:
+        text = " ".join(part.strip() for part in parts if part.strip())
+    else:
+        text = re.sub(r"</?message>", "", content).strip()
+    return text[:PREVIEW_MAX_CHARS]
+
+
+def upgrade() -> None:
+    op.create_table(
+        "conversation_summaries",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("conversation_type", sa.String(length=20), nullable=False),
+        sa.Column("conversation_id", sa.Integer(), nullable=False),
+        sa.Column("last_message_id", sa.Integer(), nullable=True),
+        sa.Column("last_message_preview", sa.Text(), nullable=True),
+        sa.Column("last_message_role", sa.String(length=20), nullable=True),
+        sa.Column("last_message_sender_id", sa.String(length=64), nullable=True),
+        sa.Column("last_message_time", UTCDateTime(), nullable=True),
+        sa.Column("unread_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("message_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("update_time", UTCDateTime(), nullable=False, server_default=sa.func.current_timestamp()),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_conversation_summaries")),
+        sa.UniqueConstraint("conversation_type", "conversation_id", name="uq_conversation_summary_target"),
+    )
+    with op.batch_alter_table("conversation_summaries", schema=None) as batch_op:
+        batch_op.create_index(batch_op.f("ix_conversation_summaries_id"), ["id"], unique=False)
+        batch_op.create_index(
+            "ix_conversation_summaries_type_time",
+            ["conversation_type", "last_message_time"],
+            unique=False,
+        )
+
+    # 回填好友会话：最后一条未删除消息（排除已删除会话）与消息数
+    op.execute(
+        """
+        INSERT INTO conversation_summaries (
+            conversation_type, conversation_id, last_message_id, last_message_preview,
+            last_message_role, last_message_time, unread_count, message_count, update_time
+        )
+        SELECT 'friend', stats.friend_id, m.id, m.content, m.role, m.create_time,
+               0, stats.message_count, CURRENT_TIMESTAMP
+        FROM (
+            SELECT s.friend_id AS friend_id, MAX(msg.id) AS max_id, COUNT(msg.id) AS message_count
+            FROM messages msg
+            JOIN chat_sessions s ON s.id = msg.session_id
+            WHERE msg.deleted = 0 AND s.deleted = 0
+            GROUP BY s.friend_id
+        ) AS stats
+        JOIN messages m ON m.id = stats.max_id
+        """
+    )
+
+    # 回填群聊会话
+    op.execute(
+        """
+        INSERT INTO conversation_summaries (
+            conversation_type, conversation_id, last_message_id, last_message_preview,
+            last_message_role, last_message_sender_id, last_message_time,
+            unread_count, message_count, update_time
+        )
+        SELECT 'group', stats.group_id, gm.id, gm.content, gm.sender_type, gm.sender_id,
+               gm.create_time, 0, stats.message_count, CURRENT_TIMESTAMP
+        FROM (
+            SELECT group_id, MAX(id) AS max_id, COUNT(id) AS message_count
+            FROM group_messages
+            GROUP BY group_id
+        ) AS stats
+        JOIN group_messages gm ON gm.id = stats.max_id
+        """
+    )
+
+    # 预览需要去掉 <message> 标签并截断，SQL 不便处理，这里逐行修正
+    bind = op.get_bind()
+    rows = bind.execute(sa.text("SELECT id, last_message_preview FROM conversation_summaries")).fetchall()
+    for row_id, content in rows:
+        preview = _build_preview(content)
+        if preview != content:
+            bind.execute(
+                sa.text("UPDATE conversation_summaries SET last_message_preview = :preview WHERE id = :id"),
+                {"preview": preview, "id": row_id},
+            )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("conversation_summaries", schema=None) as batch_op:
+        batch_op.drop_index("ix_conversation_summaries_type_time")
+        batch_op.drop_index(batch_op.f("ix_conversation_summaries_id"))
+
+    op.drop_table("conversation_summaries")
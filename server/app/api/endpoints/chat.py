@@ -1,14 +1,15 @@
-import json
 import logging
 import traceback
-from fastapi import APIRouter, Depends, HTTPException, Body
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, Body, Query, Request
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from app.api import deps
+from app.core.sse import sse_response
 from app.schemas import chat as chat_schemas
-from app.services import chat_service
+from app.services import chat_service, conversation_summary_service
+from app.services.generation_stream import generation_streams
+from app.services.message_cursor import MAX_PAGE_LIMIT, MESSAGE_SCOPE, build_page, decode_cursor
 
 logger = logging.getLogger(__name__)
 
@@ -96,21 +97,55 @@ def read_messages(
     session_id: int,
     skip: int = 0,
     limit: int = 100,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
 ):
     """
     Get messages for a specific session.
+    传入 before_id / after_id 时按 keyset 分页，skip 被忽略。
     """
     # Verify session exists first
     session = chat_service.get_session(db, session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
         
-    messages = chat_service.get_messages(db, session_id=session_id, skip=skip, limit=limit)
+    messages = chat_service.get_messages(
+        db, session_id=session_id, skip=skip, limit=limit, before_id=before_id, after_id=after_id
+    )
     return messages
 
+def _decode_message_cursors(before: Optional[str], after: Optional[str]):
+    try:
+        return decode_cursor(before, MESSAGE_SCOPE), decode_cursor(after, MESSAGE_SCOPE)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/sessions/{session_id}/messages/page", response_model=chat_schemas.MessagePage)
+def read_messages_page(
+    *,
+    db: Session = Depends(deps.get_db),
+    session_id: int,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_LIMIT),
+):
+    """
+    游标分页获取会话消息。不传游标时返回最新一页；before 向上翻更早的消息，after 拉取更新的消息。
+    """
+    session = chat_service.get_session(db, session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    before_id, after_id = _decode_message_cursors(before, after)
+    rows = chat_service.get_messages(
+        db, session_id=session_id, limit=limit + 1, before_id=before_id, after_id=after_id, latest=True
+    )
+    return build_page(rows, limit, MESSAGE_SCOPE, forward=after_id is not None)
+
 @router.post("/sessions/{session_id}/messages")
 async def send_message(
     *,
+    request: Request,
     db: Session = Depends(deps.get_db),
     session_id: int,
     message_in: chat_schemas.MessageCreate,
@@ -118,18 +153,7 @@ async def send_message(
     """
     Send a message to a session and get the AI response via SSE.
     """
-    async def event_generator():
-        async for event_data in chat_service.send_message_stream(db, session_id=session_id, message_in=message_in):
-            # event_data is a dict with 'event' and 'data' keys
-            event_type = event_data.get("event", "message")
-            data_payload = event_data.get("data", {})
-            
-            # Serialize data to JSON
-            json_data = json.dumps(data_payload, ensure_ascii=False)
-            
-            yield f"event: {event_type}\ndata: {json_data}\n\n"
-
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
+    return sse_response(chat_service.send_message_stream(db, session_id=session_id, message_in=message_in), request)
 
 # --- Friend-centric APIs (WeChat-style) ---
 
@@ -140,14 +164,42 @@ def read_friend_messages(
     friend_id: int,
     skip: int = 0,
     limit: int = 200,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
 ):
     """
     Get all messages for a specific friend across all sessions.
     This provides a WeChat-style merged chat history view.
+    传入 before_id / after_id 时按 keyset 分页，skip 被忽略。
     """
-    messages = chat_service.get_messages_by_friend(db, friend_id=friend_id, skip=skip, limit=limit)
+    messages = chat_service.get_messages_by_friend(
+        db, friend_id=friend_id, skip=skip, limit=limit, before_id=before_id, after_id=after_id
+    )
+    if skip == 0 and before_id is None and after_id is None:
+        # 加载最新一页即视为打开会话
+        conversation_summary_service.mark_read(db, conversation_summary_service.FRIEND_CONVERSATION, friend_id)
     return messages
 
+@router.get("/friends/{friend_id}/messages/page", response_model=chat_schemas.MessagePage)
+def read_friend_messages_page(
+    *,
+    db: Session = Depends(deps.get_db),
+    friend_id: int,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = Query(200, ge=1, le=MAX_PAGE_LIMIT),
+):
+    """
+    游标分页获取与好友的合并聊天记录。不传游标时返回最新一页。
+    """
+    before_id, after_id = _decode_message_cursors(before, after)
+    rows = chat_service.get_messages_by_friend(
+        db, friend_id=friend_id, limit=limit + 1, before_id=before_id, after_id=after_id
+    )
+    if before_id is None and after_id is None:
+        conversation_summary_service.mark_read(db, conversation_summary_service.FRIEND_CONVERSATION, friend_id)
+    return build_page(rows, limit, MESSAGE_SCOPE, forward=after_id is not None)
+
 @router.get("/friends/{friend_id}/sessions", response_model=List[chat_schemas.ChatSessionReadWithStats])
 def read_friend_sessions(
     *,
@@ -172,9 +224,22 @@ def clear_friend_messages(
     chat_service.clear_friend_chat_history(db, friend_id=friend_id)
     return {"ok": True}
 
+@router.post("/friends/{friend_id}/read")
+def mark_friend_conversation_read(
+    *,
+    db: Session = Depends(deps.get_db),
+    friend_id: int,
+):
+    """
+    将与该好友的会话未读数清零。
+    """
+    conversation_summary_service.mark_read(db, conversation_summary_service.FRIEND_CONVERSATION, friend_id)
+    return {"ok": True}
+
 @router.post("/friends/{friend_id}/messages")
 async def send_message_to_friend(
     *,
+    request: Request,
     db: Session = Depends(deps.get_db),
     friend_id: int,
     message_in: chat_schemas.MessageCreate,
@@ -189,19 +254,29 @@ async def send_message_to_friend(
         force_new_session,
     )
 
-    async def event_generator():
-        async for event_data in chat_service.send_message_to_friend_stream(
-            db,
-            friend_id=friend_id,
-            message_in=message_in,
-            force_new_session=force_new_session,
-        ):
-            event_type = event_data.get("event", "message")
-            data_payload = event_data.get("data", {})
-            json_data = json.dumps(data_payload, ensure_ascii=False)
-            yield f"event: {event_type}\ndata: {json_data}\n\n"
+    stream = chat_service.send_message_to_friend_stream(
+        db,
+        friend_id=friend_id,
+        message_in=message_in,
+        force_new_session=force_new_session,
+    )
+    return sse_response(stream, request)
 
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
+@router.get("/messages/{message_id}/stream")
+async def reattach_message_stream(
+    *,
+    request: Request,
+    message_id: int,
+    after: int = 0,
+):
+    """
+    重连一条仍在生成（或刚结束、在保留期内）的 AI 消息流。
+    先回放 seq > after 的缓冲事件，再跟随实时事件；每个事件的 SSE id 即 seq。
+    """
+    log = generation_streams.get(message_id)
+    if log is None:
+        raise HTTPException(status_code=404, detail="No active stream for this message")
+    return sse_response(log.subscribe(after=after), request)
 
 @router.post("/messages/{message_id}/recall")
 def recall_message(
@@ -221,6 +296,7 @@ def recall_message(
 @router.post("/sessions/{session_id}/messages/{message_id}/regenerate")
 async def regenerate_message(
     *,
+    request: Request,
     db: Session = Depends(deps.get_db),
     session_id: int,
     message_id: int,
@@ -231,11 +307,4 @@ async def regenerate_message(
     - session_id: ID of the chat session
     - message_id: ID of the AI message to regenerate
     """
-    async def event_generator():
-        async for event_data in chat_service.regenerate_message_stream(db, session_id=session_id, ai_message_id=message_id):
-            event_type = event_data.get("event", "message")
-            data_payload = event_data.get("data", {})
-            json_data = json.dumps(data_payload, ensure_ascii=False)
-            yield f"event: {event_type}\ndata: {json_data}\n\n"
-
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
+    return sse_response(chat_service.regenerate_message_stream(db, session_id=session_id, ai_message_id=message_id), request)
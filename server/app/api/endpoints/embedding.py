@@ -7,6 +7,7 @@ from sqlalchemy.orm import Session
 
 from app.api import deps
 from app.schemas.embedding import EmbeddingSetting, EmbeddingSettingCreate, EmbeddingSettingUpdate
+from app.services.config_snapshot_service import config_snapshot_service
 from app.services.embedding_service import embedding_service
 from app.services.settings_service import SettingsService
 from app.prompt import get_prompt
@@ -69,6 +70,8 @@ def create_embedding_setting(
             "当前向量模型配置ID",
         )
     
+    config_snapshot_service.refresh(db)
+
     # Reload Memobase SDK config
     try:
         from app.services.memo import reload_sdk_config
@@ -107,6 +110,8 @@ def update_embedding_setting(
         raise HTTPException(status_code=404, detail="Embedding setting not found")
     item = embedding_service.update_setting(db=db, db_obj=item, obj_in=item_in)
     
+    config_snapshot_service.refresh(db)
+
     # Reload Memobase SDK config
     try:
         from app.services.memo import reload_sdk_config
@@ -134,6 +139,8 @@ def delete_embedding_setting(
         raise HTTPException(status_code=404, detail="Embedding setting not found")
     item = embedding_service.delete_setting(db=db, db_obj=item)
     
+    config_snapshot_service.refresh(db)
+
     # Reload Memobase SDK config
     try:
         from app.services.memo import reload_sdk_config
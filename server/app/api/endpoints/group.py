@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Body
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from app.api import deps
 from app.schemas import group as group_schemas
+from app.services import conversation_summary_service, group_chat_shared
 from app.services.group_service import group_service
+from app.services.message_cursor import GROUP_MESSAGE_SCOPE, MAX_PAGE_LIMIT, build_page, decode_cursor
 from app.services.memo.constants import DEFAULT_USER_ID
 
 router = APIRouter()
@@ -109,6 +111,18 @@ def remove_group_member(
 
 # --- Group Chat Messaging ---
 
+def _ensure_group_member(db: Session, group_id: int) -> None:
+    from app.models.group import GroupMember
+
+    # 鉴权：检查当前用户是否在群组中
+    member = db.query(GroupMember).filter(
+        GroupMember.group_id == group_id,
+        GroupMember.member_id == DEFAULT_USER_ID,
+        GroupMember.member_type == "user"
+    ).first()
+    if not member:
+        raise HTTPException(status_code=403, detail="Not a member of this group")
+
 @router.get("/group/{id}/messages", response_model=List[group_schemas.GroupMessageRead])
 def read_group_messages(
     *,
@@ -116,22 +130,65 @@ def read_group_messages(
     id: int,
     skip: int = 0,
     limit: int = 100,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
 ):
     """
     获取群组历史消息。
+    传入 before_id / after_id 时按 keyset 分页，skip 被忽略。
     """
-    from app.models.group import GroupMessage, GroupMember
-    
-    # 鉴权：检查当前用户是否在群组中
-    member = db.query(GroupMember).filter(
-        GroupMember.group_id == id,
-        GroupMember.member_id == DEFAULT_USER_ID,
-        GroupMember.member_type == "user"
-    ).first()
-    if not member:
-        raise HTTPException(status_code=403, detail="Not a member of this group")
+    from app.models.group import GroupMessage
+
+    _ensure_group_member(db, id)
 
-    messages = db.query(GroupMessage).filter(GroupMessage.group_id == id).order_by(GroupMessage.create_time.desc()).offset(skip).limit(limit).all()
+    if before_id is not None or after_id is not None:
+        return group_chat_shared.fetch_group_history(
+            db, group_id=id, session_id=None, before_id=before_id, after_id=after_id, limit=limit
+        )
+
+    messages = db.query(GroupMessage).filter(GroupMessage.group_id == id).order_by(GroupMessage.id.desc()).offset(skip).limit(limit).all()
+    if skip == 0:
+        # 加载最新一页即视为打开会话
+        conversation_summary_service.mark_read(db, conversation_summary_service.GROUP_CONVERSATION, id)
     return list(reversed(messages))
 
+@router.get("/group/{id}/messages/page", response_model=group_schemas.GroupMessagePage)
+def read_group_messages_page(
+    *,
+    db: Session = Depends(deps.get_db),
+    id: int,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_LIMIT),
+):
+    """
+    游标分页获取群组历史消息。不传游标时返回最新一页。
+    """
+    _ensure_group_member(db, id)
+    try:
+        before_id = decode_cursor(before, GROUP_MESSAGE_SCOPE)
+        after_id = decode_cursor(after, GROUP_MESSAGE_SCOPE)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    rows = group_chat_shared.fetch_group_history(
+        db, group_id=id, session_id=None, before_id=before_id, after_id=after_id, limit=limit + 1
+    )
+    if before_id is None and after_id is None:
+        conversation_summary_service.mark_read(db, conversation_summary_service.GROUP_CONVERSATION, id)
+    return build_page(rows, limit, GROUP_MESSAGE_SCOPE, forward=after_id is not None)
+
 
+
+@router.post("/group/{id}/read", response_model=bool)
+def mark_group_conversation_read(
+    *,
+    db: Session = Depends(deps.get_db),
+    id: int,
+):
+    """
+    将群聊会话未读数清零。
+    """
+    _ensure_group_member(db, id)
+    conversation_summary_service.mark_read(db, conversation_summary_service.GROUP_CONVERSATION, id)
+    return True
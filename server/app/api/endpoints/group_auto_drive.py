@@ -1,9 +1,8 @@
-﻿from fastapi import APIRouter, Depends, HTTPException, Body, Query, Response
-from fastapi.responses import StreamingResponse
+﻿from fastapi import APIRouter, Depends, HTTPException, Body, Query, Response, Request
 from sqlalchemy.orm import Session
-import json
 
 from app.api import deps
+from app.core.sse import sse_response
 from app.schemas import group_auto_drive as ad_schemas
 from app.services.group_auto_drive_service import group_auto_drive_service
 from app.services.memo.constants import DEFAULT_USER_ID
@@ -40,6 +39,7 @@ async def start_auto_drive(
 @router.get("/group/auto-drive/stream")
 async def stream_auto_drive(
     *,
+    request: Request,
     db: Session = Depends(deps.get_db),
     group_id: int = Query(...),
 ):
@@ -51,14 +51,7 @@ async def stream_auto_drive(
     if not member:
         raise HTTPException(status_code=403, detail="Not a member of this group")
 
-    async def event_generator():
-        async for event_data in group_auto_drive_service.stream_auto_drive(group_id):
-            event_type = event_data.get("event", "message")
-            data_payload = event_data.get("data", {})
-            json_data = json.dumps(data_payload, ensure_ascii=False)
-            yield f"event: {event_type}\ndata: {json_data}\n\n"
-
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
+    return sse_response(group_auto_drive_service.stream_auto_drive(group_id), request)
 
 
 @router.post("/group/auto-drive/pause", response_model=ad_schemas.AutoDriveStateRead)
@@ -1,10 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
-import json
 import logging
 
 from app.api import deps
+from app.core.sse import sse_response
 from app.schemas import group as group_schemas
 from app.services.group_chat_service import group_chat_service
 from app.services.memo.constants import DEFAULT_USER_ID
@@ -16,6 +15,7 @@ logger = logging.getLogger(__name__)
 @router.post("/group/{group_id}/messages")
 async def send_group_message_stream(
     *,
+    request: Request,
     db: Session = Depends(deps.get_db),
     group_id: int,
     message_in: group_schemas.GroupMessageCreate,
@@ -39,19 +39,13 @@ async def send_group_message_stream(
         force_new_session,
     )
 
-    async def event_generator():
-        async for event_data in group_chat_service.send_group_message_stream(
-            db,
-            group_id,
-            message_in,
-            force_new_session=force_new_session,
-        ):
-            event_type = event_data.get("event", "message")
-            data_payload = event_data.get("data", {})
-            json_data = json.dumps(data_payload, ensure_ascii=False)
-            yield f"event: {event_type}\ndata: {json_data}\n\n"
-
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
+    stream = group_chat_service.send_group_message_stream(
+        db,
+        group_id,
+        message_in,
+        force_new_session=force_new_session,
+    )
+    return sse_response(stream, request)
 
 @router.post("/group/{group_id}/sessions", response_model=group_schemas.GroupSessionRead)
 def create_group_session(
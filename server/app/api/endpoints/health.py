@@ -1,8 +1,12 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from app.api import deps
+from app.core.config import settings
+from app.db.session import engine
+from app.db.sqlite_tuning import get_sqlite_status
 from app.services.llm_service import llm_service
 from app.services.embedding_service import embedding_service
+from app.vendor.memobase_server import connectors as memo_connectors
 
 router = APIRouter()
 
@@ -14,5 +18,18 @@ def health_check(db: Session = Depends(deps.get_db)):
     return {
         "status": "ok",
         "llm_configured": llm_config is not None,
-        "embedding_configured": embedding_config is not None
+        "embedding_configured": embedding_config is not None,
+        "sqlite": {
+            "configured": {
+                "journal_mode": settings.SQLITE_JOURNAL_MODE,
+                "synchronous": settings.SQLITE_SYNCHRONOUS,
+                "mmap_size": settings.SQLITE_MMAP_SIZE,
+                "cache_size": settings.SQLITE_CACHE_SIZE,
+                "temp_store": settings.SQLITE_TEMP_STORE,
+                "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+                "maintenance_interval_seconds": settings.SQLITE_MAINTENANCE_INTERVAL_SECONDS,
+            },
+            "main": get_sqlite_status(engine),
+            "memobase": get_sqlite_status(memo_connectors.DB_ENGINE),
+        },
     }
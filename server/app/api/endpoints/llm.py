@@ -5,6 +5,7 @@ import logging
 
 from app.api import deps
 from app.schemas.llm import LLMConfig, LLMConfigRead, LLMConfigUpdate, LLMConfigCreate
+from app.services.config_snapshot_service import config_snapshot_service
 from app.services.llm_service import llm_service
 from app.services.settings_service import SettingsService
 from app.prompt import get_prompt
@@ -49,6 +50,8 @@ def create_llm_config(
             "当前聊天模型配置ID",
         )
 
+    config_snapshot_service.refresh(db)
+
     # Reload Memobase SDK config
     try:
         from app.services.memo import reload_sdk_config
@@ -71,6 +74,8 @@ def update_llm_config_by_id(
     if not config:
         raise HTTPException(status_code=404, detail="LLM configuration not found")
 
+    config_snapshot_service.refresh(db)
+
     # Reload Memobase SDK config
     try:
         from app.services.memo import reload_sdk_config
@@ -97,6 +102,8 @@ def delete_llm_config(
         raise HTTPException(status_code=404, detail="LLM configuration not found")
     config = llm_service.delete_config(db, config)
 
+    config_snapshot_service.refresh(db)
+
     # Reload Memobase SDK config
     try:
         from app.services.memo import reload_sdk_config
@@ -158,6 +165,8 @@ def update_llm_config(
             "当前聊天模型配置ID",
         )
     
+    config_snapshot_service.refresh(db)
+
     # Reload Memobase SDK config
     try:
         from app.services.memo import reload_sdk_config
@@ -24,8 +24,7 @@ def update_settings_bulk(
     db: Session = Depends(get_db)
 ):
     """批量更新指定分组的设置"""
-    for key, value in payload.settings.items():
-        SettingsService.set_setting(db, group_name, key, value)
+    SettingsService.set_settings(db, group_name, payload.settings)
     return {"status": "success"}
 
 @router.get("/{group_name}/{key}", response_model=Any)
@@ -1,7 +1,9 @@
 import logging
+import os
 import httpx
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 from typing import List
 
@@ -9,12 +11,15 @@ from app.api import deps
 from app.services.voice_service import get_voice_service
 from app.schemas.voice import VoiceTimbreOut, VoiceTestRequest, VoiceTestResponse
 from app.prompt import get_prompt
+from app.services.voice_audio_store import AUDIO_MEDIA_TYPES, voice_audio_store
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 DEFAULT_DASHSCOPE_BASE_URL = "https://dashscope.aliyuncs.com/api/v1"
 DEFAULT_TTS_MODEL = "qwen3-tts-instruct-flash"
+# 内容寻址文件永不变更，可长期缓存
+VOICE_AUDIO_CACHE_CONTROL = "public, max-age=31536000, immutable"
 
 
 def _normalize_base_url(base_url: str | None) -> str:
@@ -106,3 +111,20 @@ def test_voice_config(
         voice_id=payload.voice_id,
         audio_url=audio_url,
     )
+
+
+@router.get("/audio/cas/{shard}/{filename}")
+def get_voice_audio(shard: str, filename: str, request: Request):
+    """
+    语音消息音频（内容寻址存储）。支持 Range 请求，便于客户端边下边播。
+    """
+    resolved = voice_audio_store.resolve_file(shard, filename)
+    if not resolved:
+        raise HTTPException(status_code=404, detail="音频不存在")
+    abs_path, key = resolved
+    etag = f'"{key}"'
+    headers = {"Cache-Control": VOICE_AUDIO_CACHE_CONTROL, "ETag": etag}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    ext = os.path.splitext(filename)[1]
+    return FileResponse(abs_path, media_type=AUDIO_MEDIA_TYPES.get(ext, "application/octet-stream"), headers=headers)
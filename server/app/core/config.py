@@ -31,6 +31,59 @@ class Settings(BaseSettings):
     MEMOBASE_EMBEDDING_MODEL: str = "text-embedding-3-small"
     MEMOBASE_EMBEDDING_DIM: int = 1536
 
+    # SQLite 连接调优（同时作用于 doudou.db 与 memobase.db）
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024  # bytes
+    SQLITE_CACHE_SIZE: int = -64000  # 负数表示 KiB，约 64MB
+    SQLITE_TEMP_STORE: str = "MEMORY"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MAINTENANCE_INTERVAL_SECONDS: int = 600  # 周期性 wal_checkpoint + optimize
+    SQLITE_WRITE_BATCH_WINDOW_MS: float = 5.0  # 单写者队列的 group commit 窗口
+    SQLITE_WRITE_MAX_BATCH_SIZE: int = 64
+
+    # SSE 流式输出：增量合并窗口与可选 gzip 压缩
+    SSE_COALESCE_WINDOW_MS: float = 25.0  # <= 0 关闭合并
+    SSE_COALESCE_MAX_CHARS: int = 256
+    SSE_COMPRESSION: bool = False
+
+    # 可重连生成流：每条生成的事件环形缓冲容量、结束后保留时长、最长存活时间
+    STREAM_LOG_CAPACITY: int = 4096
+    STREAM_LOG_GRACE_SECONDS: float = 120.0
+    STREAM_LOG_MAX_AGE_SECONDS: float = 1800.0
+
+    # TTS 内容寻址音频缓存的磁盘配额（仅淘汰未被消息引用的文件）
+    VOICE_AUDIO_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    # 单聊流式输出时按分段流水线合成语音（voice_segment 事件），关闭则回复结束后整段合成
+    VOICE_PIPELINED_TTS: bool = True
+    # 推测式情绪指令：首段先用该好友上次的指令（或无指令）合成，情绪指令并行生成后用于其余分段
+    VOICE_SPECULATIVE_EMOTION: bool = True
+    VOICE_EMOTION_CACHE_SIZE: int = 256
+    # 语音音频入库前转码为 Opus/OGG（需要本机 ffmpeg，留空则从 PATH 查找；找不到时保留原格式）
+    VOICE_TRANSCODE_OPUS: bool = True
+    VOICE_OPUS_BITRATE: str = "32k"
+    VOICE_FFMPEG_PATH: str = ""
+    # TTS / 音频下载共用的进程级 HTTP 连接池；并发按 TTS 服务商（base_url 主机）限制
+    TTS_HTTP2: bool = True  # 需要安装 h2，未安装时退回 HTTP/1.1
+    TTS_MAX_CONNECTIONS: int = 16
+    TTS_KEEPALIVE_EXPIRY_SECONDS: float = 90.0
+    # 与原 MAX_TTS_PARALLELISM 一致取 2；注意现在是进程级（同一服务商所有消息共享），按服务商配额可在下面单独放宽
+    TTS_MAX_PARALLELISM: int = 2
+    TTS_PROVIDER_PARALLELISM: dict[str, int] = {}
+    TTS_DOWNLOAD_CHUNK_BYTES: int = 64 * 1024
+    # 群聊本地发言人路由：置信度低于阈值时才调用 LLM 管理者
+    GROUP_SPEAKER_ROUTER_ENABLED: bool = True
+    GROUP_SPEAKER_ROUTER_MIN_CONFIDENCE: float = 0.6
+    # 自驱（接力/辩论）每次发言携带的历史上限，超出时裁掉最早的轮次；0 表示不限
+    AUTO_DRIVE_CONTEXT_MAX_TOKENS: int = 32000
+    # 自驱流水线：当前发言期间预先准备下一位（主持词/配置/提示词），语音合成不阻塞下一位
+    AUTO_DRIVE_LOOKAHEAD: bool = True
+    # 群聊多人回复：同一 LLM 服务商同时进行的生成数（按 provider/base_url 主机计，@ 的成员优先）
+    GROUP_GENERATION_MAX_PARALLELISM: int = 3
+    GROUP_LLM_PROVIDER_PARALLELISM: dict[str, int] = {}
+    # SSE 公平合并：每个参与者子流每轮最多连续输出的事件数
+    GROUP_STREAM_MERGE_QUANTUM: int = 8
+
     class Config:
         case_sensitive = True
 
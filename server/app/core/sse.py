@@ -0,0 +1,192 @@
+"""
+SSE 传输层。
+
+流式回复里每个 LLM delta 以前都是一次 json.dumps + 一次 yield，快模型一条回复就是
+上千次小写入，事件循环和 Electron 渲染进程都吃不消。这里统一处理：
+- 连续的同类增量事件（message / model_thinking 等，除 delta 外字段都相同）在
+  时间窗口（SSE_COALESCE_WINDOW_MS）或字数上限（SSE_COALESCE_MAX_CHARS）内合并
+- orjson 序列化（未安装时退回 json），事件头 "event: xxx\\ndata: " 预编码缓存
+- 可选的按连接 gzip 压缩（SSE_COMPRESSION 且客户端声明 Accept-Encoding: gzip），
+  每个分块 Z_SYNC_FLUSH，不影响实时性
+"""
+
+import asyncio
+import json
+import time
+import zlib
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from app.core.config import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson 为可选依赖
+    orjson = None
+
+# 只有这些事件的 data.delta 可以安全拼接
+COALESCABLE_EVENTS = frozenset({"message", "model_thinking", "recall_thinking"})
+# 合并时不参与比较的字段：delta 拼接；seq（群聊子流内序号）逐条递增，合并后保留最后一个
+_MERGED_KEYS = frozenset({"delta", "seq"})
+
+_EVENT_HEADERS: Dict[str, bytes] = {}
+_MISSING = object()
+
+
+def _event_header(event: str) -> bytes:
+    header = _EVENT_HEADERS.get(event)
+    if header is None:
+        header = f"event: {event}\ndata: ".encode("utf-8")
+        _EVENT_HEADERS[event] = header
+    return header
+
+
+def dumps(data: Any) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass
+    return json.dumps(data, ensure_ascii=False, default=str).encode("utf-8")
+
+
+def encode_event(event: str, data: Any, seq: Optional[int] = None) -> bytes:
+    header = _event_header(event)
+    if seq is not None:
+        # 可重连流的序号，客户端断线后以 ?after=<id> 续传
+        header = b"id: %d\n" % seq + header
+    return b"".join((header, dumps(data), b"\n\n"))
+
+
+class _PendingDelta:
+    __slots__ = ("event", "data", "parts", "size", "deadline", "seq")
+
+    def __init__(self, event: str, data: dict, deadline: float, seq: Optional[int]):
+        self.event = event
+        self.data = data
+        self.seq = seq
+        self.parts: List[str] = [data["delta"]]
+        self.size = len(data["delta"])
+        self.deadline = deadline
+
+    def matches(self, event: str, data: dict) -> bool:
+        if event != self.event or len(data) != len(self.data):
+            return False
+        return all(k in _MERGED_KEYS or self.data.get(k, _MISSING) == v for k, v in data.items())
+
+    def add(self, data: dict, seq: Optional[int]) -> None:
+        delta = data["delta"]
+        self.parts.append(delta)
+        self.size += len(delta)
+        if "seq" in data:
+            self.data = {**self.data, "seq": data["seq"]}
+        if seq is not None:
+            self.seq = seq
+
+    def encode(self) -> bytes:
+        data = dict(self.data)
+        data["delta"] = "".join(self.parts)
+        return encode_event(self.event, data, self.seq)
+
+
+def _coalescable(event: str, data: Any) -> bool:
+    return event in COALESCABLE_EVENTS and isinstance(data, dict) and isinstance(data.get("delta"), str)
+
+
+async def iter_sse(
+    source: AsyncIterator[dict],
+    *,
+    window_ms: Optional[float] = None,
+    max_chars: Optional[int] = None,
+) -> AsyncIterator[bytes]:
+    """
+    把 {"event": ..., "data": ...} 事件流编码成 SSE 字节流，并合并相邻的增量事件。
+    window_ms <= 0 时关闭合并。
+    """
+    window = (settings.SSE_COALESCE_WINDOW_MS if window_ms is None else window_ms) / 1000.0
+    limit = settings.SSE_COALESCE_MAX_CHARS if max_chars is None else max_chars
+    pending: Optional[_PendingDelta] = None
+    next_item: Optional[asyncio.Future] = None
+    try:
+        while True:
+            if pending is None:
+                fut, next_item = next_item, None
+                try:
+                    item = await (fut if fut is not None else source.__anext__())
+                except StopAsyncIteration:
+                    break
+            else:
+                if next_item is None:
+                    next_item = asyncio.ensure_future(source.__anext__())
+                timeout = pending.deadline - time.monotonic()
+                if timeout > 0:
+                    await asyncio.wait({next_item}, timeout=timeout)
+                if not next_item.done():
+                    # 窗口到期，先把攒下的增量发出去，继续等同一个 __anext__
+                    yield pending.encode()
+                    pending = None
+                    continue
+                fut, next_item = next_item, None
+                try:
+                    item = fut.result()
+                except StopAsyncIteration:
+                    break
+
+            event = item.get("event", "message")
+            data = item.get("data", {})
+            seq = item.get("seq")
+            if window > 0 and _coalescable(event, data):
+                if pending is not None and pending.matches(event, data):
+                    pending.add(data, seq)
+                else:
+                    if pending is not None:
+                        yield pending.encode()
+                    pending = _PendingDelta(event, data, time.monotonic() + window, seq)
+                if pending.size >= limit:
+                    yield pending.encode()
+                    pending = None
+                continue
+
+            if pending is not None:
+                yield pending.encode()
+                pending = None
+            yield encode_event(event, data, seq)
+
+        if pending is not None:
+            yield pending.encode()
+    finally:
+        if next_item is not None and not next_item.done():
+            next_item.cancel()
+            try:
+                await next_item
+            except (asyncio.CancelledError, Exception):
+                pass
+        aclose = getattr(source, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+async def _gzip_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def _accepts_gzip(request: Optional[Request]) -> bool:
+    if request is None:
+        return False
+    accept = request.headers.get("accept-encoding", "")
+    return any(part.split(";")[0].strip() == "gzip" for part in accept.split(","))
+
+
+def sse_response(source: AsyncIterator[dict], request: Optional[Request] = None) -> StreamingResponse:
+    body = iter_sse(source)
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if settings.SSE_COMPRESSION and _accepts_gzip(request):
+        body = _gzip_stream(body)
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    return StreamingResponse(body, media_type="text/event-stream", headers=headers)
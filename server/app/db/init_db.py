@@ -4,6 +4,7 @@ import logging
 from alembic import command
 from alembic.config import Config
 from app.core.config import settings
+from app.db.sqlite_tuning import get_sqlite_pragmas
 from app.vendor.memobase_server.connectors import init_db as init_memo_db, Session as MemoSession
 from app.vendor.memobase_server.models.database import Project as MemoProject
 from app.services.memo.constants import DEFAULT_SPACE_ID
@@ -110,7 +111,7 @@ def init_db():
     # --- 4. Initialize Memobase Static Data ---
     logger.info("Initializing Memobase static data...")
     try:
-        init_memo_db(settings.MEMOBASE_DB_URL)
+        init_memo_db(settings.MEMOBASE_DB_URL, connect_pragmas=get_sqlite_pragmas())
         with MemoSession() as session:
             MemoProject.initialize_root_project(session)
             root_project = (
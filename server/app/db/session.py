@@ -1,9 +1,11 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.db.sqlite_tuning import install_sqlite_tuning
 
 engine = create_engine(
     settings.SQLALCHEMY_DATABASE_URI, 
     connect_args={"check_same_thread": False} # Needed for SQLite
 )
+install_sqlite_tuning(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
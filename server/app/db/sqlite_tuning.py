@@ -0,0 +1,117 @@
+"""
+SQLite 连接调优
+为 doudou.db / memobase.db 的每个新连接统一设置 PRAGMA，并提供周期性维护与状态查询。
+
+- journal_mode=WAL：读写不再互斥，后台归档写 memobase 时聊天流式写入不会被阻塞
+- synchronous=NORMAL：WAL 模式下只在 checkpoint 时 fsync，单次提交开销大幅下降
+- mmap_size / cache_size / temp_store：减少读路径上的系统调用与临时 B-tree 落盘
+- busy_timeout：锁竞争时等待而不是立即抛出 "database is locked"
+"""
+import logging
+import sqlite3
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# /health 上报的 PRAGMA 列表（按读取顺序）
+REPORTED_PRAGMAS = (
+    "journal_mode",
+    "synchronous",
+    "mmap_size",
+    "cache_size",
+    "temp_store",
+    "busy_timeout",
+)
+
+_SYNCHRONOUS_NAMES = {0: "OFF", 1: "NORMAL", 2: "FULL", 3: "EXTRA"}
+_TEMP_STORE_NAMES = {0: "DEFAULT", 1: "FILE", 2: "MEMORY"}
+
+
+def get_sqlite_pragmas() -> List[Tuple[str, Any]]:
+    """
+    根据 settings 生成需要在连接建立时执行的 PRAGMA 列表。
+    busy_timeout 放在最前面，保证切换 journal_mode 时遇到锁也会等待。
+    """
+    return [
+        ("busy_timeout", int(settings.SQLITE_BUSY_TIMEOUT_MS)),
+        ("journal_mode", settings.SQLITE_JOURNAL_MODE),
+        ("synchronous", settings.SQLITE_SYNCHRONOUS),
+        ("mmap_size", int(settings.SQLITE_MMAP_SIZE)),
+        ("cache_size", int(settings.SQLITE_CACHE_SIZE)),
+        ("temp_store", settings.SQLITE_TEMP_STORE),
+    ]
+
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas: List[Tuple[str, Any]]) -> None:
+    """在原始 sqlite3 连接上执行 PRAGMA，单个失败只记录日志不影响连接可用性。"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas:
+            try:
+                cursor.execute(f"PRAGMA {name}={value}")
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to apply PRAGMA {name}={value}: {e}")
+    finally:
+        cursor.close()
+
+
+def install_sqlite_tuning(engine: Engine, pragmas: Optional[List[Tuple[str, Any]]] = None) -> None:
+    """为 engine 注册 connect 监听器，之后创建的每个连接都会应用调优参数。"""
+    if engine.dialect.name != "sqlite":
+        return
+    resolved = list(pragmas) if pragmas is not None else get_sqlite_pragmas()
+
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas_on_connect(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection, resolved)
+
+
+def run_sqlite_maintenance(engine: Optional[Engine], tag: str = "main") -> Optional[Dict[str, Any]]:
+    """
+    执行一次 WAL checkpoint 与 PRAGMA optimize。
+    使用 PASSIVE 模式，不会阻塞正在进行的读写。
+    """
+    if engine is None or engine.dialect.name != "sqlite":
+        return None
+    try:
+        with engine.connect() as conn:
+            row = conn.execute(text("PRAGMA wal_checkpoint(PASSIVE)")).fetchone()
+            conn.execute(text("PRAGMA optimize"))
+            conn.commit()
+    except Exception as e:
+        logger.warning(f"[SQLite] Maintenance failed for [{tag}]: {e}")
+        return None
+
+    result = {
+        "busy": row[0] if row else None,
+        "wal_frames": row[1] if row else None,
+        "checkpointed_frames": row[2] if row else None,
+    }
+    logger.debug(f"[SQLite] Maintenance done for [{tag}]: {result}")
+    return result
+
+
+def get_sqlite_status(engine: Optional[Engine]) -> Optional[Dict[str, Any]]:
+    """读取当前连接实际生效的 PRAGMA 值，用于健康检查。"""
+    if engine is None or engine.dialect.name != "sqlite":
+        return None
+    status: Dict[str, Any] = {}
+    try:
+        with engine.connect() as conn:
+            for name in REPORTED_PRAGMAS:
+                row = conn.execute(text(f"PRAGMA {name}")).fetchone()
+                status[name] = row[0] if row else None
+    except Exception as e:
+        logger.warning(f"[SQLite] Failed to read PRAGMA status: {e}")
+        return {"error": str(e)}
+
+    status["synchronous"] = _SYNCHRONOUS_NAMES.get(status.get("synchronous"), status.get("synchronous"))
+    status["temp_store"] = _TEMP_STORE_NAMES.get(status.get("temp_store"), status.get("temp_store"))
+    return status
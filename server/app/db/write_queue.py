@@ -0,0 +1,248 @@
+"""
+SQLite 单写者队列
+每个数据库（engine）只有一个写者协程，写操作以闭包形式提交，写者在一个短窗口内
+收集多个闭包，在同一个事务里执行并只提交一次（group commit）。
+
+- 调用方 `await writer.write(fn)` 等待落盘（提交成功后返回闭包的返回值）
+- 调用方 `writer.submit(fn)` 只投递不等待，失败只记录日志
+- 闭包签名为 `fn(session) -> Any`，只能通过传入的 session 读写数据库，不要在闭包里
+  做网络请求等外部副作用：批次失败时会回滚并逐个重放以隔离出错的闭包
+- 写者未启动（例如单元测试、脚本）时退化为在当前线程内立即执行并提交
+"""
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.orm.util import identity_key
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+WriteFn = Callable[[Session], Any]
+
+
+@dataclass
+class _WriteJob:
+    fn: WriteFn
+    future: asyncio.Future
+    label: str
+
+
+class SQLiteWriter:
+    def __init__(
+        self,
+        engine: Engine,
+        name: str,
+        batch_window_ms: Optional[float] = None,
+        max_batch_size: Optional[int] = None,
+    ):
+        self.engine = engine
+        self.name = name
+        self.batch_window_ms = (
+            settings.SQLITE_WRITE_BATCH_WINDOW_MS if batch_window_ms is None else batch_window_ms
+        )
+        self.max_batch_size = max(
+            1, settings.SQLITE_WRITE_MAX_BATCH_SIZE if max_batch_size is None else max_batch_size
+        )
+        # expire_on_commit=False：闭包返回的 ORM 对象在提交后仍可读取
+        self._session_factory = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.stats: Dict[str, int] = {
+            "jobs": 0,
+            "batches": 0,
+            "commits": 0,
+            "failed_jobs": 0,
+            "isolated_batches": 0,
+            "max_batch": 0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        # 单线程执行器：保证同一数据库同一时刻只有一个写事务，且不阻塞事件循环
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"sqlite-writer-{self.name}")
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"[SQLiteWriter:{self.name}] Started (window={self.batch_window_ms}ms, max_batch={self.max_batch_size})"
+        )
+
+    async def stop(self) -> None:
+        """投递结束哨兵，等待队列中已有的写操作全部提交后退出。"""
+        if not self.running:
+            return
+        await self._queue.put(None)
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._executor.shutdown(wait=True)
+        self._task = None
+        self._queue = None
+        self._executor = None
+        self._loop = None
+        logger.info(f"[SQLiteWriter:{self.name}] Stopped. stats={self.stats}")
+
+    def submit(self, fn: WriteFn, label: str = "write") -> asyncio.Future:
+        """投递写操作并立即返回 future；未被 await 的失败会记录日志。"""
+        future = self._enqueue(fn, label)
+        future.add_done_callback(self._log_failure(label))
+        return future
+
+    async def write(self, fn: WriteFn, label: str = "write") -> Any:
+        """投递写操作并等待其提交完成，返回闭包的返回值。"""
+        return await self._enqueue(fn, label)
+
+    def _enqueue(self, fn: WriteFn, label: str) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if not self.running or loop is not self._loop:
+            # 写者未运行：当前线程内直接执行，行为与逐条 commit 一致
+            ok, value = self._execute_batch([_WriteJob(fn, future, label)])[0]
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+            return future
+        self._queue.put_nowait(_WriteJob(fn, future, label))
+        return future
+
+    def _log_failure(self, label: str):
+        def _callback(future: asyncio.Future) -> None:
+            if future.cancelled():
+                return
+            exc = future.exception()
+            if exc is not None:
+                logger.error(f"[SQLiteWriter:{self.name}] Write '{label}' failed: {exc}")
+        return _callback
+
+    async def _run(self) -> None:
+        stopping = False
+        pending: List[_WriteJob] = []
+        try:
+            while not stopping:
+                job = await self._queue.get()
+                if job is None:
+                    break
+                pending = [job]
+                if self.batch_window_ms > 0:
+                    await asyncio.sleep(self.batch_window_ms / 1000)
+                while len(pending) < self.max_batch_size:
+                    try:
+                        nxt = self._queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        break
+                    if nxt is None:
+                        stopping = True
+                        break
+                    pending.append(nxt)
+
+                results = await self._loop.run_in_executor(self._executor, self._execute_batch, pending)
+                for pending_job, (ok, value) in zip(pending, results):
+                    if pending_job.future.done():
+                        continue
+                    if ok:
+                        pending_job.future.set_result(value)
+                    else:
+                        pending_job.future.set_exception(value)
+                pending = []
+
+            # 停止前把哨兵之后仍在队列里的写操作处理完
+            remaining: List[_WriteJob] = []
+            while True:
+                try:
+                    nxt = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if nxt is not None:
+                    remaining.append(nxt)
+            if remaining:
+                results = await self._loop.run_in_executor(self._executor, self._execute_batch, remaining)
+                for pending_job, (ok, value) in zip(remaining, results):
+                    if ok:
+                        pending_job.future.set_result(value)
+                    else:
+                        pending_job.future.set_exception(value)
+        except asyncio.CancelledError:
+            for pending_job in pending:
+                if not pending_job.future.done():
+                    pending_job.future.cancel()
+            raise
+
+    def _execute_batch(self, batch: List[_WriteJob]) -> List[Tuple[bool, Any]]:
+        self.stats["jobs"] += len(batch)
+        self.stats["batches"] += 1
+        self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+
+        session = self._session_factory()
+        try:
+            try:
+                values = [job.fn(session) for job in batch]
+                session.commit()
+                self.stats["commits"] += 1
+                return [(True, value) for value in values]
+            except Exception as e:
+                session.rollback()
+                if len(batch) == 1:
+                    self.stats["failed_jobs"] += 1
+                    return [(False, e)]
+
+            # 批次中有闭包失败：回滚后逐个重放，只让出错的那个失败
+            self.stats["isolated_batches"] += 1
+            results: List[Tuple[bool, Any]] = []
+            for job in batch:
+                try:
+                    value = job.fn(session)
+                    session.commit()
+                    self.stats["commits"] += 1
+                    results.append((True, value))
+                except Exception as e:
+                    session.rollback()
+                    self.stats["failed_jobs"] += 1
+                    results.append((False, e))
+            return results
+        finally:
+            session.close()
+
+
+_writers: Dict[Engine, SQLiteWriter] = {}
+
+
+def get_writer(engine: Engine, name: Optional[str] = None) -> SQLiteWriter:
+    """获取（必要时创建）某个 engine 对应的唯一写者。"""
+    writer = _writers.get(engine)
+    if writer is None:
+        writer = SQLiteWriter(engine, name or engine.url.database or "sqlite")
+        _writers[engine] = writer
+    return writer
+
+
+def writer_for(db: Session) -> SQLiteWriter:
+    """按调用方 session 绑定的数据库获取写者。"""
+    return get_writer(db.get_bind())
+
+
+def expire_instances(db: Session, model, *ids: Any) -> None:
+    """
+    写者在自己的 session 中提交后，调用方 session 里缓存的同一行对象已经过期，
+    这里将其标记为 expired，下次访问时重新加载。
+    """
+    for obj_id in ids:
+        if obj_id is None:
+            continue
+        obj = db.identity_map.get(identity_key(model, obj_id))
+        if obj is not None:
+            db.expire(obj)
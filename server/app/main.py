@@ -134,9 +134,22 @@ async def lifespan(app: FastAPI):
     # Initialize database (SQLAlchemy models and Alembic migrations)
     init_db()
     
+    # Start single-writer queues (group commit) for both SQLite databases
+    from app.db.session import engine as main_engine
+    from app.db.write_queue import get_writer
+    from app.vendor.memobase_server import connectors as memo_connectors
+    main_writer = get_writer(main_engine, "main")
+    await main_writer.start()
+
     # Initialize Memobase SDK
     from app.services.memo import initialize_memo_sdk
     memo_worker_task = await initialize_memo_sdk()
+
+    memo_writer = None
+    if memo_connectors.DB_ENGINE is not None:
+        memo_writer = get_writer(memo_connectors.DB_ENGINE, "memobase")
+        await memo_writer.start()
+        memo_connectors.set_write_executor(memo_writer.write)
     
     # 在第三方库初始化完成后再次确保日志配置生效
     refresh_app_logging()
@@ -170,6 +183,26 @@ async def lifespan(app: FastAPI):
                 await asyncio.sleep(30)
 
     archiver_task = asyncio.create_task(run_session_archiver())
+
+    # Start SQLite Maintenance Task (wal_checkpoint + PRAGMA optimize)
+    async def run_sqlite_maintenance_loop():
+        from app.db.session import engine as main_engine
+        from app.db.sqlite_tuning import run_sqlite_maintenance
+        from app.vendor.memobase_server import connectors as memo_connectors
+
+        interval = max(int(settings.SQLITE_MAINTENANCE_INTERVAL_SECONDS), 30)
+        while True:
+            try:
+                await asyncio.sleep(interval)
+                await asyncio.to_thread(run_sqlite_maintenance, main_engine, "main")
+                await asyncio.to_thread(run_sqlite_maintenance, memo_connectors.DB_ENGINE, "memobase")
+            except asyncio.CancelledError:
+                logger.debug("SQLite maintenance task cancelled.")
+                break
+            except Exception as e:
+                logger.error(f"Error in SQLite maintenance task: {e}")
+
+    maintenance_task = asyncio.create_task(run_sqlite_maintenance_loop())
     
     yield
     
@@ -188,6 +221,22 @@ async def lifespan(app: FastAPI):
         except asyncio.CancelledError:
             pass
 
+    if maintenance_task:
+        maintenance_task.cancel()
+        try:
+            await maintenance_task
+        except asyncio.CancelledError:
+            pass
+
+    from app.services.tts_http import tts_http_pool
+    await tts_http_pool.aclose()
+
+    # Drain pending writes before exit
+    if memo_writer:
+        memo_connectors.set_write_executor(None)
+        await memo_writer.stop()
+    await main_writer.stop()
+
 # 关联 lifespan
 app.router.lifespan_context = lifespan
 
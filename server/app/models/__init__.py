@@ -5,3 +5,4 @@ from .embedding import EmbeddingSetting
 from .system_setting import SystemSetting
 from .group import Group, GroupMember, GroupMessage, GroupSession
 from .voice import VoiceTimbre
+from .conversation import ConversationSummary
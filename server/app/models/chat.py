@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, Boolean, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 from app.db.base import Base
@@ -43,6 +43,14 @@ class Message(Base):
     update_time = Column(UTCDateTime, default=utc_now, onupdate=utc_now, nullable=False)
     deleted = Column(Boolean, default=False, nullable=False)
 
+    # 热路径均为 (session_id, deleted) 等值过滤 + 按 create_time / id 排序，
+    # 复合索引让排序直接走索引顺序，避免临时 B-tree
+    __table_args__ = (
+        Index('ix_messages_session_deleted_create_time', 'session_id', 'deleted', 'create_time', 'id'),
+        Index('ix_messages_session_deleted_id', 'session_id', 'deleted', 'id'),
+        Index('ix_messages_friend_deleted_id', 'friend_id', 'deleted', 'id'),
+    )
+
     # Relationships
     session = relationship("ChatSession", back_populates="messages")
 
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, String, Text, Index, UniqueConstraint
+from app.db.base import Base
+from app.db.types import UTCDateTime, utc_now
+
+
+class ConversationSummary(Base):
+    """
+    会话列表物化表：每个好友 / 群组一行，随消息写入、撤回、删除在同一事务内维护，
+    好友列表与群列表只需一次索引读取，不再对 messages 做聚合。
+    """
+    __tablename__ = "conversation_summaries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    conversation_type = Column(String(20), nullable=False)  # 'friend' / 'group'
+    conversation_id = Column(Integer, nullable=False)  # friend_id 或 group_id
+    last_message_id = Column(Integer, nullable=True)
+    last_message_preview = Column(Text, nullable=True)
+    # 单聊为消息 role（user/assistant/system），群聊为 sender_type（user/friend）
+    last_message_role = Column(String(20), nullable=True)
+    last_message_sender_id = Column(String(64), nullable=True)  # 仅群聊使用
+    last_message_time = Column(UTCDateTime, nullable=True)
+    unread_count = Column(Integer, default=0, nullable=False)
+    message_count = Column(Integer, default=0, nullable=False)
+    update_time = Column(UTCDateTime, default=utc_now, onupdate=utc_now, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("conversation_type", "conversation_id", name="uq_conversation_summary_target"),
+        Index("ix_conversation_summaries_type_time", "conversation_type", "last_message_time"),
+    )
@@ -72,6 +72,9 @@ class GroupMessage(Base):
 
     __table_args__ = (
         Index('ix_group_messages_group_id_create_time', 'group_id', 'create_time'),
+        # keyset 分页按 id 排序
+        Index('ix_group_messages_group_session_id', 'group_id', 'session_id', 'id'),
+        Index('ix_group_messages_group_id_id', 'group_id', 'id'),
     )
 
     # Relationships
@@ -23,6 +23,13 @@ class MessageRead(MessageBase):
     class Config:
         from_attributes = True
 
+class MessagePage(BaseModel):
+    """keyset 分页结果：items 为时间正序，游标为不透明字符串。"""
+    items: List[MessageRead]
+    before_cursor: Optional[str] = None  # 传给 before 继续向上加载更早的消息
+    after_cursor: Optional[str] = None   # 传给 after 加载更新的消息
+    has_more: bool = False               # 当前方向上是否还有更多消息
+
 # --- ChatSession Schemas ---
 class ChatSessionBase(BaseModel):
     title: Optional[str] = "新对话"
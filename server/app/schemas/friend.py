@@ -59,6 +59,7 @@ class Friend(FriendBase):
     last_message: Optional[str] = None
     last_message_role: Optional[str] = None
     last_message_time: Optional[datetime] = None
+    unread_count: int = 0
 
     model_config = ConfigDict(from_attributes=True)
 
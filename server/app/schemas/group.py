@@ -51,6 +51,13 @@ class GroupMessageRead(GroupMessageBase):
     class Config:
         from_attributes = True
 
+class GroupMessagePage(BaseModel):
+    """keyset 分页结果：items 为时间正序，游标为不透明字符串。"""
+    items: List[GroupMessageRead]
+    before_cursor: Optional[str] = None
+    after_cursor: Optional[str] = None
+    has_more: bool = False
+
 # --- Group Schemas ---
 class GroupBase(BaseModel):
     name: str
@@ -74,6 +81,7 @@ class GroupRead(GroupBase):
     last_message: Optional[str] = None
     last_message_sender_name: Optional[str] = None
     last_message_time: Optional[datetime] = None
+    unread_count: int = 0
 
     class Config:
         from_attributes = True
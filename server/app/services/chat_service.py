@@ -1,36 +1,60 @@
+from sqlalchemy import tuple_
 from sqlalchemy.orm import Session
 from typing import Any, Dict, List, Optional, Tuple
-import re
 import json
 import time
 import logging
 import asyncio
+from app.core.config import settings
 from app.models.chat import ChatSession, Message
 from app.models.friend import Friend
 from app.schemas import chat as chat_schemas
 from datetime import datetime, timedelta, timezone
 from app.services.recall_service import RecallService
 from app.services.settings_service import SettingsService
-from app.services.voice_message_service import generate_voice_payload_for_message
-from app.services import provider_rules
+from app.services.config_snapshot_service import config_snapshot_service
+from app.services.generation_stream import GenerationEventLog, generation_streams
+from app.services.voice_message_service import (
+    VoicePipeline,
+    generate_voice_payload_for_message,
+    persist_voice_payload,
+)
+from app.services import conversation_summary_service, provider_rules
 from app.services.llm_service import llm_service
 from app.services.embedding_service import embedding_service
 from app.services.llm_client import set_agents_default_client
-from app.services.memo.bridge import MemoService
+from app.services.memo.bridge import MemoService, PROFILE_TEXT_DETAILED
 from app.services.memo.constants import DEFAULT_USER_ID, DEFAULT_SPACE_ID
 from app.services.reasoning_stream import extract_reasoning_delta
+from app.services.stream_parser import (
+    KIND_THINKING,
+    StreamChunk,
+    StreamParser,
+    strip_message_tags as _strip_message_tags,
+)
 from app.prompt import get_prompt
 from app.db.session import SessionLocal
+from app.db.write_queue import expire_instances, writer_for
+
+async def _put_stream_chunks(
+    queue: GenerationEventLog,
+    chunks: List[StreamChunk],
+    parser: StreamParser,
+    voice_pipeline: Optional[VoicePipeline] = None,
+) -> None:
+    for chunk in chunks:
+        if chunk.kind == KIND_THINKING:
+            await queue.put({"event": "model_thinking", "data": {"delta": chunk.text}})
+        else:
+            await queue.put({"event": "message", "data": {"delta": chunk.text}})
+    if voice_pipeline is not None:
+        # 新完成的 <message> 分段立即派发语音合成
+        voice_pipeline.add_segments(parser.drain_segments())
 
-def _strip_message_tags(content: Optional[str]) -> Optional[str]:
-    if not content:
-        return content
-    # 提取所有 <message> 标签内容并用空格合并
-    parts = re.findall(r'<message>(.*?)</message>', content, re.DOTALL)
-    if parts:
-        return " ".join(part.strip() for part in parts if part.strip())
-    # 兜底：如果没有匹配到完整标签但包含标签字符，直接剔除所有标签文本
-    return re.sub(r'</?message>', '', content).strip()
+def _voice_segment_emitter(queue: GenerationEventLog, message_id: int):
+    async def _emit(segment: Dict[str, Any]) -> None:
+        await queue.put({"event": "voice_segment", "data": {"message_id": message_id, "segment": segment}})
+    return _emit
 
 def _model_base_name(model_name: Optional[str]) -> str:
     if not model_name:
@@ -229,6 +253,7 @@ def delete_session(db: Session, session_id: int) -> bool:
     
     # 1. Soft delete session
     db_session.deleted = True
+    conversation_summary_service.refresh_friend_summary(db, db_session.friend_id)
     db.commit()
 
     # 2. Schedule memory deletion
@@ -266,7 +291,8 @@ def clear_friend_chat_history(db: Session, friend_id: int):
         
         # 3. 标记该会话下的所有消息为已删除
         db.query(Message).filter(Message.session_id == session.id).update({"deleted": True})
-    
+
+    conversation_summary_service.refresh_friend_summary(db, friend_id)
     db.commit()
     logger.info(f"[Clear History] All chat history for friend {friend_id} has been cleared/archived.")
     
@@ -351,48 +377,90 @@ async def _delete_session_memories_async(session_id: int):
 
 # --- Message Services ---
 
-def get_messages(db: Session, session_id: int, skip: int = 0, limit: int = 100) -> List[Message]:
+def get_messages(
+    db: Session,
+    session_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+    latest: bool = False,
+) -> List[Message]:
     """
     Get messages for a specific session.
+
+    传入 before_id / after_id（或 latest=True 取最新一页）时使用 keyset 分页，
+    按 (create_time, id) 排序走 ix_messages_session_deleted_create_time，翻页代价与偏移量无关；
+    否则保持原有的 offset 分页行为。结果均为时间正序。
     """
-    return (
-        db.query(Message)
-        .filter(Message.session_id == session_id, Message.deleted == False)
-        .order_by(Message.create_time.asc())
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
+    query = db.query(Message).filter(Message.session_id == session_id, Message.deleted == False)
+
+    if before_id is None and after_id is None and not latest:
+        return (
+            query
+            .order_by(Message.create_time.asc(), Message.id.asc())
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
+
+    anchor_id = after_id if after_id is not None else before_id
+    anchor_time = None
+    if anchor_id is not None:
+        anchor_time = db.query(Message.create_time).filter(Message.id == anchor_id).scalar()
+
+    if after_id is None:
+        if anchor_time is not None:
+            query = query.filter(tuple_(Message.create_time, Message.id) < (anchor_time, before_id))
+        elif before_id is not None:
+            query = query.filter(Message.id < before_id)
+        messages = query.order_by(Message.create_time.desc(), Message.id.desc()).limit(limit).all()
+        return list(reversed(messages))
+
+    if anchor_time is not None:
+        query = query.filter(tuple_(Message.create_time, Message.id) > (anchor_time, after_id))
+    else:
+        query = query.filter(Message.id > after_id)
+    return query.order_by(Message.create_time.asc(), Message.id.asc()).limit(limit).all()
 
-def get_messages_by_friend(db: Session, friend_id: int, skip: int = 0, limit: int = 200) -> List[Message]:
+def get_messages_by_friend(
+    db: Session,
+    friend_id: int,
+    skip: int = 0,
+    limit: int = 200,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+) -> List[Message]:
     """
     Get all messages for a specific friend across all sessions.
-    Messages are merged and sorted by create_time.
-    
-    NOTE: To support pagination correctly (newest messages first for initial load),
-    we query in DESC order and then reverse the result.
+    Messages are merged and returned in chronological order (oldest to newest).
+
+    直接按 messages.friend_id 过滤并 JOIN 会话表排除已删除会话，不再先加载全部会话 ID；
+    按 id 排序走 ix_messages_friend_deleted_id。
+    - before_id：加载比该消息更早的一页（向上翻历史）
+    - after_id：加载比该消息更新的一页
+    - 都不传时按 skip/limit 从最新消息往前取（兼容旧接口）
     """
-    # Get all non-deleted sessions for this friend
-    sessions = (
-        db.query(ChatSession)
-        .filter(ChatSession.friend_id == friend_id, ChatSession.deleted == False)
-        .all()
-    )
-    session_ids = [s.id for s in sessions]
-    
-    if not session_ids:
-        return []
-    
-    # Get messages in DESC order (newest first) for pagination, then reverse
-    messages = (
+    query = (
         db.query(Message)
-        .filter(Message.session_id.in_(session_ids), Message.deleted == False)
-        .order_by(Message.create_time.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
+        .join(ChatSession, ChatSession.id == Message.session_id)
+        .filter(
+            Message.friend_id == friend_id,
+            Message.deleted == False,
+            ChatSession.deleted == False,
+        )
     )
-    # Reverse to display in chronological order (oldest to newest)
+
+    if after_id is not None:
+        return query.filter(Message.id > after_id).order_by(Message.id.asc()).limit(limit).all()
+
+    query = query.order_by(Message.id.desc())
+    if before_id is not None:
+        query = query.filter(Message.id < before_id)
+    elif skip:
+        query = query.offset(skip)
+    # DESC 取最新的一页，再反转为时间正序
+    messages = query.limit(limit).all()
     return list(reversed(messages))
 
 def get_sessions_by_friend(db: Session, friend_id: int) -> List[ChatSession]:
@@ -607,7 +675,7 @@ def _resolve_smart_context_llm_config(db: Session):
                 )
 
     if configured_id is not None:
-        config = llm_service.get_config_by_id(db, configured_id)
+        config = llm_service.get_runtime_config(db, configured_id)
         if config:
             logger.info(
                 "[SmartContext] Using dedicated judge model config_id=%s model=%s",
@@ -1225,6 +1293,44 @@ async def _archive_session_async(
     finally:
         db.close()
 
+async def _persist_ai_message_content(
+    db: Session,
+    session_id: int,
+    ai_msg_id: int,
+    content: str,
+) -> bool:
+    """
+    写入 AI 回复内容并刷新会话的最后消息时间。
+    两处更新合并为一个写闭包，经单写者队列在同一事务内提交。
+    """
+    def _write(session: Session) -> bool:
+        ai_msg = session.get(Message, ai_msg_id)
+        if not ai_msg:
+            return False
+        ai_msg.content = content
+        chat_session = session.get(ChatSession, session_id)
+        if chat_session:
+            conversation_summary_service.update_message_content(
+                session,
+                conversation_summary_service.FRIEND_CONVERSATION,
+                chat_session.friend_id,
+                ai_msg_id,
+                content,
+                count_unread=True,
+            )
+            now_time = datetime.now(timezone.utc)
+            chat_session.update_time = now_time
+            chat_session.last_message_time = now_time
+            if chat_session.memory_generated != 0:
+                chat_session.memory_generated = 0
+                chat_session.memory_error = None
+        return True
+
+    saved = await writer_for(db).write(_write, label="chat_ai_message")
+    expire_instances(db, Message, ai_msg_id)
+    expire_instances(db, ChatSession, session_id)
+    return saved
+
 async def _run_chat_generation_task(
     session_id: int,
     friend_id: int,
@@ -1232,13 +1338,14 @@ async def _run_chat_generation_task(
     ai_msg_id: int,
     message_content: str,
     enable_thinking: bool,
-    queue: asyncio.Queue
+    queue: GenerationEventLog
 ):
     """
     Background task to handle LLM generation and persistence.
     Decoupled from HTTP response to ensure completion even if client disconnects.
     """
     db = SessionLocal()
+    voice_pipeline: Optional[VoicePipeline] = None
     logger.info(f"[GenTask] Starting generation for Session {session_id}, AI Msg {ai_msg_id}")
     
     try:
@@ -1247,7 +1354,9 @@ async def _run_chat_generation_task(
         friend = db.query(Friend).filter(Friend.id == friend_id).first()
         friend_name = friend.name if friend else "AI"
         
-        llm_config = llm_service.get_active_config(db)
+        # 整个生成任务使用同一份配置快照（模型、向量配置与 memory 设置，含 tool_recall 的多次调用）
+        config_snapshot = config_snapshot_service.get(db)
+        llm_config = config_snapshot.active_llm_config
         if not llm_config:
             await queue.put({"event": "error", "data": {"code": "config_error", "detail": "LLM Config missing in background task"}})
             return
@@ -1259,11 +1368,12 @@ async def _run_chat_generation_task(
             enable_thinking = False
 
         # 2. Prepare History & Recall
-        enable_recall = SettingsService.get_setting(db, "memory", "recall_enabled", True)
+        settings_snapshot = config_snapshot.settings
+        enable_recall = settings_snapshot.get("memory", "recall_enabled", True)
 
         # Check for vectorization config
         if enable_recall:
-            embedding_config = embedding_service.get_active_setting(db)
+            embedding_config = config_snapshot.active_embedding_setting
             if not embedding_config:
                 logger.warning("[GenTask] Recall skipped: Embedding not configured.")
                 enable_recall = False
@@ -1288,25 +1398,16 @@ async def _run_chat_generation_task(
         
         if enable_recall:
             try:
-                profiles = await MemoService.get_user_profiles(DEFAULT_USER_ID, DEFAULT_SPACE_ID)
-                if profiles and profiles.profiles:
-                    profile_lines = []
-                    for item in profiles.profiles:
-                        if not item or not item.content: continue
-                        attributes = item.attributes or {}
-                        topic = (attributes.get("topic") or "").strip()
-                        sub_topic = (attributes.get("sub_topic") or "").strip()
-                        if topic or sub_topic:
-                            profile_lines.append(f"- {topic}\t{sub_topic}\t{item.content.strip()}")
-                        else:
-                            profile_lines.append(f"- {item.content.strip()}")
-                    profile_data = "\n".join(profile_lines)
+                profile_data = await MemoService.get_user_profile_text(
+                    DEFAULT_USER_ID, DEFAULT_SPACE_ID, style=PROFILE_TEXT_DETAILED
+                )
                 
                 messages_for_recall = [{"role": m.role, "content": m.content} for m in history]
                 messages_for_recall.append({"role": "user", "content": message_content})
                 
                 recall_result = await RecallService.perform_recall(
-                    db, DEFAULT_USER_ID, DEFAULT_SPACE_ID, messages_for_recall, friend_id
+                    db, DEFAULT_USER_ID, DEFAULT_SPACE_ID, messages_for_recall, friend_id,
+                    settings_snapshot=settings_snapshot,
                 )
                 injected_recall_messages = recall_result.get("injected_messages", [])
                 footprints = recall_result.get("footprints", [])
@@ -1321,18 +1422,7 @@ async def _run_chat_generation_task(
             except Exception as e:
                 error_detail = f"记忆召回失败: {e}"
                 logger.error(f"[GenTask] Recall failed: {e}")
-                ai_msg = db.query(Message).filter(Message.id == ai_msg_id).first()
-                if ai_msg:
-                    ai_msg.content = f"[错误] {error_detail}"
-                    db.commit()
-                    chat_session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
-                    if chat_session:
-                        chat_session.update_time = datetime.now(timezone.utc)
-                        chat_session.last_message_time = datetime.now(timezone.utc)
-                        if chat_session.memory_generated != 0:
-                            chat_session.memory_generated = 0
-                            chat_session.memory_error = None
-                        db.commit()
+                await _persist_ai_message_content(db, session_id, ai_msg_id, f"[错误] {error_detail}")
                 await queue.put({"event": "error", "data": {"code": "recall_error", "detail": error_detail}})
                 return
 
@@ -1393,10 +1483,10 @@ async def _run_chat_generation_task(
         async def tool_recall(query: str):
             if not enable_recall:
                 return {"events": []}
-            if not embedding_service.get_active_setting(db):
+            if not config_snapshot.active_embedding_setting:
                 return {"events": []}
-            event_topk = SettingsService.get_setting(db, "memory", "event_topk", 5)
-            threshold = SettingsService.get_setting(db, "memory", "similarity_threshold", 0.5)
+            event_topk = settings_snapshot.get("memory", "event_topk", 5)
+            threshold = settings_snapshot.get("memory", "similarity_threshold", 0.5)
             return await MemoService.recall_memory(
                 user_id=DEFAULT_USER_ID,
                 space_id=DEFAULT_SPACE_ID,
@@ -1469,18 +1559,22 @@ async def _run_chat_generation_task(
             tools=tools,
         )
 
-        full_ai_content = ""
-        saved_content = ""
         usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
         finish_reason = "stop"
         
-        buffer = ""
-        is_thinking_tag = False
-        has_reasoning_item = False
-        think_fallback_buffer = ""
+        parser = StreamParser(enable_thinking, defer_thinking=True)
         tool_call_names = {}
-        THINK_START = "<think>"
-        THINK_END = "</think>"
+        # 流水线语音：每闭合一个 <message> 分段就立即派发 TTS，就绪后推送 voice_segment 事件
+        if friend and friend.enable_voice and settings.VOICE_PIPELINED_TTS:
+            voice_pipeline = VoicePipeline.create(
+                db,
+                enable_voice=True,
+                friend_voice_id=friend.voice_id,
+                friend_id=friend.id,
+                message_id=ai_msg_id,
+                message_scope="single",
+                on_segment_ready=_voice_segment_emitter(queue, ai_msg_id),
+            )
         
         result = Runner.run_streamed(
             agent,
@@ -1491,9 +1585,8 @@ async def _run_chat_generation_task(
             if isinstance(event, RunItemStreamEvent) and event.name == "reasoning_item_created":
                 if enable_thinking and isinstance(event.item, ReasoningItem):
                     raw = event.item.raw_item
-                    text = _extract_reasoning_text(raw)
+                    text = parser.feed_reasoning(_extract_reasoning_text(raw))
                     if text:
-                        has_reasoning_item = True
                         await queue.put({"event": "model_thinking", "data": {"delta": text}})
                 continue
             if isinstance(event, RunItemStreamEvent) and event.name == "tool_called":
@@ -1537,82 +1630,38 @@ async def _run_chat_generation_task(
                 continue
 
             if event.type == "raw_response_event" and enable_thinking:
-                reasoning_delta = extract_reasoning_delta(event.data)
+                reasoning_delta = parser.feed_reasoning(extract_reasoning_delta(event.data))
                 if reasoning_delta:
-                    has_reasoning_item = True
                     await queue.put({"event": "model_thinking", "data": {"delta": reasoning_delta}})
                     continue
 
             if event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent):
-                delta = event.data.delta
-                if delta:
-                    full_ai_content += delta
-                    buffer += delta
-                    while buffer:
-                        if not is_thinking_tag:
-                            start_idx = buffer.find(THINK_START)
-                            if start_idx != -1:
-                                if start_idx > 0:
-                                    msg_delta = buffer[:start_idx]
-                                    saved_content += msg_delta
-                                    await queue.put({"event": "message", "data": {"delta": msg_delta}})
-                                buffer = buffer[start_idx + len(THINK_START):]
-                                is_thinking_tag = True
-                            else:
-                                if "<" not in buffer:
-                                    saved_content += buffer
-                                    await queue.put({"event": "message", "data": {"delta": buffer}})
-                                    buffer = ""
-                                else:
-                                    break
-                        else:
-                            end_idx = buffer.find(THINK_END)
-                            if end_idx != -1:
-                                if end_idx > 0 and enable_thinking and not has_reasoning_item:
-                                    think_fallback_buffer += buffer[:end_idx]
-                                buffer = buffer[end_idx + len(THINK_END):]
-                                is_thinking_tag = False
-                            else:
-                                if "</" not in buffer:
-                                    if enable_thinking and not has_reasoning_item:
-                                        think_fallback_buffer += buffer
-                                    buffer = ""
-                                else:
-                                    break
-        
-        if buffer:
-            if is_thinking_tag and enable_thinking and not has_reasoning_item:
-                think_fallback_buffer += buffer
-            elif not is_thinking_tag:
-                saved_content += buffer
-                await queue.put({"event": "message", "data": {"delta": buffer}})
-
-        if think_fallback_buffer and enable_thinking and not has_reasoning_item:
-            await queue.put({"event": "model_thinking", "data": {"delta": think_fallback_buffer}})
+                await _put_stream_chunks(queue, parser.feed(event.data.delta), parser, voice_pipeline)
 
+        await _put_stream_chunks(queue, parser.finish(), parser, voice_pipeline)
 
         # 5. Save to DB
+        saved_content = parser.message_text
         final_saved_content = saved_content if saved_content else "[No response]"
-        ai_msg = db.query(Message).filter(Message.id == ai_msg_id).first()
-        if ai_msg:
-            ai_msg.content = final_saved_content
-            db.commit()
-            chat_session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
-            chat_session.update_time = datetime.now(timezone.utc)
-            chat_session.last_message_time = datetime.now(timezone.utc)
-            if chat_session.memory_generated != 0:
-                chat_session.memory_generated = 0
-                chat_session.memory_error = None
-            db.commit()
+        await _persist_ai_message_content(db, session_id, ai_msg_id, final_saved_content)
 
-        usage["completion_tokens"] = len(full_ai_content)
+        usage["completion_tokens"] = parser.raw_length
 
-        # 6. Optional voice synthesis (single chat): generate first, then return together in done event.
-        # This ensures text bubble and voice bar appear at the same time on frontend.
+        # 6. Optional voice synthesis (single chat).
+        # 流水线模式下分段语音已在流式过程中派发，这里只等剩余分段；否则整段生成后随 done 一起返回。
         done_voice_payload: Optional[Dict[str, Any]] = None
         try:
             final_text = final_saved_content if final_saved_content != "[No response]" else ""
-            if friend and friend.enable_voice and final_text:
+            if voice_pipeline is not None:
+                done_voice_payload = await voice_pipeline.finish()
+                if done_voice_payload:
+                    await persist_voice_payload(db, ai_msg_id, done_voice_payload, message_scope="single")
+                    logger.info(
+                        "[GenTask] Pipelined voice synthesis completed for message=%s segments=%s",
+                        ai_msg_id,
+                        len(done_voice_payload.get("segments", [])),
+                    )
+            elif friend and friend.enable_voice and final_text:
                 logger.info(
                     "[GenTask] Voice synthesis started for message=%s friend=%s",
                     ai_msg_id,
@@ -1623,15 +1672,13 @@ async def _run_chat_generation_task(
                     content=final_text,
                     enable_voice=bool(friend.enable_voice),
                     friend_voice_id=friend.voice_id,
+                    friend_id=friend.id,
                     message_id=ai_msg_id,
                     message_scope="single",
                     on_segment_ready=None,
                 )
                 if done_voice_payload:
-                    ai_msg = db.query(Message).filter(Message.id == ai_msg_id).first()
-                    if ai_msg:
-                        ai_msg.voice_payload = done_voice_payload
-                        db.commit()
+                    await persist_voice_payload(db, ai_msg_id, done_voice_payload, message_scope="single")
                     logger.info(
                         "[GenTask] Voice synthesis completed for message=%s segments=%s",
                         ai_msg_id,
@@ -1663,6 +1710,8 @@ async def _run_chat_generation_task(
         logger.error(f"[GenTask] Error: {e}", exc_info=True)
         await queue.put({"event": "error", "data": {"code": "task_error", "detail": str(e)}})
     finally:
+        if voice_pipeline is not None:
+            await voice_pipeline.aclose()
         await queue.put(None)
         db.close()
 
@@ -1687,31 +1736,25 @@ async def send_message_stream(db: Session, session_id: int, message_in: chat_sch
     )
 
     # 1. Save User Message
-    user_msg = Message(session_id=session_id, role="user", content=message_in.content)
+    user_msg = Message(session_id=session_id, role="user", content=message_in.content, friend_id=db_session.friend_id)
     db.add(user_msg)
+    db.flush()
+    conversation_summary_service.record_friend_message(db, db_session.friend_id, user_msg)
     db.commit()
     db.refresh(user_msg)
 
     # 2. Create AI Message Placeholder
     ai_msg = Message(session_id=session_id, role="assistant", content="", friend_id=db_session.friend_id)
     db.add(ai_msg)
+    db.flush()
+    conversation_summary_service.record_friend_message(db, db_session.friend_id, ai_msg)
     db.commit()
     db.refresh(ai_msg)
 
     # 3. Start Background Generation Task
-    queue = asyncio.Queue()
-    asyncio.create_task(_run_chat_generation_task(
-        session_id=session_id,
-        friend_id=db_session.friend_id,
-        user_msg_id=user_msg.id,
-        ai_msg_id=ai_msg.id,
-        message_content=message_in.content,
-        enable_thinking=effective_enable_thinking,
-        queue=queue
-    ))
-
-    # 4. Stream events from the queue
-    yield {
+    # 事件写入可重连的事件日志（按 ai_msg_id），断线后可经 GET /chat/messages/{id}/stream 续传
+    queue = generation_streams.open(ai_msg.id)
+    queue.publish({
         "event": "start",
         "data": {
             "session_id": session_id,
@@ -1721,12 +1764,19 @@ async def send_message_stream(db: Session, session_id: int, message_in: chat_sch
             "friend_id": db_session.friend_id,
             "created_at": datetime.now(timezone.utc).isoformat()
         }
-    }
+    })
+    asyncio.create_task(_run_chat_generation_task(
+        session_id=session_id,
+        friend_id=db_session.friend_id,
+        user_msg_id=user_msg.id,
+        ai_msg_id=ai_msg.id,
+        message_content=message_in.content,
+        enable_thinking=effective_enable_thinking,
+        queue=queue
+    ))
 
-    while True:
-        event = await queue.get()
-        if event is None: # Sentinel
-            break
+    # 4. Stream events from the log
+    async for event in queue.subscribe(lossless=True):
         yield event
 
 
@@ -1827,6 +1877,7 @@ async def regenerate_message_stream(db: Session, session_id: int, ai_message_id:
 
     # 3. Soft Delete Old AI Message
     old_ai_msg.deleted = True
+    conversation_summary_service.refresh_friend_summary(db, db_session.friend_id)
     db.commit()
     logger.info(f"[Regenerate] Soft deleted old AI message {old_ai_msg.id}")
 
@@ -1850,11 +1901,13 @@ async def regenerate_message_stream(db: Session, session_id: int, ai_message_id:
     # 5. Create New AI Message Placeholder
     new_ai_msg = Message(session_id=session_id, role="assistant", content="", friend_id=db_session.friend_id)
     db.add(new_ai_msg)
+    db.flush()
+    conversation_summary_service.record_friend_message(db, db_session.friend_id, new_ai_msg)
     db.commit()
     db.refresh(new_ai_msg)
 
     # 6. Start Background Generation Task
-    queue = asyncio.Queue()
+    queue = generation_streams.open(new_ai_msg.id)
     
     # Get thinking mode from global settings (frontend handles UI toggle state)
     enable_thinking = SettingsService.get_setting(db, "chat", "enable_thinking", False)
@@ -1863,6 +1916,17 @@ async def regenerate_message_stream(db: Session, session_id: int, ai_message_id:
     if enable_thinking and not llm_config.capability_reasoning and not force_thinking:
         enable_thinking = False
 
+    queue.publish({
+        "event": "start",
+        "data": {
+            "session_id": session_id,
+            "message_id": new_ai_msg.id, # New ID
+            "user_message_id": last_user_msg.id,
+            "model": llm_config.model_name,
+            "friend_id": db_session.friend_id,
+            "created_at": datetime.now(timezone.utc).isoformat()
+        }
+    })
     asyncio.create_task(_run_chat_generation_task(
         session_id=session_id,
         friend_id=db_session.friend_id,
@@ -1874,22 +1938,7 @@ async def regenerate_message_stream(db: Session, session_id: int, ai_message_id:
     ))
 
     # 7. Stream events
-    yield {
-        "event": "start",
-        "data": {
-            "session_id": session_id,
-            "message_id": new_ai_msg.id, # New ID
-            "user_message_id": last_user_msg.id,
-            "model": llm_config.model_name,
-            "friend_id": db_session.friend_id,
-            "created_at": datetime.now(timezone.utc).isoformat()
-        }
-    }
-
-    while True:
-        event = await queue.get()
-        if event is None:
-            break
+    async for event in queue.subscribe(lossless=True):
         yield event
 
 
@@ -2024,7 +2073,8 @@ def recall_message(db: Session, message_id: int) -> bool:
     if next_msg and next_msg.role == 'assistant':
         next_msg.deleted = True
         logger.info(f"[Recall] Cascading delete of assistant message {next_msg.id}")
-        
+
+    conversation_summary_service.refresh_friend_summary(db, session.friend_id)
     db.commit()
     logger.info(f"[Recall] Message {message_id} recalled successfully.")
     return True
@@ -0,0 +1,159 @@
+"""
+模型 / 向量 / 语音配置的不可变快照
+
+LLM 配置、Embedding 配置与语音配置在热路径上被频繁读取（每次生成、每次召回、每段 TTS），
+但几乎只在设置页修改。这里把它们整体加载成一份只读快照：
+- 配置行复制为 FrozenConfig，属性与 ORM 对象同名，赋值会抛出 AttributeError
+- 每份快照带单调递增的 version，以及生成时看到的 settings_cache.version
+- 只对 settings_cache 启用的 engine 做进程内缓存；系统设置有写入（version 变化）时自动重建，
+  配置 CRUD 接口调用 refresh 主动重建
+- 一次生成任务开始时取一份快照，整个任务期间读取同一份配置
+"""
+import itertools
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.models.embedding import EmbeddingSetting
+from app.models.llm import LLMConfig
+from app.services.settings_service import SettingsService, SettingsSnapshot, settings_cache
+
+SNAPSHOT_SETTING_GROUPS = ("chat", "memory", "voice")
+
+
+class FrozenConfig:
+    """ORM 配置行的只读副本，可直接交给 pydantic(from_attributes) 或 provider_rules 使用。"""
+    __slots__ = ("_values",)
+
+    def __init__(self, values: Mapping[str, Any]):
+        object.__setattr__(self, "_values", MappingProxyType(dict(values)))
+
+    @classmethod
+    def from_row(cls, row: Any) -> "FrozenConfig":
+        return cls({attr.key: getattr(row, attr.key) for attr in inspect(row).mapper.column_attrs})
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"FrozenConfig is read-only: {name}")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"FrozenConfig is read-only: {name}")
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(self._values)
+
+    def __repr__(self) -> str:
+        return f"FrozenConfig(id={self._values.get('id')}, name={self._values.get('config_name')!r})"
+
+
+def _coerce_id(value: Any) -> Optional[int]:
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.strip():
+        try:
+            return int(value.strip())
+        except ValueError:
+            return None
+    return None
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    version: int
+    settings_version: int
+    llm_configs: Mapping[int, FrozenConfig]
+    embedding_settings: Mapping[int, FrozenConfig]
+    settings: SettingsSnapshot
+
+    @property
+    def active_llm_config_id(self) -> Optional[int]:
+        return _coerce_id(self.settings.get("chat", "active_llm_config_id"))
+
+    @property
+    def active_llm_config(self) -> Optional[FrozenConfig]:
+        return self.llm_config(self.active_llm_config_id)
+
+    @property
+    def active_embedding_config_id(self) -> Optional[int]:
+        return _coerce_id(self.settings.get("memory", "active_embedding_config_id"))
+
+    @property
+    def active_embedding_setting(self) -> Optional[FrozenConfig]:
+        return self.embedding_setting(self.active_embedding_config_id)
+
+    @property
+    def voice_settings(self) -> Mapping[str, Any]:
+        return self.settings.group("voice")
+
+    def llm_config(self, config_id: Any) -> Optional[FrozenConfig]:
+        config_id = _coerce_id(config_id)
+        return self.llm_configs.get(config_id) if config_id is not None else None
+
+    def embedding_setting(self, setting_id: Any) -> Optional[FrozenConfig]:
+        setting_id = _coerce_id(setting_id)
+        return self.embedding_settings.get(setting_id) if setting_id is not None else None
+
+
+class ConfigSnapshotService:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshots: Dict[Engine, ConfigSnapshot] = {}
+        self._versions = itertools.count(1)
+        self._generation = 0
+
+    def _build(self, db: Session) -> ConfigSnapshot:
+        settings_version = settings_cache.version
+        settings_snapshot = SettingsService.snapshot(db, *SNAPSHOT_SETTING_GROUPS)
+        llm_rows = db.query(LLMConfig).filter(LLMConfig.deleted == False).all()
+        embedding_rows = db.query(EmbeddingSetting).filter(EmbeddingSetting.deleted == False).all()
+        return ConfigSnapshot(
+            version=next(self._versions),
+            settings_version=settings_version,
+            llm_configs=MappingProxyType({row.id: FrozenConfig.from_row(row) for row in llm_rows}),
+            embedding_settings=MappingProxyType(
+                {row.id: FrozenConfig.from_row(row) for row in embedding_rows}
+            ),
+            settings=settings_snapshot,
+        )
+
+    def get(self, db: Session) -> ConfigSnapshot:
+        bind = settings_cache.bind_of(db)
+        if bind is None:
+            return self._build(db)
+
+        cached = self._snapshots.get(bind)
+        if cached is not None and cached.settings_version == settings_cache.version:
+            return cached
+
+        generation = self._generation
+        snapshot = self._build(db)
+        with self._lock:
+            # 构建期间发生了 invalidate / 设置写入时不落缓存，下次读取再重建
+            if generation == self._generation and snapshot.settings_version == settings_cache.version:
+                self._snapshots[bind] = snapshot
+        return snapshot
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._snapshots.clear()
+
+    def refresh(self, db: Session) -> ConfigSnapshot:
+        """配置 CRUD 提交后调用：丢弃旧快照并立即重建。"""
+        self.invalidate()
+        return self.get(db)
+
+
+config_snapshot_service = ConfigSnapshotService()
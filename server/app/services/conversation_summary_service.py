@@ -0,0 +1,237 @@
+"""
+会话列表物化表（conversation_summaries）维护
+
+每个好友 / 群组一行，保存最后一条消息预览、时间、角色、未读数与消息数。
+- 消息写入 / 内容落盘时增量更新（record_* / update_*），调用方负责在同一事务内提交
+- 撤回、删除、清空等低频操作调用 refresh_* 从 messages 重新计算
+- 好友列表、群列表直接读取此表，不再对 messages 做聚合
+- 计数用 SQL 表达式自增（col = col + 1），并发写入不会互相覆盖；打开会话（读取最新一页
+  消息或调用 read 接口）时 mark_read 把未读数清零
+"""
+import re
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models.chat import ChatSession, Message
+from app.models.conversation import ConversationSummary
+from app.models.group import GroupMessage
+
+FRIEND_CONVERSATION = "friend"
+GROUP_CONVERSATION = "group"
+
+PREVIEW_MAX_CHARS = 200
+
+
+def _strip_message_tags(content: Optional[str]) -> Optional[str]:
+    if not content:
+        return content
+    parts = re.findall(r"<message>(.*?)</message>", content, re.DOTALL)
+    if parts:
+        return " ".join(part.strip() for part in parts if part.strip())
+    return re.sub(r"</?message>", "", content).strip()
+
+
+def build_preview(content: Optional[str]) -> Optional[str]:
+    text = _strip_message_tags(content)
+    if text is None:
+        return None
+    return text[:PREVIEW_MAX_CHARS]
+
+
+def get_summary(db: Session, conversation_type: str, conversation_id: int) -> Optional[ConversationSummary]:
+    return (
+        db.query(ConversationSummary)
+        .filter(
+            ConversationSummary.conversation_type == conversation_type,
+            ConversationSummary.conversation_id == conversation_id,
+        )
+        .first()
+    )
+
+
+def get_summaries(
+    db: Session, conversation_type: str, conversation_ids: Iterable[int]
+) -> Dict[int, ConversationSummary]:
+    ids = list(conversation_ids)
+    if not ids:
+        return {}
+    rows = (
+        db.query(ConversationSummary)
+        .filter(
+            ConversationSummary.conversation_type == conversation_type,
+            ConversationSummary.conversation_id.in_(ids),
+        )
+        .all()
+    )
+    return {row.conversation_id: row for row in rows}
+
+
+def _get_or_create(db: Session, conversation_type: str, conversation_id: int) -> ConversationSummary:
+    summary = get_summary(db, conversation_type, conversation_id)
+    if summary is None:
+        summary = ConversationSummary(
+            conversation_type=conversation_type,
+            conversation_id=conversation_id,
+            unread_count=0,
+            message_count=0,
+        )
+        db.add(summary)
+        # 立即 flush，保证同一事务内后续查询能看到新行（session 可能关闭了 autoflush）
+        db.flush()
+    return summary
+
+
+def _apply_last_message(
+    summary: ConversationSummary,
+    message_id: Optional[int],
+    content: Optional[str],
+    role: Optional[str],
+    create_time,
+    sender_id: Optional[str] = None,
+) -> None:
+    summary.last_message_id = message_id
+    summary.last_message_preview = build_preview(content)
+    summary.last_message_role = role
+    summary.last_message_sender_id = sender_id
+    summary.last_message_time = create_time
+
+
+def _increment(db: Session, summary: ConversationSummary, *columns: str) -> None:
+    for column in columns:
+        setattr(summary, column, getattr(ConversationSummary, column) + 1)
+    # 立即 flush：未 flush 前再次赋值会覆盖上一次的表达式，丢掉一次自增
+    db.flush()
+
+
+def _record(
+    db: Session,
+    conversation_type: str,
+    conversation_id: int,
+    message_id: int,
+    content: Optional[str],
+    role: str,
+    create_time,
+    sender_id: Optional[str] = None,
+    count_unread: bool = False,
+) -> ConversationSummary:
+    summary = _get_or_create(db, conversation_type, conversation_id)
+    if summary.last_message_id is None or message_id >= summary.last_message_id:
+        _apply_last_message(summary, message_id, content, role, create_time, sender_id)
+    if count_unread:
+        _increment(db, summary, "message_count", "unread_count")
+    else:
+        _increment(db, summary, "message_count")
+    return summary
+
+
+def record_friend_message(db: Session, friend_id: int, message: Message, count_unread: bool = False) -> ConversationSummary:
+    """新消息已 flush（拥有 id）后调用，与消息插入同一事务提交。"""
+    return _record(
+        db,
+        FRIEND_CONVERSATION,
+        friend_id,
+        message.id,
+        message.content,
+        message.role,
+        message.create_time,
+        count_unread=count_unread,
+    )
+
+
+def record_group_message(db: Session, message: GroupMessage, count_unread: bool = False) -> ConversationSummary:
+    return _record(
+        db,
+        GROUP_CONVERSATION,
+        message.group_id,
+        message.id,
+        message.content,
+        message.sender_type,
+        message.create_time,
+        sender_id=message.sender_id,
+        count_unread=count_unread,
+    )
+
+
+def update_message_content(
+    db: Session,
+    conversation_type: str,
+    conversation_id: int,
+    message_id: int,
+    content: Optional[str],
+    count_unread: bool = False,
+) -> None:
+    """AI 回复内容落盘时调用：若该消息是最后一条则刷新预览，count_unread 时未读数 +1。"""
+    summary = get_summary(db, conversation_type, conversation_id)
+    if summary is None:
+        return
+    if summary.last_message_id == message_id:
+        summary.last_message_preview = build_preview(content)
+    if count_unread and content:
+        _increment(db, summary, "unread_count")
+
+
+def refresh_friend_summary(db: Session, friend_id: int) -> ConversationSummary:
+    """按 messages 重新计算好友会话摘要（撤回、删除会话、清空记录后调用）。"""
+    base = (
+        db.query(Message)
+        .join(ChatSession, ChatSession.id == Message.session_id)
+        .filter(
+            Message.friend_id == friend_id,
+            Message.deleted == False,
+            ChatSession.deleted == False,
+        )
+    )
+    db.flush()
+    last_msg = base.order_by(Message.id.desc()).first()
+    summary = _get_or_create(db, FRIEND_CONVERSATION, friend_id)
+    summary.message_count = base.count()
+    summary.unread_count = min(summary.unread_count or 0, summary.message_count)
+    if last_msg:
+        _apply_last_message(summary, last_msg.id, last_msg.content, last_msg.role, last_msg.create_time)
+    else:
+        _apply_last_message(summary, None, None, None, None)
+    return summary
+
+
+def refresh_group_summary(db: Session, group_id: int) -> ConversationSummary:
+    base = db.query(GroupMessage).filter(GroupMessage.group_id == group_id)
+    db.flush()
+    last_msg = base.order_by(GroupMessage.id.desc()).first()
+    summary = _get_or_create(db, GROUP_CONVERSATION, group_id)
+    summary.message_count = base.count()
+    summary.unread_count = min(summary.unread_count or 0, summary.message_count)
+    if last_msg:
+        _apply_last_message(
+            summary,
+            last_msg.id,
+            last_msg.content,
+            last_msg.sender_type,
+            last_msg.create_time,
+            last_msg.sender_id,
+        )
+    else:
+        _apply_last_message(summary, None, None, None, None)
+    return summary
+
+
+def delete_summary(db: Session, conversation_type: str, conversation_id: int) -> None:
+    db.query(ConversationSummary).filter(
+        ConversationSummary.conversation_type == conversation_type,
+        ConversationSummary.conversation_id == conversation_id,
+    ).delete(synchronize_session=False)
+
+
+def mark_read(db: Session, conversation_type: str, conversation_id: int) -> None:
+    """打开会话时调用：未读数清零（已为 0 时不产生写入）。"""
+    updated = (
+        db.query(ConversationSummary)
+        .filter(
+            ConversationSummary.conversation_type == conversation_type,
+            ConversationSummary.conversation_id == conversation_id,
+            ConversationSummary.unread_count > 0,
+        )
+        .update({ConversationSummary.unread_count: 0})
+    )
+    if updated:
+        db.commit()
@@ -3,7 +3,7 @@ from typing import List, Optional
 from sqlalchemy import func
 from app.models.embedding import EmbeddingSetting
 from app.schemas.embedding import EmbeddingSettingCreate, EmbeddingSettingUpdate
-from app.services.settings_service import SettingsService
+from app.services.config_snapshot_service import FrozenConfig, config_snapshot_service
 
 class EmbeddingService:
     _provider_labels = {
@@ -42,11 +42,8 @@ class EmbeddingService:
         return db.query(EmbeddingSetting).filter(EmbeddingSetting.id == setting_id, EmbeddingSetting.deleted == False).first()
 
     @staticmethod
-    def get_active_setting(db: Session) -> Optional[EmbeddingSetting]:
-        active_id = SettingsService.get_setting(db, "memory", "active_embedding_config_id", None)
-        if active_id is None:
-            return None
-        return EmbeddingService.get_setting(db, active_id)
+    def get_active_setting(db: Session) -> Optional[FrozenConfig]:
+        return config_snapshot_service.get(db).active_embedding_setting
 
     @staticmethod
     def get_multi(db: Session, skip: int = 0, limit: int = 100) -> List[EmbeddingSetting]:
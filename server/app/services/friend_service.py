@@ -1,9 +1,10 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 from typing import List, Optional
 from datetime import datetime, timezone
 from app.models.friend import Friend
 from app.models.chat import ChatSession, Message
+from app.models.conversation import ConversationSummary
+from app.services import conversation_summary_service
 from app.services.llm_service import llm_service
 from app.schemas.friend import (
     FriendCreate,
@@ -144,28 +145,19 @@ async def _stream_agent_events(
             continue
 
 def get_friends(db: Session, skip: int = 0, limit: int = 100) -> List[Friend]:
-    # 子查询：获取每个好友的最新消息ID（通过 ChatSession 连接）
-    latest_message_subquery = (
-        db.query(
-            ChatSession.friend_id,
-            func.max(Message.id).label("max_id")
-        )
-        .join(Message, ChatSession.id == Message.session_id)
-        .filter(Message.deleted == False, ChatSession.deleted == False)
-        .group_by(ChatSession.friend_id)
-        .subquery()
-    )
-
-    # 主查询：连接好友和最新消息
+    # 最后一条消息来自物化的 conversation_summaries，单次索引读取即可
     query = (
-        db.query(Friend, Message.content, Message.role, Message.create_time)
-        .outerjoin(latest_message_subquery, Friend.id == latest_message_subquery.c.friend_id)
-        .outerjoin(Message, Message.id == latest_message_subquery.c.max_id)
+        db.query(Friend, ConversationSummary)
+        .outerjoin(
+            ConversationSummary,
+            (ConversationSummary.conversation_type == conversation_summary_service.FRIEND_CONVERSATION)
+            & (ConversationSummary.conversation_id == Friend.id),
+        )
         .filter(Friend.deleted == False)
         # 排序：置顶优先，其次按最后消息时间，最后按更新时间
         .order_by(
             Friend.pinned_at.desc().nulls_last(), 
-            Message.create_time.desc().nulls_last(), 
+            ConversationSummary.last_message_time.desc().nulls_last(), 
             Friend.update_time.desc()
         )
         .offset(skip)
@@ -173,11 +165,12 @@ def get_friends(db: Session, skip: int = 0, limit: int = 100) -> List[Friend]:
     )
 
     results = []
-    for friend, content, role, msg_time in query.all():
+    for friend, summary in query.all():
         # 将消息内容绑定到 friend 对象（临时属性，以便 Pydantic 转换）
-        friend.last_message = _strip_message_tags(content)
-        friend.last_message_role = role
-        friend.last_message_time = msg_time
+        friend.last_message = summary.last_message_preview if summary else None
+        friend.last_message_role = summary.last_message_role if summary else None
+        friend.last_message_time = summary.last_message_time if summary else None
+        friend.unread_count = summary.unread_count if summary else 0
         results.append(friend)
     
     return results
@@ -257,6 +250,8 @@ def ensure_initial_message(db: Session, friend_id: int, initial_message: Optiona
         content=initial_message
     )
     db.add(db_message)
+    db.flush()
+    conversation_summary_service.record_friend_message(db, friend_id, db_message, count_unread=True)
     db.commit()
     db.refresh(db_message)
     return db_message
@@ -0,0 +1,167 @@
+"""
+可重连的生成事件流。
+
+后台生成任务与 HTTP 响应本来就是解耦的（_run_chat_generation_task 写 queue，SSE 读
+queue），但客户端断线后无法接回，只能等最终消息或者重新生成（多一次完整 LLM 调用）。
+
+GenerationEventLog 以 ai_msg_id 为键，把生成事件按递增 seq 写入环形缓冲：
+- 对生成任务而言它就是一个 queue（put(event) / put(None) 表示结束）
+- subscribe(after) 先回放 seq > after 的缓冲事件，再实时跟随，可有多个订阅者
+- 发起生成的那个响应用 subscribe(lossless=True)：事件另存一份到它独占的无界队列，
+  客户端读得慢也不会丢增量；环形缓冲只服务于断线重连
+- 生成结束后保留 STREAM_LOG_GRACE_SECONDS 供重连，随后从注册表移除
+- 重连时缓冲已被挤掉导致断档，先发一条 stream_gap 事件，前端据此以最终消息为准
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationEventLog:
+    def __init__(self, key: int, capacity: int):
+        self.key = key
+        self._events: Deque[Tuple[int, dict]] = deque(maxlen=max(1, capacity))
+        self._last_seq = 0
+        self._changed = asyncio.Event()
+        self._finished = asyncio.Event()
+        self._followers: List[Deque[Tuple[int, dict]]] = []
+        self.done = False
+        self.created_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+
+    @property
+    def last_seq(self) -> int:
+        return self._last_seq
+
+    @property
+    def first_seq(self) -> int:
+        return self._events[0][0] if self._events else self._last_seq + 1
+
+    async def put(self, event: Optional[dict]) -> None:
+        """与 asyncio.Queue.put 同形，None 表示生成结束。"""
+        self.publish(event)
+
+    def publish(self, event: Optional[dict]) -> None:
+        if self.done:
+            return
+        if event is None:
+            self.done = True
+            self.finished_at = time.monotonic()
+            self._finished.set()
+        else:
+            self._last_seq += 1
+            self._events.append((self._last_seq, event))
+            for backlog in self._followers:
+                backlog.append((self._last_seq, event))
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait_done(self) -> None:
+        await self._finished.wait()
+
+    def _gap_event(self, cursor: int) -> Dict[str, Any]:
+        return {
+            "event": "stream_gap",
+            "data": {"after": cursor, "first_seq": self.first_seq, "message_id": self.key},
+        }
+
+    def _events_after(self, cursor: int) -> list:
+        start = cursor - self.first_seq + 1
+        return list(itertools.islice(self._events, max(start, 0), None))
+
+    async def subscribe(self, after: int = 0, lossless: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        """
+        回放 seq > after 的事件并跟随直到生成结束；产出的事件带 seq 字段。
+        lossless=True 时订阅后的事件进独占的无界队列，不受环形缓冲容量影响。
+        """
+        if lossless:
+            async for event in self._follow_lossless(max(after, 0)):
+                yield event
+            return
+        cursor = max(after, 0)
+        while True:
+            if cursor < self.first_seq - 1:
+                yield self._gap_event(cursor)
+                cursor = self.first_seq - 1
+            for seq, event in self._events_after(cursor):
+                yield {**event, "seq": seq}
+                cursor = seq
+            if self.done and cursor >= self._last_seq:
+                return
+            changed = self._changed
+            if cursor >= self._last_seq:
+                await changed.wait()
+
+    async def _follow_lossless(self, cursor: int) -> AsyncIterator[Dict[str, Any]]:
+        if cursor < self.first_seq - 1:
+            yield self._gap_event(cursor)
+            cursor = self.first_seq - 1
+        # 回放与登记之间没有 await，不会漏掉中间发布的事件
+        backlog: Deque[Tuple[int, dict]] = deque(self._events_after(cursor))
+        self._followers.append(backlog)
+        try:
+            while True:
+                while backlog:
+                    seq, event = backlog.popleft()
+                    yield {**event, "seq": seq}
+                if self.done:
+                    return
+                await self._changed.wait()
+        finally:
+            self._followers.remove(backlog)
+
+
+class GenerationStreamRegistry:
+    def __init__(self):
+        self._logs: Dict[int, GenerationEventLog] = {}
+
+    def open(self, key: int) -> GenerationEventLog:
+        previous = self._logs.get(key)
+        if previous is not None and not previous.done:
+            previous.publish(None)
+        log = GenerationEventLog(key, settings.STREAM_LOG_CAPACITY)
+        self._logs[key] = log
+        self._schedule_eviction(log)
+        return log
+
+    def get(self, key: int) -> Optional[GenerationEventLog]:
+        return self._logs.get(key)
+
+    def close(self, key: int) -> None:
+        log = self._logs.get(key)
+        if log is not None:
+            log.publish(None)
+
+    def __len__(self) -> int:
+        return len(self._logs)
+
+    def _schedule_eviction(self, log: GenerationEventLog) -> None:
+        try:
+            asyncio.get_running_loop().create_task(self._evict_when_done(log))
+        except RuntimeError:
+            # 无事件循环（同步调用场景）时只靠 open 覆盖旧日志
+            pass
+
+    async def _evict_when_done(self, log: GenerationEventLog) -> None:
+        grace = settings.STREAM_LOG_GRACE_SECONDS
+        max_age = settings.STREAM_LOG_MAX_AGE_SECONDS
+        remaining = max_age - (time.monotonic() - log.created_at)
+        try:
+            await asyncio.wait_for(log.wait_done(), timeout=max(remaining, 0))
+        except asyncio.TimeoutError:
+            logger.warning("[GenStream] log %s exceeded max age, closing", log.key)
+            log.publish(None)
+        await asyncio.sleep(grace)
+        if self._logs.get(log.key) is log:
+            del self._logs[log.key]
+
+
+generation_streams = GenerationStreamRegistry()
@@ -0,0 +1,203 @@
+"""
+自驱（接力 / 辩论）运行期的增量上下文。
+
+以前每次发言 _run_single_generation 都要 fetch_group_history(limit=None) 全量读会话、
+build_name_map 重新查好友名字、再从头 split_rounds + build_group_context，40 轮的辩论
+总共要读、处理 O(n²) 条消息。AutoDriveContext 挂在 AutoDriveRuntime 上，整个 run 复用：
+- 消息落库后以快照追加（不持有 ORM 实例，避免提交后过期再懒加载回查），轮次随之增量切分
+- 按发言人缓存已闭合轮次的渲染结果，每次发言只渲染新闭合的轮次
+- 名字映射缓存，只为没见过的发送者查一次库
+- 每次发言前按 AUTO_DRIVE_CONTEXT_MAX_TOKENS 裁掉最早的轮次（所有发言人共用同一起点）
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.friend import Friend
+from app.services import group_chat_shared
+from app.services.memo.constants import DEFAULT_USER_ID
+from app.vendor.memobase_server.tokenizer import count_tokens
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ContextMessage:
+    id: int
+    sender_id: str
+    sender_type: str
+    content: str
+
+    @classmethod
+    def from_row(cls, msg) -> "ContextMessage":
+        return cls(
+            id=msg.id,
+            sender_id=str(msg.sender_id),
+            sender_type=msg.sender_type,
+            content=msg.content or "",
+        )
+
+
+class _Round:
+    __slots__ = ("user", "replies", "tokens")
+
+    def __init__(self, user: ContextMessage):
+        self.user = user
+        self.replies: List[ContextMessage] = []
+        self.tokens = count_tokens(user.content)
+
+    def split_for(self, self_id: str) -> dict:
+        """与 group_chat_shared.split_rounds 相同的切分：自己的（最后一条）回复与其他成员发言。"""
+        others: List[ContextMessage] = []
+        self_msg: Optional[ContextMessage] = None
+        for msg in self.replies:
+            if msg.sender_type == "friend" and msg.sender_id == self_id:
+                self_msg = msg
+            else:
+                others.append(msg)
+        return {"user": self.user, "others": others, "self": self_msg}
+
+
+class AutoDriveContext:
+    def __init__(
+        self,
+        group_id: int,
+        session_id: int,
+        *,
+        max_tokens: Optional[int] = None,
+    ):
+        self.group_id = group_id
+        self.session_id = session_id
+        self.max_tokens = settings.AUTO_DRIVE_CONTEXT_MAX_TOKENS if max_tokens is None else max_tokens
+        self._names: Dict[str, str] = {str(DEFAULT_USER_ID): "我"}
+        self._unresolved: Set[int] = set()
+        self._rounds: List[_Round] = []
+        # 预算裁剪后保留的第一轮，以及 _rounds[_start:] 的 token 总数
+        self._start = 0
+        self._tokens = 0
+        self._last_id = 0
+        # self_id -> {轮次下标: 渲染后的 agent 消息}，只缓存已闭合的轮次
+        self._views: Dict[str, Dict[int, List[dict]]] = {}
+
+    @property
+    def name_map(self) -> Dict[str, str]:
+        return self._names
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    def remember_names(self, friends: Dict[str, Friend]) -> None:
+        for fid, friend in friends.items():
+            self._names[str(fid)] = friend.name
+
+    def append(self, msg) -> None:
+        """追加一条已落库的消息（ORM 行或 ContextMessage），id 不大于已见过的会被忽略。"""
+        snapshot = msg if isinstance(msg, ContextMessage) else ContextMessage.from_row(msg)
+        if snapshot.id <= self._last_id:
+            return
+        self._last_id = snapshot.id
+        if snapshot.sender_id not in self._names:
+            try:
+                self._unresolved.add(int(snapshot.sender_id))
+            except (TypeError, ValueError):
+                pass
+
+        if snapshot.sender_type == "user":
+            self._rounds.append(_Round(snapshot))
+            self._tokens += self._rounds[-1].tokens
+            return
+        if not self._rounds:
+            # 与 split_rounds 一致：第一条用户消息之前的发言不进入上下文
+            return
+        last = self._rounds[-1]
+        last.replies.append(snapshot)
+        tokens = count_tokens(snapshot.content)
+        last.tokens += tokens
+        self._tokens += tokens
+
+    def sync(self, db: Session, before_id: int) -> None:
+        """
+        每次发言前调用一次：按 keyset 补齐 last_id 之后、before_id 之前落库但没有经过
+        append 的消息（通常为空），解析新出现的名字，再按 token 预算裁剪。
+        """
+        for msg in group_chat_shared.fetch_group_history(
+            db=db,
+            group_id=self.group_id,
+            session_id=self.session_id,
+            before_id=before_id,
+            after_id=self._last_id,
+        ):
+            self.append(msg)
+        self._resolve_names(db)
+        self._trim()
+
+    def _resolve_names(self, db: Session) -> None:
+        if not self._unresolved:
+            return
+        friends = db.query(Friend).filter(Friend.id.in_(self._unresolved)).all()
+        for friend in friends:
+            self._names[str(friend.id)] = friend.name
+        self._unresolved.clear()
+
+    def _trim(self) -> None:
+        if not self.max_tokens or self.max_tokens <= 0:
+            return
+        trimmed = 0
+        # 至少保留最近一轮
+        while self._tokens > self.max_tokens and self._start < len(self._rounds) - 1:
+            self._tokens -= self._rounds[self._start].tokens
+            self._start += 1
+            trimmed += 1
+        if trimmed:
+            for view in self._views.values():
+                for idx in [i for i in view if i < self._start]:
+                    del view[idx]
+            logger.info(
+                "[AutoDriveContext] session=%s trimmed %s rounds, kept %s (%s tokens)",
+                self.session_id,
+                trimmed,
+                len(self._rounds) - self._start,
+                self._tokens,
+            )
+
+    def _history_for(self, self_id: str) -> List[dict]:
+        view = self._views.setdefault(self_id, {})
+        closed = len(self._rounds) - 1
+        messages: List[dict] = []
+        for idx in range(self._start, len(self._rounds)):
+            rendered = view.get(idx)
+            if rendered is None:
+                rendered = group_chat_shared.render_group_round(
+                    self._rounds[idx].split_for(self_id), self._names
+                )
+                # 最后一轮可能还会追加回复，不缓存
+                if idx < closed:
+                    view[idx] = rendered
+            messages.extend(rendered)
+        return messages
+
+    def build_agent_messages(
+        self,
+        *,
+        self_id: int,
+        current_user_msg: str,
+        user_msg_id: int,
+        current_other_members: str,
+        mention_result: str,
+    ) -> List[dict]:
+        """等价于对已追加的消息调用 group_chat_shared.build_group_context（预算裁剪除外）。"""
+        messages = self._history_for(str(self_id))
+        messages.extend(
+            group_chat_shared.build_current_turn_messages(
+                current_user_msg,
+                user_msg_id,
+                current_other_members,
+                mention_result,
+            )
+        )
+        return messages
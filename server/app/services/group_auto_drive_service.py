@@ -1,22 +1,24 @@
 ﻿import asyncio
 import json
 import logging
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime, timezone, timedelta
-from typing import Dict, List, Optional, AsyncGenerator, Tuple
+from typing import Any, Dict, List, Optional, AsyncGenerator, Set, Tuple
 
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.db.session import SessionLocal
 from app.models.friend import Friend
-from app.models.group import GroupMember, GroupMessage, GroupSession, GroupAutoDriveRun
+from app.models.group import GroupMember, GroupAutoDriveRun
 from app.prompt import get_prompt
 from app.schemas import group_auto_drive as ad_schemas
 from app.services import group_chat_shared, provider_rules
+from app.services.group_auto_drive_context import AutoDriveContext, ContextMessage
 from app.services.llm_service import llm_service
 from app.services.memo.constants import DEFAULT_USER_ID
 from app.services.llm_client import set_agents_default_client
-from app.services.voice_message_service import generate_voice_payload_for_message
+from app.services.voice_message_service import generate_voice_payload_for_message, persist_voice_payload
 
 from openai.types.shared import Reasoning
 from agents import Agent, ModelSettings, function_tool
@@ -45,6 +47,37 @@ class AutoDriveRuntime:
     stop_event: asyncio.Event
     pause_requested: bool = False
     task: Optional[asyncio.Task] = None
+    context: AutoDriveContext = field(init=False)
+    voice_tasks: Set[asyncio.Task] = field(default_factory=set)
+
+    def __post_init__(self) -> None:
+        self.context = AutoDriveContext(self.group_id, self.session_id)
+
+
+@dataclass
+class _TurnSpec:
+    """发言计划中的一次发言。"""
+    member_id: str
+    phase: str  # 写入运行状态的阶段
+    host_phase: str  # 主持词使用的阶段（辩论开场第二位为 statement）
+    round_no: int  # 写入运行状态的轮次
+    host_round: int  # 主持词中的轮次
+    debate_side: Optional[str] = None
+    round_scoped: bool = False  # 是否向发言人提供本轮其他成员的发言
+    closes_round: bool = False  # 本轮最后一位，发言后提交 current_round
+
+
+@dataclass
+class _PreparedTurn:
+    """可提前一位准备好的发言上下文（不依赖上一位的回复）。"""
+    spec: _TurnSpec
+    friend: Friend
+    host_message: str
+    llm_config: Any
+    instructions: str = ""
+    model_settings: Optional[ModelSettings] = None
+    agent_model: Any = None
+    enable_thinking: bool = False
 
 
 class GroupAutoDriveService:
@@ -447,6 +480,7 @@ class GroupAutoDriveService:
                         await runtime.queue.put({"event": "auto_drive_error", "data": {"detail": f"成员 {member_id} 不在群内"}})
                         return
 
+                runtime.context.remember_names(friend_map)
                 topic = self._format_topic(config)
 
                 if config.mode == "debate":
@@ -479,93 +513,34 @@ class GroupAutoDriveService:
         friend_map: Dict[str, Friend],
     ) -> None:
         total_rounds = config.turn_limit
-        current_turn = run.current_turn
-
+        turns: List[_TurnSpec] = []
         for round_no in range(1, total_rounds + 1):
-            round_msgs: List[GroupMessage] = []
             for idx, member_id in enumerate(order):
-                if not await self._wait_if_paused(db, runtime, run):
-                    return
-
-                friend = friend_map[member_id]
                 phase = "opening" if round_no == 1 and idx == 0 else "rounds"
-                speaker_name = friend.name
-                host_message = self._build_host_message(
-                    config.mode,
-                    phase,
-                    round_no,
-                    speaker_name,
-                    topic,
-                )
-                current_turn += 1
-                await self._update_state(
-                    db,
-                    runtime,
-                    run,
-                    status="running",
-                    phase=phase if phase != "rounds" else "rounds",
-                    current_round=round_no,
-                    current_turn=current_turn,
-                    next_speaker_id=member_id,
-                    pause_reason=None,
-                )
-
-                other_text = group_chat_shared.build_other_members_text(round_msgs, group_chat_shared.build_name_map(db, round_msgs))
-                await self._dispatch_speaker(
-                    db,
-                    runtime,
-                    run,
-                    friend,
-                    host_message,
-                    member_id,
-                    other_text,
-                    debate_side=None,
-                )
-
-                refreshed = db.query(GroupMessage).filter(GroupMessage.session_id == run.session_id, GroupMessage.sender_id == member_id).order_by(GroupMessage.id.desc()).first()
-                if refreshed:
-                    round_msgs.append(refreshed)
-
-            run.current_round = round_no
-            db.commit()
-            db.refresh(run)
+                turns.append(_TurnSpec(
+                    member_id=member_id,
+                    phase=phase,
+                    host_phase=phase,
+                    round_no=round_no,
+                    host_round=round_no,
+                    round_scoped=True,
+                    closes_round=idx == len(order) - 1,
+                ))
 
         if config.end_action in ("summary", "both"):
             summary_by = config.summary_by
-            if summary_by and summary_by != DEFAULT_USER_ID:
-                friend = friend_map.get(str(summary_by))
-                if friend:
-                    current_turn += 1
-                    await self._update_state(
-                        db,
-                        runtime,
-                        run,
-                        status="running",
-                        phase="summary",
-                        current_round=run.current_round,
-                        current_turn=current_turn,
-                        next_speaker_id=str(summary_by),
-                        pause_reason=None,
-                    )
-                    host_message = self._build_host_message(
-                        config.mode,
-                        "summary",
-                        run.current_round or total_rounds,
-                        friend.name,
-                        topic,
-                    )
-                    await self._dispatch_speaker(
-                        db,
-                        runtime,
-                        run,
-                        friend,
-                        host_message,
-                        str(summary_by),
-                        "(empty)",
-                        debate_side=None,
-                    )
-
-        await self._end_run(db, runtime, run)
+            if summary_by and summary_by != DEFAULT_USER_ID and str(summary_by) in friend_map:
+                last_round = total_rounds if total_rounds > 0 else run.current_round
+                turns.append(_TurnSpec(
+                    member_id=str(summary_by),
+                    phase="summary",
+                    host_phase="summary",
+                    round_no=last_round,
+                    host_round=last_round or total_rounds,
+                ))
+
+        if await self._run_turns(db, runtime, run, config.mode, topic, turns, friend_map):
+            await self._end_run(db, runtime, run)
 
     async def _run_debate_mode(
         self,
@@ -578,7 +553,6 @@ class GroupAutoDriveService:
         order: List[str],
         friend_map: Dict[str, Friend],
     ) -> None:
-        current_turn = run.current_turn
         affirmative = run.roles_json.get("affirmative", [])
         negative = run.roles_json.get("negative", [])
 
@@ -586,255 +560,172 @@ class GroupAutoDriveService:
             await runtime.queue.put({"event": "auto_drive_error", "data": {"detail": "正反方配置缺失"}})
             return
 
-        opening_order = [affirmative[0], negative[0]]
-        for idx, member_id in enumerate(opening_order):
-            if not await self._wait_if_paused(db, runtime, run):
-                return
-            friend = friend_map[member_id]
-            phase = "opening" if idx == 0 else "statement"
-            current_turn += 1
-            await self._update_state(
-                db,
-                runtime,
-                run,
-                status="running",
+        turns: List[_TurnSpec] = []
+        for idx, member_id in enumerate([affirmative[0], negative[0]]):
+            turns.append(_TurnSpec(
+                member_id=member_id,
                 phase="opening",
-                current_round=0,
-                current_turn=current_turn,
-                next_speaker_id=member_id,
-                pause_reason=None,
-            )
-            host_message = self._build_host_message(
-                "debate",
-                phase,
-                0,
-                friend.name,
-                topic,
-                side_map.get(member_id),
-            )
-            await self._dispatch_speaker(
-                db,
-                runtime,
-                run,
-                friend,
-                host_message,
-                member_id,
-                "(empty)",
+                host_phase="opening" if idx == 0 else "statement",
+                round_no=0,
+                host_round=0,
                 debate_side=side_map.get(member_id),
-            )
+            ))
 
         total_rounds = config.turn_limit
         for round_no in range(1, total_rounds + 1):
-            round_msgs: List[GroupMessage] = []
-            for member_id in order:
-                if not await self._wait_if_paused(db, runtime, run):
-                    return
-                friend = friend_map[member_id]
-                current_turn += 1
-                await self._update_state(
-                    db,
-                    runtime,
-                    run,
-                    status="running",
+            for idx, member_id in enumerate(order):
+                turns.append(_TurnSpec(
+                    member_id=member_id,
                     phase="free",
-                    current_round=round_no,
-                    current_turn=current_turn,
-                    next_speaker_id=member_id,
-                    pause_reason=None,
-                )
-                other_text = group_chat_shared.build_other_members_text(round_msgs, group_chat_shared.build_name_map(db, round_msgs))
-                host_message = self._build_host_message(
-                    "debate",
-                    "free",
-                    round_no,
-                    friend.name,
-                    topic,
-                    side_map.get(member_id),
-                )
-                await self._dispatch_speaker(
-                    db,
-                    runtime,
-                    run,
-                    friend,
-                    host_message,
-                    member_id,
-                    other_text,
+                    host_phase="free",
+                    round_no=round_no,
+                    host_round=round_no,
                     debate_side=side_map.get(member_id),
-                )
-                refreshed = db.query(GroupMessage).filter(
-                    GroupMessage.session_id == run.session_id,
-                    GroupMessage.sender_id == member_id,
-                ).order_by(GroupMessage.id.desc()).first()
-                if refreshed:
-                    round_msgs.append(refreshed)
-
-            run.current_round = round_no
-            db.commit()
-            db.refresh(run)
+                    round_scoped=True,
+                    closes_round=idx == len(order) - 1,
+                ))
 
         # 辩论必须包含总结陈词阶段
-        summary_order = [negative[0], affirmative[0]]
-        for member_id in summary_order:
-            if not await self._wait_if_paused(db, runtime, run):
-                return
-            friend = friend_map[member_id]
-            current_turn += 1
-            await self._update_state(
-                db,
-                runtime,
-                run,
-                status="running",
+        last_round = total_rounds if total_rounds > 0 else run.current_round
+        for member_id in [negative[0], affirmative[0]]:
+            turns.append(_TurnSpec(
+                member_id=member_id,
                 phase="summary",
-                current_round=run.current_round,
-                current_turn=current_turn,
-                next_speaker_id=member_id,
-                pause_reason=None,
-            )
-            host_message = self._build_host_message(
-                "debate",
-                "summary",
-                run.current_round,
-                friend.name,
-                topic,
-                side_map.get(member_id),
-            )
-            await self._dispatch_speaker(
-                db,
-                runtime,
-                run,
-                friend,
-                host_message,
-                member_id,
-                "(empty)",
+                host_phase="summary",
+                round_no=last_round,
+                host_round=last_round,
                 debate_side=side_map.get(member_id),
-            )
+            ))
 
         if config.end_action in ("judge", "both") and config.judge_id and config.judge_id != DEFAULT_USER_ID:
-            judge = friend_map.get(str(config.judge_id))
-            if judge:
+            if str(config.judge_id) in friend_map:
+                turns.append(_TurnSpec(
+                    member_id=str(config.judge_id),
+                    phase="judge",
+                    host_phase="judge",
+                    round_no=last_round,
+                    host_round=last_round,
+                ))
+
+        if await self._run_turns(db, runtime, run, "debate", topic, turns, friend_map):
+            await self._end_run(db, runtime, run)
+
+    async def _run_turns(
+        self,
+        db: Session,
+        runtime: AutoDriveRuntime,
+        run: GroupAutoDriveRun,
+        mode: str,
+        topic: Dict[str, str],
+        turns: List[_TurnSpec],
+        friend_map: Dict[str, Friend],
+    ) -> bool:
+        """
+        按顺序执行发言计划。开启 AUTO_DRIVE_LOOKAHEAD 时，第 k 位发言期间就准备好第 k+1 位的
+        主持词、模型配置与系统提示词；第 k 位的语音合成放到后台，回复落库后立刻开始下一位。
+        若在两位之间确实暂停过，预先准备的结果作废并重新准备（暂停期间配置可能已被修改）。
+        返回 False 表示被停止。
+        """
+        lookahead = settings.AUTO_DRIVE_LOOKAHEAD
+        current_turn = run.current_turn
+        round_msgs: List[ContextMessage] = []
+
+        def _prepare(idx: int) -> Optional[asyncio.Task]:
+            if idx >= len(turns):
+                return None
+            spec = turns[idx]
+            return asyncio.ensure_future(
+                self._prepare_turn(db, runtime, mode, topic, spec, friend_map[spec.member_id])
+            )
+
+        def _discard(task: Optional[asyncio.Task]) -> None:
+            if task is None:
+                return
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()
+
+        next_prepared = _prepare(0) if lookahead else None
+        try:
+            for idx, spec in enumerate(turns):
+                will_pause = runtime.pause_requested or not runtime.pause_event.is_set()
+                if not await self._wait_if_paused(db, runtime, run):
+                    return False
+
+                if lookahead:
+                    if will_pause:
+                        _discard(next_prepared)
+                        next_prepared = _prepare(idx)
+                    prepared = await next_prepared
+                    # 第 k 位发言期间准备第 k+1 位
+                    next_prepared = _prepare(idx + 1)
+                else:
+                    prepared = await self._prepare_turn(
+                        db, runtime, mode, topic, spec, friend_map[spec.member_id]
+                    )
+
                 current_turn += 1
                 await self._update_state(
                     db,
                     runtime,
                     run,
                     status="running",
-                    phase="judge",
-                    current_round=run.current_round,
+                    phase=spec.phase,
+                    current_round=spec.round_no,
                     current_turn=current_turn,
-                    next_speaker_id=str(config.judge_id),
+                    next_speaker_id=spec.member_id,
                     pause_reason=None,
                 )
-                host_message = self._build_host_message(
-                    "debate",
-                    "judge",
-                    run.current_round,
-                    judge.name,
-                    topic,
-                    None,
-                )
-                await self._dispatch_speaker(
-                    db,
-                    runtime,
-                    run,
-                    judge,
-                    host_message,
-                    str(config.judge_id),
-                    "(empty)",
-                    debate_side=None,
-                )
 
-        await self._end_run(db, runtime, run)
+                other_text = "(empty)"
+                if spec.round_scoped:
+                    other_text = group_chat_shared.build_other_members_text(round_msgs, runtime.context.name_map)
+                reply = await self._dispatch_speaker(db, runtime, run, prepared, other_text)
+                if spec.round_scoped and reply:
+                    round_msgs.append(reply)
 
-    async def _dispatch_speaker(
+                if spec.closes_round:
+                    round_msgs = []
+                    run.current_round = spec.round_no
+                    db.commit()
+                    db.refresh(run)
+        finally:
+            _discard(next_prepared)
+            await self._drain_voice_tasks(runtime)
+        return True
+
+    async def _prepare_turn(
         self,
         db: Session,
         runtime: AutoDriveRuntime,
-        run: GroupAutoDriveRun,
+        mode: str,
+        topic: Dict[str, str],
+        spec: _TurnSpec,
         friend: Friend,
-        host_message: str,
-        speaker_id: str,
-        other_members_text: str,
-        debate_side: Optional[str],
-    ) -> None:
-        user_msg = group_chat_shared.create_user_message(
-            db=db,
-            group_id=run.group_id,
-            session_id=run.session_id,
-            sender_id=DEFAULT_USER_ID,
-            content=host_message,
-            message_type="text",
-            mentions=[speaker_id],
-        )
-        session = db.query(GroupSession).filter(GroupSession.id == run.session_id).first()
-        if session:
-            group_chat_shared.touch_session(db, session)
-
-        ai_msg = group_chat_shared.create_ai_placeholder(
-            db=db,
-            group_id=run.group_id,
-            session_id=run.session_id,
-            friend_id=int(speaker_id),
-            message_type="text",
-            debate_side=debate_side,
+    ) -> _PreparedTurn:
+        """一次发言中不依赖上一位回复的部分：主持词、模型配置、系统提示词与采样参数。"""
+        host_message = self._build_host_message(
+            mode,
+            spec.host_phase,
+            spec.host_round,
+            friend.name,
+            topic,
+            spec.debate_side,
         )
-
-        llm_cfg = llm_service.get_active_config(db)
-        model_name = llm_cfg.model_name if llm_cfg else "unknown"
-        await runtime.queue.put({
-            "event": "start",
-            "data": {
-                "message_id": user_msg.id,
-                "group_id": run.group_id,
-                "session_id": run.session_id,
-                "model": model_name,
-            },
-        })
-
-        await self._run_single_generation(
-            db,
-            runtime,
-            run,
-            friend,
-            host_message,
-            user_msg.id,
-            ai_msg.id,
-            other_members_text,
+        prepared = _PreparedTurn(
+            spec=spec,
+            friend=friend,
+            host_message=host_message,
+            llm_config=llm_service.get_active_config(db),
         )
-
-    async def _run_single_generation(
-        self,
-        db: Session,
-        runtime: AutoDriveRuntime,
-        run: GroupAutoDriveRun,
-        friend: Friend,
-        message_content: str,
-        user_msg_id: int,
-        ai_msg_id: int,
-        current_other_members: str,
-    ) -> None:
-        llm_config = llm_service.get_active_config(db)
+        llm_config = prepared.llm_config
         if not llm_config:
-            await runtime.queue.put({"event": "auto_drive_error", "data": {"detail": "LLM Config missing"}})
-            return
+            return prepared
 
         raw_model_name = llm_config.model_name
         model_name = llm_service.normalize_model_name(raw_model_name)
 
-        history_msgs = group_chat_shared.fetch_group_history(
-            db=db,
-            group_id=run.group_id,
-            session_id=run.session_id,
-            before_id=user_msg_id,
-            limit=None,
-        )
-
-        name_map = group_chat_shared.build_name_map(
-            db=db,
-            messages=history_msgs,
-            default_user_name="我",
-            default_user_id=DEFAULT_USER_ID,
-        )
-
         beijing_tz = timezone(timedelta(hours=8))
         now_time = datetime.now(timezone.utc).astimezone(beijing_tz)
         weekday_map = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
@@ -843,20 +734,20 @@ class GroupAutoDriveService:
         persona_prompt = (friend.system_prompt or get_prompt("chat/default_system_prompt.txt")).strip()
 
         auto_drive_rule = self._build_auto_drive_rule(
-            run.mode,
-            run.phase or "rounds",
-            max(run.current_round, 1),
+            mode,
+            spec.phase or "rounds",
+            max(spec.round_no, 1),
         )
 
         host_script = ""
         try:
-            host_script = get_prompt(f"auto_drive/host_script_{run.mode}.txt").strip()
+            host_script = get_prompt(f"auto_drive/host_script_{mode}.txt").strip()
         except Exception:
             pass
 
         best_practice = ""
         try:
-            best_practice = get_prompt(f"auto_drive/user_best_practice_{run.mode}.txt").strip()
+            best_practice = get_prompt(f"auto_drive/user_best_practice_{mode}.txt").strip()
         except Exception:
             pass
 
@@ -876,7 +767,7 @@ class GroupAutoDriveService:
 
         try:
             root_template = get_prompt("chat/root_system_prompt.txt")
-            final_instructions = group_chat_shared.build_system_prompt(
+            prepared.instructions = group_chat_shared.build_system_prompt(
                 root_template=root_template,
                 persona_prompt=persona_prompt,
                 script_prompt=script_prompt,
@@ -885,44 +776,14 @@ class GroupAutoDriveService:
                 current_time=current_time,
             )
         except Exception:
-            final_instructions = f"{persona_prompt}\n\n{script_prompt}\n\n{current_time}"
-
-        current_other_members = current_other_members or "(empty)"
-        mention_result = "被提及，需要发言"
-
-        @function_tool(name_override="get_other_members_messages", description_override="")
-        async def tool_get_other_members_messages():
-            return current_other_members
-
-        @function_tool(name_override="is_mentioned", description_override="")
-        async def tool_is_mentioned():
-            return mention_result
-
-        agent_messages = group_chat_shared.build_group_context(
-            history_msgs=history_msgs,
-            name_map=name_map,
-            self_id=int(friend.id),
-            current_user_msg=message_content,
-            user_msg_id=user_msg_id,
-            current_other_members=current_other_members,
-            mention_result=mention_result,
-            injected_recall_messages=None,
-        )
-
-        logger.info(
-            "[AutoDrive] AI Context for %s (ID: %s):\n%s",
-            friend.name,
-            friend.id,
-            json.dumps(agent_messages, ensure_ascii=False, indent=2),
-        )
-
-        set_agents_default_client(llm_config, use_for_tracing=True)
+            prepared.instructions = f"{persona_prompt}\n\n{script_prompt}\n\n{current_time}"
 
         enable_thinking = runtime.enable_thinking
         if llm_config and enable_thinking and not llm_config.capability_reasoning:
             force_thinking = provider_rules.is_gemini_model(llm_config, llm_config.model_name)
             if not force_thinking:
                 enable_thinking = False
+        prepared.enable_thinking = enable_thinking
 
         temperature = friend.temperature if friend.temperature is not None else 1.0
         top_p = friend.top_p if friend.top_p is not None else 0.9
@@ -939,77 +800,208 @@ class GroupAutoDriveService:
                 )
             )
 
-        model_settings = ModelSettings(**model_settings_kwargs)
+        prepared.model_settings = ModelSettings(**model_settings_kwargs)
 
         use_litellm = provider_rules.should_use_litellm(llm_config, raw_model_name)
         if use_litellm:
             from agents.extensions.models.litellm_model import LitellmModel
             gemini_model_name = provider_rules.normalize_gemini_model_name(raw_model_name)
             gemini_base_url = provider_rules.normalize_gemini_base_url(llm_config.base_url)
-            agent_model = LitellmModel(model=gemini_model_name, base_url=gemini_base_url, api_key=llm_config.api_key)
+            prepared.agent_model = LitellmModel(model=gemini_model_name, base_url=gemini_base_url, api_key=llm_config.api_key)
         else:
-            agent_model = model_name
+            prepared.agent_model = model_name
+        return prepared
+
+    async def _dispatch_speaker(
+        self,
+        db: Session,
+        runtime: AutoDriveRuntime,
+        run: GroupAutoDriveRun,
+        prepared: _PreparedTurn,
+        other_members_text: str,
+    ) -> Optional[ContextMessage]:
+        speaker_id = prepared.spec.member_id
+        user_msg = group_chat_shared.create_user_message(
+            db=db,
+            group_id=run.group_id,
+            session_id=run.session_id,
+            sender_id=DEFAULT_USER_ID,
+            content=prepared.host_message,
+            message_type="text",
+            mentions=[speaker_id],
+        )
+        await group_chat_shared.touch_session(db, run.session_id)
+
+        ai_msg = group_chat_shared.create_ai_placeholder(
+            db=db,
+            group_id=run.group_id,
+            session_id=run.session_id,
+            friend_id=int(speaker_id),
+            message_type="text",
+            debate_side=prepared.spec.debate_side,
+        )
+
+        model_name = prepared.llm_config.model_name if prepared.llm_config else "unknown"
+        await runtime.queue.put({
+            "event": "start",
+            "data": {
+                "message_id": user_msg.id,
+                "group_id": run.group_id,
+                "session_id": run.session_id,
+                "model": model_name,
+            },
+        })
+
+        return await self._run_single_generation(
+            db,
+            runtime,
+            run,
+            prepared,
+            user_msg.id,
+            ai_msg.id,
+            other_members_text,
+        )
+
+    async def _run_single_generation(
+        self,
+        db: Session,
+        runtime: AutoDriveRuntime,
+        run: GroupAutoDriveRun,
+        prepared: _PreparedTurn,
+        user_msg_id: int,
+        ai_msg_id: int,
+        current_other_members: str,
+    ) -> Optional[ContextMessage]:
+        """生成一次发言，返回落库后的回复快照（同时已追加到 runtime.context）。"""
+        llm_config = prepared.llm_config
+        if not llm_config:
+            await runtime.queue.put({"event": "auto_drive_error", "data": {"detail": "LLM Config missing"}})
+            return None
+
+        friend = prepared.friend
+        message_content = prepared.host_message
+        context = runtime.context
+        context.sync(db, before_id=user_msg_id)
+
+        current_other_members = current_other_members or "(empty)"
+        mention_result = "被提及，需要发言"
+
+        @function_tool(name_override="get_other_members_messages", description_override="")
+        async def tool_get_other_members_messages():
+            return current_other_members
+
+        @function_tool(name_override="is_mentioned", description_override="")
+        async def tool_is_mentioned():
+            return mention_result
+
+        agent_messages = context.build_agent_messages(
+            self_id=int(friend.id),
+            current_user_msg=message_content,
+            user_msg_id=user_msg_id,
+            current_other_members=current_other_members,
+            mention_result=mention_result,
+        )
+
+        logger.info(
+            "[AutoDrive] AI Context for %s (ID: %s):\n%s",
+            friend.name,
+            friend.id,
+            json.dumps(agent_messages, ensure_ascii=False, indent=2),
+        )
+
+        set_agents_default_client(llm_config, use_for_tracing=True)
 
         agent = Agent(
             name=friend.name,
-            instructions=final_instructions,
-            model=agent_model,
-            model_settings=model_settings,
+            instructions=prepared.instructions,
+            model=prepared.agent_model,
+            model_settings=prepared.model_settings,
             tools=group_chat_shared.build_agent_tools(
                 tool_get_other_members_messages,
                 tool_is_mentioned,
             ),
         )
 
-        await group_chat_shared.stream_llm_to_queue(
+        final_content = await group_chat_shared.stream_llm_to_queue(
             agent=agent,
             agent_messages=agent_messages,
             queue=runtime.queue,
-            enable_thinking=enable_thinking,
+            enable_thinking=prepared.enable_thinking,
             sender_id=friend.id,
             message_id=ai_msg_id,
             session_id=run.session_id,
             db=db,
             sanitize_message_tags=False,
         )
+        reply = ContextMessage(id=ai_msg_id, sender_id=str(friend.id), sender_type="friend", content=final_content)
+        context.append(ContextMessage(id=user_msg_id, sender_id=DEFAULT_USER_ID, sender_type="user", content=message_content))
+        context.append(reply)
 
         if friend.enable_voice:
-            try:
-                final_msg = db.query(GroupMessage).filter(GroupMessage.id == ai_msg_id).first()
-                final_content = (final_msg.content or "") if final_msg else ""
-
-                async def _on_voice_segment_ready(segment_data: Dict[str, object]):
-                    await runtime.queue.put({
-                        "event": "voice_segment",
-                        "data": {
-                            "sender_id": str(friend.id),
-                            "message_id": ai_msg_id,
-                            "segment": segment_data,
-                        },
-                    })
-
+            voice = self._synthesize_voice(runtime, friend, ai_msg_id, final_content)
+            if settings.AUTO_DRIVE_LOOKAHEAD:
+                # 语音不挡下一位发言：后台合成，run 结束前统一等待
+                task = asyncio.create_task(voice)
+                runtime.voice_tasks.add(task)
+                task.add_done_callback(runtime.voice_tasks.discard)
+            else:
+                await voice
+
+        return reply
+
+    async def _synthesize_voice(
+        self,
+        runtime: AutoDriveRuntime,
+        friend: Friend,
+        ai_msg_id: int,
+        final_content: str,
+    ) -> None:
+        try:
+            async def _on_voice_segment_ready(segment_data: Dict[str, object]):
+                await runtime.queue.put({
+                    "event": "voice_segment",
+                    "data": {
+                        "sender_id": str(friend.id),
+                        "message_id": ai_msg_id,
+                        "segment": segment_data,
+                    },
+                })
+
+            # 可能与下一位的生成并发，使用独立会话
+            with SessionLocal() as voice_db:
                 voice_payload = await generate_voice_payload_for_message(
-                    db=db,
+                    db=voice_db,
                     content=final_content,
                     enable_voice=bool(friend.enable_voice),
                     friend_voice_id=friend.voice_id,
+                    friend_id=friend.id,
                     message_id=ai_msg_id,
                     message_scope="group",
                     on_segment_ready=_on_voice_segment_ready,
                 )
-                if voice_payload and final_msg:
-                    final_msg.voice_payload = voice_payload
-                    db.commit()
-                    await runtime.queue.put({
-                        "event": "voice_payload",
-                        "data": {
-                            "sender_id": str(friend.id),
-                            "message_id": ai_msg_id,
-                            "voice_payload": voice_payload,
-                        },
-                    })
-            except Exception as voice_exc:
-                logger.warning("[AutoDrive] Voice synthesis failed for message=%s: %s", ai_msg_id, voice_exc)
+                if voice_payload:
+                    await persist_voice_payload(voice_db, ai_msg_id, voice_payload, message_scope="group")
+            if voice_payload:
+                await runtime.queue.put({
+                    "event": "voice_payload",
+                    "data": {
+                        "sender_id": str(friend.id),
+                        "message_id": ai_msg_id,
+                        "voice_payload": voice_payload,
+                    },
+                })
+        except Exception as voice_exc:
+            logger.warning("[AutoDrive] Voice synthesis failed for message=%s: %s", ai_msg_id, voice_exc)
+
+    async def _drain_voice_tasks(self, runtime: AutoDriveRuntime) -> None:
+        """正常结束时等后台语音合成完成；已停止则直接取消，不让停止等语音。"""
+        if not runtime.voice_tasks:
+            return
+        tasks = list(runtime.voice_tasks)
+        if runtime.stop_event.is_set():
+            for task in tasks:
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
 
     async def _update_state(
         self,
@@ -1070,6 +1062,7 @@ class GroupAutoDriveService:
                 self._runtimes.pop(group_id, None)
                 break
         if runtime:
+            await self._drain_voice_tasks(runtime)
             await runtime.queue.put(None)
 
     async def _ensure_run_closed(self, run_id: int) -> None:
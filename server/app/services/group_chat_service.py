@@ -8,17 +8,27 @@ from datetime import datetime, timezone, timedelta
 
 from app.models.group import Group, GroupMember, GroupMessage, GroupSession
 from app.models.friend import Friend
+from app.core.config import settings
 from app.schemas import group as group_schemas
 from app.services.llm_service import llm_service
 from app.services.settings_service import SettingsService
-from app.services.embedding_service import embedding_service
+from app.services.config_snapshot_service import config_snapshot_service
 from app.services import provider_rules
-from app.services import group_chat_shared
-from app.services.voice_message_service import generate_voice_payload_for_message
+from app.services import conversation_summary_service, group_chat_shared
+from app.services.group_recall import GroupRecallBatch
+from app.services import group_speaker_router
+from app.services.group_generation_scheduler import (
+    PRIORITY_SELECTED,
+    Priority,
+    StreamMultiplexer,
+    generation_gate,
+    participant_priorities,
+)
+from app.services.voice_message_service import generate_voice_payload_for_message, persist_voice_payload
 from app.prompt import get_prompt
 from app.db.session import SessionLocal
 from app.services.memo.constants import DEFAULT_USER_ID, DEFAULT_SPACE_ID
-from app.services.memo.bridge import MemoService
+from app.services.memo.bridge import MemoService, PROFILE_TEXT_CONTENT
 from app.services.llm_client import set_agents_default_client
 
 
@@ -92,7 +102,7 @@ def _resolve_smart_context_llm_config(db: Session):
                 )
 
     if configured_id is not None:
-        config = llm_service.get_config_by_id(db, configured_id)
+        config = llm_service.get_runtime_config(db, configured_id)
         if config:
             logger.info(
                 "[GroupSmartContext] Using dedicated judge model config_id=%s model=%s",
@@ -773,6 +783,58 @@ class GroupChatService:
                 logger.info(f"[GroupSession] Manual new session: Ending session {session.id}. (NO memory extraction - group chat policy)")
         return GroupChatService._create_group_session(db, group_id)
 
+    @staticmethod
+    async def _select_speakers(
+        db: Session,
+        group_id: int,
+        session_id: Optional[int],
+        message_id: Optional[int],
+        content: str,
+        llm_config,
+        friend_map: Dict[int, Friend],
+    ) -> List[Friend]:
+        """先走本地发言人路由，置信度不足（或路由关闭）时回退到 LLM 管理者。"""
+        if not settings.GROUP_SPEAKER_ROUTER_ENABLED:
+            return await GroupChatService._select_speakers_by_manager(
+                db=db,
+                group_id=group_id,
+                session_id=session_id,
+                llm_config=llm_config,
+                friend_map=friend_map,
+            )
+
+        history_msgs = group_chat_shared.fetch_group_history(
+            db=db,
+            group_id=group_id,
+            session_id=session_id,
+            before_id=message_id,
+            limit=group_speaker_router.RECENT_WINDOW,
+        )
+        decision = await group_speaker_router.route_speakers(
+            content=content,
+            history=[m for m in history_msgs if m.message_type == "text"],
+            friend_map=friend_map,
+            use_embeddings=bool(config_snapshot_service.get(db).active_embedding_setting),
+        )
+        log_kwargs = {"group_id": group_id, "session_id": session_id, "message_id": message_id}
+        if decision.confident():
+            group_speaker_router.log_routing_decision(
+                decision, source="router", final_ids=decision.speaker_ids, **log_kwargs
+            )
+            return [friend_map[fid] for fid in decision.speaker_ids if fid in friend_map]
+
+        participants = await GroupChatService._select_speakers_by_manager(
+            db=db,
+            group_id=group_id,
+            session_id=session_id,
+            llm_config=llm_config,
+            friend_map=friend_map,
+        )
+        group_speaker_router.log_routing_decision(
+            decision, source="llm", final_ids=[p.id for p in participants], **log_kwargs
+        )
+        return participants
+
     @staticmethod
     async def _select_speakers_by_manager(
         db: Session,
@@ -996,7 +1058,7 @@ class GroupChatService:
             message_type=message_in.message_type,
             mentions=message_in.mentions,
         )
-        group_chat_shared.touch_session(db, session)
+        await group_chat_shared.touch_session(db, session.id)
 
         llm_config = llm_service.get_active_config(db)
         model_name = llm_config.model_name if llm_config else "unknown"
@@ -1019,6 +1081,7 @@ class GroupChatService:
             return
 
         participants = []
+        mentioned_ids: List[int] = []
         friend_map = GroupChatService._get_group_friend_map(db, group_id)
         if message_in.mentions:
             seen = set()
@@ -1030,15 +1093,18 @@ class GroupChatService:
                     continue
                 if f_id in friend_map and f_id not in seen:
                     participants.append(friend_map[f_id])
+                    mentioned_ids.append(f_id)
                     seen.add(f_id)
 
         if not participants:
-            participants = await GroupChatService._select_speakers_by_manager(
+            participants = await GroupChatService._select_speakers(
                 db=db,
                 group_id=group_id,
                 session_id=session.id,
+                message_id=db_message.id,
+                content=message_in.content,
                 llm_config=llm_config,
-                friend_map=friend_map
+                friend_map=friend_map,
             )
 
         if not participants:
@@ -1054,9 +1120,10 @@ class GroupChatService:
         }
         yield {"event": "meta_participants", "data": meta_payload}
 
-        # 3. 为每个参与回复的 AI 创建任务
-        queue = asyncio.Queue()
-        
+        # 3. 为每个参与回复的 AI 创建任务：每人一条子流，生成并发受 generation_gate 限制
+        multiplexer = StreamMultiplexer()
+        priorities = participant_priorities([p.id for p in participants], mentioned_ids)
+
         # 获取思考模式设置
         enable_thinking = message_in.enable_thinking
         if llm_config and enable_thinking and not llm_config.capability_reasoning:
@@ -1065,6 +1132,17 @@ class GroupChatService:
              if not force_thinking:
                  enable_thinking = False
 
+        # 多人回复时共享一次召回（一次 RecallAgent + 多好友向量检索），按好友分发结果
+        recall_batch = None
+        if len(participants) > 1:
+            recall_batch = GroupRecallBatch(
+                group_id=group_id,
+                session_id=session.id,
+                user_msg_id=db_message.id,
+                message_content=message_in.content,
+                friend_ids=[p.id for p in participants],
+            )
+
         active_tasks = []
         for friend in participants:
             # 为 AI 创建消息占位符
@@ -1084,17 +1162,17 @@ class GroupChatService:
                 ai_msg_id=db_ai_msg.id,
                 message_content=message_in.content,
                 enable_thinking=enable_thinking,
-                queue=queue
+                queue=multiplexer.open(str(friend.id)),
+                recall_batch=recall_batch,
+                priority=priorities[friend.id],
             ))
             active_tasks.append(task)
 
-        # 4. 消费队列中的事件
-        completed_count = 0
-        while completed_count < len(active_tasks):
-            event = await queue.get()
-            if event is None: # We use None as a completion signal for ONE task
-                completed_count += 1
-                continue
+        if recall_batch is not None:
+            recall_batch.cancel_when_done(active_tasks)
+
+        # 4. 公平合并各参与者子流的事件（子流内保序，每个任务结束时写入 None）
+        async for event in multiplexer.fair_merge():
             yield event
 
     @staticmethod
@@ -1106,10 +1184,15 @@ class GroupChatService:
         ai_msg_id: int,
         message_content: str,
         enable_thinking: bool,
-        queue: asyncio.Queue
+        queue,
+        recall_batch: Optional[GroupRecallBatch] = None,
+        priority: Priority = (PRIORITY_SELECTED, 0),
     ):
         """
         后台任务：处理单个 AI 在群聊中的生成。
+        queue 为该参与者的子流（ParticipantStream，或任何提供 async put 的队列）。
+        recall_batch 存在时从批次中取本好友的召回结果，不再单独运行 RecallAgent。
+        LLM 流式生成占用 generation_gate 的一个名额，按 priority 排队。
         """
         try:
             with SessionLocal() as db:
@@ -1121,7 +1204,9 @@ class GroupChatService:
 
                 friend_name = friend.name
                 
-                llm_config = llm_service.get_active_config(db)
+                # 整个生成任务使用同一份配置快照（模型、向量配置与 memory 设置，含 tool_recall 的多次调用）
+                config_snapshot = config_snapshot_service.get(db)
+                llm_config = config_snapshot.active_llm_config
                 if not llm_config:
                     await queue.put({"event": "error", "data": {"sender_id": str(friend_id), "detail": "LLM Config missing"}})
                     await queue.put(None)
@@ -1151,35 +1236,38 @@ class GroupChatService:
                 # 记忆召回
                 profile_data = ""
                 injected_recall_messages = []
-                enable_recall = SettingsService.get_setting(db, "memory", "recall_enabled", True)
+                settings_snapshot = config_snapshot.settings
+                enable_recall = settings_snapshot.get("memory", "recall_enabled", True)
 
                 if enable_recall:
-                    if not embedding_service.get_active_setting(db):
+                    if not config_snapshot.active_embedding_setting:
                         logger.warning("[GroupGenTask] Recall skipped: Embedding not configured.")
                         enable_recall = False
 
                 if enable_recall:
                     try:
                         # 获取用户画像
-                        from app.services.memo.bridge import MemoService
-                        profiles = await MemoService.get_user_profiles(DEFAULT_USER_ID, DEFAULT_SPACE_ID)
-                        if profiles and profiles.profiles:
-                            profile_lines = [f"- {p.content.strip()}" for p in profiles.profiles if p and p.content]
-                            profile_data = "\n".join(profile_lines)
+                        profile_data = await MemoService.get_user_profile_text(
+                            DEFAULT_USER_ID, DEFAULT_SPACE_ID, style=PROFILE_TEXT_CONTENT
+                        )
                         
                         # 执行召回
-                        from app.services.recall_service import RecallService
-                        messages_for_recall = []
-                        for m in history_msgs:
-                            role = "assistant" if (m.sender_type == "friend" and m.sender_id == str(friend_id)) else "user"
-                            messages_for_recall.append({"role": role, "content": m.content})
-                        
-                        # 增加当前收到的消息参与召回
-                        messages_for_recall.append({"role": "user", "content": message_content})
-
-                        recall_result = await RecallService.perform_recall(
-                            db, DEFAULT_USER_ID, DEFAULT_SPACE_ID, messages_for_recall, friend_id
-                        )
+                        if recall_batch is not None and recall_batch.covers(friend_id):
+                            recall_result = await recall_batch.get(friend_id)
+                        else:
+                            from app.services.recall_service import RecallService
+                            messages_for_recall = []
+                            for m in history_msgs:
+                                role = "assistant" if (m.sender_type == "friend" and m.sender_id == str(friend_id)) else "user"
+                                messages_for_recall.append({"role": role, "content": m.content})
+
+                            # 增加当前收到的消息参与召回
+                            messages_for_recall.append({"role": "user", "content": message_content})
+
+                            recall_result = await RecallService.perform_recall(
+                                db, DEFAULT_USER_ID, DEFAULT_SPACE_ID, messages_for_recall, friend_id,
+                                settings_snapshot=settings_snapshot,
+                            )
                         injected_recall_messages = recall_result.get("injected_messages", [])
                         
                         # 推送召回的心路历程
@@ -1287,10 +1375,10 @@ class GroupChatService:
                 async def tool_recall(query: str):
                     if not enable_recall:
                         return {"events": []}
-                    if not embedding_service.get_active_setting(db):
+                    if not config_snapshot.active_embedding_setting:
                         return {"events": []}
-                    event_topk = SettingsService.get_setting(db, "memory", "event_topk", 5)
-                    threshold = SettingsService.get_setting(db, "memory", "similarity_threshold", 0.5)
+                    event_topk = settings_snapshot.get("memory", "event_topk", 5)
+                    threshold = settings_snapshot.get("memory", "similarity_threshold", 0.5)
                     return await MemoService.recall_memory(
                         user_id=DEFAULT_USER_ID,
                         space_id=DEFAULT_SPACE_ID,
@@ -1366,17 +1454,18 @@ class GroupChatService:
                     tools=agent_tools,
                 )
                 
-                await group_chat_shared.stream_llm_to_queue(
-                    agent=agent,
-                    agent_messages=agent_messages,
-                    queue=queue,
-                    enable_thinking=enable_thinking,
-                    sender_id=friend_id,
-                    message_id=ai_msg_id,
-                    session_id=session_id,
-                    db=db,
-                    sanitize_message_tags=False,
-                )
+                async with generation_gate.slot(llm_config, priority):
+                    await group_chat_shared.stream_llm_to_queue(
+                        agent=agent,
+                        agent_messages=agent_messages,
+                        queue=queue,
+                        enable_thinking=enable_thinking,
+                        sender_id=friend_id,
+                        message_id=ai_msg_id,
+                        session_id=session_id,
+                        db=db,
+                        sanitize_message_tags=False,
+                    )
 
                 # 语音回复（在 done 事件后异步补充 voice 事件）
                 if friend.enable_voice:
@@ -1399,13 +1488,13 @@ class GroupChatService:
                             content=final_content,
                             enable_voice=bool(friend.enable_voice),
                             friend_voice_id=friend.voice_id,
+                            friend_id=friend.id,
                             message_id=ai_msg_id,
                             message_scope="group",
                             on_segment_ready=_on_voice_segment_ready,
                         )
                         if voice_payload and final_msg:
-                            final_msg.voice_payload = voice_payload
-                            db.commit()
+                            await persist_voice_payload(db, ai_msg_id, voice_payload, message_scope="group")
                             await queue.put({
                                 "event": "voice_payload",
                                 "data": {
@@ -1433,6 +1522,7 @@ class GroupChatService:
         """
         db.query(GroupMessage).filter(GroupMessage.group_id == group_id).delete()
         db.query(GroupSession).filter(GroupSession.group_id == group_id).delete()
+        conversation_summary_service.refresh_group_summary(db, group_id)
         db.commit()
 
 
@@ -3,8 +3,10 @@ from typing import Dict, List, Optional
 
 from sqlalchemy.orm import Session
 
+from app.db.write_queue import expire_instances, writer_for
 from app.models.friend import Friend
 from app.models.group import GroupMessage, GroupSession
+from app.services import conversation_summary_service
 from app.services.memo.constants import DEFAULT_USER_ID
 
 from agents import RunConfig, Runner
@@ -13,22 +15,16 @@ from agents.stream_events import RunItemStreamEvent
 from openai.types.responses import ResponseTextDeltaEvent
 
 from app.services.reasoning_stream import extract_reasoning_delta
+from app.services.stream_parser import (
+    KIND_THINKING,
+    StreamChunk,
+    StreamParser,
+)
 
 # Story 09-06: 控制符常量
 CTRL_NO_REPLY = "<CTRL:NO_REPLY>"
 
 
-def _strip_message_tags(content: Optional[str]) -> Optional[str]:
-    if not content:
-        return content
-    import re
-
-    parts = re.findall(r"<message>(.*?)</message>", content, re.DOTALL)
-    if parts:
-        return " ".join(part.strip() for part in parts if part.strip())
-    return re.sub(r"</?message>", "", content).strip()
-
-
 def create_group_session(
     db: Session,
     group_id: int,
@@ -76,6 +72,8 @@ def create_user_message(
         mentions=mentions,
     )
     db.add(db_message)
+    db.flush()
+    conversation_summary_service.record_group_message(db, db_message)
     db.commit()
     db.refresh(db_message)
     return db_message
@@ -99,6 +97,8 @@ def create_ai_placeholder(
         debate_side=debate_side,
     )
     db.add(db_ai_msg)
+    db.flush()
+    conversation_summary_service.record_group_message(db, db_ai_msg)
     db.commit()
     db.refresh(db_ai_msg)
     return db_ai_msg
@@ -119,19 +119,57 @@ def touch_session_by_id(db: Session, session_id: int) -> Optional[GroupSession]:
     return session
 
 
+def _touch_session_row(session: Session, session_id: int) -> bool:
+    group_session = session.get(GroupSession, session_id)
+    if not group_session:
+        return False
+    now_time = datetime.now(timezone.utc)
+    group_session.last_message_time = now_time
+    group_session.update_time = now_time
+    return True
+
+
+async def touch_session(db: Session, session_id: int) -> None:
+    """
+    经单写者队列刷新会话的最后消息时间；提交完成后再让调用方 session 里的缓存对象过期，
+    避免过期后立即重新加载到提交前的旧值。
+    """
+    await writer_for(db).write(
+        lambda session: _touch_session_row(session, session_id),
+        label="group_touch_session",
+    )
+    expire_instances(db, GroupSession, session_id)
+
+
 def fetch_group_history(
     db: Session,
     group_id: int,
     session_id: Optional[int],
     before_id: Optional[int] = None,
     limit: Optional[int] = None,
+    after_id: Optional[int] = None,
 ) -> List[GroupMessage]:
+    """
+    按 id keyset 拉取群消息，返回时间正序。
+    - before_id：取该消息之前的（最近）limit 条
+    - after_id：取该消息之后的 limit 条
+    按 id 排序可直接走 (group_id, session_id, id) / (group_id, id) 索引，无需临时排序。
+    """
     query = db.query(GroupMessage).filter(GroupMessage.group_id == group_id)
     if session_id is not None:
         query = query.filter(GroupMessage.session_id == session_id)
+
+    if after_id is not None:
+        query = query.filter(GroupMessage.id > after_id).order_by(GroupMessage.id.asc())
+        if before_id is not None:
+            query = query.filter(GroupMessage.id < before_id)
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
+
     if before_id is not None:
         query = query.filter(GroupMessage.id < before_id)
-    query = query.order_by(GroupMessage.create_time.desc())
+    query = query.order_by(GroupMessage.id.desc())
     if limit is not None:
         query = query.limit(limit)
     history_msgs = query.all()
@@ -190,44 +228,45 @@ def build_other_members_text(others: List[GroupMessage], name_map: Dict[str, str
     return others_content or "(empty)"
 
 
-def build_group_context(
-    history_msgs: List[GroupMessage],
+def render_group_round(
+    round_data: dict,
     name_map: Dict[str, str],
-    self_id: int,
-    current_user_msg: str,
-    user_msg_id: int,
-    current_other_members: str,
-    mention_result: str,
-    injected_recall_messages: Optional[List[dict]] = None,
     ctrl_no_reply: str = CTRL_NO_REPLY,
 ) -> List[dict]:
-    agent_messages: List[dict] = []
-    rounds = split_rounds(history_msgs, self_id)
-
-    for r in rounds:
-        u_msg = r["user"]
-        agent_messages.append({"role": "user", "content": u_msg.content})
-
-        others_content = build_other_members_text(r["others"], name_map)
-        tc_id_hist = f"call_get_msgs_{u_msg.id}"
-        agent_messages.append({
+    """把 split_rounds 产出的一轮渲染为 agent 输入（用户消息 + 其他成员发言工具调用 + 自己的回复）。"""
+    u_msg = round_data["user"]
+    others_content = build_other_members_text(round_data["others"], name_map)
+    tc_id_hist = f"call_get_msgs_{u_msg.id}"
+    self_msg = round_data["self"]
+    if self_msg and self_msg.content.strip():
+        assistant_content = self_msg.content
+    else:
+        assistant_content = ctrl_no_reply
+    return [
+        {"role": "user", "content": u_msg.content},
+        {
             "type": "function_call",
             "call_id": tc_id_hist,
             "name": "get_other_members_messages",
             "arguments": "{}",
-        })
-        agent_messages.append({
+        },
+        {
             "type": "function_call_output",
             "call_id": tc_id_hist,
             "output": others_content,
-        })
+        },
+        {"role": "assistant", "content": assistant_content},
+    ]
 
-        if r["self"] and r["self"].content.strip():
-            agent_messages.append({"role": "assistant", "content": r["self"].content})
-        else:
-            agent_messages.append({"role": "assistant", "content": ctrl_no_reply})
 
-    agent_messages.append({"role": "user", "content": current_user_msg})
+def build_current_turn_messages(
+    current_user_msg: str,
+    user_msg_id: int,
+    current_other_members: str,
+    mention_result: str,
+    injected_recall_messages: Optional[List[dict]] = None,
+) -> List[dict]:
+    agent_messages: List[dict] = [{"role": "user", "content": current_user_msg}]
 
     # Gemini through LiteLLM requires function_call turns to appear
     # immediately after a user turn (or a function response turn).
@@ -263,6 +302,32 @@ def build_group_context(
     return agent_messages
 
 
+def build_group_context(
+    history_msgs: List[GroupMessage],
+    name_map: Dict[str, str],
+    self_id: int,
+    current_user_msg: str,
+    user_msg_id: int,
+    current_other_members: str,
+    mention_result: str,
+    injected_recall_messages: Optional[List[dict]] = None,
+    ctrl_no_reply: str = CTRL_NO_REPLY,
+) -> List[dict]:
+    agent_messages: List[dict] = []
+    for r in split_rounds(history_msgs, self_id):
+        agent_messages.extend(render_group_round(r, name_map, ctrl_no_reply))
+    agent_messages.extend(
+        build_current_turn_messages(
+            current_user_msg,
+            user_msg_id,
+            current_other_members,
+            mention_result,
+            injected_recall_messages,
+        )
+    )
+    return agent_messages
+
+
 def build_system_prompt(
     root_template: str,
     persona_prompt: str,
@@ -317,6 +382,17 @@ def _extract_reasoning_text(raw: object) -> str:
     )
 
 
+async def _put_stream_chunk(queue, chunk: StreamChunk, sender_id: int, message_id: int) -> None:
+    await queue.put({
+        "event": "model_thinking" if chunk.kind == KIND_THINKING else "message",
+        "data": {
+            "sender_id": str(sender_id),
+            "delta": chunk.text,
+            "message_id": message_id,
+        },
+    })
+
+
 async def stream_llm_to_queue(
     agent,
     agent_messages: List[dict],
@@ -328,28 +404,20 @@ async def stream_llm_to_queue(
     db: Session,
     sanitize_message_tags: bool = False,
 ) -> str:
-    content_buffer = ""
-    has_reasoning_item = False
+    parser = StreamParser(enable_thinking)
     reasoning_stream_seen = False
     tool_call_names: Dict[str, str] = {}
     usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
 
     result = Runner.run_streamed(agent, agent_messages, run_config=RunConfig(trace_include_sensitive_data=True))
 
-    buffer = ""
-    is_thinking_tag = False
-    THINK_START = "<think>"
-    THINK_END = "</think>"
-    saved_content = ""
-
     async for event in result.stream_events():
         if isinstance(event, RunItemStreamEvent) and event.name == "reasoning_item_created":
             if enable_thinking and isinstance(event.item, ReasoningItem):
                 if not reasoning_stream_seen:
                     raw = event.item.raw_item
-                    text = _extract_reasoning_text(raw)
+                    text = parser.feed_reasoning(_extract_reasoning_text(raw))
                     if text:
-                        has_reasoning_item = True
                         await queue.put({
                             "event": "model_thinking",
                             "data": {
@@ -413,10 +481,9 @@ async def stream_llm_to_queue(
             continue
 
         if event.type == "raw_response_event" and enable_thinking:
-            reasoning_delta = extract_reasoning_delta(event.data)
+            reasoning_delta = parser.feed_reasoning(extract_reasoning_delta(event.data))
             if reasoning_delta:
                 reasoning_stream_seen = True
-                has_reasoning_item = True
                 await queue.put({
                     "event": "model_thinking",
                     "data": {
@@ -428,102 +495,15 @@ async def stream_llm_to_queue(
                 continue
 
         if event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent):
-            delta = event.data.delta
-            if delta:
-                content_buffer += delta
-                buffer += delta
-
-                while buffer:
-                    if not is_thinking_tag:
-                        start_idx = buffer.find(THINK_START)
-                        if start_idx != -1:
-                            if start_idx > 0:
-                                msg_delta = buffer[:start_idx]
-                                saved_content += msg_delta
-                                await queue.put({
-                                    "event": "message",
-                                    "data": {
-                                        "sender_id": str(sender_id),
-                                        "delta": msg_delta,
-                                        "message_id": message_id,
-                                    },
-                                })
-                            buffer = buffer[start_idx + len(THINK_START):]
-                            is_thinking_tag = True
-                        else:
-                            if "<" not in buffer:
-                                saved_content += buffer
-                                await queue.put({
-                                    "event": "message",
-                                    "data": {
-                                        "sender_id": str(sender_id),
-                                        "delta": buffer,
-                                        "message_id": message_id,
-                                    },
-                                })
-                                buffer = ""
-                            else:
-                                break
-                    else:
-                        end_idx = buffer.find(THINK_END)
-                        if end_idx != -1:
-                            if end_idx > 0 and enable_thinking and not has_reasoning_item:
-                                think_chunk = buffer[:end_idx]
-                                await queue.put({
-                                    "event": "model_thinking",
-                                    "data": {
-                                        "sender_id": str(sender_id),
-                                        "delta": think_chunk,
-                                        "message_id": message_id,
-                                    },
-                                })
-
-                            buffer = buffer[end_idx + len(THINK_END):]
-                            is_thinking_tag = False
-                        else:
-                            if "</" not in buffer:
-                                if enable_thinking and not has_reasoning_item:
-                                    await queue.put({
-                                        "event": "model_thinking",
-                                        "data": {
-                                            "sender_id": str(sender_id),
-                                            "delta": buffer,
-                                            "message_id": message_id,
-                                        },
-                                    })
-                                buffer = ""
-                            else:
-                                break
-
-    if buffer:
-        if is_thinking_tag:
-            if enable_thinking and not has_reasoning_item:
-                await queue.put({
-                    "event": "model_thinking",
-                    "data": {
-                        "sender_id": str(sender_id),
-                        "delta": buffer,
-                        "message_id": message_id,
-                    },
-                })
-        else:
-            saved_content += buffer
-            await queue.put({
-                "event": "message",
-                "data": {
-                    "sender_id": str(sender_id),
-                    "delta": buffer,
-                    "message_id": message_id,
-                },
-            })
-
-    final_content = saved_content if saved_content else content_buffer
-    final_content = final_content.replace(THINK_START, "").replace(THINK_END, "")
-    if sanitize_message_tags:
-        final_content = _strip_message_tags(final_content) or final_content
-
-    persist_final_content(db, message_id, final_content, session_id)
-    usage["completion_tokens"] = len(content_buffer)
+            for chunk in parser.feed(event.data.delta):
+                await _put_stream_chunk(queue, chunk, sender_id, message_id)
+
+    for chunk in parser.finish():
+        await _put_stream_chunk(queue, chunk, sender_id, message_id)
+
+    final_content = parser.final_content(sanitize_message_tags=sanitize_message_tags)
+    await persist_final_content(db, message_id, final_content, session_id)
+    usage["completion_tokens"] = parser.raw_length
 
     await queue.put({
         "event": "done",
@@ -539,10 +519,22 @@ async def stream_llm_to_queue(
     return final_content
 
 
-def persist_final_content(db: Session, ai_msg_id: int, final_content: str, session_id: int) -> None:
-    db_msg = db.query(GroupMessage).filter(GroupMessage.id == ai_msg_id).first()
-    if db_msg:
-        db_msg.content = final_content
-        db.commit()
-
-    touch_session_by_id(db, session_id)
+async def persist_final_content(db: Session, ai_msg_id: int, final_content: str, session_id: int) -> None:
+    """写入最终内容并刷新会话时间，合并为一次提交并等待落盘。"""
+    def _write(session: Session) -> None:
+        db_msg = session.get(GroupMessage, ai_msg_id)
+        if db_msg:
+            db_msg.content = final_content
+            conversation_summary_service.update_message_content(
+                session,
+                conversation_summary_service.GROUP_CONVERSATION,
+                db_msg.group_id,
+                ai_msg_id,
+                final_content,
+                count_unread=True,
+            )
+        _touch_session_row(session, session_id)
+
+    await writer_for(db).write(_write, label="group_final_content")
+    expire_instances(db, GroupMessage, ai_msg_id)
+    expire_instances(db, GroupSession, session_id)
@@ -0,0 +1,180 @@
+"""
+群聊多人回复的生成调度与 SSE 多路合并。
+
+以前每个参与者一个任务直接往同一个 asyncio.Queue 里写事件：没有并发上限，10 人群会同时
+打出 10 个 agent 请求；各参与者的事件按到达顺序混在一起，一个吐字快的好友可以长时间
+占满输出。这里：
+- GenerationGate：按 LLM 服务商（provider / base_url 主机）限制同时进行的生成数
+  （GROUP_LLM_PROVIDER_PARALLELISM 优先，其余用 GROUP_GENERATION_MAX_PARALLELISM），
+  等待者按优先级放行，被 @ 的成员先于其他成员。一次请求的参与者要么全是被 @ 的成员，要么全是
+  选出的发言人，所以这个优先级只在多个并发请求争用同一服务商时起作用
+- ParticipantStream：每个参与者一条子流，事件带子流内递增的 seq，可当作 queue 传给生成任务
+- fair_merge：轮询所有有就绪事件的子流，每条子流每轮最多输出 GROUP_STREAM_MERGE_QUANTUM 个事件，
+  子流内保序
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, Deque, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Priority = Tuple[int, int]
+
+PRIORITY_MENTIONED = 0
+PRIORITY_SELECTED = 1
+
+
+def provider_for(llm_config) -> str:
+    provider = (getattr(llm_config, "provider", None) or "").strip().lower()
+    if provider:
+        return provider
+    host = (urlparse(getattr(llm_config, "base_url", None) or "").hostname or "").lower()
+    return host or "default"
+
+
+def provider_parallelism(provider: str) -> int:
+    limits = settings.GROUP_LLM_PROVIDER_PARALLELISM or {}
+    return max(1, int(limits.get(provider, settings.GROUP_GENERATION_MAX_PARALLELISM)))
+
+
+class _PriorityGate:
+    """容量受限的信号量，等待者按 (priority, 到达顺序) 放行。"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._active = 0
+        self._waiters: List[Tuple[Priority, int, asyncio.Future]] = []
+        self._order = itertools.count()
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    async def acquire(self, priority: Priority) -> None:
+        if self._active < self.capacity and not self._waiters:
+            self._active += 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), fut))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # 名额已经转交给我们但任务被取消：转交给下一位
+                self.release()
+            raise
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                # 名额直接转交，_active 不变
+                fut.set_result(None)
+                return
+        self._active -= 1
+
+
+class GenerationGate:
+    def __init__(self):
+        self._gates: Dict[str, Tuple[asyncio.AbstractEventLoop, _PriorityGate]] = {}
+
+    def _gate(self, provider: str) -> _PriorityGate:
+        loop = asyncio.get_running_loop()
+        entry = self._gates.get(provider)
+        if entry is None or entry[0] is not loop:
+            entry = (loop, _PriorityGate(provider_parallelism(provider)))
+            self._gates[provider] = entry
+        return entry[1]
+
+    @asynccontextmanager
+    async def slot(self, llm_config, priority: Priority = (PRIORITY_SELECTED, 0)):
+        gate = self._gate(provider_for(llm_config))
+        await gate.acquire(priority)
+        try:
+            yield
+        finally:
+            gate.release()
+
+
+class ParticipantStream:
+    """单个参与者的事件子流；put(None) 表示该参与者结束。"""
+
+    def __init__(self, key: str, ready: asyncio.Event):
+        self.key = key
+        self.seq = 0
+        self.closed = False
+        self._buffer: Deque[Optional[dict]] = deque()
+        self._ready = ready
+
+    async def put(self, event: Optional[dict]) -> None:
+        if event is not None:
+            self.seq += 1
+            data = event.get("data")
+            if isinstance(data, dict):
+                event = {**event, "data": {**data, "seq": self.seq}}
+        self._buffer.append(event)
+        self._ready.set()
+
+    def has_pending(self) -> bool:
+        return bool(self._buffer)
+
+    def pop(self) -> Optional[dict]:
+        return self._buffer.popleft()
+
+
+class StreamMultiplexer:
+    def __init__(self, quantum: Optional[int] = None):
+        self.quantum = max(1, quantum or settings.GROUP_STREAM_MERGE_QUANTUM)
+        self._ready = asyncio.Event()
+        self._streams: List[ParticipantStream] = []
+
+    def open(self, key: str) -> ParticipantStream:
+        stream = ParticipantStream(key, self._ready)
+        self._streams.append(stream)
+        return stream
+
+    async def fair_merge(self) -> AsyncGenerator[dict, None]:
+        """按 open 的顺序轮询子流，直到所有子流都结束。"""
+        active: Deque[ParticipantStream] = deque(self._streams)
+        while active:
+            progressed = False
+            for _ in range(len(active)):
+                stream = active[0]
+                active.rotate(-1)
+                emitted = 0
+                while stream.has_pending() and emitted < self.quantum:
+                    event = stream.pop()
+                    if event is None:
+                        stream.closed = True
+                        active.remove(stream)
+                        break
+                    emitted += 1
+                    yield event
+                progressed = progressed or emitted > 0 or stream.closed
+            if not progressed:
+                self._ready.clear()
+                if not any(s.has_pending() for s in active):
+                    await self._ready.wait()
+
+
+def participant_priorities(participant_ids: Sequence[int], mentioned_ids: Sequence[int]) -> Dict[int, Priority]:
+    """
+    被 @ 的成员优先；同一级别内保持参与者列表顺序。
+    单次请求不会混合两类成员（有 @ 时只回复被 @ 的成员），级别差异只在跨请求排队时生效。
+    """
+    mentioned = set(mentioned_ids)
+    return {
+        fid: (PRIORITY_MENTIONED if fid in mentioned else PRIORITY_SELECTED, idx)
+        for idx, fid in enumerate(participant_ids)
+    }
+
+
+generation_gate = GenerationGate()
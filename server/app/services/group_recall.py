@@ -0,0 +1,107 @@
+"""
+群聊召回协调器。
+
+群里 N 个好友同时回复时，每个生成任务以前各自跑一遍 RecallService.perform_recall：
+N 次 RecallAgent（LLM）运行，外加 N 组几乎相同的 embedding 与向量检索。
+
+GroupRecallBatch 以一条用户消息为单位，由第一个需要召回的参与者任务触发：
+- 一次 RecallAgent 运行产出查询集合
+- 每个查询一次 embedding + 一次多好友向量检索（按好友分区取 top-k）
+- 按好友拆分结果，分发给各参与者任务（结构与单好友召回相同）
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.db.session import SessionLocal
+from app.services import group_chat_shared
+from app.services.config_snapshot_service import config_snapshot_service
+from app.services.memo.constants import DEFAULT_SPACE_ID, DEFAULT_USER_ID
+
+logger = logging.getLogger(__name__)
+
+
+class GroupRecallBatch:
+    def __init__(
+        self,
+        *,
+        group_id: int,
+        session_id: int,
+        user_msg_id: int,
+        message_content: str,
+        friend_ids: Iterable[int],
+    ):
+        self.group_id = group_id
+        self.session_id = session_id
+        self.user_msg_id = user_msg_id
+        self.message_content = message_content
+        self.friend_ids: List[int] = list(dict.fromkeys(friend_ids))
+        self._future: Optional[asyncio.Future] = None
+
+    def covers(self, friend_id: int) -> bool:
+        return friend_id in self.friend_ids
+
+    async def get(self, friend_id: int) -> Dict[str, Any]:
+        """返回该好友的召回结果；首次调用时启动整批召回，其余调用共享同一结果。"""
+        if self._future is None:
+            self._future = asyncio.ensure_future(self._run())
+        # shield：某个参与者任务被取消时不影响其他参与者等待同一批结果
+        results = await asyncio.shield(self._future)
+        return results.get(friend_id) or {"injected_messages": [], "footprints": []}
+
+    def cancel(self) -> None:
+        if self._future is not None and not self._future.done():
+            self._future.cancel()
+
+    def cancel_when_done(self, tasks: Iterable[asyncio.Future]) -> None:
+        """所有参与者任务结束（完成或被取消）后，取消仍在进行的整批召回。"""
+        pending = set(tasks)
+        if not pending:
+            self.cancel()
+            return
+
+        def _on_done(task: asyncio.Future) -> None:
+            pending.discard(task)
+            if not pending:
+                self.cancel()
+
+        for task in pending:
+            task.add_done_callback(_on_done)
+
+    def _build_messages(self, history_msgs) -> List[Dict[str, str]]:
+        # 与单好友召回不同：一批召回服务所有参与者，无法区分“自己”的发言，
+        # 所有好友的发言都标为 assistant，用户发言标为 user
+        messages = [
+            {"role": "assistant" if m.sender_type == "friend" else "user", "content": m.content}
+            for m in history_msgs
+        ]
+        messages.append({"role": "user", "content": self.message_content})
+        return messages
+
+    async def _run(self) -> Dict[int, Dict[str, Any]]:
+        from app.services.recall_service import RecallService
+
+        with SessionLocal() as db:
+            config_snapshot = config_snapshot_service.get(db)
+            history_msgs = group_chat_shared.fetch_group_history(
+                db=db,
+                group_id=self.group_id,
+                session_id=self.session_id,
+                before_id=self.user_msg_id,
+                limit=None,
+            )
+            results = await RecallService.perform_group_recall(
+                db,
+                DEFAULT_USER_ID,
+                DEFAULT_SPACE_ID,
+                self._build_messages(history_msgs),
+                self.friend_ids,
+                settings_snapshot=config_snapshot.settings,
+            )
+        logger.info(
+            "[GroupRecall] message=%s recalled once for %s participants",
+            self.user_msg_id,
+            len(self.friend_ids),
+        )
+        return results
@@ -1,9 +1,11 @@
 import logging
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from typing import List, Optional, Any
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import and_, func
+from typing import Dict, List, Optional, Any
+from app.models.conversation import ConversationSummary
 from app.models.group import Group, GroupMember
 from app.models.friend import Friend
+from app.services import conversation_summary_service
 from app.schemas.group import GroupCreate, GroupUpdate
 from app.services.memo.constants import DEFAULT_USER_ID
 
@@ -26,21 +28,39 @@ class GroupService:
         return GroupService.DEFAULT_USER_AVATAR
 
     @staticmethod
-    def _populate_group_members(db: Session, group: Group) -> None:
+    def _load_member_friends(db: Session, groups: List[Group]) -> Dict[str, Friend]:
+        """一次性批量查询多个群组中的好友成员信息。"""
+        friend_ids = {
+            m.member_id
+            for g in groups
+            for m in g.members
+            if m.member_type == "friend"
+        }
+        if not friend_ids:
+            return {}
+        return {str(f.id): f for f in db.query(Friend).filter(Friend.id.in_(friend_ids)).all()}
+
+    @staticmethod
+    def _populate_group_members(
+        db: Session,
+        group: Group,
+        friends_map: Optional[Dict[str, Friend]] = None,
+        user_avatar: Optional[str] = None,
+    ) -> None:
         """
         Populate member names, avatars and count for a group.
         Modifies the group object in place.
+        批量场景下由调用方传入 friends_map / user_avatar，避免逐群查询。
         """
         group.member_count = len(group.members)
         
         # Batch fetch friend info
-        friend_ids = [m.member_id for m in group.members if m.member_type == "friend"]
-        friends_map = {}
-        if friend_ids:
-            friends_map = {str(f.id): f for f in db.query(Friend).filter(Friend.id.in_(friend_ids)).all()}
+        if friends_map is None:
+            friends_map = GroupService._load_member_friends(db, [group])
         
         # Get user avatar once
-        user_avatar = GroupService._get_user_avatar(db)
+        if user_avatar is None:
+            user_avatar = GroupService._get_user_avatar(db)
         
         for m in group.members:
             if m.member_type == "friend":
@@ -56,29 +76,20 @@ class GroupService:
                 m.avatar = user_avatar
 
     @staticmethod
-    def _populate_last_message(db: Session, group: Group) -> None:
+    def _populate_last_message(group: Group, summary: Optional[ConversationSummary]) -> None:
         """
-        Populate last message preview for a group.
+        Populate last message preview for a group from its conversation summary.
         """
-        from app.models.group import GroupMessage
-        from sqlalchemy import desc
-        
-        last_msg = db.query(GroupMessage).filter(
-            GroupMessage.group_id == group.id
-        ).order_by(desc(GroupMessage.create_time)).first()
-        
-        if last_msg:
-            # For groups, we use _strip_message_tags if it was available.
-            # FriendService has _strip_message_tags.
-            from app.services.friend_service import _strip_message_tags
-            group.last_message = _strip_message_tags(last_msg.content)
-            group.last_message_time = last_msg.create_time
+        group.unread_count = summary.unread_count if summary else 0
+        if summary and summary.last_message_id is not None:
+            group.last_message = summary.last_message_preview
+            group.last_message_time = summary.last_message_time
             
-            if last_msg.sender_type == "user":
+            if summary.last_message_role == "user":
                 group.last_message_sender_name = "我"
             else:
                 # Find friend name in members (members should be populated already)
-                sender = next((m for m in group.members if m.member_id == last_msg.sender_id and m.member_type == "friend"), None)
+                sender = next((m for m in group.members if m.member_id == summary.last_message_sender_id and m.member_type == "friend"), None)
                 if sender and hasattr(sender, 'name'):
                     group.last_message_sender_name = sender.name
                 else:
@@ -92,20 +103,40 @@ class GroupService:
     def get_user_groups(db: Session, user_id: str = DEFAULT_USER_ID) -> List[Group]:
         """
         Get all groups the user belongs to with member count and populated members.
+        群组、成员与会话摘要批量加载，查询次数与群数量无关。
         """
-        groups = db.query(Group).join(GroupMember).filter(
-            and_(
-                GroupMember.member_id == user_id,
-                GroupMember.member_type == "user"
+        rows = (
+            db.query(Group, ConversationSummary)
+            .join(GroupMember)
+            .outerjoin(
+                ConversationSummary,
+                and_(
+                    ConversationSummary.conversation_type == conversation_summary_service.GROUP_CONVERSATION,
+                    ConversationSummary.conversation_id == Group.id,
+                ),
             )
-        ).all()
-        
-        for g in groups:
-            GroupService._populate_group_members(db, g)
-            GroupService._populate_last_message(db, g)
-        
-        # Sort groups by last message time descending
-        groups.sort(key=lambda x: (x.last_message_time or x.update_time or x.create_time), reverse=True)
+            .filter(
+                and_(
+                    GroupMember.member_id == user_id,
+                    GroupMember.member_type == "user"
+                )
+            )
+            .options(selectinload(Group.members))
+            # Sort groups by last message time descending
+            .order_by(
+                func.coalesce(
+                    ConversationSummary.last_message_time, Group.update_time, Group.create_time
+                ).desc()
+            )
+            .all()
+        )
+
+        groups = [group for group, _ in rows]
+        friends_map = GroupService._load_member_friends(db, groups)
+        user_avatar = GroupService._get_user_avatar(db)
+        for g, summary in rows:
+            GroupService._populate_group_members(db, g, friends_map=friends_map, user_avatar=user_avatar)
+            GroupService._populate_last_message(g, summary)
         
         return groups
 
@@ -169,7 +200,10 @@ class GroupService:
             return None
         
         GroupService._populate_group_members(db, db_group)
-        GroupService._populate_last_message(db, db_group)
+        summary = conversation_summary_service.get_summary(
+            db, conversation_summary_service.GROUP_CONVERSATION, db_group.id
+        )
+        GroupService._populate_last_message(db_group, summary)
         return db_group
 
     @staticmethod
@@ -248,6 +282,9 @@ class GroupService:
         # In this single-human sandbox, if the user exits, the group is gone
         if db_group.owner_id == user_id:
             db.delete(db_group)
+            conversation_summary_service.delete_summary(
+                db, conversation_summary_service.GROUP_CONVERSATION, group_id
+            )
             db.commit()
             logger.info(f"Owner {user_id} exited group {group_id} - dissolved group")
             return True
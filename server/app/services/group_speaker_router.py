@@ -0,0 +1,276 @@
+"""
+群聊本地发言人路由。
+
+用户没有 @ 任何人时，以前每条消息都要先跑一次 GroupManager（LLM + few-shot）决定谁发言，
+所有参与者的生成都排在这次 LLM 往返之后。这里先在本地给每个群成员打分：
+- 点名：消息正文里直接出现了好友名字
+- 语义：消息与好友人设 / 近期发言的 embedding 相似度（人设与发言向量按文本哈希缓存）
+- 接话：用户是在回复刚刚发言的好友
+- 轮换：很久没发言的好友略微加分
+置信度足够时直接采用路由结果，否则回退到 LLM 管理者。每次决策（含回退时 LLM 的选择）
+都以 JSON 写入 "app.speaker_routing" 日志，便于离线评估与调参。
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+from app.models.friend import Friend
+from app.models.group import GroupMessage
+from app.services.memo.constants import DEFAULT_SPACE_ID
+
+logger = logging.getLogger(__name__)
+routing_log = logging.getLogger("app.speaker_routing")
+
+MAX_SPEAKERS = 3
+RECENT_WINDOW = 20
+RECENT_LINES_PER_FRIEND = 3
+PERSONA_PROMPT_CHARS = 300
+EMBEDDING_TIMEOUT_SECONDS = 2.0
+
+WEIGHT_SEMANTIC = 0.5
+WEIGHT_CONTINUITY = 0.35
+WEIGHT_FAIRNESS = 0.15
+# 没有语义信号时只靠接话/轮换不足以下结论，置信度封顶在此，交给 LLM
+NO_SEMANTIC_CONFIDENCE_CAP = 0.5
+MENTION_CONFIDENCE = 0.95
+# 第一名领先第二名这么多分即视为完全确定
+FULL_CONFIDENCE_MARGIN = 0.3
+# 语义分按原始余弦相似度的绝对差距缩放：成员间相似度相差达到该值才拉满，
+# 避免 min-max 归一化把 0.6000 vs 0.6001 这样的近似平局放大成 1.0 vs 0.0
+SEMANTIC_SPREAD_FLOOR = 0.15
+# 与第一名足够接近的成员一起发言
+CO_SPEAKER_RATIO = 0.9
+
+
+@dataclass
+class RoutingDecision:
+    speaker_ids: List[int]
+    confidence: float
+    reason: str
+    scores: Dict[int, Dict[str, float]] = field(default_factory=dict)
+
+    def confident(self, threshold: Optional[float] = None) -> bool:
+        limit = settings.GROUP_SPEAKER_ROUTER_MIN_CONFIDENCE if threshold is None else threshold
+        return bool(self.speaker_ids) and self.confidence >= limit
+
+
+class _EmbeddingCache:
+    def __init__(self, capacity: int = 512):
+        self.capacity = capacity
+        self._items: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        key = self.key(text)
+        vec = self._items.get(key)
+        if vec is not None:
+            self._items.move_to_end(key)
+        return vec
+
+    def put(self, text: str, vec: np.ndarray) -> None:
+        key = self.key(text)
+        self._items[key] = vec
+        self._items.move_to_end(key)
+        while len(self._items) > self.capacity:
+            self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        self._items.clear()
+
+
+_doc_cache = _EmbeddingCache()
+
+
+async def _embed(texts: List[str], phase: str) -> Optional[np.ndarray]:
+    from app.vendor.memobase_server.env import CONFIG
+    from app.vendor.memobase_server.llms.embeddings import get_embedding
+
+    promise = await get_embedding(DEFAULT_SPACE_ID, texts, phase=phase, model=CONFIG.embedding_model)
+    if not promise.ok():
+        logger.info("[SpeakerRouter] Embedding unavailable: %s", promise.msg())
+        return None
+    return np.asarray(promise.data(), dtype=np.float32)
+
+
+def _cosine(a: np.ndarray, b: np.ndarray) -> float:
+    denom = float(np.linalg.norm(a) * np.linalg.norm(b))
+    return float(np.dot(a, b) / denom) if denom > 0 else 0.0
+
+
+def _friend_id_of(msg: GroupMessage) -> Optional[int]:
+    if msg.sender_type != "friend":
+        return None
+    try:
+        return int(msg.sender_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def _persona_text(friend: Friend) -> str:
+    parts = [friend.name or ""]
+    if friend.description:
+        parts.append(friend.description.strip())
+    if friend.system_prompt:
+        parts.append(friend.system_prompt.strip()[:PERSONA_PROMPT_CHARS])
+    return "\n".join(p for p in parts if p)
+
+
+def _name_mentions(content: str, friend_map: Dict[int, Friend]) -> List[int]:
+    text = content or ""
+    hits = []
+    for fid, friend in friend_map.items():
+        name = (friend.name or "").strip()
+        if len(name) >= 2 and name in text:
+            hits.append((text.index(name), fid))
+    return [fid for _, fid in sorted(hits)]
+
+
+def _turn_taking(history: Sequence[GroupMessage], friend_ids: Sequence[int]) -> Dict[int, Dict[str, float]]:
+    """接话（continuity）与轮换（fairness）分数，history 为时间正序、不含当前消息。"""
+    stats = {fid: {"continuity": 0.0, "fairness": 1.0} for fid in friend_ids}
+    # 用户上一条消息之后发言的好友，视为当前消息在回应的对象
+    replied_to: List[int] = []
+    for msg in reversed(history):
+        fid = _friend_id_of(msg)
+        if fid is None:
+            if replied_to:
+                break
+            continue
+        if fid in stats and fid not in replied_to:
+            replied_to.append(fid)
+    for rank, fid in enumerate(replied_to):
+        stats[fid]["continuity"] = 1.0 if rank == 0 else 0.5
+    window = list(history)[-RECENT_WINDOW:]
+    seen = set()
+    for age, msg in enumerate(reversed(window)):
+        fid = _friend_id_of(msg)
+        if fid in stats and fid not in seen:
+            seen.add(fid)
+            stats[fid]["fairness"] = age / max(len(window), 1)
+    return stats
+
+
+async def _semantic_scores(
+    content: str,
+    history: Sequence[GroupMessage],
+    friend_map: Dict[int, Friend],
+) -> Optional[Dict[int, float]]:
+    docs: Dict[int, List[str]] = {}
+    for fid, friend in friend_map.items():
+        lines = [m.content.strip() for m in history if _friend_id_of(m) == fid and (m.content or "").strip()]
+        texts = [_persona_text(friend)]
+        if lines:
+            texts.append("\n".join(lines[-RECENT_LINES_PER_FRIEND:]))
+        docs[fid] = texts
+
+    missing = list(dict.fromkeys(t for texts in docs.values() for t in texts if _doc_cache.get(t) is None))
+    calls = [_embed([content], "query")]
+    if missing:
+        calls.append(_embed(missing, "document"))
+    results = await asyncio.wait_for(asyncio.gather(*calls), timeout=EMBEDDING_TIMEOUT_SECONDS)
+    if any(r is None for r in results):
+        return None
+    query_vec = results[0][0]
+    if missing:
+        for text, vec in zip(missing, results[1]):
+            _doc_cache.put(text, vec)
+
+    raw: Dict[int, float] = {}
+    for fid, texts in docs.items():
+        sims = [_cosine(query_vec, _doc_cache.get(t)) for t in texts]
+        # 人设为主，近期发言为辅
+        raw[fid] = sims[0] if len(sims) == 1 else 0.6 * sims[0] + 0.4 * sims[1]
+    low = min(raw.values())
+    # 相对最低者的绝对差距 / 固定下限，近似平局得到接近 0 的语义分与置信度
+    return {fid: min(1.0, (v - low) / SEMANTIC_SPREAD_FLOOR) for fid, v in raw.items()}
+
+
+async def route_speakers(
+    *,
+    content: str,
+    history: Sequence[GroupMessage],
+    friend_map: Dict[int, Friend],
+    use_embeddings: bool = True,
+) -> RoutingDecision:
+    if not friend_map:
+        return RoutingDecision([], 0.0, "no_members")
+    if len(friend_map) == 1:
+        only = next(iter(friend_map))
+        return RoutingDecision([only], 1.0, "single_member")
+
+    mentioned = _name_mentions(content, friend_map)
+    if mentioned:
+        return RoutingDecision(mentioned[:MAX_SPEAKERS], MENTION_CONFIDENCE, "name_mention")
+
+    turn_stats = _turn_taking(history, list(friend_map))
+    semantic: Optional[Dict[int, float]] = None
+    if use_embeddings:
+        try:
+            semantic = await _semantic_scores(content, history, friend_map)
+        except Exception as exc:
+            logger.info("[SpeakerRouter] Semantic scoring skipped: %s", exc)
+
+    scores: Dict[int, Dict[str, float]] = {}
+    for fid in friend_map:
+        parts = dict(turn_stats[fid])
+        parts["semantic"] = semantic.get(fid, 0.0) if semantic else 0.0
+        parts["total"] = (
+            WEIGHT_SEMANTIC * parts["semantic"]
+            + WEIGHT_CONTINUITY * parts["continuity"]
+            + WEIGHT_FAIRNESS * parts["fairness"]
+        )
+        scores[fid] = parts
+
+    ranked = sorted(scores, key=lambda fid: (-scores[fid]["total"], fid))
+    top = scores[ranked[0]]["total"]
+    margin = top - scores[ranked[1]]["total"]
+    confidence = min(1.0, margin / FULL_CONFIDENCE_MARGIN)
+    if semantic is None:
+        confidence = min(confidence, NO_SEMANTIC_CONFIDENCE_CAP)
+    speakers = [ranked[0]]
+    for fid in ranked[1:MAX_SPEAKERS]:
+        if top > 0 and scores[fid]["total"] >= top * CO_SPEAKER_RATIO:
+            speakers.append(fid)
+    return RoutingDecision(speakers, round(confidence, 4), "scored", scores)
+
+
+def log_routing_decision(
+    decision: RoutingDecision,
+    *,
+    group_id: int,
+    session_id: Optional[int],
+    message_id: Optional[int],
+    source: str,
+    final_ids: Sequence[int],
+) -> None:
+    """source: "router" 表示直接采用路由结果，"llm" 表示回退到 LLM 管理者。"""
+    routing_log.info(
+        json.dumps(
+            {
+                "group_id": group_id,
+                "session_id": session_id,
+                "message_id": message_id,
+                "source": source,
+                "reason": decision.reason,
+                "confidence": decision.confidence,
+                "router_ids": decision.speaker_ids,
+                "final_ids": list(final_ids),
+                "scores": {
+                    str(fid): {k: round(v, 4) for k, v in parts.items()}
+                    for fid, parts in decision.scores.items()
+                },
+            },
+            ensure_ascii=False,
+        )
+    )
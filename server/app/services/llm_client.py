@@ -1,8 +1,42 @@
-from typing import Optional
+import asyncio
+from collections import OrderedDict
+from typing import Optional, Tuple
 
 from agents import set_default_openai_api, set_default_openai_client
 from openai import AsyncOpenAI
 
+# (base_url, api_key, timeout) -> (事件循环, client)。群聊多人并发回复、召回等每次调用都会
+# 设置默认 client，以前每次新建 AsyncOpenAI（各自一套连接池）；同一配置在同一循环内复用。
+# 按 LRU 最多保留 MAX_SHARED_CLIENTS 个，修改 api_key / base_url 后旧 client 会被挤掉。
+MAX_SHARED_CLIENTS = 16
+_clients: "OrderedDict[Tuple[Optional[str], Optional[str], Optional[float]], Tuple[object, AsyncOpenAI]]" = OrderedDict()
+
+
+def _current_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def get_shared_client(llm_config, *, timeout: Optional[float] = None) -> AsyncOpenAI:
+    key = (llm_config.base_url, llm_config.api_key, timeout)
+    loop = _current_loop()
+    entry = _clients.get(key)
+    if entry is not None and entry[0] is loop and not entry[1].is_closed():
+        _clients.move_to_end(key)
+        return entry[1]
+    client = AsyncOpenAI(
+        base_url=llm_config.base_url,
+        api_key=llm_config.api_key,
+        timeout=timeout,
+    )
+    _clients[key] = (loop, client)
+    _clients.move_to_end(key)
+    while len(_clients) > MAX_SHARED_CLIENTS:
+        _clients.popitem(last=False)
+    return client
+
 
 def set_agents_default_client(
     llm_config,
@@ -10,11 +44,7 @@ def set_agents_default_client(
     timeout: Optional[float] = None,
     use_for_tracing: bool = True,
 ) -> AsyncOpenAI:
-    client = AsyncOpenAI(
-        base_url=llm_config.base_url,
-        api_key=llm_config.api_key,
-        timeout=timeout,
-    )
+    client = get_shared_client(llm_config, timeout=timeout)
     set_default_openai_client(client, use_for_tracing=use_for_tracing)
     set_default_openai_api("chat_completions")
     return client
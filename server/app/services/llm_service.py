@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func
 from app.models.llm import LLMConfig
 from app.schemas.llm import LLMConfigUpdate, LLMConfigCreate
-from app.services.settings_service import SettingsService
+from app.services.config_snapshot_service import FrozenConfig, config_snapshot_service
 
 class LLMService:
     _provider_labels = {
@@ -55,7 +55,7 @@ class LLMService:
         return f"{base} #{suffix}"
 
     @staticmethod
-    def get_config(db: Session) -> Optional[LLMConfig]:
+    def get_config(db: Session) -> Optional[FrozenConfig]:
         """
         Backward-compatible: return active LLM configuration if available.
         """
@@ -90,11 +90,17 @@ class LLMService:
         )
 
     @staticmethod
-    def get_active_config(db: Session) -> Optional[LLMConfig]:
-        active_id = SettingsService.get_setting(db, "chat", "active_llm_config_id", None)
-        if active_id is None:
-            return None
-        return LLMService.get_config_by_id(db, active_id)
+    def get_active_config(db: Session) -> Optional[FrozenConfig]:
+        """
+        Return the active LLM configuration from the config snapshot (read-only).
+        Use get_config_by_id when the ORM row needs to be modified.
+        """
+        return config_snapshot_service.get(db).active_llm_config
+
+    @staticmethod
+    def get_runtime_config(db: Session, config_id: int) -> Optional[FrozenConfig]:
+        """Read-only lookup by id from the config snapshot, for generation paths."""
+        return config_snapshot_service.get(db).llm_config(config_id)
 
     @staticmethod
     def create_config(db: Session, config_in: LLMConfigCreate) -> LLMConfig:
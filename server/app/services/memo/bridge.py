@@ -3,6 +3,7 @@ import logging
 from typing import List, Optional, Dict, Any
 from app.core.config import settings
 from app.db.session import SessionLocal
+from app.db.sqlite_tuning import get_sqlite_pragmas
 from app.models.llm import LLMConfig
 from app.models.embedding import EmbeddingSetting
 from app.services.settings_service import SettingsService
@@ -13,13 +14,15 @@ from app.vendor.memobase_server.controllers.buffer_background import start_memob
 from app.vendor.memobase_server.models.database import UserEvent, UserEventGist
 from app.vendor.memobase_server.utils import to_uuid
 from app.vendor.memobase_server.llms.embeddings import get_embedding
-from sqlalchemy import text, desc, select, func, case
+from sqlalchemy import text, desc, select, func, case, true
+from sqlalchemy.orm import aliased
 from datetime import datetime, timedelta, timezone
 
 # SDK Controllers
 from app.vendor.memobase_server.controllers.user import get_user, create_user, delete_user
 from app.vendor.memobase_server.controllers.profile import (
-    get_user_profiles, add_user_profiles, update_user_profiles, delete_user_profiles
+    get_user_profiles, add_user_profiles, update_user_profiles, delete_user_profiles,
+    get_user_profile_snapshot,
 )
 from app.vendor.memobase_server.controllers.event import (
     get_user_events, append_user_event, update_user_event, delete_user_event, search_user_events,
@@ -168,7 +171,7 @@ async def initialize_memo_sdk():
     reload_sdk_config()
     
     # 2. Initialize Database
-    init_db(settings.MEMOBASE_DB_URL)
+    init_db(settings.MEMOBASE_DB_URL, connect_pragmas=get_sqlite_pragmas())
     
     # 4. Start background worker
     worker_task = asyncio.create_task(start_memobase_worker(interval_s=60))
@@ -176,6 +179,36 @@ async def initialize_memo_sdk():
     return worker_task
 
 
+# 画像文本块的渲染方式：单聊带 topic / sub_topic，群聊只列内容
+PROFILE_TEXT_DETAILED = "detailed"
+PROFILE_TEXT_CONTENT = "content"
+
+
+def _render_profiles_detailed(profiles) -> str:
+    lines = []
+    for item in profiles:
+        if not item or not item.content:
+            continue
+        attributes = item.attributes or {}
+        topic = (attributes.get("topic") or "").strip()
+        sub_topic = (attributes.get("sub_topic") or "").strip()
+        if topic or sub_topic:
+            lines.append(f"- {topic}\t{sub_topic}\t{item.content.strip()}")
+        else:
+            lines.append(f"- {item.content.strip()}")
+    return "\n".join(lines)
+
+
+def _render_profiles_content(profiles) -> str:
+    return "\n".join(f"- {p.content.strip()}" for p in profiles if p and p.content)
+
+
+_PROFILE_TEXT_RENDERERS = {
+    PROFILE_TEXT_DETAILED: _render_profiles_detailed,
+    PROFILE_TEXT_CONTENT: _render_profiles_content,
+}
+
+
 class MemoService:
     """
     Bridge service for Memobase SDK.
@@ -226,6 +259,18 @@ class MemoService:
         promise = await get_user_profiles(user_id=user_id, project_id=space_id)
         return cls._unwrap(promise)
 
+    @classmethod
+    async def get_user_profile_text(
+        cls, user_id: str, space_id: str, style: str = PROFILE_TEXT_DETAILED
+    ) -> str:
+        """
+        返回用于 {{user-profile}} 的画像文本块。
+        基于不可变的画像快照，渲染结果随快照缓存，画像未变化时只是一次字典查找。
+        """
+        promise = await get_user_profile_snapshot(user_id=user_id, project_id=space_id)
+        snapshot = cls._unwrap(promise)
+        return snapshot.render(style, _PROFILE_TEXT_RENDERERS[style])
+
     @classmethod
     async def add_user_profiles(
         cls, user_id: str, space_id: str, contents: List[str], attributes: List[dict]
@@ -569,70 +614,112 @@ class MemoService:
         Returns:
             UserEventGistsData with filtered event gists
         """
+        results = await cls.search_memories_for_friends(
+            user_id, space_id, query, [friend_id], topk, similarity_threshold
+        )
+        return results[friend_id]
+
+    @classmethod
+    async def search_memories_for_friends(
+        cls,
+        user_id: str,
+        space_id: str,
+        query: str,
+        friend_ids: List[int],
+        topk: int = 5,
+        similarity_threshold: float = 0.5
+    ) -> Dict[int, UserEventGistsData]:
+        """
+        Multi-friend vector search: one query embedding and one SQL pass return
+        the top-k gists for every friend in friend_ids.
+
+        The friend_id tag is expanded once per event (json_each) and results are
+        ranked with ROW_NUMBER() partitioned by friend, so a group fan-out costs
+        the same embedding call and table scan as a single friend.
+        """
         logger = logging.getLogger(__name__)
-        user_id_uuid = to_uuid(user_id)
-        
+        friend_ids = list(dict.fromkeys(friend_ids))
+        results: Dict[int, UserEventGistsData] = {
+            fid: UserEventGistsData(gists=[], events=[]) for fid in friend_ids
+        }
+        if not friend_ids:
+            return results
+
         # 1. Check if event embedding is enabled
         if not CONFIG.enable_event_embedding:
             logger.warning("Event embedding is not enabled, falling back to filter_friend_event_gists")
-            return await cls.filter_friend_event_gists(user_id, space_id, friend_id, topk)
-        
-        # 2. Get query embedding
+            filtered = await asyncio.gather(
+                *(cls.filter_friend_event_gists(user_id, space_id, fid, topk) for fid in friend_ids)
+            )
+            return dict(zip(friend_ids, filtered))
+
+        # 2. Get query embedding (once for all friends)
         query_embeddings = await get_embedding(
             space_id, [query], phase="query", model=CONFIG.embedding_model
         )
         if not query_embeddings.ok():
             logger.error(f"Failed to get query embedding: {query_embeddings.msg()}")
             raise MemoServiceException(f"Failed to get query embedding: {query_embeddings.msg()}")
-        
-        query_embedding = query_embeddings.data()[0]
-        query_embedding_bytes = serialize_embedding(query_embedding)
-        
+
+        query_embedding_bytes = serialize_embedding(query_embeddings.data()[0])
+
         # 3. Calculate time cutoff (365 days)
         days_ago = datetime.now(timezone.utc) - timedelta(days=365)
-        
-        # 4. Build SQL query with friend_id tag filter and vector similarity
-        # sqlite-vec uses vec_distance_cosine
+
+        # 4. Rank gists per friend in one statement
         # Use case() to prevent calling vec_distance_cosine on NULL embeddings
         distance_expr = case(
             (UserEventGist.embedding.is_not(None), func.vec_distance_cosine(UserEventGist.embedding, query_embedding_bytes)),
             else_=None
         )
         similarity_expr = (1 - distance_expr)
-        
-        stmt = (
+        event_tags = (
+            func.json_each(func.json_extract(UserEvent.event_data, "$.event_tags"))
+            .table_valued("value")
+            .alias("event_tags")
+        )
+        tag_friend_id = func.json_extract(event_tags.c.value, "$.value")
+
+        ranked = (
             select(
                 UserEventGist,
                 similarity_expr.label("similarity"),
+                tag_friend_id.label("friend_id"),
+                func.row_number()
+                .over(partition_by=tag_friend_id, order_by=desc(similarity_expr))
+                .label("friend_rank"),
             )
             .join(UserEvent, UserEventGist.event_id == UserEvent.id)
+            .join(event_tags, true())
             .where(
                 UserEventGist.embedding.is_not(None),
-                UserEvent.user_id == user_id_uuid,
+                UserEvent.user_id == to_uuid(user_id),
                 UserEvent.project_id == space_id,
                 UserEvent.created_at >= days_ago,
                 similarity_expr > similarity_threshold,
+                func.json_extract(event_tags.c.value, "$.tag") == "friend_id",
+                tag_friend_id.in_([str(fid) for fid in friend_ids]),
             )
-            # Add friend_id tag filter using json_each
-            .where(text("""
-                EXISTS (
-                    SELECT 1 
-                    FROM json_each(json_extract(user_events.event_data, '$.event_tags')) 
-                    WHERE json_extract(value, '$.tag') = 'friend_id' 
-                    AND json_extract(value, '$.value') = :friend_id
-                )
-            """).bindparams(friend_id=str(friend_id)))
-            .order_by(desc("similarity"))
-            .limit(topk)
+            .subquery()
         )
-        
+        gist_alias = aliased(UserEventGist, ranked)
+        stmt = (
+            select(gist_alias, ranked.c.similarity, ranked.c.friend_id)
+            .where(ranked.c.friend_rank <= topk)
+            .order_by(ranked.c.friend_id, desc(ranked.c.similarity))
+        )
+
         with Session() as session:
-            result = session.execute(stmt).all()
-            result_gists = []
-            for row in result:
-                gist: UserEventGist = row[0]
-                similarity: float = row[1]
-                result_gists.append(
+            rows = session.execute(stmt).all()
+            for gist, similarity, tag_value in rows:
+                try:
+                    fid = int(tag_value)
+                except (TypeError, ValueError):
+                    continue
+                bucket = results.get(fid)
+                if bucket is None or any(g.id == gist.id for g in bucket.gists):
+                    continue
+                bucket.gists.append(
                     UserEventGistData(
                         id=gist.id,
                         gist_data=EventGistData(**gist.gist_data),
@@ -641,9 +728,25 @@ class MemoService:
                         similarity=similarity,
                     )
                 )
-        
-        logger.debug(f"search_memories_with_tags returned {len(result_gists)} gists for friend {friend_id}")
-        return UserEventGistsData(gists=result_gists, events=[])
+
+        logger.debug(
+            "search_memories_for_friends returned %s gists for friends %s",
+            sum(len(r.gists) for r in results.values()),
+            friend_ids,
+        )
+        return results
+
+    @staticmethod
+    def _format_recall_events(events_data: UserEventGistsData) -> List[Dict[str, Any]]:
+        events_result = []
+        for gist in events_data.gists:
+            gist_data = gist.gist_data if isinstance(gist.gist_data, dict) else gist.gist_data.model_dump()
+            events_result.append({
+                "date": gist.created_at.isoformat() if gist.created_at else None,
+                "content": gist_data.get("summary", gist_data.get("content", "")),
+                "similarity": getattr(gist, 'similarity', None)
+            })
+        return events_result
 
     @classmethod
     async def recall_memory(
@@ -676,8 +779,6 @@ class MemoService:
         """
         logger = logging.getLogger(__name__)
         
-        events_result = []
-        
         try:
             events_task = cls.search_memories_with_tags(
                 user_id, space_id, query, friend_id, topk_event, threshold
@@ -696,13 +797,7 @@ class MemoService:
         events_data = events_data[0] if events_data else UserEventGistsData(gists=[], events=[])
 
         # Format events
-        for gist in events_data.gists:
-            gist_data = gist.gist_data if isinstance(gist.gist_data, dict) else gist.gist_data.model_dump()
-            events_result.append({
-                "date": gist.created_at.isoformat() if gist.created_at else None,
-                "content": gist_data.get("summary", gist_data.get("content", "")),
-                "similarity": getattr(gist, 'similarity', None)
-            })
+        events_result = cls._format_recall_events(events_data)
         
         logger.info(f"recall_memory: {len(events_result)} events for query: {query[:30]}...")
         
@@ -710,6 +805,45 @@ class MemoService:
             "events": events_result
         }
 
+    @classmethod
+    async def recall_memory_for_friends(
+        cls,
+        user_id: str,
+        space_id: str,
+        query: str,
+        friend_ids: List[int],
+        topk_event: int = 5,
+        threshold: float = 0.5,
+        timeout: float = 10.0
+    ) -> Dict[int, Dict[str, Any]]:
+        """
+        recall_memory for several friends at once (group chat fan-out).
+
+        Returns:
+            {friend_id: {"events": [...]}, ...}
+        """
+        logger = logging.getLogger(__name__)
+        try:
+            results = await asyncio.wait_for(
+                cls.search_memories_for_friends(
+                    user_id, space_id, query, friend_ids, topk_event, threshold
+                ),
+                timeout=timeout,
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"recall_memory_for_friends timed out after {timeout}s")
+            return {fid: {"events": []} for fid in friend_ids}
+        except Exception as e:
+            logger.error(f"recall_memory_for_friends failed: {e}")
+            raise MemoServiceException(f"Memory recall failed: {e}") from e
+
+        recalled = {fid: {"events": cls._format_recall_events(data)} for fid, data in results.items()}
+        logger.info(
+            f"recall_memory_for_friends: {sum(len(r['events']) for r in recalled.values())} events "
+            f"for {len(friend_ids)} friends, query: {query[:30]}..."
+        )
+        return recalled
+
     @classmethod
     async def delete_friend_memories(
         cls, user_id: str, space_id: str, friend_id: int
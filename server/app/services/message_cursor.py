@@ -0,0 +1,59 @@
+"""
+消息历史的 keyset 分页游标
+
+游标对前端是不透明字符串，内部编码为 "<scope>:<message_id>"：
+- scope 区分单聊 / 群聊消息，避免把一个列表的游标误用到另一个列表
+- 服务端按 message_id 做 `id < cursor` / `id > cursor` 的范围查询，配合复合索引，
+  每一页的代价与翻到多深无关
+"""
+import base64
+from typing import Any, Dict, List, Optional
+
+MESSAGE_SCOPE = "m"
+GROUP_MESSAGE_SCOPE = "g"
+# 分页接口单页条数上限
+MAX_PAGE_LIMIT = 500
+
+
+def encode_cursor(scope: str, message_id: Optional[int]) -> Optional[str]:
+    if message_id is None:
+        return None
+    raw = f"{scope}:{int(message_id)}".encode("ascii")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], scope: str) -> Optional[int]:
+    """解析游标，格式不合法或 scope 不匹配时抛出 ValueError。"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("ascii")
+        cursor_scope, _, value = raw.partition(":")
+        message_id = int(value)
+    except (ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if cursor_scope != scope or message_id <= 0:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return message_id
+
+
+def build_page(
+    rows: List[Any],
+    limit: int,
+    scope: str,
+    forward: bool = False,
+) -> Dict[str, Any]:
+    """
+    将多取一条（limit + 1）的正序结果整理为分页结构。
+    forward=False 表示向更早方向翻页，多出来的一条在列表头部；forward=True 则在尾部。
+    """
+    has_more = len(rows) > limit
+    if has_more:
+        rows = rows[:limit] if forward else rows[len(rows) - limit:]
+    return {
+        "items": rows,
+        "before_cursor": encode_cursor(scope, rows[0].id) if rows else None,
+        "after_cursor": encode_cursor(scope, rows[-1].id) if rows else None,
+        "has_more": has_more,
+    }
@@ -12,7 +12,7 @@ from sqlalchemy.orm import Session
 
 from app.services.memo.bridge import MemoService
 from app.services.llm_service import llm_service
-from app.services.settings_service import SettingsService
+from app.services.settings_service import SettingsService, SettingsSnapshot
 from app.services import provider_rules
 from app.services.llm_client import set_agents_default_client
 from app.prompt import get_prompt
@@ -102,64 +102,27 @@ class RecallService:
             return merged_events[:max_events]
         return merged_events
 
-    @classmethod
-    async def perform_recall(
-        cls,
-        db: Session,
-        user_id: str,
-        space_id: str,
-        messages: Iterable[Any],
-        friend_id: int,
-    ) -> Dict[str, Any]:
-        """
-        执行记忆召回逻辑。
-        
-        该方法启动一个 RecallAgent，模拟 Function Calling 过程去召回记忆。
-        
-        返回:
-            {
-                "injected_messages": [mock_tool_call, mock_tool_result], # 用于注入到主对话历史中的伪造消息
-                "footprints": [ # 执行过程中的足迹，用于前端展示
-                    {"type": "thinking", "content": "..."},
-                    {"type": "tool_call", "name": "...", "arguments": "..."},
-                    {"type": "tool_result", "name": "...", "result": "..."},
-                ]
-            }
-        """
-        # 1. 获取 LLM 配置和系统设置
+    @staticmethod
+    def _recall_settings(db: Session, settings_snapshot: Optional[SettingsSnapshot]) -> Tuple[Any, int, int, float]:
         llm_config = llm_service.get_active_config(db)
         if not llm_config:
             raise Exception("LLM configuration not found in database")
 
-        search_rounds = SettingsService.get_setting(db, "memory", "search_rounds", 3)
-        event_topk = SettingsService.get_setting(db, "memory", "event_topk", 5)
-        threshold = SettingsService.get_setting(db, "memory", "similarity_threshold", 0.5)
+        if settings_snapshot is None:
+            settings_snapshot = SettingsService.snapshot(db, "memory")
+        search_rounds = settings_snapshot.get("memory", "search_rounds", 3)
+        event_topk = settings_snapshot.get("memory", "event_topk", 5)
+        threshold = settings_snapshot.get("memory", "similarity_threshold", 0.5)
+        return llm_config, search_rounds, event_topk, threshold
 
-        messages_list = list(messages)
+    @staticmethod
+    def _build_agent(llm_config, search_rounds: int, tool_recall) -> Tuple[Agent, str]:
+        """构造 RecallAgent，返回 (agent, 规范化后的模型名)。"""
         raw_model_name = llm_config.model_name
 
-        # 2. 定义 Agent 手里的“召回工具”
-        tool_description = get_prompt("recall/recall_tool_description.txt").strip()
-
-        @function_tool(
-            name_override="recall_memory",
-            description_override=tool_description,
-        )
-        async def tool_recall(query: str) -> Dict[str, Any]:
-            # 工具逻辑：调用向量检索服务
-            return await MemoService.recall_memory(
-                user_id=user_id,
-                space_id=space_id,
-                query=query,
-                friend_id=friend_id,
-                topk_event=event_topk,
-                threshold=threshold,
-            )
-
-        # 3. 设置 OpenAI 客户端
+        # 设置 OpenAI 客户端
         set_agents_default_client(llm_config, use_for_tracing=True)
 
-        # 4. 初始化 RecallAgent
         # 内部逻辑使用 UTC，但给 RecallAgent 的指示词建议使用北京时间以便更好地进行相对时间检索
         beijing_tz = timezone(timedelta(hours=8))
         now_time = datetime.now(timezone.utc).astimezone(beijing_tz)
@@ -203,20 +166,14 @@ class RecallService:
             tools=[tool_recall],
             model_settings=model_settings,
         )
+        return agent, model_name
 
-        # 5. 准备对话上下文并运行 Agent
-        agent_messages = cls._normalize_messages(messages_list)
-        if not agent_messages:
-            return {"injected_messages": [], "footprints": []}
-
-        # 执行 Agent 逻辑
-        result = await Runner.run(
-            agent,
-            agent_messages,
-            run_config=RunConfig(trace_include_sensitive_data=True),
-        )
-
-        # 6. 处理 Agent 运行结果，提取足迹和召回的事件
+    @classmethod
+    def _collect_run_items(cls, result: Any) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], Optional[str], Optional[str]]:
+        """
+        处理 Agent 运行结果。
+        返回 (tool_outputs, footprints, last_tool_call_id, last_tool_call_args)。
+        """
         tool_outputs: List[Dict[str, Any]] = []
         footprints: List[Dict[str, Any]] = []
         
@@ -252,54 +209,224 @@ class RecallService:
                         "type": "thinking",
                         "content": reasoning
                     })
+        return tool_outputs, footprints, last_tool_call_id, last_tool_call_args
 
-        # 7. 对多次搜索的结果进行合并去重
-        merged_events = cls._merge_events(tool_outputs, event_topk)
-
-        # 8. 构造“伪造消息对”用于注入主对话历史
+    @staticmethod
+    def _build_injected_messages(
+        llm_config,
+        model_name: str,
+        agent_messages: List[Dict[str, str]],
+        call_id: Optional[str],
+        call_args: Optional[str],
+        merged_events: List[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        """构造“伪造消息对”用于注入主对话历史。"""
         # 即使 Agent 没调工具或出错，我们也确保有一个基本的注入结构
-        if not last_tool_call_id:
-            last_tool_call_id = f"recall_{uuid.uuid4().hex}"
+        if not call_id:
+            call_id = f"recall_{uuid.uuid4().hex}"
 
-        if not last_tool_call_args:
+        if not call_args:
             # 兜底：使用用户最后一句消息作为 query
             last_user = next(
                 (msg["content"] for msg in reversed(agent_messages) if msg.get("role") == "user"),
                 "",
             )
-            last_tool_call_args = json.dumps({"query": last_user or ""}, ensure_ascii=False)
+            call_args = json.dumps({"query": last_user or ""}, ensure_ascii=False)
 
         # 伪造模型的一次 Function Call 动作
         tool_call_item = {
             "type": "function_call",
-            "call_id": last_tool_call_id,
+            "call_id": call_id,
             "name": "recall_memory",
-            "arguments": last_tool_call_args,
+            "arguments": call_args,
         }
         if provider_rules.needs_gemini_thought_signature(llm_config, model_name):
             tool_call_item["provider_data"] = {"thought_signature": "skip_thought_signature_validator"}
         # 伪造该 Function Call 的返回结果（即我们合规后的记忆事件）
         tool_result_item = {
             "type": "function_call_output",
-            "call_id": last_tool_call_id,
+            "call_id": call_id,
             "output": json.dumps({"events": merged_events}, ensure_ascii=False),
         }
+        return [
+            *(
+                [{
+                    "type": "reasoning",
+                    "summary": [{"text": "正在检索相关记忆。", "type": "summary_text"}],
+                }]
+                if provider_rules.needs_deepseek_reasoning_item(llm_config, model_name)
+                else []
+            ),
+            tool_call_item,
+            tool_result_item
+        ]
+
+    @classmethod
+    async def perform_recall(
+        cls,
+        db: Session,
+        user_id: str,
+        space_id: str,
+        messages: Iterable[Any],
+        friend_id: int,
+        settings_snapshot: Optional[SettingsSnapshot] = None,
+    ) -> Dict[str, Any]:
+        """
+        执行记忆召回逻辑。
+        settings_snapshot 由调用方（生成任务）传入时直接复用，否则现取一份 memory 分组快照。
+        
+        该方法启动一个 RecallAgent，模拟 Function Calling 过程去召回记忆。
+        
+        返回:
+            {
+                "injected_messages": [mock_tool_call, mock_tool_result], # 用于注入到主对话历史中的伪造消息
+                "footprints": [ # 执行过程中的足迹，用于前端展示
+                    {"type": "thinking", "content": "..."},
+                    {"type": "tool_call", "name": "...", "arguments": "..."},
+                    {"type": "tool_result", "name": "...", "result": "..."},
+                ]
+            }
+        """
+        # 1. 获取 LLM 配置和系统设置
+        llm_config, search_rounds, event_topk, threshold = cls._recall_settings(db, settings_snapshot)
+        messages_list = list(messages)
+
+        # 2. 定义 Agent 手里的“召回工具”
+        tool_description = get_prompt("recall/recall_tool_description.txt").strip()
+
+        @function_tool(
+            name_override="recall_memory",
+            description_override=tool_description,
+        )
+        async def tool_recall(query: str) -> Dict[str, Any]:
+            # 工具逻辑：调用向量检索服务
+            return await MemoService.recall_memory(
+                user_id=user_id,
+                space_id=space_id,
+                query=query,
+                friend_id=friend_id,
+                topk_event=event_topk,
+                threshold=threshold,
+            )
+
+        # 3. 初始化 RecallAgent
+        agent, model_name = cls._build_agent(llm_config, search_rounds, tool_recall)
+
+        # 4. 准备对话上下文并运行 Agent
+        agent_messages = cls._normalize_messages(messages_list)
+        if not agent_messages:
+            return {"injected_messages": [], "footprints": []}
+
+        # 执行 Agent 逻辑
+        result = await Runner.run(
+            agent,
+            agent_messages,
+            run_config=RunConfig(trace_include_sensitive_data=True),
+        )
+
+        # 5. 提取足迹和召回的事件，对多次搜索的结果进行合并去重
+        tool_outputs, footprints, last_tool_call_id, last_tool_call_args = cls._collect_run_items(result)
+        merged_events = cls._merge_events(tool_outputs, event_topk)
 
         logger.info("RecallService merged %s events, generated %s footprints", len(merged_events), len(footprints))
 
         return {
-            "injected_messages": [
-                *(
-                    [{
-                        "type": "reasoning",
-                        "summary": [{"text": "正在检索相关记忆。", "type": "summary_text"}],
-                    }]
-                    if provider_rules.needs_deepseek_reasoning_item(llm_config, model_name)
-                    else []
-                ),
-                tool_call_item,
-                tool_result_item
-            ],
+            "injected_messages": cls._build_injected_messages(
+                llm_config, model_name, agent_messages, last_tool_call_id, last_tool_call_args, merged_events
+            ),
             "footprints": footprints
         }
 
+    @staticmethod
+    def _query_from_arguments(arguments: Optional[str]) -> Optional[str]:
+        try:
+            parsed = json.loads(arguments or "")
+        except (TypeError, ValueError):
+            return None
+        query = parsed.get("query") if isinstance(parsed, dict) else None
+        return query if isinstance(query, str) else None
+
+    @classmethod
+    async def perform_group_recall(
+        cls,
+        db: Session,
+        user_id: str,
+        space_id: str,
+        messages: Iterable[Any],
+        friend_ids: List[int],
+        settings_snapshot: Optional[SettingsSnapshot] = None,
+    ) -> Dict[int, Dict[str, Any]]:
+        """
+        群聊多好友召回：一次 RecallAgent 运行产出查询集合，每个查询做一次多好友向量检索，
+        再按好友拆分结果。
+
+        返回 {friend_id: {"injected_messages": [...], "footprints": [...]}}，
+        每个好友的结构与 perform_recall 相同（tool_result 足迹只含该好友的事件）。
+        """
+        llm_config, search_rounds, event_topk, threshold = cls._recall_settings(db, settings_snapshot)
+        friend_ids = list(dict.fromkeys(friend_ids))
+        empty = {fid: {"injected_messages": [], "footprints": []} for fid in friend_ids}
+        agent_messages = cls._normalize_messages(list(messages))
+        if not agent_messages or not friend_ids:
+            return empty
+
+        # 每个查询 -> {friend_id: {"events": [...]}}
+        per_query: Dict[str, Dict[int, Dict[str, Any]]] = {}
+        tool_description = get_prompt("recall/recall_tool_description.txt").strip()
+
+        @function_tool(
+            name_override="recall_memory",
+            description_override=tool_description,
+        )
+        async def tool_recall(query: str) -> Dict[str, Any]:
+            recalled = per_query.get(query)
+            if recalled is None:
+                recalled = await MemoService.recall_memory_for_friends(
+                    user_id=user_id,
+                    space_id=space_id,
+                    query=query,
+                    friend_ids=friend_ids,
+                    topk_event=event_topk,
+                    threshold=threshold,
+                )
+                per_query[query] = recalled
+            # Agent 只需要判断是否继续检索，这里给它各好友结果的合并视图
+            return {"events": cls._merge_events(recalled.values(), event_topk)}
+
+        agent, model_name = cls._build_agent(llm_config, search_rounds, tool_recall)
+        result = await Runner.run(
+            agent,
+            agent_messages,
+            run_config=RunConfig(trace_include_sensitive_data=True),
+        )
+        _, shared_footprints, last_tool_call_id, last_tool_call_args = cls._collect_run_items(result)
+
+        results: Dict[int, Dict[str, Any]] = {}
+        for fid in friend_ids:
+            footprints: List[Dict[str, Any]] = []
+            outputs: List[Dict[str, Any]] = []
+            current_query: Optional[str] = None
+            for fp in shared_footprints:
+                if fp["type"] == "tool_call":
+                    current_query = cls._query_from_arguments(fp.get("arguments"))
+                    footprints.append(fp)
+                elif fp["type"] == "tool_result":
+                    output = per_query.get(current_query or "", {}).get(fid, {"events": []})
+                    outputs.append(output)
+                    footprints.append({**fp, "result": output})
+                else:
+                    footprints.append(fp)
+            merged_events = cls._merge_events(outputs, event_topk)
+            results[fid] = {
+                "injected_messages": cls._build_injected_messages(
+                    llm_config, model_name, agent_messages, last_tool_call_id, last_tool_call_args, merged_events
+                ),
+                "footprints": footprints,
+            }
+
+        logger.info(
+            "RecallService group recall: %s queries for %s friends in one agent run",
+            len(per_query),
+            len(friend_ids),
+        )
+        return results
@@ -1,13 +1,105 @@
 import json
-from typing import Any, Dict, List, Optional, Union
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from app.models.system_setting import SystemSetting
-from app.db.session import SessionLocal
+from app.db.session import SessionLocal, engine as main_engine
 
 # 哨兵值，用于区分 "配置不存在" 和 "配置值为 None/null"
 NOT_FOUND = object()
 
+_EMPTY_GROUP: Mapping[str, Any] = MappingProxyType({})
+
+
+class SettingsSnapshot:
+    """
+    某一时刻若干配置分组的只读视图。
+    一次生成任务开始时获取，整个任务期间读取同一份配置，不再访问数据库。
+    """
+    __slots__ = ("version", "_groups")
+
+    def __init__(self, version: int, groups: Mapping[str, Mapping[str, Any]]):
+        self.version = version
+        self._groups = MappingProxyType(dict(groups))
+
+    def get(self, group_name: str, key: str, default: Any = None) -> Any:
+        return self._groups.get(group_name, _EMPTY_GROUP).get(key, default)
+
+    def group(self, group_name: str) -> Mapping[str, Any]:
+        return self._groups.get(group_name, _EMPTY_GROUP)
+
+    def __repr__(self) -> str:
+        return f"SettingsSnapshot(version={self.version}, groups={list(self._groups)})"
+
+
+class _SettingsCache:
+    """
+    按分组缓存的已转换类型的配置值（write-through）。
+    - 只对注册过的 engine 生效（默认为主库），其它 engine（如测试库）直接读库
+    - 每个分组首次访问时整组加载一次，之后只在 set_setting / 批量更新时写穿更新
+    - 每次写入递增 version，快照据此标识自己看到的配置版本
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._engines: set = set()
+        self._groups: Dict[Tuple[Engine, str], Mapping[str, Any]] = {}
+        self.version = 0
+
+    def enable(self, engine: Engine) -> None:
+        with self._lock:
+            self._engines.add(engine)
+
+    def disable(self, engine: Engine) -> None:
+        with self._lock:
+            self._engines.discard(engine)
+            for cache_key in [k for k in self._groups if k[0] is engine]:
+                del self._groups[cache_key]
+            self.version += 1
+
+    def bind_of(self, db: Session) -> Optional[Engine]:
+        bind = db.get_bind()
+        return bind if bind in self._engines else None
+
+    def get_group(self, bind: Engine, group_name: str) -> Optional[Mapping[str, Any]]:
+        return self._groups.get((bind, group_name))
+
+    def store_group(
+        self, bind: Engine, group_name: str, values: Dict[str, Any], loaded_version: int
+    ) -> Mapping[str, Any]:
+        frozen = MappingProxyType(values)
+        with self._lock:
+            # 加载期间有并发写入时不落缓存，避免把旧值缓存下来
+            if self.version == loaded_version:
+                self._groups[(bind, group_name)] = frozen
+        return frozen
+
+    def write_through(self, bind: Engine, group_name: str, updates: Dict[str, Any]) -> None:
+        with self._lock:
+            current = self._groups.get((bind, group_name))
+            if current is not None:
+                merged = dict(current)
+                merged.update(updates)
+                self._groups[(bind, group_name)] = MappingProxyType(merged)
+            self.version += 1
+
+    def invalidate(self, group_name: Optional[str] = None) -> None:
+        with self._lock:
+            if group_name is None:
+                self._groups.clear()
+            else:
+                for cache_key in [k for k in self._groups if k[1] == group_name]:
+                    del self._groups[cache_key]
+            self.version += 1
+
+
+settings_cache = _SettingsCache()
+settings_cache.enable(main_engine)
+
+
 class SettingsService:
     @staticmethod
     def _convert_value(value: str, value_type: str) -> Any:
@@ -36,38 +128,69 @@ class SettingsService:
         如果配置不存在，返回 default（默认为 None）。
         建议使用 NOT_FOUND 哨兵值区分 "不存在" 和 "值为 None"。
         """
+        bind = settings_cache.bind_of(db)
+        if bind is not None:
+            return cls._load_group(db, group_name, bind).get(key, default)
+
         setting = db.query(SystemSetting).filter_by(group_name=group_name, key=key).first()
         if not setting:
             return default
         return cls._convert_value(setting.value, setting.value_type)
 
     @classmethod
-    def get_settings_by_group(cls, db: Session, group_name: str) -> Dict[str, Any]:
+    def _query_group(cls, db: Session, group_name: str) -> Dict[str, Any]:
         settings = db.query(SystemSetting).filter_by(group_name=group_name).all()
         return {s.key: cls._convert_value(s.value, s.value_type) for s in settings}
 
     @classmethod
-    def set_setting(
-        cls, 
-        db: Session, 
-        group_name: str, 
-        key: str, 
-        value: Any, 
+    def _load_group(cls, db: Session, group_name: str, bind: Optional[Engine]) -> Mapping[str, Any]:
+        if bind is None:
+            return cls._query_group(db, group_name)
+        cached = settings_cache.get_group(bind, group_name)
+        if cached is None:
+            loaded_version = settings_cache.version
+            cached = settings_cache.store_group(
+                bind, group_name, cls._query_group(db, group_name), loaded_version
+            )
+        return cached
+
+    @classmethod
+    def get_settings_by_group(cls, db: Session, group_name: str) -> Dict[str, Any]:
+        return dict(cls._load_group(db, group_name, settings_cache.bind_of(db)))
+
+    @classmethod
+    def snapshot(cls, db: Session, *group_names: str) -> SettingsSnapshot:
+        """
+        获取若干分组的一致性快照，供一次生成任务全程使用。
+        """
+        bind = settings_cache.bind_of(db)
+        version = settings_cache.version
+        groups = {name: cls._load_group(db, name, bind) for name in group_names}
+        return SettingsSnapshot(version, groups)
+
+    @classmethod
+    def _infer_value_type(cls, value: Any) -> str:
+        if isinstance(value, bool): return "bool"
+        elif isinstance(value, int): return "int"
+        elif isinstance(value, float): return "float"
+        elif isinstance(value, (dict, list)): return "json"
+        return "string"
+
+    @classmethod
+    def _upsert(
+        cls,
+        db: Session,
+        group_name: str,
+        key: str,
+        value: Any,
         value_type: Optional[str] = None,
-        description: Optional[str] = None
+        description: Optional[str] = None,
     ) -> SystemSetting:
         setting = db.query(SystemSetting).filter_by(group_name=group_name, key=key).first()
         
         # If value_type not provided, try to infer it if setting doesn't exist
         if not value_type:
-            if setting:
-                value_type = setting.value_type
-            else:
-                if isinstance(value, bool): value_type = "bool"
-                elif isinstance(value, int): value_type = "int"
-                elif isinstance(value, float): value_type = "float"
-                elif isinstance(value, (dict, list)): value_type = "json"
-                else: value_type = "string"
+            value_type = setting.value_type if setting else cls._infer_value_type(value)
 
         formatted_value = cls._format_value(value, value_type)
 
@@ -85,11 +208,43 @@ class SettingsService:
                 description=description
             )
             db.add(setting)
-        
+        return setting
+
+    @classmethod
+    def set_setting(
+        cls, 
+        db: Session, 
+        group_name: str, 
+        key: str, 
+        value: Any, 
+        value_type: Optional[str] = None,
+        description: Optional[str] = None
+    ) -> SystemSetting:
+        setting = cls._upsert(db, group_name, key, value, value_type, description)
         db.commit()
         db.refresh(setting)
+        cls._write_through(db, group_name, [setting])
         return setting
 
+    @classmethod
+    def set_settings(cls, db: Session, group_name: str, values: Dict[str, Any]) -> List[SystemSetting]:
+        """批量更新同一分组的多个配置，一次提交并写穿缓存。"""
+        settings = [cls._upsert(db, group_name, key, value) for key, value in values.items()]
+        db.commit()
+        cls._write_through(db, group_name, settings)
+        return settings
+
+    @classmethod
+    def _write_through(cls, db: Session, group_name: str, settings: List[SystemSetting]) -> None:
+        bind = settings_cache.bind_of(db)
+        if bind is None:
+            return
+        settings_cache.write_through(
+            bind,
+            group_name,
+            {s.key: cls._convert_value(s.value, s.value_type) for s in settings},
+        )
+
     @classmethod
     def initialize_defaults(cls):
         db = SessionLocal()
@@ -136,3 +291,5 @@ class SettingsService:
                 db.rollback()
         finally:
             db.close()
+            # 上面有绕过 set_setting 的直接写入，统一丢弃缓存
+            settings_cache.invalidate()
@@ -0,0 +1,229 @@
+"""
+增量流解析器：单聊 / 群聊共用。
+
+LLM 的文本增量里混着 <think>...</think> 思考段和 <message>...</message> 分段标签，
+以前两边各自维护一份状态机，每个 delta 都对整段缓冲区 find/切片/拼接，响应越长越慢
+（O(n^2)）。这里一次扫描只处理“上次未决的几个字符 + 新 delta”：
+- 输出按列表累积，需要全文时才 join（结果有缓存）
+- 只在结尾疑似半截标签（如 "<thi"）时才暂扣几个字符，其余文本立即下发
+- 推理通道（reasoning item / reasoning delta）出现后，<think> 兜底内容不再下发
+- 同时跟踪已闭合的 <message> 分段，供分段下游（如语音）逐段消费；分段结果与
+  voice_message_service.parse_message_segments(全文) 逐段一致（segment_index 与前端对齐）
+"""
+
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+THINK_START = "<think>"
+THINK_END = "</think>"
+MESSAGE_START = "<message>"
+MESSAGE_END = "</message>"
+
+KIND_MESSAGE = "message"
+KIND_THINKING = "thinking"
+
+# 可能被拆在两个 delta 之间、需要暂扣判断的标签
+_HELD_TAGS = (THINK_START, THINK_END, MESSAGE_START, MESSAGE_END)
+_MAX_TAG_LEN = max(len(tag) for tag in _HELD_TAGS)
+_MESSAGE_TAG_RE = re.compile(r"</?message>")
+_MESSAGE_PART_RE = re.compile(r"<message>(.*?)</message>", re.DOTALL)
+
+
+def strip_message_tags(content: Optional[str]) -> Optional[str]:
+    if not content:
+        return content
+    # 提取所有 <message> 标签内容并用空格合并
+    parts = _MESSAGE_PART_RE.findall(content)
+    if parts:
+        return " ".join(part.strip() for part in parts if part.strip())
+    # 兜底：没有完整标签时直接剔除标签文本
+    return _MESSAGE_TAG_RE.sub("", content).strip()
+
+
+def _strip_think_tags(content: str) -> str:
+    return content.replace(THINK_START, "").replace(THINK_END, "")
+
+
+def _partial_tag_length(text: str, start: int) -> int:
+    """text[start:] 末尾若是某个标签的真前缀，返回该前缀长度，否则 0。"""
+    lt = text.rfind("<", max(start, len(text) - _MAX_TAG_LEN + 1))
+    if lt == -1:
+        return 0
+    tail = text[lt:]
+    for tag in _HELD_TAGS:
+        if len(tail) < len(tag) and tag.startswith(tail):
+            return len(tail)
+    return 0
+
+
+@dataclass(frozen=True)
+class StreamChunk:
+    kind: str  # KIND_MESSAGE / KIND_THINKING
+    text: str
+
+
+class StreamParser:
+    """
+    用法：
+        parser = StreamParser(enable_thinking)
+        for chunk in parser.feed(delta): ...            # 文本增量
+        text = parser.feed_reasoning(reasoning_delta)   # 推理通道增量
+        for chunk in parser.finish(): ...               # 流结束
+        parser.message_text / parser.final_content()
+
+    defer_thinking=True 时，<think> 兜底内容在 finish() 时一次性下发（单聊的既有行为）。
+    """
+
+    def __init__(self, enable_thinking: bool, defer_thinking: bool = False):
+        self.enable_thinking = enable_thinking
+        self.defer_thinking = defer_thinking
+        self.has_reasoning = False
+        self.raw_length = 0
+        self._in_think = False
+        self._pending = ""
+        self._raw_parts: List[str] = []
+        self._message_parts: List[str] = []
+        self._think_parts: List[str] = []
+        self._joined: Tuple[int, str] = (0, "")
+        # <message> 分段跟踪：_segment_parts 为第一个 <message> 起尚未闭合的文本，
+        # _segment_probe 保留上次末尾几个字符，用于发现跨 delta 的标签
+        self._seen_message_tag = False
+        self._segment_parts: List[str] = []
+        self._segment_probe = ""
+        self._segments: List[str] = []
+        self._segments_drained = 0
+        self._finished = False
+
+    # ---- 输入 ----
+
+    def feed(self, delta: str) -> List[StreamChunk]:
+        if not delta:
+            return []
+        self._raw_parts.append(delta)
+        self.raw_length += len(delta)
+
+        text = self._pending + delta if self._pending else delta
+        self._pending = ""
+        out: List[StreamChunk] = []
+        pos, n = 0, len(text)
+        while pos < n:
+            tag = THINK_END if self._in_think else THINK_START
+            idx = text.find(tag, pos)
+            if idx == -1:
+                end = n - _partial_tag_length(text, pos)
+                if end > pos:
+                    self._emit(text[pos:end], out)
+                self._pending = text[end:]
+                break
+            if idx > pos:
+                self._emit(text[pos:idx], out)
+            pos = idx + len(tag)
+            self._in_think = not self._in_think
+        return out
+
+    def feed_reasoning(self, text: Optional[str]) -> str:
+        """推理通道的增量；有内容时返回该文本并关闭 <think> 兜底。"""
+        if not text:
+            return ""
+        self.has_reasoning = True
+        return text
+
+    def finish(self) -> List[StreamChunk]:
+        out: List[StreamChunk] = []
+        if self._finished:
+            return out
+        self._finished = True
+        if self._pending:
+            pending, self._pending = self._pending, ""
+            self._emit(pending, out)
+        if self._think_parts and self._thinking_allowed():
+            out.append(StreamChunk(KIND_THINKING, "".join(self._think_parts)))
+        self._think_parts = []
+        self._close_trailing_segment()
+        return out
+
+    # ---- 输出 ----
+
+    @property
+    def message_text(self) -> str:
+        count = len(self._message_parts)
+        if self._joined[0] != count:
+            self._joined = (count, "".join(self._message_parts))
+        return self._joined[1]
+
+    def final_content(self, sanitize_message_tags: bool = False) -> str:
+        """消息正文（无正文时退回原始文本），去掉残留的 think 标签。"""
+        content = _strip_think_tags(self.message_text or "".join(self._raw_parts))
+        if sanitize_message_tags:
+            content = strip_message_tags(content) or content
+        return content
+
+    def drain_segments(self) -> List[str]:
+        """
+        返回自上次调用以来新完成的分段（已去首尾空白）。finish() 之后还会补上
+        尾部未闭合的分段，或在没有任何分段时整段正文作为一个分段。
+        """
+        segments = self._segments[self._segments_drained:]
+        self._segments_drained = len(self._segments)
+        return segments
+
+    # ---- 内部 ----
+
+    def _thinking_allowed(self) -> bool:
+        return self.enable_thinking and not self.has_reasoning
+
+    def _emit(self, text: str, out: List[StreamChunk]) -> None:
+        if self._in_think:
+            if not self._thinking_allowed():
+                return
+            if self.defer_thinking:
+                self._think_parts.append(text)
+                return
+            kind = KIND_THINKING
+        else:
+            self._message_parts.append(text)
+            self._track_segments(text)
+            kind = KIND_MESSAGE
+        if out and out[-1].kind == kind:
+            out[-1] = StreamChunk(kind, out[-1].text + text)
+        else:
+            out.append(StreamChunk(kind, text))
+
+    def _track_segments(self, text: str) -> None:
+        probe = self._segment_probe + text
+        self._segment_probe = probe[-(_MAX_TAG_LEN - 1):]
+        if not self._seen_message_tag:
+            # 第一个 <message> 之前的文本不属于任何分段
+            idx = probe.find(MESSAGE_START)
+            if idx == -1:
+                return
+            self._seen_message_tag = True
+            self._segment_parts = [probe[idx:]]
+        else:
+            self._segment_parts.append(text)
+            if MESSAGE_END not in probe:
+                return
+        pending = "".join(self._segment_parts)
+        consumed = 0
+        for match in _MESSAGE_PART_RE.finditer(pending):
+            segment = match.group(1).strip()
+            if segment:
+                self._segments.append(segment)
+            consumed = match.end()
+        rest = pending[consumed:]
+        self._segment_parts = [rest] if rest else []
+
+    def _close_trailing_segment(self) -> None:
+        pending = "".join(self._segment_parts)
+        self._segment_parts = []
+        open_idx = pending.find(MESSAGE_START)
+        if open_idx != -1:
+            trailing = pending[open_idx + len(MESSAGE_START):].strip()
+            if trailing:
+                self._segments.append(trailing)
+        if not self._segments:
+            # 没有标签或分段全为空：整段正文作为一个分段
+            text = self.message_text.strip()
+            if text:
+                self._segments.append(text)
@@ -0,0 +1,112 @@
+"""
+TTS 共享 HTTP 连接池。
+
+以前每条消息生成语音都新建一个 httpx.AsyncClient，DashScope 和音频 CDN 的
+TCP/TLS 握手每次都要重来；音频下载还是整包读进内存后在事件循环里同步写盘。这里：
+- 进程级共享一个 AsyncClient（keep-alive，安装了 h2 时启用 HTTP/2），按事件循环绑定
+- TTS 并发按服务商（base_url 主机）全局限流：TTS_PROVIDER_PARALLELISM 里配置的优先，
+  其余用 TTS_MAX_PARALLELISM
+- download_to_file 以 client.stream 分块下载，写盘放到线程里，由调用方负责原子 rename
+"""
+
+import asyncio
+import importlib.util
+import logging
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_TIMEOUT = httpx.Timeout(60.0, connect=10.0, read=60.0, write=60.0)
+
+
+def http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+def provider_for(base_url: Optional[str]) -> str:
+    """由 base_url 主机名得到服务商标识，DashScope 各地域统一为 "dashscope"。"""
+    host = (urlparse(base_url or "").hostname or "").lower()
+    if "dashscope" in host:
+        return "dashscope"
+    return host or "default"
+
+
+def provider_parallelism(provider: str) -> int:
+    limits = settings.TTS_PROVIDER_PARALLELISM or {}
+    return max(1, int(limits.get(provider, settings.TTS_MAX_PARALLELISM)))
+
+
+class TtsHttpPool:
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._limiters: Dict[str, Tuple[asyncio.AbstractEventLoop, asyncio.Semaphore]] = {}
+
+    def client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            # 连接与事件循环绑定；换了循环（测试、重启）就重建，旧循环上的连接随之废弃
+            use_http2 = settings.TTS_HTTP2 and http2_available()
+            if settings.TTS_HTTP2 and not use_http2:
+                logger.info("[TTS-HTTP] h2 not installed, falling back to HTTP/1.1")
+            self._client = httpx.AsyncClient(
+                timeout=_TIMEOUT,
+                follow_redirects=True,
+                http2=use_http2,
+                limits=httpx.Limits(
+                    max_connections=settings.TTS_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.TTS_MAX_CONNECTIONS,
+                    keepalive_expiry=settings.TTS_KEEPALIVE_EXPIRY_SECONDS,
+                ),
+            )
+            self._client_loop = loop
+        return self._client
+
+    def limiter(self, base_url: Optional[str]) -> asyncio.Semaphore:
+        provider = provider_for(base_url)
+        loop = asyncio.get_running_loop()
+        entry = self._limiters.get(provider)
+        if entry is None or entry[0] is not loop:
+            entry = (loop, asyncio.Semaphore(provider_parallelism(provider)))
+            self._limiters[provider] = entry
+        return entry[1]
+
+    async def aclose(self) -> None:
+        client, self._client = self._client, None
+        self._client_loop = None
+        self._limiters.clear()
+        if client is not None and not client.is_closed:
+            await client.aclose()
+
+
+async def download_to_file(
+    client: httpx.AsyncClient,
+    url: str,
+    dest_path: str,
+    *,
+    chunk_bytes: Optional[int] = None,
+) -> Optional[str]:
+    """
+    流式下载 url 到 dest_path（通常是 .part 临时文件），返回 content-type。
+    非 2xx 时读完响应体再抛 HTTPStatusError，便于调用方记录错误内容。
+    """
+    chunk_size = chunk_bytes or settings.TTS_DOWNLOAD_CHUNK_BYTES
+    async with client.stream("GET", url) as response:
+        if response.is_error:
+            await response.aread()
+        response.raise_for_status()
+        f = await asyncio.to_thread(open, dest_path, "wb")
+        try:
+            async for chunk in response.aiter_bytes(chunk_size):
+                await asyncio.to_thread(f.write, chunk)
+        finally:
+            await asyncio.to_thread(f.close)
+        return response.headers.get("content-type")
+
+
+tts_http_pool = TtsHttpPool()
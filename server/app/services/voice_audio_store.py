@@ -0,0 +1,286 @@
+"""
+内容寻址的 TTS 音频存储。
+
+同一好友反复说的短句（“晚安”“哈哈”、开场白模板）以及重新生成，以前每次都要重新
+调 TTS 并在 uploads 下另存一份文件。这里按 (model, voice_id, text, instructions,
+language) 的 sha256 存一份共享文件：
+
+    {DATA_DIR}/uploads/audio/cas/<key[:2]>/<key><ext>   ->   /api/voice/audio/cas/<key[:2]>/<key><ext>
+
+（由支持 Range 与长缓存头的 voice 接口提供；旧的 /uploads/audio/cas/... 地址仍可访问）
+
+- 命中即返回，文件 mtime 作为 LRU 时间戳（命中时 touch）
+- 同一 key 的并发合成只做一次（in-flight 去重）
+- 超出 VOICE_AUDIO_CACHE_MAX_BYTES 时做一次标记-清除：先扫消息表里的 voice_payload
+  得到仍被引用的 key（引用计数 > 0 的永不淘汰），再按 LRU 删除未被引用的文件；
+  清除后仍超配额（剩余都被引用）时退避，容量再增长 GC_RETRY_GROWTH_RATIO 才重扫
+- 清除时顺带删掉超过 STALE_TEMP_SECONDS 的 .part（进程崩溃或强退留下的半截下载）
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+AUDIO_EXTENSIONS = (".ogg", ".opus", ".mp3", ".wav", ".aac", ".m4a")
+AUDIO_MEDIA_TYPES = {
+    ".ogg": "audio/ogg",
+    ".opus": "audio/ogg",
+    ".mp3": "audio/mpeg",
+    ".wav": "audio/wav",
+    ".aac": "audio/aac",
+    ".m4a": "audio/mp4",
+}
+CAS_REL_DIR = "audio/cas"
+_KEY_RE = re.compile(r"/audio/cas/[0-9a-f]{2}/([0-9a-f]{64})\.[a-z0-9]+$")
+_FILENAME_RE = re.compile(r"^([0-9a-f]{64})(\.[a-z0-9]+)$")
+# 清除后仍超配额时，总量要比上次清除后再增长配额的这一比例才重新扫描
+GC_RETRY_GROWTH_RATIO = 0.05
+# 早于此时长的 .part 不可能还在写入，清除时删除
+STALE_TEMP_SECONDS = 3600
+
+
+def audio_key(
+    *,
+    model: str,
+    voice_id: str,
+    text: str,
+    instruction: Optional[str],
+    language: str,
+) -> str:
+    h = hashlib.sha256()
+    for part in (model, voice_id, language, instruction or "", text):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def key_from_url(audio_url: Optional[str]) -> Optional[str]:
+    if not audio_url:
+        return None
+    match = _KEY_RE.search(audio_url)
+    return match.group(1) if match else None
+
+
+class VoiceAudioStore:
+    def __init__(self, root: Optional[str] = None):
+        self._root = root
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._total_bytes: Optional[int] = None
+        self._gc_task: Optional[asyncio.Task] = None
+        # 上次清除后仍超配额时的总量，用于退避
+        self._gc_backoff_bytes: Optional[int] = None
+
+    @property
+    def root(self) -> str:
+        return self._root or os.path.join(settings.DATA_DIR, "uploads", *CAS_REL_DIR.split("/"))
+
+    def _paths(self, key: str, ext: str) -> Tuple[str, str]:
+        shard = key[:2]
+        abs_path = os.path.join(self.root, shard, f"{key}{ext}")
+        rel_url = f"{settings.API_STR}/voice/{CAS_REL_DIR}/{shard}/{key}{ext}"
+        return abs_path, rel_url
+
+    def resolve_file(self, shard: str, filename: str) -> Optional[Tuple[str, str]]:
+        """校验 URL 中的分片与文件名，存在时返回 (abs_path, key)。"""
+        match = _FILENAME_RE.match(filename or "")
+        if not match:
+            return None
+        key, ext = match.groups()
+        if shard != key[:2] or ext not in AUDIO_EXTENSIONS:
+            return None
+        abs_path, _ = self._paths(key, ext)
+        return (abs_path, key) if os.path.isfile(abs_path) else None
+
+    def lookup(self, key: str) -> Optional[Tuple[str, str]]:
+        """命中返回 (abs_path, rel_url) 并刷新 LRU 时间戳。"""
+        for ext in AUDIO_EXTENSIONS:
+            abs_path, rel_url = self._paths(key, ext)
+            if os.path.exists(abs_path):
+                try:
+                    os.utime(abs_path, None)
+                except OSError:
+                    pass
+                return abs_path, rel_url
+        return None
+
+    def temp_path(self, key: str, ext: str) -> str:
+        abs_path, _ = self._paths(key, ext)
+        os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+        return f"{abs_path}.{os.getpid()}.{id(asyncio.current_task())}.part"
+
+    @staticmethod
+    def discard_temp(temp_path: str) -> None:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+    def commit(self, key: str, ext: str, temp_path: str) -> Tuple[str, str]:
+        """把写好的临时文件原子地放到内容地址上。"""
+        abs_path, rel_url = self._paths(key, ext)
+        os.replace(temp_path, abs_path)
+        if self._total_bytes is not None:
+            self._total_bytes += os.path.getsize(abs_path)
+        self._maybe_schedule_gc()
+        return abs_path, rel_url
+
+    async def get_or_create(
+        self,
+        key: str,
+        create: Callable[[], Awaitable[Tuple[str, str]]],
+    ) -> Tuple[Tuple[str, str], bool]:
+        """
+        命中直接返回；否则调用 create()（负责合成并 commit）。同一 key 并发只执行一次。
+        返回 ((abs_path, rel_url), hit)。
+        """
+        hit = self.lookup(key)
+        if hit:
+            return hit, True
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight), True
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            result = await create()
+            fut.set_result(result)
+            return result, False
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as exc:
+            fut.set_exception(exc)
+            # 没有其他等待者时避免 "exception was never retrieved"
+            fut.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    # ---- 配额与回收 ----
+
+    def _iter_files(self) -> Iterable[Tuple[str, str, int, float]]:
+        if not os.path.isdir(self.root):
+            return
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if not entry.is_file() or entry.name.endswith(".part"):
+                    continue
+                key, _ = os.path.splitext(entry.name)
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                yield key, entry.path, st.st_size, st.st_mtime
+
+    def total_bytes(self) -> int:
+        if self._total_bytes is None:
+            self._total_bytes = sum(size for _, _, size, _ in self._iter_files())
+        return self._total_bytes
+
+    def _maybe_schedule_gc(self) -> None:
+        max_bytes = settings.VOICE_AUDIO_CACHE_MAX_BYTES
+        total = self.total_bytes()
+        if total <= max_bytes:
+            return
+        if self._gc_backoff_bytes is not None:
+            margin = max(1, int(max_bytes * GC_RETRY_GROWTH_RATIO))
+            if total < self._gc_backoff_bytes + margin:
+                return
+        if self._gc_task is not None and not self._gc_task.done():
+            return
+        try:
+            self._gc_task = asyncio.get_running_loop().create_task(self.enforce_quota())
+        except RuntimeError:
+            pass
+
+    async def enforce_quota(self, referenced: Optional[Set[str]] = None) -> Dict[str, Any]:
+        if referenced is None:
+            referenced = await asyncio.to_thread(collect_referenced_keys)
+        return await asyncio.to_thread(self._sweep, referenced, settings.VOICE_AUDIO_CACHE_MAX_BYTES)
+
+    def _remove_stale_temps(self, now: float) -> int:
+        removed = 0
+        if not os.path.isdir(self.root):
+            return removed
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if not entry.name.endswith(".part"):
+                    continue
+                try:
+                    if now - entry.stat().st_mtime < STALE_TEMP_SECONDS:
+                        continue
+                    os.remove(entry.path)
+                except OSError:
+                    continue
+                removed += 1
+        return removed
+
+    def _sweep(self, referenced: Set[str], max_bytes: int) -> Dict[str, Any]:
+        stale_temps = self._remove_stale_temps(time.time())
+        files = list(self._iter_files())
+        total = sum(size for _, _, size, _ in files)
+        removed = freed = 0
+        # 未被引用的按 mtime 从旧到新淘汰
+        for key, path, size, _ in sorted(files, key=lambda f: f[3]):
+            if total <= max_bytes:
+                break
+            if key in referenced:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            freed += size
+            removed += 1
+        self._total_bytes = total
+        self._gc_backoff_bytes = total if total > max_bytes else None
+        if total > max_bytes:
+            logger.info(
+                "[VoiceStore] Still over quota after sweep (%s > %s bytes); remaining files are referenced.",
+                total,
+                max_bytes,
+            )
+        logger.info(
+            "[VoiceStore] Sweep removed %s files, freed %s bytes, cleared %s stale temp files",
+            removed,
+            freed,
+            stale_temps,
+        )
+        return {"removed": removed, "freed_bytes": freed, "total_bytes": total, "stale_temps": stale_temps}
+
+
+def collect_referenced_keys() -> Set[str]:
+    """标记阶段：单聊/群聊消息 voice_payload 里仍引用的内容地址。"""
+    from app.db.session import SessionLocal
+    from app.models.chat import Message
+    from app.models.group import GroupMessage
+
+    keys: Set[str] = set()
+    db = SessionLocal()
+    try:
+        for model in (Message, GroupMessage):
+            rows = db.query(model.voice_payload).filter(model.voice_payload.isnot(None)).yield_per(500)
+            for (payload,) in rows:
+                for segment in (payload or {}).get("segments", []) or []:
+                    key = segment.get("audio_key") or key_from_url(segment.get("audio_url"))
+                    if key:
+                        keys.add(key)
+    finally:
+        db.close()
+    return keys
+
+
+voice_audio_store = VoiceAudioStore()
@@ -1,14 +1,13 @@
 import asyncio
+import hashlib
 import json
 import logging
 import math
-import os
 import re
-import uuid
-import wave
+from collections import OrderedDict
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Awaitable, Callable, Dict, List, Optional
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
 from urllib.parse import urlparse
 
 import httpx
@@ -16,6 +15,7 @@ from agents import Agent, ModelSettings, RunConfig, Runner
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
+from app.db.write_queue import expire_instances, writer_for
 from app.models.chat import Message
 from app.models.friend import Friend
 from app.models.group import GroupMessage
@@ -23,18 +23,21 @@ from app.prompt import get_prompt
 from app.services import provider_rules
 from app.services.llm_client import set_agents_default_client
 from app.services.llm_service import llm_service
-from app.services.settings_service import SettingsService
+from app.services.config_snapshot_service import ConfigSnapshot, config_snapshot_service
+from app.services.tts_http import download_to_file, tts_http_pool
+from app.services.voice_audio_store import audio_key, voice_audio_store
+from app.services.voice_transcode import OPUS_EXTENSION, audio_duration_seconds, transcode_to_opus
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_DASHSCOPE_BASE_URL = "https://dashscope.aliyuncs.com/api/v1"
 DEFAULT_TTS_MODEL = "qwen3-tts-instruct-flash"
 VOICE_ENDPOINT = "/services/aigc/multimodal-generation/generation"
-MAX_TTS_PARALLELISM = 2
 MAX_TTS_SEGMENT_CHARS = 300
 MAX_EMOTION_CONTEXT_MESSAGES = 12
 MAX_EMOTION_CONTEXT_CHARS = 1200
 MAX_EMOTION_REPLY_CHARS = 800
+TTS_LANGUAGE_TYPE = "Chinese"
 
 
 def parse_message_segments(content: str) -> List[str]:
@@ -226,7 +229,7 @@ def _build_tts_request_debug(
         "endpoint": endpoint,
         "model": model,
         "voice": voice_id,
-        "language_type": "Chinese",
+        "language_type": TTS_LANGUAGE_TYPE,
         "text_len": len(segment_text or ""),
         "text_preview": _clip_text(_compact_text(segment_text or ""), 120),
         "has_instructions": bool(emotion_instruction),
@@ -253,18 +256,6 @@ def _estimate_duration_seconds(text: str) -> int:
     return max(1, min(60, math.ceil(len(text) / 4.5)))
 
 
-def _try_read_wav_duration_seconds(file_path: str) -> Optional[int]:
-    try:
-        with wave.open(file_path, "rb") as wav:
-            frames = wav.getnframes()
-            framerate = wav.getframerate()
-            if framerate <= 0:
-                return None
-            return max(1, int(round(frames / float(framerate))))
-    except Exception:
-        return None
-
-
 def _infer_extension(audio_url: str, content_type: Optional[str]) -> str:
     suffix = Path(urlparse(audio_url).path).suffix.lower()
     if suffix in {".mp3", ".wav", ".aac", ".ogg", ".m4a"}:
@@ -282,35 +273,24 @@ def _infer_extension(audio_url: str, content_type: Optional[str]) -> str:
     return ".mp3"
 
 
-def _build_audio_output_path(message_id: int, segment_index: int, ext: str) -> tuple[str, str]:
-    day_bucket = datetime.now(timezone.utc).strftime("%Y%m%d")
-    rel_dir = os.path.join("audio", day_bucket)
-    abs_dir = os.path.join(settings.DATA_DIR, "uploads", rel_dir)
-    os.makedirs(abs_dir, exist_ok=True)
-
-    filename = f"msg{message_id}_seg{segment_index}_{uuid.uuid4().hex[:8]}{ext}"
-    abs_path = os.path.join(abs_dir, filename)
-    rel_url = f"/uploads/{rel_dir.replace(os.sep, '/')}/{filename}"
-    return abs_path, rel_url
-
-
-def resolve_voice_runtime_config(db: Session) -> Optional[Dict[str, Any]]:
-    api_key = str(SettingsService.get_setting(db, "voice", "api_key", "") or "").strip()
+def resolve_voice_runtime_config(
+    db: Session, snapshot: Optional[ConfigSnapshot] = None
+) -> Optional[Dict[str, Any]]:
+    voice_settings = (snapshot or config_snapshot_service.get(db)).voice_settings
+    api_key = str(voice_settings.get("api_key", "") or "").strip()
     if not api_key:
         return None
 
-    model = str(SettingsService.get_setting(db, "voice", "tts_model", DEFAULT_TTS_MODEL) or DEFAULT_TTS_MODEL).strip()
+    model = str(voice_settings.get("tts_model", DEFAULT_TTS_MODEL) or DEFAULT_TTS_MODEL).strip()
     if not model:
         model = DEFAULT_TTS_MODEL
 
-    base_url_raw = SettingsService.get_setting(db, "voice", "base_url", None)
+    base_url_raw = voice_settings.get("base_url", None)
     base_url = _normalize_base_url(str(base_url_raw) if isinstance(base_url_raw, str) else None)
 
-    default_voice_id = str(SettingsService.get_setting(db, "voice", "default_voice_id", "") or "").strip()
-    emotion_enhance_enabled = bool(
-        SettingsService.get_setting(db, "voice", "emotion_enhance_enabled", False)
-    )
-    emotion_llm_config_id = SettingsService.get_setting(db, "voice", "emotion_llm_config_id", "")
+    default_voice_id = str(voice_settings.get("default_voice_id", "") or "").strip()
+    emotion_enhance_enabled = bool(voice_settings.get("emotion_enhance_enabled", False))
+    emotion_llm_config_id = voice_settings.get("emotion_llm_config_id", "")
 
     return {
         "api_key": api_key,
@@ -338,7 +318,7 @@ def _resolve_emotion_llm_config(db: Session, configured_value: Any):
                 )
 
     if configured_id is not None:
-        config = llm_service.get_config_by_id(db, configured_id)
+        config = llm_service.get_runtime_config(db, configured_id)
         if config:
             return config
         logger.warning(
@@ -487,6 +467,59 @@ def _extract_result_text(result: Any) -> str:
     return "\n".join(parts)
 
 
+class EmotionInstructionCache:
+    """
+    情绪指令缓存。
+    - (好友, 近期上下文 + 本条回复的哈希) -> 指令：同一条回复在同样上下文下重复合成
+      （重新生成出相同文本、重复点播）时跳过 LLM 调用
+    - 好友 -> 最近一次指令：跨回复的推测默认值，推测模式下首段先用它合成，不必等 LLM
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._by_context: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._latest: "OrderedDict[str, str]" = OrderedDict()
+
+    @staticmethod
+    def context_hash(context_text: str, reply_text: str) -> str:
+        digest = hashlib.sha1(context_text.encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(reply_text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, speaker_key: str, context_hash: str) -> Optional[str]:
+        key = (speaker_key, context_hash)
+        instruction = self._by_context.get(key)
+        if instruction is not None:
+            self._by_context.move_to_end(key)
+        return instruction
+
+    def latest(self, speaker_key: Optional[str]) -> Optional[str]:
+        return self._latest.get(speaker_key) if speaker_key else None
+
+    def put(self, speaker_key: str, context_hash: str, instruction: str) -> None:
+        self._by_context[(speaker_key, context_hash)] = instruction
+        self._by_context.move_to_end((speaker_key, context_hash))
+        self._latest[speaker_key] = instruction
+        self._latest.move_to_end(speaker_key)
+        for lru in (self._by_context, self._latest):
+            while len(lru) > max(self.capacity, 1):
+                lru.popitem(last=False)
+
+    def clear(self) -> None:
+        self._by_context.clear()
+        self._latest.clear()
+
+
+emotion_instruction_cache = EmotionInstructionCache(settings.VOICE_EMOTION_CACHE_SIZE)
+
+
+def _emotion_enhance_applicable(runtime_config: Dict[str, Any]) -> bool:
+    return bool(runtime_config.get("emotion_enhance_enabled")) and _supports_tts_instructions(
+        runtime_config.get("model")
+    )
+
+
 async def _generate_tts_emotion_instruction(
     db: Session,
     *,
@@ -494,6 +527,7 @@ async def _generate_tts_emotion_instruction(
     message_id: int,
     message_scope: Optional[str],
     runtime_config: Dict[str, Any],
+    speaker_key: Optional[str] = None,
 ) -> Optional[str]:
     if not bool(runtime_config.get("emotion_enhance_enabled")):
         logger.info("[Voice] Emotion enhancement disabled for message=%s.", message_id)
@@ -506,6 +540,22 @@ async def _generate_tts_emotion_instruction(
             tts_model,
         )
         return None
+
+    reply_text = _clip_text(_compact_text(_strip_message_tags(content)), MAX_EMOTION_REPLY_CHARS)
+    if not reply_text:
+        return None
+
+    context_text = _build_tts_emotion_context_with_scope(db, message_id, message_scope) or "(暂无上下文)"
+    context_hash = EmotionInstructionCache.context_hash(context_text, reply_text)
+    if speaker_key:
+        cached = emotion_instruction_cache.get(speaker_key, context_hash)
+        if cached:
+            logger.info(
+                "[Voice] Emotion instruction cache hit for message=%s speaker=%s",
+                message_id,
+                speaker_key,
+            )
+            return cached
     logger.info(
         "[Voice] Emotion enhancement started for message=%s tts_model=%s emotion_llm_config_id=%s",
         message_id,
@@ -523,11 +573,6 @@ async def _generate_tts_emotion_instruction(
         logger.info("[Voice] Skip emotion enhancement: empty model_name.")
         return None
 
-    reply_text = _clip_text(_compact_text(_strip_message_tags(content)), MAX_EMOTION_REPLY_CHARS)
-    if not reply_text:
-        return None
-    context_text = _build_tts_emotion_context_with_scope(db, message_id, message_scope) or "(暂无上下文)"
-
     try:
         prompt_template = get_prompt("chat/tts-emotion-instructions.txt").strip()
     except Exception as exc:
@@ -603,6 +648,8 @@ async def _generate_tts_emotion_instruction(
             message_id,
             emotion_instruction,
         )
+        if speaker_key:
+            emotion_instruction_cache.put(speaker_key, context_hash, emotion_instruction)
         return emotion_instruction
     except Exception as exc:
         logger.warning(
@@ -625,6 +672,74 @@ async def _synthesize_single_segment(
     voice_id: str,
     emotion_instruction: Optional[str] = None,
 ) -> Dict[str, Any]:
+    key = audio_key(
+        model=model,
+        voice_id=voice_id,
+        text=segment_text,
+        instruction=emotion_instruction,
+        language=TTS_LANGUAGE_TYPE,
+    )
+
+    created_duration: List[Optional[float]] = []
+
+    async def _create() -> tuple[str, str]:
+        abs_path, rel_url, duration = await _request_and_store_audio(
+            client,
+            segment_text,
+            segment_index,
+            key=key,
+            message_id=message_id,
+            model=model,
+            base_url=base_url,
+            api_key=api_key,
+            voice_id=voice_id,
+            emotion_instruction=emotion_instruction,
+        )
+        created_duration.append(duration)
+        return abs_path, rel_url
+
+    (abs_path, rel_url), hit = await voice_audio_store.get_or_create(key, _create)
+    if hit:
+        logger.info(
+            "[Voice] Audio cache hit for message=%s segment=%s key=%s",
+            message_id,
+            segment_index,
+            key[:12],
+        )
+
+    segment_data: Dict[str, Any] = {
+        "segment_index": segment_index,
+        "text": segment_text,
+        "audio_url": rel_url,
+        "audio_key": key,
+    }
+    # 本次刚转码的直接用转码返回的时长；缓存命中才回头读文件（放到线程里）
+    if created_duration:
+        exact_duration = created_duration[0]
+    else:
+        exact_duration = await asyncio.to_thread(audio_duration_seconds, abs_path)
+    if exact_duration is not None:
+        segment_data["duration_sec"] = max(1, int(round(exact_duration)))
+        segment_data["duration_ms"] = int(round(exact_duration * 1000))
+    else:
+        segment_data["duration_sec"] = _estimate_duration_seconds(segment_text)
+    return segment_data
+
+
+async def _request_and_store_audio(
+    client: httpx.AsyncClient,
+    segment_text: str,
+    segment_index: int,
+    *,
+    key: str,
+    message_id: int,
+    model: str,
+    base_url: str,
+    api_key: str,
+    voice_id: str,
+    emotion_instruction: Optional[str] = None,
+) -> tuple[str, str, Optional[float]]:
+    """合成、下载并入库，返回 (abs_path, rel_url, 转码得到的时长；未转码时为 None)。"""
     endpoint = f"{base_url}{VOICE_ENDPOINT}"
     request_debug = _build_tts_request_debug(
         endpoint=endpoint,
@@ -637,7 +752,7 @@ async def _synthesize_single_segment(
     input_payload: Dict[str, Any] = {
         "text": segment_text,
         "voice": voice_id,
-        "language_type": "Chinese",
+        "language_type": TTS_LANGUAGE_TYPE,
     }
     if emotion_instruction:
         input_payload["instructions"] = emotion_instruction
@@ -685,10 +800,12 @@ async def _synthesize_single_segment(
         payload_preview = _clip_text(_compact_text(json.dumps(payload, ensure_ascii=False)), 2000)
         raise ValueError(f"TTS 响应中未找到 audio url: payload={payload_preview}")
 
+    # 扩展名要等响应头才能确定，临时文件先不带扩展名，commit 时再放到最终地址
+    temp_path = voice_audio_store.temp_path(key, "")
     try:
-        audio_resp = await client.get(remote_audio_url)
-        audio_resp.raise_for_status()
+        content_type = await download_to_file(client, remote_audio_url, temp_path)
     except httpx.HTTPStatusError as exc:
+        voice_audio_store.discard_temp(temp_path)
         err_summary = _http_response_error_summary(exc)
         logger.warning(
             "[Voice] Audio download failed for message=%s segment=%s status=%s request_id=%s remote_url=%s response=%s",
@@ -701,6 +818,7 @@ async def _synthesize_single_segment(
         )
         raise
     except httpx.RequestError as exc:
+        voice_audio_store.discard_temp(temp_path)
         logger.warning(
             "[Voice] Audio download network error for message=%s segment=%s type=%s remote_url=%s error=%s",
             message_id,
@@ -710,24 +828,266 @@ async def _synthesize_single_segment(
             exc,
         )
         raise
+    except BaseException:
+        voice_audio_store.discard_temp(temp_path)
+        raise
 
-    ext = _infer_extension(remote_audio_url, audio_resp.headers.get("content-type"))
-    abs_path, rel_url = _build_audio_output_path(message_id, segment_index, ext)
-    with open(abs_path, "wb") as f:
-        f.write(audio_resp.content)
+    ext = _infer_extension(remote_audio_url, content_type)
+    opus_temp_path = voice_audio_store.temp_path(key, OPUS_EXTENSION)
+    duration: Optional[float] = None
+    try:
+        transcoded = await transcode_to_opus(temp_path, opus_temp_path)
+        if transcoded:
+            voice_audio_store.discard_temp(temp_path)
+            temp_path, ext = opus_temp_path, OPUS_EXTENSION
+            duration = transcoded[1]
+        abs_path, rel_url = voice_audio_store.commit(key, ext, temp_path)
+        return abs_path, rel_url, duration
+    except BaseException:
+        voice_audio_store.discard_temp(temp_path)
+        voice_audio_store.discard_temp(opus_temp_path)
+        raise
 
-    duration = None
-    if ext == ".wav":
-        duration = _try_read_wav_duration_seconds(abs_path)
-    if duration is None:
-        duration = _estimate_duration_seconds(segment_text)
 
-    return {
-        "segment_index": segment_index,
-        "text": segment_text,
-        "audio_url": rel_url,
-        "duration_sec": duration,
-    }
+async def persist_voice_payload(
+    db: Session,
+    message_id: int,
+    voice_payload: Dict[str, Any],
+    message_scope: str = "single",
+) -> bool:
+    """通过单写者队列写入 voice_payload，并等待提交完成。"""
+    model = GroupMessage if message_scope == "group" else Message
+
+    def _write(session: Session) -> bool:
+        msg = session.get(model, message_id)
+        if not msg:
+            return False
+        msg.voice_payload = voice_payload
+        return True
+
+    saved = await writer_for(db).write(_write, label=f"{message_scope}_voice_payload")
+    expire_instances(db, model, message_id)
+    return saved
+
+
+SegmentCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class VoicePipeline:
+    """
+    分段语音合成流水线。
+
+    分段可以一次性加入（generate_voice_payload_for_message 用 parse_message_segments 切好），
+    也可以在 LLM 流式输出时逐段加入（单聊流水线模式，分段来自 StreamParser.drain_segments）：
+    每加入一个分段就按句号切片并立即派发 TTS，
+    共享 tts_http_pool 的连接，并发受所属服务商的全局限额约束。on_segment_ready 严格按 segment_index 顺序回调
+    （前面的分段失败则跳过它），finish() 返回与以往一致的 voice_payload。
+
+    推测模式（VOICE_SPECULATIVE_EMOTION）下首段不等情绪指令：先用该好友上次的指令
+    （没有则不带指令）合成，情绪指令并行生成，之后的分段再使用它。
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        *,
+        runtime_config: Dict[str, Any],
+        voice_id: str,
+        message_id: int,
+        message_scope: Optional[str],
+        on_segment_ready: Optional[SegmentCallback] = None,
+        emotion_content: Optional[str] = None,
+        friend_id: Optional[int] = None,
+    ):
+        self.db = db
+        self.runtime_config = runtime_config
+        self.voice_id = voice_id
+        self.message_id = message_id
+        self.message_scope = message_scope
+        self.on_segment_ready = on_segment_ready
+        self._emotion_content = emotion_content
+        self.speaker_key = f"friend:{friend_id}" if friend_id is not None else f"voice:{voice_id}"
+        self._speculative = settings.VOICE_SPECULATIVE_EMOTION and _emotion_enhance_applicable(runtime_config)
+        self._emotion_future: Optional[asyncio.Future] = None
+        self._tasks: List[asyncio.Task] = []
+        self._results: Dict[int, Optional[Dict[str, Any]]] = {}
+        self._next_index = 0
+        self._next_emit = 0
+        self._emit_lock = asyncio.Lock()
+        self._raw_segment_count = 0
+        self._closed = False
+
+    @classmethod
+    def create(
+        cls,
+        db: Session,
+        *,
+        enable_voice: bool,
+        friend_voice_id: Optional[str],
+        message_id: int,
+        message_scope: Optional[str] = None,
+        on_segment_ready: Optional[SegmentCallback] = None,
+        emotion_content: Optional[str] = None,
+        friend_id: Optional[int] = None,
+    ) -> Optional["VoicePipeline"]:
+        if not enable_voice:
+            return None
+        runtime_config = resolve_voice_runtime_config(db)
+        if not runtime_config:
+            logger.info("[Voice] Skip voice generation: global voice config incomplete.")
+            return None
+        voice_id = (friend_voice_id or runtime_config["default_voice_id"] or "").strip()
+        if not voice_id:
+            logger.info("[Voice] Skip voice generation: no voice_id resolved for message=%s", message_id)
+            return None
+        return cls(
+            db,
+            runtime_config=runtime_config,
+            voice_id=voice_id,
+            message_id=message_id,
+            message_scope=message_scope,
+            on_segment_ready=on_segment_ready,
+            emotion_content=emotion_content,
+            friend_id=friend_id,
+        )
+
+    @property
+    def dispatched(self) -> int:
+        return self._next_index
+
+    def add_segments(self, segments: Iterable[str]) -> None:
+        """加入已完成的 <message> 分段，按顺序派发合成。"""
+        for segment in segments:
+            self._dispatch_segment(segment)
+
+    async def finish(self) -> Optional[Dict[str, Any]]:
+        """等待已派发的分段合成完毕，返回 voice_payload。"""
+        try:
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+        finally:
+            await self.aclose()
+        collected = [self._results[i] for i in sorted(self._results) if self._results[i]]
+        if not collected:
+            return None
+        return {
+            "voice_id": self.voice_id,
+            "segments": collected,
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+    async def aclose(self) -> None:
+        """取消未完成的合成；可重复调用。"""
+        if self._closed:
+            return
+        self._closed = True
+        pending = [t for t in self._tasks if not t.done()]
+        if self._emotion_future is not None and not self._emotion_future.done():
+            pending.append(self._emotion_future)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    # ---- 内部 ----
+
+    def _dispatch_segment(self, raw_segment: str) -> None:
+        if self._closed:
+            return
+        self._raw_segment_count += 1
+        parts = _split_segment_by_period(raw_segment, max_chars=MAX_TTS_SEGMENT_CHARS)
+        if len(parts) > 1:
+            logger.info(
+                "[Voice] Segment split applied for message=%s raw_segment=%s parts=%s max_chars=%s",
+                self.message_id,
+                self._raw_segment_count - 1,
+                len(parts),
+                MAX_TTS_SEGMENT_CHARS,
+            )
+        if self._emotion_future is None:
+            self._emotion_future = asyncio.ensure_future(self._resolve_emotion_instruction(raw_segment))
+        for part in parts:
+            index = self._next_index
+            self._next_index += 1
+            self._tasks.append(
+                asyncio.create_task(self._worker(part, index), name=f"voice-seg-{index}")
+            )
+
+    async def _resolve_emotion_instruction(self, first_segment: str) -> Optional[str]:
+        content = self._emotion_content or first_segment
+        emotion_instruction = await _generate_tts_emotion_instruction(
+            self.db,
+            content=content,
+            message_id=self.message_id,
+            message_scope=self.message_scope,
+            runtime_config=self.runtime_config,
+            speaker_key=self.speaker_key,
+        )
+        if bool(self.runtime_config.get("emotion_enhance_enabled")):
+            if emotion_instruction:
+                logger.info(
+                    "[Voice] Emotion instruction applied for message=%s (length=%s).",
+                    self.message_id,
+                    len(emotion_instruction),
+                )
+            else:
+                logger.info("[Voice] Emotion instruction not generated for message=%s.", self.message_id)
+        return emotion_instruction
+
+    async def _instruction_for(self, seg_index: int) -> Optional[str]:
+        future = self._emotion_future
+        if seg_index == 0 and self._speculative and not future.done():
+            speculative = emotion_instruction_cache.latest(self.speaker_key)
+            logger.info(
+                "[Voice] Speculative first segment for message=%s (cached_default=%s)",
+                self.message_id,
+                bool(speculative),
+            )
+            return speculative
+        return await asyncio.shield(future)
+
+    async def _worker(self, seg_text: str, seg_index: int) -> None:
+        segment_data: Optional[Dict[str, Any]] = None
+        try:
+            emotion_instruction = await self._instruction_for(seg_index)
+            async with tts_http_pool.limiter(self.runtime_config["base_url"]):
+                segment_data = await _synthesize_single_segment(
+                    tts_http_pool.client(),
+                    seg_text,
+                    seg_index,
+                    message_id=self.message_id,
+                    model=self.runtime_config["model"],
+                    base_url=self.runtime_config["base_url"],
+                    api_key=self.runtime_config["api_key"],
+                    voice_id=self.voice_id,
+                    emotion_instruction=emotion_instruction,
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning(
+                "[Voice] Segment synthesis failed for message=%s task=voice-seg-%s type=%s error=%s",
+                self.message_id,
+                seg_index,
+                type(exc).__name__,
+                exc,
+                exc_info=True,
+            )
+        self._results[seg_index] = segment_data
+        await self._emit_ready()
+
+    async def _emit_ready(self) -> None:
+        # 按 segment_index 顺序回调，保证前端逐段播放的顺序
+        async with self._emit_lock:
+            while self._next_emit in self._results:
+                segment_data = self._results[self._next_emit]
+                self._next_emit += 1
+                if segment_data is None or not self.on_segment_ready:
+                    continue
+                try:
+                    await self.on_segment_ready(segment_data)
+                except Exception as callback_exc:
+                    logger.warning("[Voice] on_segment_ready callback failed: %s", callback_exc)
 
 
 async def generate_voice_payload_for_message(
@@ -738,118 +1098,32 @@ async def generate_voice_payload_for_message(
     friend_voice_id: Optional[str],
     message_id: int,
     message_scope: Optional[str] = None,
-    on_segment_ready: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+    on_segment_ready: Optional[SegmentCallback] = None,
+    friend_id: Optional[int] = None,
 ) -> Optional[Dict[str, Any]]:
     """
     为消息生成语音 payload。
     返回格式:
     {
       "voice_id": "...",
-      "segments": [{segment_index, text, audio_url, duration_sec}, ...],
+      "segments": [{segment_index, text, audio_url, audio_key, duration_sec, duration_ms?}, ...],
       "generated_at": "..."
     }
     """
-    if not enable_voice:
-        return None
-
-    runtime_config = resolve_voice_runtime_config(db)
-    if not runtime_config:
-        logger.info("[Voice] Skip voice generation: global voice config incomplete.")
-        return None
-
-    voice_id = (friend_voice_id or runtime_config["default_voice_id"] or "").strip()
-    if not voice_id:
-        logger.info("[Voice] Skip voice generation: no voice_id resolved for message=%s", message_id)
-        return None
-
-    raw_segments = parse_message_segments(content)
-    segments = []
-    for seg in raw_segments:
-        segments.extend(_split_segment_by_period(seg, max_chars=MAX_TTS_SEGMENT_CHARS))
-    if not segments:
-        return None
-    if len(segments) != len(raw_segments):
-        logger.info(
-            "[Voice] Segment split applied for message=%s raw_segments=%s normalized_segments=%s max_chars=%s",
-            message_id,
-            len(raw_segments),
-            len(segments),
-            MAX_TTS_SEGMENT_CHARS,
-        )
-
-    model = runtime_config["model"]
-    base_url = runtime_config["base_url"]
-    api_key = runtime_config["api_key"]
-    emotion_instruction = await _generate_tts_emotion_instruction(
+    pipeline = VoicePipeline.create(
         db,
-        content=content,
+        enable_voice=enable_voice,
+        friend_voice_id=friend_voice_id,
         message_id=message_id,
         message_scope=message_scope,
-        runtime_config=runtime_config,
+        on_segment_ready=on_segment_ready,
+        emotion_content=content,
+        friend_id=friend_id,
     )
-    if bool(runtime_config.get("emotion_enhance_enabled")):
-        if emotion_instruction:
-            logger.info(
-                "[Voice] Emotion instruction applied for message=%s (length=%s).",
-                message_id,
-                len(emotion_instruction),
-            )
-        else:
-            logger.info("[Voice] Emotion instruction not generated for message=%s.", message_id)
-
-    semaphore = asyncio.Semaphore(MAX_TTS_PARALLELISM)
-    collected: Dict[int, Dict[str, Any]] = {}
-
-    async def _worker(seg_text: str, seg_index: int, client: httpx.AsyncClient):
-        async with semaphore:
-            return await _synthesize_single_segment(
-                client,
-                seg_text,
-                seg_index,
-                message_id=message_id,
-                model=model,
-                base_url=base_url,
-                api_key=api_key,
-                voice_id=voice_id,
-                emotion_instruction=emotion_instruction,
-            )
-
-    timeout = httpx.Timeout(60.0, connect=10.0, read=60.0, write=60.0)
-    async with httpx.AsyncClient(timeout=timeout, follow_redirects=True) as client:
-        tasks = [
-            asyncio.create_task(_worker(segment, idx, client), name=f"voice-seg-{idx}")
-            for idx, segment in enumerate(segments)
-        ]
-
-        for future in asyncio.as_completed(tasks):
-            try:
-                segment_data = await future
-            except Exception as exc:
-                task_name = future.get_name() if hasattr(future, "get_name") else "voice-seg-unknown"
-                logger.warning(
-                    "[Voice] Segment synthesis failed for message=%s task=%s type=%s error=%s",
-                    message_id,
-                    task_name,
-                    type(exc).__name__,
-                    exc,
-                    exc_info=True,
-                )
-                continue
-
-            seg_index = int(segment_data["segment_index"])
-            collected[seg_index] = segment_data
-            if on_segment_ready:
-                try:
-                    await on_segment_ready(segment_data)
-                except Exception as callback_exc:
-                    logger.warning("[Voice] on_segment_ready callback failed: %s", callback_exc)
-
-    if not collected:
+    if pipeline is None:
         return None
-
-    ordered_segments = [collected[i] for i in sorted(collected.keys())]
-    return {
-        "voice_id": voice_id,
-        "segments": ordered_segments,
-        "generated_at": datetime.now(timezone.utc).isoformat(),
-    }
+    try:
+        pipeline.add_segments(parse_message_segments(content))
+        return await pipeline.finish()
+    finally:
+        await pipeline.aclose()
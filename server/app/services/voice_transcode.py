@@ -0,0 +1,153 @@
+"""
+语音音频后处理：转码为 Opus/OGG 并计算精确时长。
+
+TTS 下载下来的多是 WAV，体积大、Electron 端起播慢。入库前用本机 ffmpeg
+（VOICE_FFMPEG_PATH 或 PATH 中查找）以异步子进程转成 Opus/OGG；找不到编码器或转码失败时
+保留原文件。时长从编码后的流里读取（OGG 取末页 granule position 减去 pre-skip，
+WAV 取帧数），不再按字数估算；读文件放在线程里，不阻塞事件循环。
+
+不用 ProcessPoolExecutor：PyInstaller 打包后的入口没有 freeze_support，
+spawn 出的工作进程会重新执行整个后端。
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import struct
+import wave
+from typing import Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+OPUS_EXTENSION = ".ogg"
+OPUS_SAMPLE_RATE = 48000
+_OGG_CAPTURE = b"OggS"
+_OGG_TAIL_BYTES = 64 * 1024
+_TRANSCODE_TIMEOUT_SECONDS = 60.0
+
+
+def find_encoder() -> Optional[str]:
+    configured = (settings.VOICE_FFMPEG_PATH or "").strip()
+    if configured:
+        return configured if os.path.isfile(configured) else shutil.which(configured)
+    return shutil.which("ffmpeg")
+
+
+def ogg_opus_duration_seconds(file_path: str) -> Optional[float]:
+    """读取 OpusHead 的 pre-skip 与最后一页的 granule position，得到精确时长。"""
+    try:
+        with open(file_path, "rb") as f:
+            head = f.read(512)
+            size = f.seek(0, os.SEEK_END)
+            f.seek(max(0, size - _OGG_TAIL_BYTES))
+            tail = f.read()
+    except OSError:
+        return None
+    marker = head.find(b"OpusHead")
+    if not head.startswith(_OGG_CAPTURE) or marker == -1 or len(head) < marker + 12:
+        return None
+    pre_skip = struct.unpack_from("<H", head, marker + 10)[0]
+    last_page = tail.rfind(_OGG_CAPTURE)
+    if last_page == -1 or len(tail) < last_page + 14:
+        return None
+    granule = struct.unpack_from("<q", tail, last_page + 6)[0]
+    if granule <= pre_skip:
+        return None
+    return (granule - pre_skip) / OPUS_SAMPLE_RATE
+
+
+def wav_duration_seconds(file_path: str) -> Optional[float]:
+    try:
+        with wave.open(file_path, "rb") as wav:
+            framerate = wav.getframerate()
+            if framerate <= 0:
+                return None
+            return wav.getnframes() / float(framerate)
+    except Exception:
+        return None
+
+
+def audio_duration_seconds(file_path: str) -> Optional[float]:
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext in (".ogg", ".opus"):
+        return ogg_opus_duration_seconds(file_path)
+    if ext == ".wav":
+        return wav_duration_seconds(file_path)
+    return None
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+async def _run_encoder(encoder: str, src_path: str, dst_path: str, bitrate: str) -> None:
+    cmd = [
+        encoder,
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-nostdin",
+        "-y",
+        "-i",
+        src_path,
+        "-vn",
+        "-c:a",
+        "libopus",
+        "-b:a",
+        bitrate,
+        "-application",
+        "voip",
+        "-f",
+        "ogg",
+        dst_path,
+    ]
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        _, stderr = await asyncio.wait_for(proc.communicate(), timeout=_TRANSCODE_TIMEOUT_SECONDS)
+    except BaseException:
+        # 超时或调用方取消：不留下孤儿 ffmpeg 进程
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        raise
+    if proc.returncode != 0:
+        detail = (stderr or b"").decode("utf-8", errors="replace").strip()
+        raise RuntimeError(f"ffmpeg exited with {proc.returncode}: {detail[-500:]}")
+
+
+async def transcode_to_opus(src_path: str, dst_path: str) -> Optional[Tuple[str, float]]:
+    """
+    把 src_path 转成 Opus/OGG 写到 dst_path，返回 (dst_path, 时长秒)。
+    未开启、没有编码器、源文件已是 Opus 或转码失败时返回 None，调用方沿用原文件。
+    """
+    if not settings.VOICE_TRANSCODE_OPUS:
+        return None
+    if await asyncio.to_thread(ogg_opus_duration_seconds, src_path) is not None:
+        return None
+    encoder = find_encoder()
+    if not encoder:
+        return None
+    try:
+        await _run_encoder(encoder, src_path, dst_path, settings.VOICE_OPUS_BITRATE)
+        duration = await asyncio.to_thread(ogg_opus_duration_seconds, dst_path)
+        if duration is None:
+            raise ValueError("encoded stream has no valid Opus duration")
+    except asyncio.CancelledError:
+        _remove_quietly(dst_path)
+        raise
+    except Exception as exc:
+        _remove_quietly(dst_path)
+        logger.warning("[VoiceTranscode] Opus transcode failed for %s: %s", src_path, exc)
+        return None
+    return dst_path, duration
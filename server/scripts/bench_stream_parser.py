@@ -0,0 +1,114 @@
+"""
+Micro-benchmark for app.services.stream_parser.
+
+Compares the shared incremental StreamParser with the previous hand-rolled
+buffer/find/concat loop on long synthetic streams (small deltas, <think>
+prefix, many <message> segments).
+
+Usage (from server/):
+    python scripts/bench_stream_parser.py [--chars 200000] [--delta 4]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.stream_parser import StreamParser  # noqa: E402
+
+THINK_START = "<think>"
+THINK_END = "</think>"
+
+
+def build_stream(total_chars: int, delta_size: int, seed: int = 7) -> list[str]:
+    rng = random.Random(seed)
+    words = ["你好", "今天", "天气", "hello", "world", "我们", "一起", "吃饭", "a<b", "ok"]
+    parts = [THINK_START, "让我想想" * 50, THINK_END]
+    size = 0
+    while size < total_chars:
+        seg = "".join(rng.choice(words) for _ in range(rng.randint(10, 60)))
+        parts.append(f"<message>{seg}</message>\n")
+        size += len(seg) + 21
+    text = "".join(parts)
+    return [text[i:i + delta_size] for i in range(0, len(text), delta_size)]
+
+
+def legacy_parse(deltas: list[str]) -> str:
+    """旧实现（仅用于计时）：整段缓冲区 find + 切片 + 字符串拼接。"""
+    full_ai_content = ""
+    saved_content = ""
+    buffer = ""
+    is_thinking_tag = False
+    for delta in deltas:
+        full_ai_content += delta
+        buffer += delta
+        while buffer:
+            if not is_thinking_tag:
+                start_idx = buffer.find(THINK_START)
+                if start_idx != -1:
+                    saved_content += buffer[:start_idx]
+                    buffer = buffer[start_idx + len(THINK_START):]
+                    is_thinking_tag = True
+                elif "<" not in buffer:
+                    saved_content += buffer
+                    buffer = ""
+                else:
+                    break
+            else:
+                end_idx = buffer.find(THINK_END)
+                if end_idx != -1:
+                    buffer = buffer[end_idx + len(THINK_END):]
+                    is_thinking_tag = False
+                elif "</" not in buffer:
+                    buffer = ""
+                else:
+                    break
+    if buffer and not is_thinking_tag:
+        saved_content += buffer
+    return saved_content
+
+
+def parser_parse(deltas: list[str]) -> str:
+    parser = StreamParser(enable_thinking=True)
+    for delta in deltas:
+        parser.feed(delta)
+        parser.drain_segments()
+    parser.finish()
+    return parser.message_text
+
+
+def _time(fn, deltas, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(deltas)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chars", type=int, default=200_000)
+    ap.add_argument("--delta", type=int, default=4)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    for chars in (args.chars // 4, args.chars // 2, args.chars):
+        deltas = build_stream(chars, args.delta)
+        text = "".join(deltas)
+        expected = text[text.index(THINK_END) + len(THINK_END):]
+        # 旧实现遇到拆在 delta 边界上的 "<" + "/think>" 会丢字符，这里只校验新实现
+        assert parser_parse(deltas) == expected
+        legacy = _time(legacy_parse, deltas, args.repeat)
+        current = _time(parser_parse, deltas, args.repeat)
+        print(
+            f"chars={chars:>8} deltas={len(deltas):>7} "
+            f"legacy={legacy * 1000:8.1f}ms parser={current * 1000:8.1f}ms "
+            f"speedup={legacy / current:6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.models.friend import Friend
+from app.models.group import Group, GroupMessage
+from app.services import group_chat_shared
+from app.services.group_auto_drive_context import AutoDriveContext, ContextMessage
+from app.services.group_chat_service import group_chat_service
+from app.services.memo.constants import DEFAULT_USER_ID
+
+
+@pytest.fixture
+def debate(db: Session):
+    group = Group(name="auto-drive-context", owner_id=DEFAULT_USER_ID)
+    db.add(group)
+    db.commit()
+    db.refresh(group)
+    session = group_chat_service.create_group_session(db, group.id)
+    friends = [Friend(name="正方"), Friend(name="反方"), Friend(name="评委")]
+    db.add_all(friends)
+    db.commit()
+    return group, session, friends
+
+
+def _add(db: Session, group, session, sender_id, sender_type: str, content: str) -> GroupMessage:
+    msg = GroupMessage(
+        group_id=group.id,
+        session_id=session.id,
+        sender_id=str(sender_id),
+        sender_type=sender_type,
+        content=content,
+        message_type="text",
+    )
+    db.add(msg)
+    db.commit()
+    db.refresh(msg)
+    return msg
+
+
+def _expected(db: Session, group, session, self_id: int, host: GroupMessage) -> list:
+    history = group_chat_shared.fetch_group_history(db, group.id, session.id, before_id=host.id)
+    name_map = group_chat_shared.build_name_map(db, history)
+    return group_chat_shared.build_group_context(
+        history_msgs=history,
+        name_map=name_map,
+        self_id=self_id,
+        current_user_msg=host.content,
+        user_msg_id=host.id,
+        current_other_members="(empty)",
+        mention_result="被提及，需要发言",
+    )
+
+
+def test_incremental_context_matches_full_rebuild(db: Session, debate):
+    group, session, friends = debate
+    context = AutoDriveContext(group.id, session.id, max_tokens=0)
+    context.remember_names({str(f.id): f for f in friends[:2]})
+
+    for turn in range(6):
+        speaker = friends[turn % len(friends)]
+        host = _add(db, group, session, DEFAULT_USER_ID, "user", f"主持人：请 {speaker.name} 发言（第 {turn} 轮）")
+        context.sync(db, before_id=host.id)
+        actual = context.build_agent_messages(
+            self_id=speaker.id,
+            current_user_msg=host.content,
+            user_msg_id=host.id,
+            current_other_members="(empty)",
+            mention_result="被提及，需要发言",
+        )
+        assert actual == _expected(db, group, session, speaker.id, host)
+
+        reply = _add(db, group, session, speaker.id, "friend", f"{speaker.name} 的观点 {turn}")
+        context.append(ContextMessage.from_row(host))
+        context.append(reply)
+
+
+def test_sync_picks_up_unseen_messages_and_caches_names(db: Session, debate):
+    group, session, friends = debate
+    context = AutoDriveContext(group.id, session.id, max_tokens=0)
+    _add(db, group, session, DEFAULT_USER_ID, "user", "大家好")
+    _add(db, group, session, friends[2].id, "friend", "我来旁听")
+    host = _add(db, group, session, DEFAULT_USER_ID, "user", "开始吧")
+
+    context.sync(db, before_id=host.id)
+    assert context.last_id == host.id - 1
+    assert context.name_map[str(friends[2].id)] == "评委"
+
+    with patch.object(group_chat_shared, "render_group_round", wraps=group_chat_shared.render_group_round) as render:
+        for _ in range(3):
+            context.sync(db, before_id=host.id)
+            context.build_agent_messages(
+                self_id=friends[0].id,
+                current_user_msg=host.content,
+                user_msg_id=host.id,
+                current_other_members="(empty)",
+                mention_result="被提及，需要发言",
+            )
+    # 只有一轮且是最后一轮（不缓存），每次发言只渲染这一轮
+    assert render.call_count == 3
+
+
+def test_closed_rounds_are_rendered_once_per_speaker():
+    context = AutoDriveContext(1, 1, max_tokens=0)
+    next_id = iter(range(1, 1000))
+    with patch.object(group_chat_shared, "render_group_round", wraps=group_chat_shared.render_group_round) as render:
+        for turn in range(10):
+            context.append(ContextMessage(next(next_id), DEFAULT_USER_ID, "user", f"第 {turn} 轮"))
+            context.append(ContextMessage(next(next_id), "7", "friend", f"回复 {turn}"))
+            before = render.call_count
+            context.build_agent_messages(
+                self_id=7,
+                current_user_msg="下一轮",
+                user_msg_id=10_000 + turn,
+                current_other_members="(empty)",
+                mention_result="被提及，需要发言",
+            )
+            # 新闭合的上一轮 + 未闭合的最后一轮
+            assert render.call_count - before <= 2
+
+
+def test_token_budget_trims_oldest_rounds():
+    context = AutoDriveContext(1, 1, max_tokens=60)
+    next_id = iter(range(1, 1000))
+    for turn in range(20):
+        context.append(ContextMessage(next(next_id), DEFAULT_USER_ID, "user", f"round {turn} topic text"))
+        context.append(ContextMessage(next(next_id), "7", "friend", f"reply {turn} with some words"))
+
+    context._trim()
+    messages = context.build_agent_messages(
+        self_id=7,
+        current_user_msg="next",
+        user_msg_id=999,
+        current_other_members="(empty)",
+        mention_result="被提及，需要发言",
+    )
+    user_turns = [m["content"] for m in messages if m.get("role") == "user"]
+    assert "round 0 topic text" not in user_turns
+    assert user_turns[-2] == "round 19 topic text"
+    assert context._tokens <= 60
@@ -0,0 +1,248 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.group import Group, GroupAutoDriveRun
+from app.schemas import group_auto_drive as ad_schemas
+from app.services.group_auto_drive_context import ContextMessage
+from app.services.group_auto_drive_service import AutoDriveRuntime, GroupAutoDriveService, _PreparedTurn
+from app.services.group_chat_service import group_chat_service
+from app.services.memo.constants import DEFAULT_USER_ID
+
+FRIENDS = {
+    "1": SimpleNamespace(id=1, name="正方"),
+    "2": SimpleNamespace(id=2, name="反方"),
+    "3": SimpleNamespace(id=3, name="评委"),
+}
+
+
+@pytest.fixture
+def run_setup(db: Session):
+    group = Group(name="auto-drive-lookahead", owner_id=DEFAULT_USER_ID)
+    db.add(group)
+    db.commit()
+    db.refresh(group)
+    session = group_chat_service.create_group_session(db, group.id)
+    run = GroupAutoDriveRun(
+        group_id=group.id,
+        session_id=session.id,
+        mode="debate",
+        topic_json={},
+        roles_json={"affirmative": ["1"], "negative": ["2"], "order": ["1", "2"]},
+        turn_limit=2,
+        end_action="judge",
+        judge_id="3",
+        status="running",
+        current_round=0,
+        current_turn=0,
+    )
+    db.add(run)
+    db.commit()
+    db.refresh(run)
+    runtime = AutoDriveRuntime(
+        run_id=run.id,
+        group_id=group.id,
+        session_id=session.id,
+        enable_thinking=False,
+        queue=asyncio.Queue(),
+        pause_event=asyncio.Event(),
+        stop_event=asyncio.Event(),
+    )
+    runtime.pause_event.set()
+    return run, runtime
+
+
+def _debate_config(**overrides) -> ad_schemas.AutoDriveConfig:
+    values = dict(
+        mode="debate",
+        topic={"motion": "m"},
+        roles={"affirmative": ["1"], "negative": ["2"]},
+        turn_limit=2,
+        end_action="judge",
+        judge_id="3",
+    )
+    values.update(overrides)
+    # 测试只关心发言计划，跳过话题/角色校验
+    return ad_schemas.AutoDriveConfig.model_construct(**values)
+
+
+@pytest.mark.asyncio
+async def test_debate_plan_matches_sequential_schedule(db: Session, run_setup, monkeypatch):
+    run, runtime = run_setup
+    service = GroupAutoDriveService()
+    captured = {}
+
+    async def _fake_run_turns(db, runtime, run, mode, topic, turns, friend_map):
+        captured["turns"] = turns
+        return False
+
+    monkeypatch.setattr(service, "_run_turns", _fake_run_turns)
+    await service._run_debate_mode(
+        db, runtime, run, _debate_config(), {}, {"1": "affirmative", "2": "negative"}, ["1", "2"], FRIENDS
+    )
+
+    plan = [(t.member_id, t.phase, t.host_phase, t.round_no, t.closes_round) for t in captured["turns"]]
+    assert plan == [
+        ("1", "opening", "opening", 0, False),
+        ("2", "opening", "statement", 0, False),
+        ("1", "free", "free", 1, False),
+        ("2", "free", "free", 1, True),
+        ("1", "free", "free", 2, False),
+        ("2", "free", "free", 2, True),
+        ("2", "summary", "summary", 2, False),
+        ("1", "summary", "summary", 2, False),
+        ("3", "judge", "judge", 2, False),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_next_turn_is_prepared_while_current_streams(db: Session, run_setup, monkeypatch):
+    run, runtime = run_setup
+    monkeypatch.setattr(settings, "AUTO_DRIVE_LOOKAHEAD", True)
+    service = GroupAutoDriveService()
+    events = []
+
+    async def _fake_prepare(db, runtime, mode, topic, spec, friend):
+        events.append(("prepare", id(spec)))
+        return _PreparedTurn(spec=spec, friend=friend, host_message=f"@{friend.name}", llm_config=None)
+
+    async def _fake_dispatch(db, runtime, run, prepared, other_text):
+        events.append(("start", id(prepared.spec)))
+        await asyncio.sleep(0.01)
+        events.append(("done", id(prepared.spec)))
+        return ContextMessage(id=len(events), sender_id=prepared.spec.member_id, sender_type="friend", content="ok")
+
+    monkeypatch.setattr(service, "_prepare_turn", _fake_prepare)
+    monkeypatch.setattr(service, "_dispatch_speaker", _fake_dispatch)
+    await service._run_debate_mode(
+        db, runtime, run, _debate_config(), {}, {"1": "affirmative", "2": "negative"}, ["1", "2"], FRIENDS
+    )
+
+    prepares = [events.index(e) for e in events if e[0] == "prepare"]
+    dones = [events.index(e) for e in events if e[0] == "done"]
+    assert len(prepares) == len(dones) == 9
+    # 第 k+1 位的准备在第 k 位发言结束之前完成
+    for k in range(8):
+        assert prepares[k + 1] < dones[k]
+    assert run.status == "ended"
+    assert run.current_round == 2
+
+
+@pytest.mark.asyncio
+async def test_round_scoped_turns_see_earlier_replies_of_the_round(db: Session, run_setup, monkeypatch):
+    run, runtime = run_setup
+    service = GroupAutoDriveService()
+    seen = []
+
+    async def _fake_prepare(db, runtime, mode, topic, spec, friend):
+        return _PreparedTurn(spec=spec, friend=friend, host_message="", llm_config=None)
+
+    async def _fake_dispatch(db, runtime, run, prepared, other_text):
+        seen.append(other_text)
+        return ContextMessage(id=len(seen), sender_id=prepared.spec.member_id, sender_type="friend", content=f"r{len(seen)}")
+
+    runtime.context.remember_names(FRIENDS)
+    monkeypatch.setattr(service, "_prepare_turn", _fake_prepare)
+    monkeypatch.setattr(service, "_dispatch_speaker", _fake_dispatch)
+    config = ad_schemas.AutoDriveConfig.model_construct(
+        mode="brainstorm", topic={}, roles={}, turn_limit=2, end_action="summary", summary_by=None
+    )
+    await service._run_round_mode(db, runtime, run, config, {}, ["1", "2"], FRIENDS)
+
+    assert seen == ["(empty)", "正方: r1", "(empty)", "正方: r3"]
+
+
+@pytest.mark.asyncio
+async def test_pending_voice_is_drained_before_run_returns(db: Session, run_setup, monkeypatch):
+    run, runtime = run_setup
+    service = GroupAutoDriveService()
+    finished = []
+
+    async def _slow_voice():
+        await asyncio.sleep(0.02)
+        finished.append(True)
+
+    async def _fake_prepare(db, runtime, mode, topic, spec, friend):
+        return _PreparedTurn(spec=spec, friend=friend, host_message="", llm_config=None)
+
+    async def _fake_dispatch(db, runtime, run, prepared, other_text):
+        task = asyncio.create_task(_slow_voice())
+        runtime.voice_tasks.add(task)
+        task.add_done_callback(runtime.voice_tasks.discard)
+        return None
+
+    monkeypatch.setattr(service, "_prepare_turn", _fake_prepare)
+    monkeypatch.setattr(service, "_dispatch_speaker", _fake_dispatch)
+    await service._run_debate_mode(
+        db, runtime, run, _debate_config(turn_limit=1, end_action="summary"), {}, {}, ["1", "2"], FRIENDS
+    )
+
+    assert len(finished) == 6
+    assert not runtime.voice_tasks
+
+
+@pytest.mark.asyncio
+async def test_lookahead_is_discarded_after_a_real_pause(db: Session, run_setup, monkeypatch):
+    run, runtime = run_setup
+    monkeypatch.setattr(settings, "AUTO_DRIVE_LOOKAHEAD", True)
+    service = GroupAutoDriveService()
+    prepared_names = []
+    dispatched = []
+
+    async def _fake_prepare(db, runtime, mode, topic, spec, friend):
+        prepared_names.append(friend.name)
+        return _PreparedTurn(spec=spec, friend=friend, host_message=f"v{len(prepared_names)}", llm_config=None)
+
+    async def _fake_dispatch(db, runtime, run, prepared, other_text):
+        dispatched.append(prepared.host_message)
+        if len(dispatched) == 1:
+            # 第一位发言期间用户请求暂停，稍后恢复
+            runtime.pause_requested = True
+            asyncio.get_running_loop().call_later(0.01, runtime.pause_event.set)
+        return None
+
+    monkeypatch.setattr(service, "_prepare_turn", _fake_prepare)
+    monkeypatch.setattr(service, "_dispatch_speaker", _fake_dispatch)
+    await service._run_debate_mode(
+        db, runtime, run, _debate_config(turn_limit=0, end_action="summary"), {}, {}, ["1", "2"], FRIENDS
+    )
+
+    # 反方在暂停前准备过一次（v2），恢复后重新准备（v3），用的是新结果
+    assert prepared_names[:3] == ["正方", "反方", "反方"]
+    assert dispatched[:2] == ["v1", "v3"]
+
+
+@pytest.mark.asyncio
+async def test_stop_cancels_pending_voice_instead_of_waiting(db: Session, run_setup, monkeypatch):
+    run, runtime = run_setup
+    service = GroupAutoDriveService()
+    voice = []
+
+    async def _endless_voice():
+        await asyncio.sleep(10)
+
+    async def _fake_prepare(db, runtime, mode, topic, spec, friend):
+        return _PreparedTurn(spec=spec, friend=friend, host_message="", llm_config=None)
+
+    async def _fake_dispatch(db, runtime, run, prepared, other_text):
+        task = asyncio.create_task(_endless_voice())
+        voice.append(task)
+        runtime.voice_tasks.add(task)
+        task.add_done_callback(runtime.voice_tasks.discard)
+        runtime.stop_event.set()
+        return None
+
+    monkeypatch.setattr(service, "_prepare_turn", _fake_prepare)
+    monkeypatch.setattr(service, "_dispatch_speaker", _fake_dispatch)
+    await asyncio.wait_for(
+        service._run_debate_mode(
+            db, runtime, run, _debate_config(turn_limit=1, end_action="summary"), {}, {}, ["1", "2"], FRIENDS
+        ),
+        timeout=1,
+    )
+
+    assert len(voice) == 1 and voice[0].cancelled()
+    assert not runtime.voice_tasks
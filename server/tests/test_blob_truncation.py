@@ -0,0 +1,63 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.vendor.memobase_server import utils
+from app.vendor.memobase_server.controllers.modal import chat as chat_modal
+from app.vendor.memobase_server.models.blob import BlobType
+
+
+def _row(content, token_size=None):
+    row = SimpleNamespace(
+        blob_data={"messages": [{"role": "user", "content": content}]},
+        created_at=datetime(2026, 1, 1),
+        additional_fields=None,
+    )
+    return utils.pack_blob_from_db(row, BlobType.chat, token_size=token_size)
+
+
+def test_pack_blob_carries_stored_token_size():
+    blob = _row("hello", token_size=7)
+    assert blob.stored_token_size == 7
+    assert "token_size" not in blob.to_request()["blob_data"]
+    assert _row("hello").stored_token_size is None
+
+
+@pytest.mark.asyncio
+async def test_truncate_uses_stored_sizes_and_counts_only_boundary(monkeypatch):
+    rendered = []
+    original = utils.get_blob_str
+
+    def _tracking(blob):
+        rendered.append(blob.messages[0].content)
+        return original(blob)
+
+    monkeypatch.setattr(utils, "get_blob_str", _tracking)
+    blobs = [_row(f"m{i}", token_size=10) for i in range(6)]
+
+    kept = await chat_modal.truncate_chat_blobs(blobs, 35)
+    assert [b.messages[0].content for b in kept] == ["m3", "m4", "m5"]
+    # 只有越界的 m2 被重新渲染计数，其余全部用存储值
+    assert rendered == ["m2"]
+
+    rendered.clear()
+    assert len(await chat_modal.truncate_chat_blobs(blobs, 1000)) == 6
+    assert rendered == []
+
+
+@pytest.mark.asyncio
+async def test_truncate_boundary_blob_kept_when_exact_count_fits():
+    blobs = [_row("a", token_size=500), _row("b", token_size=10)]
+    # 存储值偏大（例如入库时渲染不同），边界 blob 精确计数后仍能放下
+    kept = await chat_modal.truncate_chat_blobs(blobs, 100)
+    assert [b.messages[0].content for b in kept] == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_truncate_strings_async_matches_sync_helper():
+    long_text = "memobase " * 50
+    short, cut = await utils.truncate_strings_async(["hi", long_text], 5)
+    assert short == "hi"
+    assert cut == utils.truncate_string(long_text, 5)
+    assert cut.endswith("...")
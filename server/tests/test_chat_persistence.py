@@ -77,12 +77,12 @@ async def test_chat_persistence_after_disconnect(client, db):
 
     # Mock 外部服务以防阻塞
     mock_recall_func = AsyncMock(return_value={"injected_messages": [], "footprints": []})
-    mock_memo_func = AsyncMock(return_value=MagicMock(profiles=[]))
+    mock_memo_func = AsyncMock(return_value="")
 
     with patch("app.services.chat_service.Runner.run_streamed", return_value=mock_runner_result), \
          patch("app.services.chat_service.SessionLocal", MockSessionLocal), \
          patch("app.services.chat_service.RecallService.perform_recall", mock_recall_func), \
-         patch("app.services.chat_service.MemoService.get_user_profiles", mock_memo_func), \
+         patch("app.services.chat_service.MemoService.get_user_profile_text", mock_memo_func), \
          patch("app.services.chat_service.AsyncOpenAI", return_value=MagicMock()):
         
         # 3. 发送消息并故意中途断开
@@ -0,0 +1,103 @@
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.models.embedding import EmbeddingSetting
+from app.models.llm import LLMConfig
+from app.schemas.llm import LLMConfigUpdate
+from app.services.config_snapshot_service import config_snapshot_service
+from app.services.llm_service import llm_service
+from app.services.settings_service import SettingsService, settings_cache
+from app.services.voice_message_service import resolve_voice_runtime_config
+
+
+@pytest.fixture
+def cached_db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'configs.db'}")
+    Base.metadata.create_all(bind=engine)
+    settings_cache.enable(engine)
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        if "llm_configs" in statement and statement.lstrip().upper().startswith("SELECT"):
+            statements.append(statement)
+
+    db = sessionmaker(bind=engine, autoflush=False)()
+    try:
+        yield db, statements
+    finally:
+        db.close()
+        config_snapshot_service.invalidate()
+        settings_cache.disable(engine)
+        engine.dispose()
+
+
+def _add_llm_config(db, model_name):
+    config = LLMConfig(provider="openai", model_name=model_name, capability_reasoning=True)
+    db.add(config)
+    db.commit()
+    return config
+
+
+def test_snapshot_is_cached_and_read_only(cached_db):
+    db, statements = cached_db
+    config = _add_llm_config(db, "gpt-a")
+    db.add(EmbeddingSetting(embedding_provider="openai", embedding_model="text-embedding-3-small"))
+    db.commit()
+    SettingsService.set_setting(db, "chat", "active_llm_config_id", config.id, "int")
+    SettingsService.set_setting(db, "memory", "active_embedding_config_id", 1, "int")
+
+    snapshot = config_snapshot_service.get(db)
+    statements.clear()
+    assert config_snapshot_service.get(db) is snapshot
+    assert llm_service.get_active_config(db).model_name == "gpt-a"
+    assert llm_service.get_runtime_config(db, str(config.id)).id == config.id
+    assert snapshot.active_embedding_setting.embedding_model == "text-embedding-3-small"
+    assert statements == []
+
+    with pytest.raises(AttributeError):
+        snapshot.active_llm_config.model_name = "other"
+
+
+def test_settings_write_rebuilds_snapshot(cached_db):
+    db, _ = cached_db
+    first = _add_llm_config(db, "gpt-a")
+    second = _add_llm_config(db, "gpt-b")
+    SettingsService.set_setting(db, "chat", "active_llm_config_id", first.id, "int")
+    old = config_snapshot_service.get(db)
+
+    SettingsService.set_setting(db, "chat", "active_llm_config_id", second.id)
+    new = config_snapshot_service.get(db)
+    assert new.version > old.version
+    assert new.active_llm_config.model_name == "gpt-b"
+    # 旧快照保持不变，进行中的生成任务不受影响
+    assert old.active_llm_config.model_name == "gpt-a"
+
+
+def test_refresh_picks_up_config_update(cached_db):
+    db, _ = cached_db
+    config = _add_llm_config(db, "gpt-a")
+    SettingsService.set_setting(db, "chat", "active_llm_config_id", config.id, "int")
+    assert llm_service.get_active_config(db).model_name == "gpt-a"
+
+    llm_service.update_config(db, config.id, LLMConfigUpdate(model_name="gpt-a2"))
+    assert llm_service.get_active_config(db).model_name == "gpt-a"
+    config_snapshot_service.refresh(db)
+    assert llm_service.get_active_config(db).model_name == "gpt-a2"
+
+
+def test_voice_runtime_config_from_snapshot(cached_db):
+    db, _ = cached_db
+    assert resolve_voice_runtime_config(db) is None
+
+    SettingsService.set_settings(
+        db,
+        "voice",
+        {"api_key": "sk-test", "default_voice_id": "Maia", "tts_model": ""},
+    )
+    runtime = resolve_voice_runtime_config(db)
+    assert runtime["api_key"] == "sk-test"
+    assert runtime["default_voice_id"] == "Maia"
+    assert runtime["model"]
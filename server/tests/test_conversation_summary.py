@@ -0,0 +1,105 @@
+import pytest
+from sqlalchemy.orm import Session
+
+from app.models.chat import ChatSession, Message
+from app.models.group import GroupSession
+from app.services import chat_service, conversation_summary_service, friend_service, group_chat_shared
+from app.services.group_chat_service import group_chat_service
+from app.services.memo.constants import DEFAULT_USER_ID
+
+
+def _friend_row(client, friend_id):
+    friends = client.get("/api/friends/").json()
+    return next(f for f in friends if f["id"] == friend_id)
+
+
+def _create_friend(client, name):
+    return client.post("/api/friends/", json={"name": name, "is_preset": False}).json()["id"]
+
+
+@pytest.mark.asyncio
+async def test_friend_summary_tracks_insert_reply_and_recall(client, db: Session):
+    friend_id = _create_friend(client, "摘要好友")
+    friend_service.ensure_initial_message(db, friend_id, "<message>你好呀</message>")
+
+    row = _friend_row(client, friend_id)
+    assert row["last_message"] == "你好呀"
+    assert row["last_message_role"] == "assistant"
+    assert row["unread_count"] == 1
+
+    assert client.post(f"/api/chat/friends/{friend_id}/read").status_code == 200
+    assert _friend_row(client, friend_id)["unread_count"] == 0
+
+    session = db.query(ChatSession).filter(ChatSession.friend_id == friend_id).first()
+    user_msg = Message(session_id=session.id, friend_id=friend_id, role="user", content="在吗")
+    db.add(user_msg)
+    db.flush()
+    conversation_summary_service.record_friend_message(db, friend_id, user_msg)
+    ai_msg = Message(session_id=session.id, friend_id=friend_id, role="assistant", content="")
+    db.add(ai_msg)
+    db.flush()
+    conversation_summary_service.record_friend_message(db, friend_id, ai_msg)
+    db.commit()
+
+    await chat_service._persist_ai_message_content(db, session.id, ai_msg.id, "<message>在的</message>")
+    db.expire_all()
+
+    row = _friend_row(client, friend_id)
+    assert row["last_message"] == "在的"
+    assert row["unread_count"] == 1
+    summary = conversation_summary_service.get_summary(
+        db, conversation_summary_service.FRIEND_CONVERSATION, friend_id
+    )
+    assert summary.message_count == 3
+
+    # 打开会话（加载最新一页）即清零
+    client.get(f"/api/chat/friends/{friend_id}/messages/page")
+    assert _friend_row(client, friend_id)["unread_count"] == 0
+
+    # 撤回用户消息会级联删除其后的 AI 回复，摘要回退为撤回提示
+    assert chat_service.recall_message(db, user_msg.id)
+    db.expire_all()
+    row = _friend_row(client, friend_id)
+    assert row["last_message"] == "你撤回了一条消息"
+    assert row["last_message_role"] == "system"
+    summary = conversation_summary_service.get_summary(
+        db, conversation_summary_service.FRIEND_CONVERSATION, friend_id
+    )
+    assert summary.message_count == 2
+
+    # 删除会话后不再有最后消息
+    chat_service.delete_session(db, session.id)
+    row = _friend_row(client, friend_id)
+    assert row["last_message"] is None
+    assert row["unread_count"] == 0
+
+
+@pytest.mark.asyncio
+async def test_group_summary_tracks_messages_and_clear(client, db: Session):
+    friend_id = _create_friend(client, "群摘要好友")
+    group_id = client.post(
+        "/api/group/create", json={"name": "摘要群", "member_ids": [str(friend_id)]}
+    ).json()["id"]
+    group_session = GroupSession(group_id=group_id)
+    db.add(group_session)
+    db.commit()
+
+    group_chat_shared.create_user_message(db, group_id, group_session.id, DEFAULT_USER_ID, "大家好")
+    ai_msg = group_chat_shared.create_ai_placeholder(db, group_id, group_session.id, friend_id)
+    await group_chat_shared.persist_final_content(db, ai_msg.id, "你好！", group_session.id)
+    db.expire_all()
+
+    groups = client.get("/api/groups").json()
+    row = next(g for g in groups if g["id"] == group_id)
+    assert row["last_message"] == "你好！"
+    assert row["last_message_sender_name"] == "群摘要好友"
+    assert row["unread_count"] == 1
+    assert row["member_count"] == 2
+
+    assert client.post(f"/api/group/{group_id}/read").json() is True
+    group_chat_service.clear_group_messages(db, group_id)
+    db.expire_all()
+
+    row = next(g for g in client.get("/api/groups").json() if g["id"] == group_id)
+    assert row["last_message"] is None
+    assert row["unread_count"] == 0
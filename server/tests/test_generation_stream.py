@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.services import generation_stream
+from app.services.generation_stream import GenerationEventLog, generation_streams
+
+
+async def _drain(stream):
+    return [event async for event in stream]
+
+
+@pytest.mark.asyncio
+async def test_late_subscriber_replays_then_tails():
+    log = GenerationEventLog(1, capacity=16)
+    await log.put({"event": "start", "data": {}})
+    await log.put({"event": "message", "data": {"delta": "a"}})
+
+    first = asyncio.create_task(_drain(log.subscribe()))
+    resumed = asyncio.create_task(_drain(log.subscribe(after=1)))
+    await asyncio.sleep(0)
+    await log.put({"event": "message", "data": {"delta": "b"}})
+    await log.put({"event": "done", "data": {}})
+    await log.put(None)
+
+    events = await asyncio.wait_for(first, 1)
+    assert [e["seq"] for e in events] == [1, 2, 3, 4]
+    assert [e["event"] for e in events] == ["start", "message", "message", "done"]
+    assert [e["seq"] for e in await asyncio.wait_for(resumed, 1)] == [2, 3, 4]
+    # 结束后的订阅者直接拿到缓冲并退出
+    assert [e["seq"] for e in await _drain(log.subscribe(after=3))] == [4]
+
+
+@pytest.mark.asyncio
+async def test_ring_buffer_overflow_reports_gap():
+    log = GenerationEventLog(2, capacity=3)
+    for i in range(5):
+        await log.put({"event": "message", "data": {"delta": str(i)}})
+    await log.put(None)
+    events = await _drain(log.subscribe(after=0))
+    assert events[0]["event"] == "stream_gap"
+    assert events[0]["data"]["first_seq"] == 3
+    assert [e["seq"] for e in events[1:]] == [3, 4, 5]
+
+
+@pytest.mark.asyncio
+async def test_lossless_subscriber_outlives_ring_buffer():
+    log = GenerationEventLog(3, capacity=2)
+    await log.put({"event": "start", "data": {}})
+    stream = log.subscribe(lossless=True)
+    assert (await stream.__anext__())["seq"] == 1
+    # 慢客户端：环形缓冲早已被挤掉，独占队列仍保留全部增量
+    for i in range(5):
+        await log.put({"event": "message", "data": {"delta": str(i)}})
+    await log.put(None)
+    rest = await _drain(stream)
+    assert [e["seq"] for e in rest] == [2, 3, 4, 5, 6]
+    assert "".join(e["data"]["delta"] for e in rest) == "01234"
+    assert log._followers == []
+
+
+@pytest.mark.asyncio
+async def test_registry_closes_log_past_max_age(monkeypatch):
+    monkeypatch.setattr(generation_stream.settings, "STREAM_LOG_MAX_AGE_SECONDS", 0.01)
+    monkeypatch.setattr(generation_stream.settings, "STREAM_LOG_GRACE_SECONDS", 0.01)
+    log = generation_streams.open(987655)
+    await asyncio.sleep(0.05)
+    assert log.done
+    assert generation_streams.get(987655) is None
+
+
+@pytest.mark.asyncio
+async def test_registry_evicts_after_grace(monkeypatch):
+    monkeypatch.setattr(generation_stream.settings, "STREAM_LOG_GRACE_SECONDS", 0.01)
+    log = generation_streams.open(987654)
+    assert generation_streams.get(987654) is log
+    await log.put(None)
+    await asyncio.sleep(0.05)
+    assert generation_streams.get(987654) is None
+
+
+def test_reattach_endpoint_replays_after_seq(client: TestClient):
+    log = generation_streams.open(424242)
+    log.publish({"event": "start", "data": {"message_id": 424242}})
+    log.publish({"event": "message", "data": {"delta": "你好"}})
+    log.publish({"event": "done", "data": {"content": "你好"}})
+    log.publish(None)
+    try:
+        resp = client.get("/api/chat/messages/424242/stream", params={"after": 1})
+        assert resp.status_code == 200
+        body = resp.text
+        assert "id: 1\n" not in body
+        assert 'id: 2\nevent: message\ndata: {"delta":"你好"}' in body
+        assert "id: 3\nevent: done" in body
+
+        assert client.get("/api/chat/messages/1/stream").status_code == 404
+    finally:
+        generation_streams._logs.pop(424242, None)
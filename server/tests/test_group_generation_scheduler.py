@@ -0,0 +1,172 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import settings
+from app.core.sse import iter_sse
+from app.services import group_generation_scheduler as scheduler
+from app.services.group_generation_scheduler import (
+    GenerationGate,
+    StreamMultiplexer,
+    _PriorityGate,
+    participant_priorities,
+    provider_for,
+)
+from app.services import llm_client
+from app.services.llm_client import get_shared_client
+
+
+def _event(sender: int, n: int) -> dict:
+    return {"event": "message", "data": {"sender_id": str(sender), "delta": str(n)}}
+
+
+@pytest.mark.asyncio
+async def test_fair_merge_interleaves_and_numbers_each_substream():
+    mux = StreamMultiplexer(quantum=2)
+    fast = mux.open("1")
+    slow = mux.open("2")
+    for n in range(6):
+        await fast.put(_event(1, n))
+    await fast.put(None)
+    await slow.put(_event(2, 0))
+    await slow.put(_event(2, 1))
+    await slow.put(None)
+
+    merged = [e async for e in mux.fair_merge()]
+
+    senders = [e["data"]["sender_id"] for e in merged]
+    assert senders == ["1", "1", "2", "2", "1", "1", "1", "1"]
+    for key in ("1", "2"):
+        seqs = [e["data"]["seq"] for e in merged if e["data"]["sender_id"] == key]
+        assert seqs == list(range(1, len(seqs) + 1))
+        deltas = [e["data"]["delta"] for e in merged if e["data"]["sender_id"] == key]
+        assert deltas == sorted(deltas, key=int)
+
+
+@pytest.mark.asyncio
+async def test_fair_merge_waits_for_late_producers():
+    mux = StreamMultiplexer(quantum=4)
+    streams = [mux.open(str(i)) for i in range(3)]
+
+    async def _produce(idx: int, stream):
+        for n in range(3):
+            await asyncio.sleep(0.001 * (idx + 1))
+            await stream.put(_event(idx, n))
+        await stream.put(None)
+        # 重复的结束信号会被忽略
+        await stream.put(None)
+
+    tasks = [asyncio.create_task(_produce(i, s)) for i, s in enumerate(streams)]
+    merged = [e async for e in mux.fair_merge()]
+    await asyncio.gather(*tasks)
+
+    assert len(merged) == 9
+    assert all(s.closed for s in streams)
+
+
+@pytest.mark.asyncio
+async def test_merged_deltas_still_coalesce_into_sse_frames():
+    mux = StreamMultiplexer(quantum=16)
+    stream = mux.open("1")
+    for n in range(11):
+        await stream.put({"event": "message", "data": {"sender_id": "1", "delta": str(n % 10)}})
+    await stream.put(None)
+
+    chunks = [c async for c in iter_sse(mux.fair_merge(), window_ms=1000, max_chars=256)]
+    frames = [json.loads(f.split("data: ", 1)[1]) for f in b"".join(chunks).decode("utf-8").split("\n\n") if f]
+
+    # seq 逐条递增不应阻止合并：11 个增量合成一帧，保留最后的 seq
+    assert frames == [{"sender_id": "1", "delta": "01234567890", "seq": 11}]
+
+
+@pytest.mark.asyncio
+async def test_priority_gate_admits_mentioned_first():
+    gate = _PriorityGate(capacity=1)
+    await gate.acquire((1, 0))
+    order = []
+
+    async def _wait(name, priority):
+        await gate.acquire(priority)
+        order.append(name)
+        await asyncio.sleep(0)
+        gate.release()
+
+    tasks = [
+        asyncio.create_task(_wait("selected-a", (1, 1))),
+        asyncio.create_task(_wait("selected-b", (1, 2))),
+        asyncio.create_task(_wait("mentioned", (0, 3))),
+    ]
+    await asyncio.sleep(0)
+    gate.release()
+    await asyncio.gather(*tasks)
+
+    assert order == ["mentioned", "selected-a", "selected-b"]
+    assert gate.active == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_leak_a_slot():
+    gate = _PriorityGate(capacity=1)
+    await gate.acquire((1, 0))
+    waiter = asyncio.create_task(gate.acquire((1, 1)))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    gate.release()
+    assert gate.active == 0
+
+
+@pytest.mark.asyncio
+async def test_generation_gate_bounds_concurrency_per_provider(monkeypatch):
+    monkeypatch.setattr(settings, "GROUP_GENERATION_MAX_PARALLELISM", 2)
+    monkeypatch.setattr(settings, "GROUP_LLM_PROVIDER_PARALLELISM", {"slowprovider": 1})
+    gate = GenerationGate()
+    running = {"default": 0, "slowprovider": 0}
+    peak = {"default": 0, "slowprovider": 0}
+
+    async def _generate(provider: str, idx: int):
+        config = SimpleNamespace(provider=provider, base_url=None)
+        key = "slowprovider" if provider else "default"
+        async with gate.slot(config, (1, idx)):
+            running[key] += 1
+            peak[key] = max(peak[key], running[key])
+            await asyncio.sleep(0.005)
+            running[key] -= 1
+
+    await asyncio.gather(
+        *[_generate("", i) for i in range(6)],
+        *[_generate("slowprovider", i) for i in range(3)],
+    )
+    assert peak == {"default": 2, "slowprovider": 1}
+
+
+def test_priorities_and_provider_keys():
+    assert participant_priorities([5, 7, 9], [9]) == {5: (1, 0), 7: (1, 1), 9: (0, 2)}
+    assert provider_for(SimpleNamespace(provider="", base_url="https://api.deepseek.com/v1")) == "api.deepseek.com"
+    assert provider_for(SimpleNamespace(provider="OpenAI", base_url="https://x")) == "openai"
+    assert scheduler.provider_parallelism("unknown") == settings.GROUP_GENERATION_MAX_PARALLELISM
+
+
+@pytest.mark.asyncio
+async def test_llm_client_is_shared_per_config():
+    config = SimpleNamespace(base_url="https://llm.example/v1", api_key="sk-test")
+    first = get_shared_client(config)
+    assert get_shared_client(config) is first
+    other = get_shared_client(SimpleNamespace(base_url="https://llm.example/v1", api_key="sk-other"))
+    assert other is not first
+
+
+@pytest.mark.asyncio
+async def test_llm_client_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(llm_client, "MAX_SHARED_CLIENTS", 2)
+    monkeypatch.setattr(llm_client, "_clients", llm_client.OrderedDict())
+    configs = [SimpleNamespace(base_url="https://llm.example/v1", api_key=f"sk-{i}") for i in range(3)]
+    first = get_shared_client(configs[0])
+    get_shared_client(configs[1])
+    assert get_shared_client(configs[0]) is first  # 命中后移到队尾
+    get_shared_client(configs[2])
+    assert len(llm_client._clients) == 2
+    assert get_shared_client(configs[0]) is first
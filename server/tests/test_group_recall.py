@@ -0,0 +1,224 @@
+import asyncio
+import json
+import math
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+import sqlite_vec
+from sqlalchemy import create_engine, event
+
+from app.services.memo import bridge
+from app.services.memo.bridge import MemoService
+from app.vendor.memobase_server.connectors import Session as MemoSession
+from app.vendor.memobase_server.models.database import REG, UserEvent, UserEventGist
+from app.vendor.memobase_server.utils import to_uuid
+
+USER_ID = "6c1b5c4e-4a8e-4b8a-9d0e-3f1f0d7a2b11"
+SPACE_ID = "group-recall-space"
+_CAN_LOAD_EXTENSIONS = hasattr(sqlite3.Connection, "enable_load_extension")
+
+
+def _unit(angle: float) -> list:
+    return [math.cos(angle), math.sin(angle), 0.0, 0.0]
+
+
+@pytest.fixture
+def memo_db(monkeypatch):
+    engine = create_engine("sqlite://")
+
+    @event.listens_for(engine, "connect")
+    def _load_vec(dbapi_connection, _record):
+        dbapi_connection.enable_load_extension(True)
+        sqlite_vec.load(dbapi_connection)
+        dbapi_connection.enable_load_extension(False)
+
+    REG.metadata.create_all(engine, tables=[UserEvent.__table__, UserEventGist.__table__])
+    previous_bind = MemoSession.kw.get("bind")
+    MemoSession.configure(bind=engine)
+    monkeypatch.setattr(bridge.CONFIG, "enable_event_embedding", True)
+
+    async def _fake_embedding(space_id, texts, phase=None, model=None):
+        return SimpleNamespace(ok=lambda: True, data=lambda: [_unit(0.0)], msg=lambda: "")
+
+    monkeypatch.setattr(bridge, "get_embedding", _fake_embedding)
+    try:
+        yield engine
+    finally:
+        MemoSession.configure(bind=previous_bind)
+        engine.dispose()
+
+
+def _add_gist(session, friend_ids, content, angle):
+    event_row = UserEvent(
+        event_data={"event_tags": [{"tag": "friend_id", "value": str(f)} for f in friend_ids]},
+        user_id=to_uuid(USER_ID),
+        project_id=SPACE_ID,
+    )
+    session.add(event_row)
+    session.flush()
+    session.add(
+        UserEventGist(
+            gist_data={"content": content},
+            event_id=event_row.id,
+            user_id=to_uuid(USER_ID),
+            project_id=SPACE_ID,
+            embedding=_unit(angle),
+        )
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not _CAN_LOAD_EXTENSIONS, reason="sqlite3 built without extension loading (sqlite-vec)")
+async def test_multi_friend_search_returns_per_friend_topk(memo_db):
+    with MemoSession() as session:
+        _add_gist(session, [1], "f1-best", 0.1)
+        _add_gist(session, [1], "f1-second", 0.3)
+        _add_gist(session, [1], "f1-third", 0.5)
+        _add_gist(session, [2], "f2-only", 0.2)
+        _add_gist(session, [1, 2], "shared", 0.4)
+        _add_gist(session, [3], "not-a-participant", 0.0)
+        _add_gist(session, [2], "below-threshold", 1.5)
+        session.commit()
+
+    results = await MemoService.search_memories_for_friends(
+        USER_ID, SPACE_ID, "q", [1, 2], topk=2, similarity_threshold=0.5
+    )
+    contents = {fid: [g.gist_data.content for g in data.gists] for fid, data in results.items()}
+    assert contents == {1: ["f1-best", "f1-second"], 2: ["f2-only", "shared"]}
+
+    single = await MemoService.search_memories_with_tags(USER_ID, SPACE_ID, "q", 2, topk=5)
+    assert [g.gist_data.content for g in single.gists] == ["f2-only", "shared"]
+
+
+def _fake_llm_config():
+    return SimpleNamespace(
+        id=1,
+        model_name="gpt-4o-mini",
+        provider="openai",
+        base_url="https://api.openai.com/v1",
+        api_key="sk-test",
+        capability_reasoning=False,
+    )
+
+
+@pytest.mark.asyncio
+async def test_group_recall_runs_agent_once_and_splits_per_friend(monkeypatch):
+    from agents import Runner
+    from agents.items import ToolCallItem, ToolCallOutputItem
+
+    from app.services import recall_service
+    from app.services.recall_service import RecallService
+
+    friend_ids = [1, 2, 3, 4, 5]
+    agent_runs = []
+    searches = []
+
+    async def _fake_recall_for_friends(*, query, friend_ids, **kwargs):
+        searches.append(query)
+        return {
+            fid: {"events": [{"date": None, "content": f"{query}-{fid}", "similarity": 0.9 - fid / 100}]}
+            for fid in friend_ids
+        }
+
+    async def _fake_run(agent, messages, **kwargs):
+        agent_runs.append(agent.name)
+        tool = agent.tools[0]
+        items = []
+        for i, query in enumerate(["失眠", "睡眠", "失眠"]):
+            args = json.dumps({"query": query}, ensure_ascii=False)
+            call = {"type": "function_call", "name": "recall_memory", "call_id": f"c{i}", "arguments": args}
+            ctx = SimpleNamespace(context=None, tool_name="recall_memory", tool_call_id=f"c{i}", tool_arguments=args)
+            output = await tool.on_invoke_tool(ctx, args)
+            items.append(ToolCallItem(agent=agent, raw_item=call))
+            items.append(
+                ToolCallOutputItem(
+                    agent=agent,
+                    raw_item={"type": "function_call_output", "call_id": f"c{i}", "output": ""},
+                    output=output,
+                )
+            )
+        return SimpleNamespace(new_items=items)
+
+    monkeypatch.setattr(recall_service.llm_service, "get_active_config", lambda db: _fake_llm_config())
+    monkeypatch.setattr(MemoService, "recall_memory_for_friends", _fake_recall_for_friends)
+    monkeypatch.setattr(Runner, "run", _fake_run)
+
+    snapshot = SimpleNamespace(get=lambda group, key, default=None: default)
+    results = await RecallService.perform_group_recall(
+        None,
+        "user",
+        "space",
+        [{"role": "user", "content": "最近总是失眠"}],
+        friend_ids,
+        settings_snapshot=snapshot,
+    )
+
+    assert agent_runs == ["RecallAgent"]
+    assert searches == ["失眠", "睡眠"]  # 重复查询复用同一次多好友检索
+    assert set(results) == set(friend_ids)
+    for fid in friend_ids:
+        tool_call, tool_output = results[fid]["injected_messages"]
+        assert tool_call["call_id"] == tool_output["call_id"] == "c2"
+        events = json.loads(tool_output["output"])["events"]
+        assert sorted(e["content"] for e in events) == [f"失眠-{fid}", f"睡眠-{fid}"]
+        tool_results = [fp["result"] for fp in results[fid]["footprints"] if fp["type"] == "tool_result"]
+        assert [r["events"][0]["content"] for r in tool_results] == [f"失眠-{fid}", f"睡眠-{fid}", f"失眠-{fid}"]
+
+
+@pytest.mark.asyncio
+async def test_recall_batch_shares_one_run_across_participants(monkeypatch):
+    from app.services import group_recall
+    from app.services.recall_service import RecallService
+
+    calls = []
+
+    async def _fake_group_recall(db, user_id, space_id, messages, friend_ids, settings_snapshot=None):
+        calls.append((messages, friend_ids))
+        await asyncio.sleep(0.01)
+        return {fid: {"injected_messages": [{"friend": fid}], "footprints": []} for fid in friend_ids}
+
+    monkeypatch.setattr(group_recall.group_chat_shared, "fetch_group_history", lambda **kwargs: [])
+    monkeypatch.setattr(RecallService, "perform_group_recall", _fake_group_recall)
+
+    batch = group_recall.GroupRecallBatch(
+        group_id=1, session_id=1, user_msg_id=10, message_content="大家好", friend_ids=[1, 2, 3]
+    )
+    results = await asyncio.gather(*(batch.get(fid) for fid in (1, 2, 3)))
+
+    assert len(calls) == 1
+    assert calls[0] == ([{"role": "user", "content": "大家好"}], [1, 2, 3])
+    assert [r["injected_messages"][0]["friend"] for r in results] == [1, 2, 3]
+    assert batch.covers(2) and not batch.covers(9)
+
+
+@pytest.mark.asyncio
+async def test_recall_batch_cancelled_once_all_participants_finish(monkeypatch):
+    from app.services import group_recall
+    from app.services.recall_service import RecallService
+
+    started = asyncio.Event()
+
+    async def _slow_group_recall(db, user_id, space_id, messages, friend_ids, settings_snapshot=None):
+        started.set()
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(group_recall.group_chat_shared, "fetch_group_history", lambda **kwargs: [])
+    monkeypatch.setattr(RecallService, "perform_group_recall", _slow_group_recall)
+
+    batch = group_recall.GroupRecallBatch(
+        group_id=1, session_id=1, user_msg_id=10, message_content="大家好", friend_ids=[1, 2]
+    )
+    tasks = [asyncio.create_task(batch.get(fid)) for fid in (1, 2)]
+    batch.cancel_when_done(tasks)
+    await started.wait()
+
+    tasks[0].cancel()
+    await asyncio.sleep(0)
+    # 还有参与者在等，召回继续
+    assert not batch._future.done()
+
+    tasks[1].cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await asyncio.sleep(0)
+    assert batch._future.cancelled()
@@ -0,0 +1,215 @@
+import json
+import logging
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import numpy as np
+import pytest
+
+from app.models.group import Group
+from app.services import group_speaker_router
+from app.services.group_chat_service import GroupChatService, group_chat_service
+from app.services.group_speaker_router import route_speakers
+from app.services.memo.constants import DEFAULT_USER_ID
+
+
+def _friend(fid: int, name: str, description: str = "") -> SimpleNamespace:
+    return SimpleNamespace(id=fid, name=name, description=description, system_prompt=None)
+
+
+def _msg(sender_type: str, sender_id, content: str) -> SimpleNamespace:
+    return SimpleNamespace(sender_type=sender_type, sender_id=str(sender_id), content=content, message_type="text")
+
+
+FRIENDS = {
+    1: _friend(1, "阿哲", "足球迷，天天聊球赛"),
+    2: _friend(2, "小雨", "烘焙爱好者，喜欢做甜点"),
+    3: _friend(3, "老周", "程序员，聊代码和键盘"),
+}
+
+# 关键词 -> 方向，模拟 embedding：同话题的文本向量接近
+_TOPICS = {"球": 0, "甜点": 1, "蛋糕": 1, "代码": 2}
+
+
+def _fake_vector(text: str) -> np.ndarray:
+    vec = np.full(3, 0.05, dtype=np.float32)
+    for word, axis in _TOPICS.items():
+        if word in text:
+            vec[axis] += 1.0
+    return vec
+
+
+@pytest.fixture(autouse=True)
+def fake_embed(monkeypatch):
+    calls = []
+
+    async def _embed(texts, phase):
+        calls.append((phase, list(texts)))
+        return np.stack([_fake_vector(t) for t in texts])
+
+    group_speaker_router._doc_cache.clear()
+    monkeypatch.setattr(group_speaker_router, "_embed", _embed)
+    yield calls
+    group_speaker_router._doc_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_single_member_routes_without_scoring(fake_embed):
+    decision = await route_speakers(content="在吗", history=[], friend_map={1: FRIENDS[1]})
+    assert decision.speaker_ids == [1]
+    assert decision.reason == "single_member"
+    assert decision.confident()
+    assert fake_embed == []
+
+
+@pytest.mark.asyncio
+async def test_name_mention_in_text_wins(fake_embed):
+    decision = await route_speakers(content="老周你周末干嘛，小雨也说说", history=[], friend_map=FRIENDS)
+    assert decision.speaker_ids == [3, 2]
+    assert decision.reason == "name_mention"
+    assert decision.confident()
+    assert fake_embed == []
+
+
+@pytest.mark.asyncio
+async def test_semantic_pick_is_confident():
+    decision = await route_speakers(content="周末一起做个蛋糕吧", history=[], friend_map=FRIENDS)
+    assert decision.reason == "scored"
+    assert decision.speaker_ids == [2]
+    assert decision.confident()
+    assert decision.scores[2]["semantic"] == pytest.approx(1.0)
+
+
+@pytest.mark.asyncio
+async def test_persona_embeddings_are_cached(fake_embed):
+    await route_speakers(content="周末一起做个蛋糕吧", history=[], friend_map=FRIENDS)
+    await route_speakers(content="今晚的球你看了吗", history=[], friend_map=FRIENDS)
+    document_calls = [texts for phase, texts in fake_embed if phase == "document"]
+    assert len(document_calls) == 1
+    assert len(document_calls[0]) == len(FRIENDS)
+
+
+@pytest.mark.asyncio
+async def test_continuity_without_embeddings_is_capped():
+    history = [
+        _msg("user", DEFAULT_USER_ID, "大家好"),
+        _msg("friend", 1, "好呀"),
+        _msg("friend", 3, "晚上好"),
+    ]
+    decision = await route_speakers(content="哈哈是吗", history=history, friend_map=FRIENDS, use_embeddings=False)
+    # 最后接话的是老周
+    assert decision.speaker_ids[0] == 3
+    assert decision.scores[3]["continuity"] == 1.0
+    assert decision.scores[1]["continuity"] == 0.5
+    assert decision.confidence <= group_speaker_router.NO_SEMANTIC_CONFIDENCE_CAP
+    assert not decision.confident()
+
+
+@pytest.mark.asyncio
+async def test_embedding_failure_falls_back_to_low_confidence(monkeypatch):
+    async def _unavailable(texts, phase):
+        return None
+
+    monkeypatch.setattr(group_speaker_router, "_embed", _unavailable)
+    decision = await route_speakers(content="周末一起做个蛋糕吧", history=[], friend_map=FRIENDS)
+    assert decision.reason == "scored"
+    assert not decision.confident()
+
+
+def _create_group_with_session(db, name: str):
+    group = Group(name=name, owner_id=DEFAULT_USER_ID)
+    db.add(group)
+    db.commit()
+    db.refresh(group)
+    session = group_chat_service.create_group_session(db, group.id)
+    return group, session
+
+
+@pytest.mark.asyncio
+async def test_confident_route_skips_llm_manager(db, caplog):
+    group, session = _create_group_with_session(db, "router-confident")
+    with patch.object(
+        GroupChatService, "_select_speakers_by_manager", new_callable=AsyncMock
+    ) as manager, caplog.at_level(logging.INFO, logger="app.speaker_routing"):
+        participants = await GroupChatService._select_speakers(
+            db=db,
+            group_id=group.id,
+            session_id=session.id,
+            message_id=None,
+            content="小雨，蛋糕做好了吗",
+            llm_config=None,
+            friend_map=FRIENDS,
+        )
+
+    assert [p.id for p in participants] == [2]
+    manager.assert_not_called()
+    record = json.loads(caplog.records[-1].getMessage())
+    assert record["source"] == "router"
+    assert record["final_ids"] == [2]
+
+
+@pytest.mark.asyncio
+async def test_low_confidence_falls_back_and_logs_llm_choice(db, caplog):
+    group, session = _create_group_with_session(db, "router-fallback")
+    with patch.object(
+        GroupChatService,
+        "_select_speakers_by_manager",
+        new_callable=AsyncMock,
+        return_value=[FRIENDS[1]],
+    ) as manager, caplog.at_level(logging.INFO, logger="app.speaker_routing"):
+        participants = await GroupChatService._select_speakers(
+            db=db,
+            group_id=group.id,
+            session_id=session.id,
+            message_id=None,
+            content="嗯嗯",
+            llm_config=None,
+            friend_map=FRIENDS,
+        )
+
+    assert [p.id for p in participants] == [1]
+    manager.assert_awaited_once()
+    record = json.loads(caplog.records[-1].getMessage())
+    assert record["source"] == "llm"
+    assert record["final_ids"] == [1]
+    assert record["reason"] == "scored"
+
+
+@pytest.mark.asyncio
+async def test_near_tied_similarities_fall_back_to_llm(db, caplog, monkeypatch):
+    # 余弦相似度 0.6000 / 0.6001 / 0.6000：差距远小于 SEMANTIC_SPREAD_FLOOR，不能判定为确定
+    similarities = {"阿哲": 0.6, "小雨": 0.6001, "老周": 0.6}
+
+    async def _embed(texts, phase):
+        vectors = []
+        for text in texts:
+            cos = next((v for name, v in similarities.items() if name in text), None)
+            vectors.append([1.0, 0.0] if cos is None else [cos, (1 - cos**2) ** 0.5])
+        return np.asarray(vectors, dtype=np.float32)
+
+    monkeypatch.setattr(group_speaker_router, "_embed", _embed)
+    decision = await route_speakers(content="随便聊聊", history=[], friend_map=FRIENDS)
+    assert decision.reason == "scored"
+    assert decision.confidence < 0.1
+    assert not decision.confident()
+
+    group, session = _create_group_with_session(db, "router-near-tie")
+    with patch.object(
+        GroupChatService,
+        "_select_speakers_by_manager",
+        new_callable=AsyncMock,
+        return_value=[FRIENDS[3]],
+    ) as manager, caplog.at_level(logging.INFO, logger="app.speaker_routing"):
+        participants = await GroupChatService._select_speakers(
+            db=db,
+            group_id=group.id,
+            session_id=session.id,
+            message_id=None,
+            content="随便聊聊",
+            llm_config=None,
+            friend_map=FRIENDS,
+        )
+
+    assert [p.id for p in participants] == [3]
+    manager.assert_awaited_once()
+    assert json.loads(caplog.records[-1].getMessage())["source"] == "llm"
@@ -0,0 +1,105 @@
+import asyncio
+import time
+import uuid
+
+import pytest
+
+from app.vendor.memobase_server.memory_store import (
+    CHECK_AND_DELETE_LOCK_SCRIPT,
+    RENEW_LOCK_SCRIPT,
+    LocalMemoryCache,
+    LocalMemoryStore,
+)
+
+
+def _key(name: str) -> str:
+    return f"test:{name}:{uuid.uuid4().hex}"
+
+
+@pytest.fixture
+def small_store():
+    store = LocalMemoryStore()
+    original = store.max_bytes
+    store.clear()
+    try:
+        yield store
+    finally:
+        store.clear()
+        store.configure(max_bytes=original)
+
+
+@pytest.mark.asyncio
+async def test_list_queue_fifo_and_empty_list_removed():
+    cache = LocalMemoryCache()
+    key = _key("queue")
+    assert await cache.rpush(key, "a", "b") == 2
+    assert await cache.rpush(key, "c") == 3
+    assert [await cache.lpop(key) for _ in range(3)] == ["a", "b", "c"]
+    assert await cache.lpop(key) is None
+    assert await cache.llen(key) == 0
+    assert not cache.data.exists(key)
+
+
+@pytest.mark.asyncio
+async def test_expired_keys_are_swept_without_access():
+    cache = LocalMemoryCache()
+    key = _key("ttl")
+    await cache.set(key, "v", ex=0.05)
+    assert await cache.ttl(key) in (0, 1)
+    time.sleep(0.08)
+    assert cache.data.sweep_expired() >= 1
+    assert not cache.data.exists(key)
+    assert await cache.get(key) is None
+
+
+@pytest.mark.asyncio
+async def test_lock_compare_and_delete_and_renew():
+    cache = LocalMemoryCache()
+    key = _key("lock")
+    assert await cache.set(key, "owner", nx=True, ex=60)
+    assert not await cache.set(key, "other", nx=True, ex=60)
+
+    assert await cache.eval(RENEW_LOCK_SCRIPT, 1, key, "other", 120) == 0
+    assert await cache.eval(RENEW_LOCK_SCRIPT, 1, key, "owner", 120) == 1
+    assert await cache.ttl(key) > 60
+
+    assert await cache.eval(CHECK_AND_DELETE_LOCK_SCRIPT, 1, key, "other") == 0
+    assert await cache.eval(CHECK_AND_DELETE_LOCK_SCRIPT, 1, key, "owner") == 1
+    assert await cache.get(key) is None
+
+    with pytest.raises(NotImplementedError):
+        await cache.eval("return 1", 0)
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction_spares_locks_and_queues(small_store):
+    cache = LocalMemoryCache()
+    small_store.configure(max_bytes=2000)
+    lock_key, queue_key = _key("lock"), _key("queue")
+    await cache.set(lock_key, "owner", nx=True, ex=60)
+    await cache.rpush(queue_key, "x" * 100)
+
+    keys = [_key(f"profile{i}") for i in range(4)]
+    for key in keys:
+        await cache.set(key, "p" * 300)
+    await cache.get(keys[0])  # keys[0] becomes most recently used
+    await cache.set(_key("big"), "p" * 600)
+
+    stats = await cache.stats()
+    assert stats["used_bytes"] <= 2000
+    assert stats["evictions"] >= 1
+    assert await cache.get(lock_key) == "owner"
+    assert await cache.llen(queue_key) == 1
+    assert await cache.get(keys[0]) is not None
+    assert await cache.get(keys[1]) is None
+
+
+@pytest.mark.asyncio
+async def test_incrby_keeps_ttl_and_counts():
+    cache = LocalMemoryCache()
+    key = _key("counter")
+    assert await cache.incrby(key, 2) == 2
+    await cache.expire(key, 100)
+    assert await cache.incrby(key) == 3
+    assert await cache.ttl(key) > 0
+    await asyncio.sleep(0)
@@ -0,0 +1,121 @@
+"""
+messages 热路径查询计划回归测试：
+确认 (session_id, deleted) 过滤 + create_time / id 排序直接走复合索引，不再出现临时 B-tree 排序。
+"""
+import pytest
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.models.chat import ChatSession, Message
+from app.models.friend import Friend
+
+
+@pytest.fixture(scope="module")
+def plan_db():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    friend = Friend(name="索引测试")
+    db.add(friend)
+    db.flush()
+    for _ in range(3):
+        session = ChatSession(friend_id=friend.id)
+        db.add(session)
+        db.flush()
+        for i in range(20):
+            db.add(Message(
+                session_id=session.id,
+                friend_id=friend.id,
+                role="user" if i % 2 == 0 else "assistant",
+                content=f"msg {i}",
+            ))
+    db.commit()
+    try:
+        yield db
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def _query_plan(db, query) -> str:
+    compiled = query.statement.compile(
+        dialect=db.get_bind().dialect, compile_kwargs={"render_postcompile": True}
+    )
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).fetchall()
+    return "\n".join(row[-1] for row in rows)
+
+
+def _assert_uses_index(plan: str, index_name: str):
+    assert index_name in plan, plan
+    assert "TEMP B-TREE" not in plan, plan
+
+
+def test_session_messages_ordered_by_create_time_use_index(plan_db):
+    # get_messages / 历史加载 / recall_message 的下一条消息查询
+    query = (
+        plan_db.query(Message)
+        .filter(Message.session_id == 1, Message.deleted == False)
+        .order_by(Message.create_time.desc(), Message.id.desc())
+        .limit(20)
+    )
+    _assert_uses_index(_query_plan(plan_db, query), "ix_messages_session_deleted_create_time")
+
+    query = (
+        plan_db.query(Message)
+        .filter(Message.session_id == 1, Message.deleted == False)
+        .order_by(Message.create_time.asc())
+    )
+    _assert_uses_index(_query_plan(plan_db, query), "ix_messages_session_deleted_create_time")
+
+
+def test_session_messages_ordered_by_id_use_index(plan_db):
+    # 智能上下文判断的最近 6 条历史
+    query = (
+        plan_db.query(Message)
+        .filter(Message.session_id == 1, Message.deleted == False)
+        .order_by(Message.id.desc())
+        .limit(6)
+    )
+    _assert_uses_index(_query_plan(plan_db, query), "ix_messages_session_deleted_id")
+
+
+def test_session_message_count_is_covered(plan_db):
+    query = plan_db.query(func.count(Message.id)).filter(
+        Message.session_id == 1, Message.deleted == False
+    )
+    plan = _query_plan(plan_db, query)
+    assert "COVERING INDEX ix_messages_session_deleted" in plan, plan
+
+
+def test_friend_messages_ordered_by_id_use_index(plan_db):
+    query = (
+        plan_db.query(Message)
+        .filter(Message.friend_id == 1, Message.deleted == False)
+        .order_by(Message.id.desc())
+        .limit(50)
+    )
+    _assert_uses_index(_query_plan(plan_db, query), "ix_messages_friend_deleted_id")
+
+
+def test_session_stats_group_by_uses_index(plan_db):
+    # get_sessions_with_stats_by_friend 中按会话聚合的子查询
+    query = (
+        plan_db.query(Message.session_id, func.max(Message.id))
+        .filter(Message.session_id.in_([1, 2, 3]), Message.deleted == False)
+        .group_by(Message.session_id)
+    )
+    _assert_uses_index(_query_plan(plan_db, query), "ix_messages_session_deleted")
+
+
+def test_group_history_keyset_uses_index(plan_db):
+    from app.models.group import GroupMessage
+
+    query = (
+        plan_db.query(GroupMessage)
+        .filter(GroupMessage.group_id == 1, GroupMessage.session_id == 1, GroupMessage.id < 100)
+        .order_by(GroupMessage.id.desc())
+        .limit(20)
+    )
+    _assert_uses_index(_query_plan(plan_db, query), "ix_group_messages_group_session_id")
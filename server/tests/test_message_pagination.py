@@ -0,0 +1,172 @@
+import pytest
+from sqlalchemy.orm import Session
+
+from app.models.chat import ChatSession, Message
+from app.models.friend import Friend
+from app.models.group import GroupMessage, GroupSession
+from app.services import chat_service
+from app.services.memo.constants import DEFAULT_USER_ID
+from app.services.message_cursor import (
+    GROUP_MESSAGE_SCOPE,
+    MAX_PAGE_LIMIT,
+    MESSAGE_SCOPE,
+    decode_cursor,
+    encode_cursor,
+)
+
+
+@pytest.fixture(scope="module")
+def friend_history(db: Session):
+    friend = Friend(name="分页测试好友")
+    db.add(friend)
+    db.flush()
+
+    live_session = ChatSession(friend_id=friend.id)
+    deleted_session = ChatSession(friend_id=friend.id, deleted=True)
+    db.add_all([live_session, deleted_session])
+    db.flush()
+
+    for i in range(5):
+        db.add(Message(session_id=deleted_session.id, friend_id=friend.id, role="user", content=f"gone {i}"))
+    for i in range(25):
+        db.add(Message(
+            session_id=live_session.id,
+            friend_id=friend.id,
+            role="user" if i % 2 == 0 else "assistant",
+            content=f"msg {i}",
+            deleted=(i == 3),
+        ))
+    db.commit()
+    return friend, live_session
+
+
+def test_cursor_round_trip_and_scope_check():
+    cursor = encode_cursor(MESSAGE_SCOPE, 42)
+    assert decode_cursor(cursor, MESSAGE_SCOPE) == 42
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, GROUP_MESSAGE_SCOPE)
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor", MESSAGE_SCOPE)
+
+
+def test_get_messages_keyset_matches_offset(db: Session, friend_history):
+    _, session = friend_history
+    all_messages = chat_service.get_messages(db, session.id, limit=100)
+    assert len(all_messages) == 24
+
+    latest = chat_service.get_messages(db, session.id, limit=10, latest=True)
+    assert [m.id for m in latest] == [m.id for m in all_messages[-10:]]
+
+    older = chat_service.get_messages(db, session.id, limit=10, before_id=latest[0].id)
+    assert [m.id for m in older] == [m.id for m in all_messages[-20:-10]]
+
+    newer = chat_service.get_messages(db, session.id, limit=5, after_id=older[-1].id)
+    assert [m.id for m in newer] == [m.id for m in latest[:5]]
+
+
+def test_friend_messages_skip_deleted_sessions(db: Session, friend_history):
+    friend, _ = friend_history
+    messages = chat_service.get_messages_by_friend(db, friend.id, limit=100)
+    assert len(messages) == 24
+    assert all(not m.content.startswith("gone") for m in messages)
+    assert [m.id for m in messages] == sorted(m.id for m in messages)
+
+
+def test_friend_messages_page_endpoint_walks_history(client, friend_history):
+    friend, _ = friend_history
+    seen = []
+    before = None
+    pages = 0
+    while True:
+        params = {"limit": 10}
+        if before:
+            params["before"] = before
+        response = client.get(f"/api/chat/friends/{friend.id}/messages/page", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        seen = [m["id"] for m in page["items"]] + seen
+        pages += 1
+        if not page["has_more"]:
+            break
+        before = page["before_cursor"]
+
+    assert pages == 3
+    assert len(seen) == 24
+    assert seen == sorted(seen)
+
+    # after 游标：从第一页的末尾继续拉取更新的消息
+    first_page = client.get(
+        f"/api/chat/friends/{friend.id}/messages/page",
+        params={"limit": 10, "after": encode_cursor(MESSAGE_SCOPE, seen[0])},
+    ).json()
+    assert [m["id"] for m in first_page["items"]] == seen[1:11]
+    assert first_page["has_more"] is True
+
+
+def test_session_messages_page_endpoint(client, friend_history):
+    _, session = friend_history
+    response = client.get(f"/api/chat/sessions/{session.id}/messages/page", params={"limit": 20})
+    assert response.status_code == 200
+    page = response.json()
+    assert len(page["items"]) == 20
+    assert page["has_more"] is True
+
+    response = client.get(
+        f"/api/chat/sessions/{session.id}/messages/page",
+        params={"limit": 20, "before": page["before_cursor"]},
+    )
+    rest = response.json()
+    assert len(rest["items"]) == 4
+    assert rest["has_more"] is False
+
+
+def test_page_endpoint_rejects_invalid_cursor(client, friend_history):
+    friend, _ = friend_history
+    response = client.get(
+        f"/api/chat/friends/{friend.id}/messages/page",
+        params={"before": encode_cursor(GROUP_MESSAGE_SCOPE, 1)},
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("limit", [0, -1, MAX_PAGE_LIMIT + 1])
+def test_page_endpoint_rejects_out_of_range_limit(client, friend_history, limit):
+    friend, session = friend_history
+    for url in (
+        f"/api/chat/friends/{friend.id}/messages/page",
+        f"/api/chat/sessions/{session.id}/messages/page",
+    ):
+        assert client.get(url, params={"limit": limit}).status_code == 422
+
+
+def test_group_messages_page_endpoint(client, db: Session):
+    group_id = client.post("/api/group/create", json={"name": "分页群", "member_ids": []}).json()["id"]
+    group_session = GroupSession(group_id=group_id)
+    db.add(group_session)
+    db.flush()
+    for i in range(15):
+        db.add(GroupMessage(
+            group_id=group_id,
+            session_id=group_session.id,
+            sender_id=DEFAULT_USER_ID,
+            sender_type="user",
+            content=f"group {i}",
+        ))
+    db.commit()
+
+    first = client.get(f"/api/group/{group_id}/messages/page", params={"limit": 10}).json()
+    assert [m["content"] for m in first["items"]] == [f"group {i}" for i in range(5, 15)]
+    assert first["has_more"] is True
+
+    second = client.get(
+        f"/api/group/{group_id}/messages/page",
+        params={"limit": 10, "before": first["before_cursor"]},
+    ).json()
+    assert [m["content"] for m in second["items"]] == [f"group {i}" for i in range(5)]
+    assert second["has_more"] is False
+
+    legacy = client.get(
+        f"/api/group/{group_id}/messages",
+        params={"limit": 3, "before_id": first["items"][0]["id"]},
+    ).json()
+    assert [m["content"] for m in legacy] == ["group 2", "group 3", "group 4"]
@@ -0,0 +1,59 @@
+import pytest
+
+from app.vendor.memobase_server.controllers import project as project_controller
+from app.vendor.memobase_server.controllers.modal.chat.utils import pack_current_user_profiles
+from app.vendor.memobase_server.models.response import UserProfilesData
+from app.vendor.memobase_server.prompts.profile_init_utils import (
+    get_profile_define_maps,
+    read_out_profile_config,
+)
+from app.vendor.memobase_server.types import UserProfileTopic
+
+CONFIG_YAML = """
+language: zh
+profile_strict_mode: true
+overwrite_user_profiles:
+  - topic: interest
+    sub_topics:
+      - name: games
+      - name: music
+        validate_value: true
+"""
+
+
+def test_parsed_config_cached_by_hash():
+    project_controller.invalidate_project_profile_config()
+    first = project_controller._parse_profile_config("p1", CONFIG_YAML)
+    assert project_controller._parse_profile_config("p1", CONFIG_YAML) is first
+    assert first.language == "zh"
+
+    changed = project_controller._parse_profile_config("p1", CONFIG_YAML + "event_tags: []\n")
+    assert changed is not first
+    assert changed.event_tags == []
+
+    project_controller.invalidate_project_profile_config("p1")
+    assert project_controller._parse_profile_config("p1", CONFIG_YAML) is not first
+    assert project_controller._parse_profile_config("p2", None).overwrite_user_profiles is None
+    project_controller.invalidate_project_profile_config()
+
+
+@pytest.mark.asyncio
+async def test_derived_structures_reused_per_config():
+    project_controller.invalidate_project_profile_config()
+    config = project_controller._parse_profile_config("p1", CONFIG_YAML)
+    defaults = [UserProfileTopic("work", sub_topics=[{"name": "title"}])]
+
+    slots = read_out_profile_config(config, defaults)
+    assert read_out_profile_config(config, defaults) is slots
+    assert [t.topic for t in slots] == ["interest"]
+
+    define_maps = get_profile_define_maps(config, slots)
+    assert get_profile_define_maps(config, slots) is define_maps
+    assert define_maps[("interest", "music")].validate_value is True
+
+    packed = await pack_current_user_profiles(UserProfilesData(profiles=[]), config)
+    packed_again = await pack_current_user_profiles(UserProfilesData(profiles=[]), config)
+    assert packed_again["project_profile_slots"] is packed["project_profile_slots"]
+    assert packed_again["allowed_topic_subtopics"] is packed["allowed_topic_subtopics"]
+    assert ("interest", "games") in packed["allowed_topic_subtopics"]
+    project_controller.invalidate_project_profile_config()
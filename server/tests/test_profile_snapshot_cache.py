@@ -0,0 +1,90 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.services.memo.bridge import MemoService, PROFILE_TEXT_CONTENT, PROFILE_TEXT_DETAILED
+from app.vendor.memobase_server.controllers import profile as profile_controller
+from app.vendor.memobase_server.models.response import ProfileData
+
+
+def _profile(content, topic, sub_topic, minutes_ago):
+    return ProfileData(
+        id=uuid.uuid4(),
+        content=content,
+        attributes={"topic": topic, "sub_topic": sub_topic},
+        created_at=datetime.now(timezone.utc),
+        updated_at=datetime.now(timezone.utc) - timedelta(minutes=minutes_ago),
+    )
+
+
+@pytest.fixture
+def profile_loader(monkeypatch):
+    user_id, project_id = str(uuid.uuid4()), "test-project"
+    rows = [
+        _profile("喜欢猫", "interest", "pets", 5),
+        _profile("程序员", "work", "title", 1),
+    ]
+    calls = []
+
+    def _load(uid, pid):
+        calls.append((uid, pid))
+        return tuple(rows)
+
+    monkeypatch.setattr(profile_controller, "_load_user_profiles", _load)
+    yield user_id, project_id, rows, calls
+    profile_controller.bump_user_profile_version(user_id, project_id)
+
+
+@pytest.mark.asyncio
+async def test_snapshot_served_from_memory_until_version_bump(profile_loader):
+    user_id, project_id, rows, calls = profile_loader
+
+    first = (await profile_controller.get_user_profile_snapshot(user_id, project_id)).data()
+    second = (await profile_controller.get_user_profile_snapshot(user_id, project_id)).data()
+    assert first is second
+    assert len(calls) == 1
+
+    await profile_controller.refresh_user_profile_cache(user_id, project_id)
+    rows.append(_profile("住在上海", "basic_info", "city", 0))
+    third = (await profile_controller.get_user_profile_snapshot(user_id, project_id)).data()
+    assert third.version > first.version
+    assert len(third.profiles) == 3
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_returned_data_is_a_copy(profile_loader):
+    user_id, project_id, _, _ = profile_loader
+    data = (await profile_controller.get_user_profiles(user_id, project_id)).data()
+    truncated = (await profile_controller.truncate_profiles(data, topk=1)).data()
+    assert len(truncated.profiles) == 1
+
+    snapshot = (await profile_controller.get_user_profile_snapshot(user_id, project_id)).data()
+    assert len(snapshot.profiles) == 2
+
+
+@pytest.mark.asyncio
+async def test_mutating_returned_attributes_leaves_snapshot_intact(profile_loader):
+    user_id, project_id, _, _ = profile_loader
+    data = (await profile_controller.get_user_profiles(user_id, project_id)).data()
+    # merge 会原地累加 update_hits
+    data.profiles[0].attributes["update_hits"] = 5
+    data.profiles[0].content = "changed"
+
+    snapshot = (await profile_controller.get_user_profile_snapshot(user_id, project_id)).data()
+    assert all("update_hits" not in p.attributes for p in snapshot.profiles)
+    assert "changed" not in [p.content for p in snapshot.profiles]
+
+
+@pytest.mark.asyncio
+async def test_rendered_profile_text_cached_per_style(profile_loader):
+    user_id, project_id, _, _ = profile_loader
+
+    detailed = await MemoService.get_user_profile_text(user_id, project_id, style=PROFILE_TEXT_DETAILED)
+    assert detailed == "- interest\tpets\t喜欢猫\n- work\ttitle\t程序员"
+    content = await MemoService.get_user_profile_text(user_id, project_id, style=PROFILE_TEXT_CONTENT)
+    assert content == "- 喜欢猫\n- 程序员"
+
+    snapshot = (await profile_controller.get_user_profile_snapshot(user_id, project_id)).data()
+    assert snapshot._rendered[PROFILE_TEXT_DETAILED] is detailed
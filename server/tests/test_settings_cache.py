@@ -0,0 +1,80 @@
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.services.settings_service import SettingsService, settings_cache
+
+
+@pytest.fixture
+def cached_db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'settings.db'}")
+    Base.metadata.create_all(bind=engine)
+    settings_cache.enable(engine)
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        if "system_settings" in statement and statement.lstrip().upper().startswith("SELECT"):
+            statements.append(statement)
+
+    db = sessionmaker(bind=engine, autoflush=False)()
+    try:
+        yield db, statements
+    finally:
+        db.close()
+        settings_cache.disable(engine)
+        engine.dispose()
+
+
+def test_group_loaded_once_then_served_from_cache(cached_db):
+    db, statements = cached_db
+    SettingsService.set_setting(db, "memory", "event_topk", 5, "int")
+    SettingsService.set_setting(db, "memory", "similarity_threshold", 0.5, "float")
+    statements.clear()
+
+    assert SettingsService.get_setting(db, "memory", "event_topk") == 5
+    assert SettingsService.get_setting(db, "memory", "similarity_threshold") == 0.5
+    assert SettingsService.get_setting(db, "memory", "missing", "fallback") == "fallback"
+    assert SettingsService.get_settings_by_group(db, "memory") == {
+        "event_topk": 5,
+        "similarity_threshold": 0.5,
+    }
+    assert len(statements) == 1
+
+
+def test_set_setting_writes_through(cached_db):
+    db, statements = cached_db
+    SettingsService.set_setting(db, "session", "passive_timeout", 1800, "int")
+    assert SettingsService.get_setting(db, "session", "passive_timeout") == 1800
+
+    version = settings_cache.version
+    SettingsService.set_setting(db, "session", "passive_timeout", 60)
+    assert settings_cache.version > version
+    statements.clear()
+    assert SettingsService.get_setting(db, "session", "passive_timeout") == 60
+    assert statements == []
+
+
+def test_bulk_update_and_snapshot_isolation(cached_db):
+    db, _ = cached_db
+    SettingsService.set_settings(db, "voice", {"provider": "aliyun_bailian", "emotion_enhance_enabled": False})
+    snapshot = SettingsService.snapshot(db, "voice", "memory")
+    assert snapshot.get("voice", "provider") == "aliyun_bailian"
+    assert snapshot.group("memory") == {}
+
+    SettingsService.set_settings(db, "voice", {"provider": "other", "emotion_enhance_enabled": True})
+    # 旧快照保持不变，新快照看到新值与更高的版本号
+    assert snapshot.get("voice", "provider") == "aliyun_bailian"
+    fresh = SettingsService.snapshot(db, "voice")
+    assert fresh.get("voice", "provider") == "other"
+    assert fresh.get("voice", "emotion_enhance_enabled") is True
+    assert fresh.version > snapshot.version
+    with pytest.raises(TypeError):
+        fresh.group("voice")["provider"] = "mutated"
+
+
+def test_bulk_endpoint_updates_cached_values(client, db):
+    response = client.post("/api/settings/memory/bulk", json={"settings": {"event_topk": 9}})
+    assert response.status_code == 200
+    assert client.get("/api/settings/memory/event_topk").json() == 9
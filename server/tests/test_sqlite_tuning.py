@@ -0,0 +1,53 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.db.sqlite_tuning import (
+    get_sqlite_pragmas,
+    get_sqlite_status,
+    install_sqlite_tuning,
+    run_sqlite_maintenance,
+)
+
+
+def test_install_sqlite_tuning_applies_pragmas(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'tuning.db'}")
+    install_sqlite_tuning(engine, [
+        ("busy_timeout", 4321),
+        ("journal_mode", "WAL"),
+        ("synchronous", "NORMAL"),
+        ("cache_size", -2048),
+        ("temp_store", "MEMORY"),
+    ])
+    try:
+        status = get_sqlite_status(engine)
+        assert status["journal_mode"] == "wal"
+        assert status["synchronous"] == "NORMAL"
+        assert status["cache_size"] == -2048
+        assert status["temp_store"] == "MEMORY"
+        assert status["busy_timeout"] == 4321
+    finally:
+        engine.dispose()
+
+
+def test_run_sqlite_maintenance_checkpoints_wal(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'maintenance.db'}")
+    install_sqlite_tuning(engine, get_sqlite_pragmas())
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT)"))
+            conn.execute(text("INSERT INTO t (v) VALUES ('a'), ('b')"))
+
+        result = run_sqlite_maintenance(engine, tag="test")
+        assert result is not None
+        assert result["busy"] == 0
+        assert result["checkpointed_frames"] == result["wal_frames"]
+    finally:
+        engine.dispose()
+
+
+def test_health_reports_sqlite_settings(client: TestClient):
+    response = client.get("/api/health")
+    assert response.status_code == 200
+    sqlite_info = response.json()["sqlite"]
+    assert sqlite_info["configured"]["journal_mode"] == "WAL"
+    assert "main" in sqlite_info
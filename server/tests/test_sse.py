@@ -0,0 +1,72 @@
+import asyncio
+import gzip
+import json
+
+import pytest
+
+from app.core import sse
+
+
+async def _source(events, delays=None):
+    for i, event in enumerate(events):
+        if delays and delays[i]:
+            await asyncio.sleep(delays[i])
+        yield event
+
+
+def _parse(chunks):
+    out = []
+    for frame in b"".join(chunks).decode("utf-8").split("\n\n"):
+        if not frame:
+            continue
+        head, data = frame.split("\n", 1)
+        out.append((head[len("event: "):], json.loads(data[len("data: "):])))
+    return out
+
+
+async def _collect(stream):
+    return [chunk async for chunk in stream]
+
+
+@pytest.mark.asyncio
+async def test_adjacent_deltas_are_coalesced_in_order():
+    events = [{"event": "start", "data": {"message_id": 1}}]
+    events += [{"event": "message", "data": {"delta": c}} for c in "你好世界"]
+    events += [
+        {"event": "message", "data": {"delta": "A", "sender_id": "1"}},
+        {"event": "message", "data": {"delta": "B", "sender_id": "2"}},
+        {"event": "done", "data": {"content": "你好世界"}},
+    ]
+    chunks = await _collect(sse.iter_sse(_source(events), window_ms=1000, max_chars=256))
+    assert _parse(chunks) == [
+        ("start", {"message_id": 1}),
+        ("message", {"delta": "你好世界"}),
+        ("message", {"delta": "A", "sender_id": "1"}),
+        ("message", {"delta": "B", "sender_id": "2"}),
+        ("done", {"content": "你好世界"}),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_window_and_size_limits_flush_pending_delta():
+    events = [{"event": "message", "data": {"delta": "a"}}, {"event": "message", "data": {"delta": "b"}}]
+    chunks = await _collect(sse.iter_sse(_source(events, delays=[0, 0.05]), window_ms=10, max_chars=256))
+    assert [data["delta"] for _, data in _parse(chunks)] == ["a", "b"]
+
+    events = [{"event": "model_thinking", "data": {"delta": "xy"}} for _ in range(3)]
+    chunks = await _collect(sse.iter_sse(_source(events), window_ms=1000, max_chars=4))
+    assert [data["delta"] for _, data in _parse(chunks)] == ["xyxy", "xy"]
+
+    chunks = await _collect(sse.iter_sse(_source(events), window_ms=0))
+    assert len(_parse(chunks)) == 3
+
+
+def test_encode_event_keeps_non_ascii_and_non_str_keys():
+    raw = sse.encode_event("done", {"content": "中文", 1: "x"})
+    assert raw == 'event: done\ndata: {"content":"中文","1":"x"}\n\n'.encode("utf-8")
+
+
+@pytest.mark.asyncio
+async def test_gzip_stream_is_decodable_per_flush():
+    chunks = await _collect(sse._gzip_stream(_source([b"event: a\ndata: {}\n\n", b"event: b\ndata: {}\n\n"])))
+    assert gzip.decompress(b"".join(chunks)) == b"event: a\ndata: {}\n\nevent: b\ndata: {}\n\n"
@@ -0,0 +1,74 @@
+from app.services.stream_parser import (
+    KIND_MESSAGE,
+    KIND_THINKING,
+    StreamChunk,
+    StreamParser,
+    strip_message_tags,
+)
+
+
+def _feed_all(parser, deltas):
+    chunks = []
+    for delta in deltas:
+        chunks.extend(parser.feed(delta))
+    chunks.extend(parser.finish())
+    return chunks
+
+
+def _text(chunks, kind):
+    return "".join(c.text for c in chunks if c.kind == kind)
+
+
+def test_think_tags_split_across_deltas():
+    text = "<think>想一想</think><message>你好</message><message>再见</message>"
+    for size in (1, 2, 3, 7):
+        parser = StreamParser(enable_thinking=True)
+        chunks = _feed_all(parser, [text[i:i + size] for i in range(0, len(text), size)])
+        assert _text(chunks, KIND_THINKING) == "想一想"
+        assert _text(chunks, KIND_MESSAGE) == "<message>你好</message><message>再见</message>"
+        assert parser.drain_segments() == ["你好", "再见"]
+        assert parser.raw_length == len(text)
+
+
+def test_message_text_streams_without_waiting_for_end():
+    parser = StreamParser(enable_thinking=False)
+    chunks = parser.feed("<message>你好")
+    assert [(c.kind, c.text) for c in chunks] == [(KIND_MESSAGE, "<message>你好")]
+    # 疑似半截标签暂扣，随后补齐
+    assert parser.feed("，世界</mes") == [StreamChunk(KIND_MESSAGE, "，世界")]
+    assert parser.drain_segments() == []
+    parser.feed("sage>")
+    assert parser.drain_segments() == ["你好，世界"]
+    assert parser.drain_segments() == []
+
+
+def test_reasoning_channel_suppresses_think_fallback():
+    parser = StreamParser(enable_thinking=True, defer_thinking=True)
+    assert parser.feed("<think>fallback") == []
+    assert parser.feed_reasoning("real reasoning") == "real reasoning"
+    chunks = _feed_all(parser, ["</think>answer"])
+    assert [(c.kind, c.text) for c in chunks] == [(KIND_MESSAGE, "answer")]
+
+    parser = StreamParser(enable_thinking=True, defer_thinking=True)
+    chunks = _feed_all(parser, ["<think>a", "b</think>ok"])
+    assert [(c.kind, c.text) for c in chunks] == [(KIND_MESSAGE, "ok"), (KIND_THINKING, "ab")]
+
+
+def test_final_content_sanitizes_tags():
+    parser = StreamParser(enable_thinking=False)
+    _feed_all(parser, ["<think>x</think>", "<message> 一 </message><message>二</message>"])
+    assert parser.final_content() == "<message> 一 </message><message>二</message>"
+    assert parser.final_content(sanitize_message_tags=True) == "一 二"
+
+    parser = StreamParser(enable_thinking=False)
+    _feed_all(parser, ["<think>only thinking"])
+    assert parser.message_text == ""
+    assert parser.final_content() == "only thinking"
+    assert strip_message_tags("<message>半截") == "半截"
+
+
+def test_plain_text_without_tags_is_one_segment():
+    parser = StreamParser(enable_thinking=False)
+    chunks = _feed_all(parser, ["a < b", " and 1<2"])
+    assert _text(chunks, KIND_MESSAGE) == "a < b and 1<2"
+    assert parser.drain_segments() == ["a < b and 1<2"]
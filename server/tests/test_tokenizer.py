@@ -0,0 +1,44 @@
+import threading
+
+import pytest
+
+from app.vendor.memobase_server import tokenizer
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache():
+    tokenizer.clear_count_cache()
+    yield
+    tokenizer.clear_count_cache()
+
+
+@pytest.mark.asyncio
+async def test_batch_counts_match_sync_and_encode_off_loop(monkeypatch):
+    encode_threads = []
+    original = tokenizer._encode_ordinary_batch
+
+    def _tracking(contents):
+        encode_threads.append(threading.current_thread().name)
+        return original(contents)
+
+    monkeypatch.setattr(tokenizer, "_encode_ordinary_batch", _tracking)
+    texts = ["hello world", "", "你好，世界", "hello world"]
+    counts = await tokenizer.count_tokens_batch(texts)
+
+    assert counts[1] == 0
+    assert counts[0] == counts[3]
+    assert len(encode_threads) == 1
+    assert encode_threads[0].startswith("memobase-tokenize")
+    assert counts == [tokenizer.count_tokens(t) for t in texts]
+    assert len(encode_threads) == 1  # 第二轮全部命中缓存
+
+
+@pytest.mark.asyncio
+async def test_special_token_text_does_not_raise():
+    assert await tokenizer.count_tokens_async("before <|endoftext|> after") > 0
+
+
+def test_approx_token_count():
+    assert tokenizer.approx_token_count("") == 0
+    assert tokenizer.approx_token_count("你好世界") == 4
+    assert tokenizer.approx_token_count("a" * 40) == 10
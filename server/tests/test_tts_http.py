@@ -0,0 +1,59 @@
+import asyncio
+import os
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.services import tts_http
+from app.services.tts_http import TtsHttpPool, download_to_file, provider_for
+
+
+def test_provider_for_and_limits(monkeypatch):
+    assert provider_for("https://dashscope.aliyuncs.com/api/v1") == "dashscope"
+    assert provider_for("https://dashscope-intl.aliyuncs.com/api/v1") == "dashscope"
+    assert provider_for("https://tts.example.com/v1") == "tts.example.com"
+    assert provider_for(None) == "default"
+
+    monkeypatch.setattr(settings, "TTS_MAX_PARALLELISM", 3)
+    monkeypatch.setattr(settings, "TTS_PROVIDER_PARALLELISM", {"dashscope": 5})
+    assert tts_http.provider_parallelism("dashscope") == 5
+    assert tts_http.provider_parallelism("tts.example.com") == 3
+
+
+@pytest.mark.asyncio
+async def test_pool_shares_client_and_provider_limiter():
+    pool = TtsHttpPool()
+    try:
+        assert pool.client() is pool.client()
+        a = pool.limiter("https://dashscope.aliyuncs.com/api/v1")
+        b = pool.limiter("https://dashscope-intl.aliyuncs.com/api/v1")
+        c = pool.limiter("https://tts.example.com")
+        assert a is b and a is not c
+    finally:
+        await pool.aclose()
+
+
+@pytest.mark.asyncio
+async def test_download_streams_chunks_to_file(tmp_path):
+    body = os.urandom(200_000)
+
+    async def _chunks():
+        for i in range(0, len(body), 7_000):
+            await asyncio.sleep(0)
+            yield body[i:i + 7_000]
+
+    def _handler(request):
+        if request.url.path == "/missing":
+            return httpx.Response(404, json={"message": "gone"})
+        return httpx.Response(200, headers={"content-type": "audio/wav"}, content=_chunks())
+
+    dest = tmp_path / "seg.part"
+    async with httpx.AsyncClient(transport=httpx.MockTransport(_handler)) as client:
+        content_type = await download_to_file(client, "https://cdn.example.com/a.wav", str(dest), chunk_bytes=16_384)
+        assert content_type == "audio/wav"
+        assert dest.read_bytes() == body
+
+        with pytest.raises(httpx.HTTPStatusError) as exc_info:
+            await download_to_file(client, "https://cdn.example.com/missing", str(tmp_path / "x.part"))
+        assert exc_info.value.response.json() == {"message": "gone"}
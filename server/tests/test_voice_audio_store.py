@@ -0,0 +1,119 @@
+import asyncio
+import os
+
+import pytest
+
+from app.services import voice_audio_store as store_module
+from app.services.voice_audio_store import VoiceAudioStore, audio_key, key_from_url
+
+
+def _key(text, instruction=None):
+    return audio_key(model="qwen3-tts", voice_id="v1", text=text, instruction=instruction, language="Chinese")
+
+
+def test_key_depends_on_every_field():
+    base = _key("晚安")
+    assert base == _key("晚安")
+    assert base != _key("晚安", instruction="温柔")
+    assert base != audio_key(model="qwen3-tts", voice_id="v2", text="晚安", instruction=None, language="Chinese")
+    assert key_from_url(f"/uploads/audio/cas/{base[:2]}/{base}.wav") == base
+    assert key_from_url("/uploads/audio/20260101/msg1_seg0_abcd.wav") is None
+
+
+@pytest.mark.asyncio
+async def test_get_or_create_dedupes_concurrent_and_repeat_calls(tmp_path):
+    store = VoiceAudioStore(root=str(tmp_path))
+    key = _key("哈哈")
+    calls = []
+
+    async def _create():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        temp = store.temp_path(key, ".wav")
+        with open(temp, "wb") as f:
+            f.write(b"RIFF")
+        return store.commit(key, ".wav", temp)
+
+    results = await asyncio.gather(*(store.get_or_create(key, _create) for _ in range(3)))
+    assert len(calls) == 1
+    assert sorted(hit for _, hit in results) == [False, True, True]
+    (path, url), hit = await store.get_or_create(key, _create)
+    assert hit and len(calls) == 1
+    assert url == f"/api/voice/audio/cas/{key[:2]}/{key}.wav"
+    assert os.path.exists(path)
+    assert not [p for p in os.listdir(os.path.dirname(path)) if p.endswith(".part")]
+
+
+@pytest.mark.asyncio
+async def test_quota_sweep_keeps_referenced_and_evicts_lru(tmp_path, monkeypatch):
+    store = VoiceAudioStore(root=str(tmp_path))
+    monkeypatch.setattr(store_module.settings, "VOICE_AUDIO_CACHE_MAX_BYTES", 10**9)
+    keys = [_key(f"句子{i}") for i in range(3)]
+    for i, key in enumerate(keys):
+        temp = store.temp_path(key, ".mp3")
+        with open(temp, "wb") as f:
+            f.write(b"x" * 100)
+        path, _ = store.commit(key, ".mp3", temp)
+        os.utime(path, (1000 + i, 1000 + i))
+
+    monkeypatch.setattr(store_module.settings, "VOICE_AUDIO_CACHE_MAX_BYTES", 150)
+    # keys[0] 最旧但仍被消息引用，应淘汰 keys[1]、keys[2] 直到满足配额
+    stats = await store.enforce_quota(referenced={keys[0]})
+    assert stats["removed"] == 2
+    assert store.lookup(keys[0]) is not None
+    assert store.lookup(keys[1]) is None and store.lookup(keys[2]) is None
+    assert store.total_bytes() == 100
+
+
+def _commit_bytes(store, text, size):
+    key = _key(text)
+    temp = store.temp_path(key, ".mp3")
+    with open(temp, "wb") as f:
+        f.write(b"x" * size)
+    store.commit(key, ".mp3", temp)
+    return key
+
+
+@pytest.mark.asyncio
+async def test_gc_backs_off_when_everything_left_is_referenced(tmp_path, monkeypatch):
+    store = VoiceAudioStore(root=str(tmp_path))
+    monkeypatch.setattr(store_module.settings, "VOICE_AUDIO_CACHE_MAX_BYTES", 1000)
+    sweeps = []
+
+    async def _fake_enforce(referenced=None):
+        # 所有文件都仍被消息引用
+        sweeps.append(store.total_bytes())
+        return store._sweep({key for key, *_ in store._iter_files()}, 1000)
+
+    monkeypatch.setattr(store, "enforce_quota", _fake_enforce)
+    _commit_bytes(store, "a", 1100)
+    await asyncio.sleep(0)
+    assert len(sweeps) == 1
+
+    # 全部被引用仍超配额：小幅增长不再触发扫描
+    _commit_bytes(store, "b", 10)
+    await asyncio.sleep(0)
+    assert len(sweeps) == 1
+
+    # 增长超过配额的 GC_RETRY_GROWTH_RATIO 后重新扫描
+    _commit_bytes(store, "c", 60)
+    await asyncio.sleep(0)
+    assert len(sweeps) == 2
+
+
+@pytest.mark.asyncio
+async def test_sweep_removes_stale_part_files(tmp_path, monkeypatch):
+    store = VoiceAudioStore(root=str(tmp_path))
+    key = _key("残留")
+    stale = store.temp_path(key, ".wav")
+    fresh = stale + ".fresh.part"
+    for path in (stale, fresh):
+        with open(path, "wb") as f:
+            f.write(b"half")
+    old = store_module.time.time() - store_module.STALE_TEMP_SECONDS - 10
+    os.utime(stale, (old, old))
+
+    stats = await store.enforce_quota(referenced=set())
+    assert stats["stale_temps"] == 1
+    assert not os.path.exists(stale)
+    assert os.path.exists(fresh)
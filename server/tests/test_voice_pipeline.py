@@ -0,0 +1,189 @@
+import asyncio
+import random
+
+import pytest
+
+from app.services import voice_message_service as vms
+from app.services.stream_parser import StreamParser
+from app.services.voice_message_service import VoicePipeline, parse_message_segments
+
+SAMPLES = [
+    "",
+    "  没有标签的回复  ",
+    "<message>你好</message>\n<message>再见</message>",
+    "<message>第一段</message>杂项<message>第二段",
+    "<message></message>",
+    "前缀<message>a<message>b</message>c</message><message> d </message>",
+    "</message>先闭合<message>x</message>",
+]
+
+
+def _segment_incrementally(text, rng):
+    parser = StreamParser(enable_thinking=False)
+    out, pos = [], 0
+    while pos < len(text):
+        step = rng.randint(1, 6)
+        parser.feed(text[pos:pos + step])
+        out.extend(parser.drain_segments())
+        pos += step
+    parser.finish()
+    out.extend(parser.drain_segments())
+    return out
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_stream_parser_segments_match_batch_parser(text):
+    rng = random.Random(42)
+    for _ in range(20):
+        assert _segment_incrementally(text, rng) == parse_message_segments(text)
+
+
+def _pipeline(ready):
+    async def _on_ready(segment):
+        ready.append(segment["segment_index"])
+
+    return VoicePipeline(
+        None,
+        runtime_config={"model": "m", "base_url": "b", "api_key": "k", "emotion_enhance_enabled": False},
+        voice_id="v",
+        message_id=1,
+        message_scope="single",
+        on_segment_ready=_on_ready,
+    )
+
+
+@pytest.mark.asyncio
+async def test_pipeline_dispatches_while_streaming_and_emits_in_order(monkeypatch):
+    started = []
+    delays = {"一": 0.05, "二": 0.0, "三": 0.01}
+
+    async def _fake_synth(client, text, index, **kwargs):
+        started.append(text)
+        await asyncio.sleep(delays.get(text, 0))
+        if text == "三":
+            raise RuntimeError("tts failed")
+        return {"segment_index": index, "text": text, "audio_url": f"/a/{index}", "duration_sec": 1}
+
+    async def _no_emotion(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(vms, "_synthesize_single_segment", _fake_synth)
+    monkeypatch.setattr(vms, "_generate_tts_emotion_instruction", _no_emotion)
+
+    ready = []
+    pipeline = _pipeline(ready)
+    parser = StreamParser(enable_thinking=False)
+
+    def _stream(text):
+        parser.feed(text)
+        pipeline.add_segments(parser.drain_segments())
+
+    _stream("<message>一</mess")
+    assert pipeline.dispatched == 0
+    _stream("age><message>二</message>")
+    assert pipeline.dispatched == 2
+    await asyncio.sleep(0.01)
+    assert started == ["一", "二"]
+    assert ready == []  # 分段 0 未完成前，分段 1 不会先回调
+
+    _stream("<message>三</message><message>四")
+    parser.finish()
+    pipeline.add_segments(parser.drain_segments())
+    payload = await pipeline.finish()
+
+    assert ready == [0, 1, 3]
+    assert [s["segment_index"] for s in payload["segments"]] == [0, 1, 3]
+    assert payload["voice_id"] == "v"
+
+
+@pytest.mark.asyncio
+async def test_pipeline_aclose_cancels_pending(monkeypatch):
+    cancelled = []
+
+    async def _slow_synth(client, text, index, **kwargs):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(index)
+            raise
+
+    async def _no_emotion(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(vms, "_synthesize_single_segment", _slow_synth)
+    monkeypatch.setattr(vms, "_generate_tts_emotion_instruction", _no_emotion)
+
+    pipeline = _pipeline([])
+    pipeline.add_segments(["一"])
+    await asyncio.sleep(0)
+    await asyncio.wait_for(pipeline.aclose(), 1)
+    assert cancelled == [0]
+
+
+@pytest.fixture
+def _emotion_cache():
+    vms.emotion_instruction_cache.clear()
+    yield vms.emotion_instruction_cache
+    vms.emotion_instruction_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_speculative_first_segment_uses_cached_default(monkeypatch, _emotion_cache):
+    used = {}
+
+    async def _fake_synth(client, text, index, *, emotion_instruction=None, **kwargs):
+        used[index] = emotion_instruction
+        return {"segment_index": index, "text": text, "audio_url": f"/a/{index}", "duration_sec": 1}
+
+    async def _slow_emotion(*args, **kwargs):
+        await asyncio.sleep(0.02)
+        return "开心地说"
+
+    monkeypatch.setattr(vms, "_synthesize_single_segment", _fake_synth)
+    monkeypatch.setattr(vms, "_generate_tts_emotion_instruction", _slow_emotion)
+    _emotion_cache.put("friend:7", "old-context", "平静地说")
+
+    pipeline = VoicePipeline(
+        None,
+        runtime_config={
+            "model": "qwen3-tts-instruct-flash",
+            "base_url": "b",
+            "api_key": "k",
+            "emotion_enhance_enabled": True,
+        },
+        voice_id="v",
+        message_id=1,
+        message_scope="single",
+        friend_id=7,
+    )
+    pipeline.add_segments(["一", "二", "三"])
+    await pipeline.finish()
+
+    assert used == {0: "平静地说", 1: "开心地说", 2: "开心地说"}
+
+
+@pytest.mark.asyncio
+async def test_emotion_instruction_cached_per_speaker_context_and_reply(monkeypatch, _emotion_cache):
+    monkeypatch.setattr(vms, "_build_tts_emotion_context_with_scope", lambda *args: "用户: 今天好累")
+
+    def _no_llm(*args, **kwargs):
+        raise AssertionError("LLM should not be called on cache hit")
+
+    monkeypatch.setattr(vms, "_resolve_emotion_llm_config", _no_llm)
+    context_hash = vms.EmotionInstructionCache.context_hash("用户: 今天好累", "辛苦啦")
+    _emotion_cache.put("friend:7", context_hash, "温柔地安慰")
+
+    kwargs = dict(
+        content="<message>辛苦啦</message>",
+        message_id=1,
+        message_scope="single",
+        runtime_config={"model": "qwen3-tts-instruct-flash", "emotion_enhance_enabled": True},
+    )
+    assert await vms._generate_tts_emotion_instruction(None, speaker_key="friend:7", **kwargs) == "温柔地安慰"
+    with pytest.raises(AssertionError):
+        await vms._generate_tts_emotion_instruction(None, speaker_key="friend:8", **kwargs)
+    # 同样的上下文、不同的回复不能复用指令
+    with pytest.raises(AssertionError):
+        await vms._generate_tts_emotion_instruction(
+            None, speaker_key="friend:7", **{**kwargs, "content": "<message>哈哈哈</message>"}
+        )
@@ -0,0 +1,128 @@
+import os
+import struct
+import wave
+
+import pytest
+
+from app.core.config import settings
+from app.services import voice_transcode
+from app.services.voice_audio_store import voice_audio_store
+
+
+def _ogg_page(granule: int, payload: bytes, header_type: int = 0) -> bytes:
+    # 只需页头的 capture pattern 与 granule position，CRC 不参与时长计算
+    header = b"OggS" + bytes([0, header_type]) + struct.pack("<qIII", granule, 1, 0, 0)
+    return header + bytes([1, len(payload)]) + payload
+
+
+def _write_opus(path, pre_skip: int, last_granule: int) -> None:
+    opus_head = b"OpusHead" + bytes([1, 1]) + struct.pack("<HIhB", pre_skip, 48000, 0, 0)
+    with open(path, "wb") as f:
+        f.write(_ogg_page(0, opus_head, header_type=2))
+        f.write(_ogg_page(0, b"OpusTags"))
+        f.write(_ogg_page(last_granule // 2, b"\x00" * 10))
+        f.write(_ogg_page(last_granule, b"\x00" * 10, header_type=4))
+
+
+def _write_wav(path, seconds: float, rate: int = 16000) -> None:
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(b"\x00\x00" * int(rate * seconds))
+
+
+def test_exact_duration_from_encoded_streams(tmp_path):
+    ogg = tmp_path / "a.ogg"
+    _write_opus(ogg, pre_skip=312, last_granule=312 + 48000 * 2 + 24000)
+    assert voice_transcode.audio_duration_seconds(str(ogg)) == pytest.approx(2.5)
+
+    wav_path = tmp_path / "a.wav"
+    _write_wav(wav_path, 1.25)
+    assert voice_transcode.audio_duration_seconds(str(wav_path)) == pytest.approx(1.25)
+
+    not_ogg = tmp_path / "b.ogg"
+    not_ogg.write_bytes(b"ID3 not an ogg stream")
+    assert voice_transcode.audio_duration_seconds(str(not_ogg)) is None
+
+
+@pytest.mark.asyncio
+async def test_transcode_skipped_without_encoder(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "VOICE_FFMPEG_PATH", str(tmp_path / "missing-ffmpeg"))
+    src = tmp_path / "a.wav"
+    _write_wav(src, 0.5)
+    assert await voice_transcode.transcode_to_opus(str(src), str(tmp_path / "a.ogg")) is None
+    assert not (tmp_path / "a.ogg").exists()
+
+
+def _fake_encoder(tmp_path, body: str) -> str:
+    # 模拟 ffmpeg：最后一个参数是输出路径
+    script = tmp_path / "fake-ffmpeg"
+    script.write_text("#!/bin/sh\nfor last; do :; done\n" + body)
+    script.chmod(0o755)
+    return str(script)
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(os.name == "nt", reason="needs a POSIX shell")
+async def test_transcode_runs_encoder_as_async_subprocess(tmp_path, monkeypatch):
+    encoded = tmp_path / "encoded.ogg"
+    _write_opus(encoded, pre_skip=312, last_granule=312 + 48000)
+    monkeypatch.setattr(settings, "VOICE_TRANSCODE_OPUS", True)
+    monkeypatch.setattr(settings, "VOICE_FFMPEG_PATH", _fake_encoder(tmp_path, f'cp "{encoded}" "$last"\n'))
+    src = tmp_path / "a.wav"
+    _write_wav(src, 1.0)
+
+    result = await voice_transcode.transcode_to_opus(str(src), str(tmp_path / "a.ogg"))
+    assert result == (str(tmp_path / "a.ogg"), pytest.approx(1.0))
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(os.name == "nt", reason="needs a POSIX shell")
+async def test_failed_transcode_removes_partial_output(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "VOICE_TRANSCODE_OPUS", True)
+    monkeypatch.setattr(
+        settings, "VOICE_FFMPEG_PATH", _fake_encoder(tmp_path, 'echo partial > "$last"\necho boom >&2\nexit 1\n')
+    )
+    src = tmp_path / "a.wav"
+    _write_wav(src, 0.5)
+
+    assert await voice_transcode.transcode_to_opus(str(src), str(tmp_path / "a.ogg")) is None
+    assert not (tmp_path / "a.ogg").exists()
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(voice_transcode.find_encoder() is None, reason="ffmpeg not installed")
+async def test_transcode_wav_to_opus(tmp_path):
+    src = tmp_path / "a.wav"
+    _write_wav(src, 1.5)
+    result = await voice_transcode.transcode_to_opus(str(src), str(tmp_path / "a.ogg"))
+    assert result is not None
+    dst, duration = result
+    assert duration == pytest.approx(1.5, abs=0.05)
+    assert os.path.getsize(dst) < os.path.getsize(src)
+
+
+def test_voice_audio_endpoint_supports_range_and_caching(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(voice_audio_store, "_root", str(tmp_path))
+    key = "ab" + "0" * 62
+    os.makedirs(tmp_path / "ab")
+    body = bytes(range(256)) * 4
+    (tmp_path / "ab" / f"{key}.ogg").write_bytes(body)
+    url = f"{settings.API_STR}/voice/audio/cas/ab/{key}.ogg"
+
+    full = client.get(url)
+    assert full.status_code == 200
+    assert full.content == body
+    assert full.headers["content-type"] == "audio/ogg"
+    assert "immutable" in full.headers["cache-control"]
+    assert full.headers["accept-ranges"] == "bytes"
+
+    partial = client.get(url, headers={"Range": "bytes=100-199"})
+    assert partial.status_code == 206
+    assert partial.content == body[100:200]
+    assert partial.headers["content-range"] == f"bytes 100-199/{len(body)}"
+
+    assert client.get(url, headers={"If-None-Match": f'"{key}"'}).status_code == 304
+    assert client.get(f"{settings.API_STR}/voice/audio/cas/cd/{key}.ogg").status_code == 404
+    assert client.get(f"{settings.API_STR}/voice/audio/cas/ab/..%2F..%2Fdoudou.db").status_code == 404
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.db.write_queue import SQLiteWriter
+
+
+def _make_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'writer.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT NOT NULL)"))
+    return engine
+
+
+def _insert(value):
+    def _fn(session):
+        return session.execute(text("INSERT INTO t (v) VALUES (:v)"), {"v": value}).lastrowid
+    return _fn
+
+
+def _count(engine):
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT COUNT(*) FROM t")).scalar()
+
+
+@pytest.mark.asyncio
+async def test_writer_group_commits_concurrent_writes(tmp_path):
+    engine = _make_engine(tmp_path)
+    writer = SQLiteWriter(engine, "test", batch_window_ms=20, max_batch_size=64)
+    await writer.start()
+    try:
+        ids = await asyncio.gather(*[writer.write(_insert(f"v{i}")) for i in range(10)])
+        assert len(set(ids)) == 10
+        assert _count(engine) == 10
+        assert writer.stats["jobs"] == 10
+        assert writer.stats["commits"] < 10
+    finally:
+        await writer.stop()
+        engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_writer_isolates_failing_job(tmp_path):
+    engine = _make_engine(tmp_path)
+    writer = SQLiteWriter(engine, "test", batch_window_ms=20)
+    await writer.start()
+    try:
+        results = await asyncio.gather(
+            writer.write(_insert("ok-1")),
+            writer.write(_insert(None)),
+            writer.write(_insert("ok-2")),
+            return_exceptions=True,
+        )
+        assert isinstance(results[1], Exception)
+        assert not isinstance(results[0], Exception)
+        assert not isinstance(results[2], Exception)
+        assert _count(engine) == 2
+        assert writer.stats["failed_jobs"] == 1
+    finally:
+        await writer.stop()
+        engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_writer_runs_inline_when_not_started(tmp_path):
+    engine = _make_engine(tmp_path)
+    writer = SQLiteWriter(engine, "test")
+    try:
+        await writer.write(_insert("inline"))
+        assert _count(engine) == 1
+        assert not writer.running
+    finally:
+        engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_writer_drains_queue_on_stop(tmp_path):
+    engine = _make_engine(tmp_path)
+    writer = SQLiteWriter(engine, "test", batch_window_ms=50)
+    await writer.start()
+    futures = [writer.submit(_insert(f"v{i}")) for i in range(5)]
+    await writer.stop()
+    assert all(f.done() and not f.exception() for f in futures)
+    assert _count(engine) == 5
+    engine.dispose()